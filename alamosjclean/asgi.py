@@ -5,12 +5,50 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+
+Perfil ASGI: las rutas con versión asíncrona (alamosjclean.urls_asgi) se
+atienden en el event loop sin ocupar un hilo mientras esperan la base de
+datos. Ejemplo:
+
+    uvicorn alamosjclean.asgi:application --workers 4
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alamosjclean.settings')
+# Lo leen los perfiles de base de datos (alamosjclean.bd)
+os.environ.setdefault('ALAMOS_SERVIDOR', 'asgi')
+
+
+class ManejadorASGI(ASGIHandler):
+    """ASGIHandler que resuelve las URL con ``URLCONF_ASGI``"""
+
+    def create_request(self, scope, body_file):
+        request, respuesta_error = super().create_request(scope, body_file)
+        urlconf = getattr(settings, 'URLCONF_ASGI', None)
+        if request is not None and urlconf:
+            request.urlconf = urlconf
+        return request, respuesta_error
+
+
+# Equivalente a get_asgi_application() con el manejador propio
+django.setup(set_prefix=False)
+django_application = ManejadorASGI()
+
+# Importar después de inicializar Django (requiere las apps cargadas)
+from servicios.sse import RUTA_SEGUIMIENTO, aplicacion_seguimiento  # noqa: E402
+
 
-application = get_asgi_application()
+async def application(scope, receive, send):
+    """
+    Enruta el stream SSE de seguimiento fuera del stack de Django; el resto
+    de peticiones va a la aplicación Django normal
+    """
+    if scope['type'] == 'http' and scope['path'] == RUTA_SEGUIMIENTO:
+        await aplicacion_seguimiento(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
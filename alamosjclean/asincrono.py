@@ -0,0 +1,96 @@
+"""
+Decoradores para vistas ``async def``.
+
+En Django 4.2 ``csrf_exempt``, ``require_http_methods``, ``login_required``,
+``cache_control`` y ``condition`` envuelven la vista en una función síncrona:
+con una vista asíncrona devuelven la corrutina sin esperarla y Django deja de
+reconocerla como asíncrona (lo corrige Django 5.0). Estos equivalentes
+mantienen la vista como corrutina para que ASGIHandler la ejecute en el event
+loop sin ocupar un hilo; lo que necesita la base de datos (sesión, usuario,
+validadores) pasa por ``sync_to_async``.
+"""
+from datetime import timezone as dt_timezone
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponseNotAllowed
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def _usuario(request):
+    # Acceder a un atributo evalúa el SimpleLazyObject: lee la sesión y el usuario
+    request.user.pk
+    return request.user
+
+
+async def cargar_usuario(request):
+    """``request.user`` ya resuelto, sin consultar desde el event loop"""
+    return await sync_to_async(_usuario)(request)
+
+
+def exento_csrf(vista):
+    vista.csrf_exempt = True
+    return vista
+
+
+def requiere_metodos(metodos):
+    def decorador(vista):
+        @wraps(vista)
+        async def envoltura(request, *args, **kwargs):
+            if request.method not in metodos:
+                return HttpResponseNotAllowed(metodos)
+            return await vista(request, *args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def requiere_login(vista):
+    @wraps(vista)
+    async def envoltura(request, *args, **kwargs):
+        usuario = await cargar_usuario(request)
+        if not usuario.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await vista(request, *args, **kwargs)
+    return envoltura
+
+
+def control_cache(**opciones):
+    def decorador(vista):
+        @wraps(vista)
+        async def envoltura(request, *args, **kwargs):
+            response = await vista(request, *args, **kwargs)
+            patch_cache_control(response, **opciones)
+            return response
+        return envoltura
+    return decorador
+
+
+def condicion(etag_func=None, last_modified_func=None):
+    """Como ``django.views.decorators.http.condition``; los validadores son síncronos"""
+    def validadores(request, *args, **kwargs):
+        ultima = last_modified_func(request, *args, **kwargs) if last_modified_func else None
+        if ultima:
+            if timezone.is_naive(ultima):
+                ultima = timezone.make_aware(ultima, dt_timezone.utc)
+            ultima = int(ultima.timestamp())
+        etag = etag_func(request, *args, **kwargs) if etag_func else None
+        return (quote_etag(etag) if etag is not None else None), ultima
+
+    def decorador(vista):
+        @wraps(vista)
+        async def envoltura(request, *args, **kwargs):
+            etag, ultima = await sync_to_async(validadores)(request, *args, **kwargs)
+            response = get_conditional_response(request, etag=etag, last_modified=ultima)
+            if response is None:
+                response = await vista(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                if ultima and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(ultima)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            return response
+        return envoltura
+    return decorador
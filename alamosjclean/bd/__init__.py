@@ -0,0 +1,180 @@
+"""
+Perfiles de base de datos seleccionables con la variable de entorno
+``ALAMOS_BD_PERFIL``.
+
+    sqlite      (defecto) db.sqlite3 con WAL, synchronous=NORMAL, mmap y
+                busy_timeout; las transacciones empiezan con BEGIN IMMEDIATE
+    postgresql  conexiones persistentes con health checks, una por hilo de
+                cada worker. El pool de conexiones solo se activa en
+                Django >= 5.1; con el Django 4.2 de requirements.txt no hay
+                pool (ver ``perfil_postgresql``). Bajo ASGI
+                (``ALAMOS_SERVIDOR=asgi``, lo fija alamosjclean.asgi) las
+                conexiones no se reutilizan entre peticiones. Los
+                consumidores de eventos leen con un margen de
+                ``RETRASO_EVENTOS_POSTGRESQL`` segundos
+
+Réplicas de lectura: ``ALAMOS_BD_REPLICAS`` es una lista separada por comas de
+rutas SQLite (perfil sqlite) o de hosts (perfil postgresql, mismas
+credenciales). Se registran como alias ``replica1``, ``replica2``... y
+``servicios.routers.RouterReplicas`` les envía las lecturas de servicios.
+
+El resto de parámetros también se leen del entorno (ver cada función). Este
+módulo se importa desde settings, así que no debe importar nada de django.db.
+"""
+import os
+
+import django
+
+PERFILES = ('sqlite', 'postgresql')
+
+# OPTIONS['pool'] de PostgreSQL existe desde Django 5.1
+POOL_DISPONIBLE = django.VERSION >= (5, 1)
+
+# Motor SQLite propio (alamosjclean/bd/sqlite3/base.py)
+MOTOR_SQLITE = 'alamosjclean.bd.sqlite3'
+
+# Margen de servicios.eventos.leer en PostgreSQL: los ids se asignan al
+# insertar pero se ven al confirmar, así que un id menor puede aparecer después
+# de uno mayor. Debe superar la transacción de escritura más larga.
+RETRASO_EVENTOS_POSTGRESQL = 5
+
+PRAGMAS_SQLITE = {
+    # Lectores y escritor no se bloquean entre sí
+    'journal_mode': 'WAL',
+    # Con WAL, NORMAL solo arriesga la última transacción ante un corte de energía
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'cache_size': -64 * 1024,  # Negativo = KiB
+}
+
+
+def _entero(nombre, defecto):
+    return int(os.environ.get(nombre, defecto))
+
+
+def perfil_sqlite(ruta, busy_timeout_ms=None):
+    """
+    SQLite afinado para varios hilos escribiendo: la espera por el bloqueo la
+    hace SQLite (busy_timeout) y BEGIN IMMEDIATE toma el bloqueo de escritura al
+    empezar la transacción, en lugar de fallar con "database is locked" al
+    pasar de lectura a escritura a mitad de ella.
+    """
+    if busy_timeout_ms is None:
+        busy_timeout_ms = _entero('ALAMOS_BD_BUSY_TIMEOUT_MS', 20000)
+    return {
+        'ENGINE': MOTOR_SQLITE,
+        'NAME': ruta,
+        'OPTIONS': {
+            # Parámetro de sqlite3.connect(), en segundos: instala el busy handler
+            'timeout': busy_timeout_ms / 1000,
+            'pragmas': {**PRAGMAS_SQLITE, 'busy_timeout': busy_timeout_ms},
+            'transaccion_inmediata': True,
+        },
+    }
+
+
+def servidor_asgi():
+    return os.environ.get('ALAMOS_SERVIDOR', 'wsgi') == 'asgi'
+
+
+def tamano_pool(workers=None, hilos=None, conexiones_maximas=None):
+    """
+    Tamaño máximo del pool de cada worker. Cada hilo que atiende peticiones
+    necesita una conexión, pero entre los ``ALAMOS_WORKERS`` workers no deben
+    superar ``ALAMOS_BD_CONEXIONES_MAXIMAS`` (las que admite el servidor menos
+    las de administración; 0 = sin tope). Si el tope no alcanza, los hilos
+    esperan una conexión libre del pool de su worker.
+    """
+    workers = workers if workers is not None else _entero('ALAMOS_WORKERS', 1)
+    hilos = hilos if hilos is not None else _entero('ALAMOS_HILOS_POR_WORKER', 4)
+    if conexiones_maximas is None:
+        conexiones_maximas = _entero('ALAMOS_BD_CONEXIONES_MAXIMAS', 0)
+    tamano = hilos
+    if conexiones_maximas > 0:
+        tamano = min(tamano, conexiones_maximas // max(1, workers))
+    return max(1, tamano)
+
+
+def perfil_postgresql():
+    """
+    PostgreSQL con conexiones persistentes.
+
+    Django 4.2 (la versión de requirements.txt) no tiene pool: este perfil no
+    crea ninguno y cada hilo conserva su conexión ``CONN_MAX_AGE`` segundos, de
+    modo que cada worker mantiene a lo sumo ``ALAMOS_HILOS_POR_WORKER``
+    conexiones abiertas; ``CONN_HEALTH_CHECKS`` descarta las que se cortaron
+    antes de reutilizarlas. Con varios workers el total es workers × hilos y,
+    si supera ``ALAMOS_BD_CONEXIONES_MAXIMAS``, hace falta pgbouncer (modo
+    transaction) delante. A partir de Django 5.1 se usa el pool de psycopg 3
+    de ``tamano_pool()`` conexiones por worker.
+
+    Bajo ASGI las consultas de cada petición corren en hilos de
+    ``sync_to_async`` que no sobreviven a la petición, así que una conexión
+    persistente quedaría abierta sin volver a usarse: ``CONN_MAX_AGE`` pasa a 0
+    y la reutilización queda a cargo de pgbouncer (o del pool en Django >= 5.1).
+    """
+    hilos = _entero('ALAMOS_HILOS_POR_WORKER', 4)
+    configuracion = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('ALAMOS_BD_NOMBRE', 'alamosjclean'),
+        'USER': os.environ.get('ALAMOS_BD_USUARIO', 'alamosjclean'),
+        'PASSWORD': os.environ.get('ALAMOS_BD_PASSWORD', ''),
+        'HOST': os.environ.get('ALAMOS_BD_HOST', 'localhost'),
+        'PORT': os.environ.get('ALAMOS_BD_PUERTO', '5432'),
+        'CONN_MAX_AGE': _entero('ALAMOS_BD_CONN_MAX_AGE', 0 if servidor_asgi() else 600),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'connect_timeout': 5,
+        },
+    }
+    if POOL_DISPONIBLE:
+        # El pool no admite conexiones persistentes: las reemplaza
+        configuracion['CONN_MAX_AGE'] = 0
+        configuracion['OPTIONS']['pool'] = {'min_size': 1, 'max_size': tamano_pool(hilos=hilos)}
+    return configuracion
+
+
+def retraso_lectura_eventos(perfil=None):
+    """
+    EVENTOS_RETRASO_LECTURA del perfil: en SQLite las escrituras son seriales y
+    los ids se ven en orden, así que no hace falta margen.
+    ``ALAMOS_EVENTOS_RETRASO_LECTURA`` lo reemplaza.
+    """
+    perfil = perfil or os.environ.get('ALAMOS_BD_PERFIL', 'sqlite')
+    defecto = RETRASO_EVENTOS_POSTGRESQL if perfil == 'postgresql' else 0
+    return _entero('ALAMOS_EVENTOS_RETRASO_LECTURA', defecto)
+
+
+def base_de_datos(ruta_sqlite, perfil=None):
+    """Configuración de DATABASES['default'] para el perfil pedido"""
+    perfil = perfil or os.environ.get('ALAMOS_BD_PERFIL', 'sqlite')
+    if perfil == 'sqlite':
+        return perfil_sqlite(ruta_sqlite)
+    if perfil == 'postgresql':
+        return perfil_postgresql()
+    raise ValueError(f'Perfil de base de datos desconocido: {perfil} (opciones: {", ".join(PERFILES)})')
+
+
+def replicas(perfil=None, destinos=None):
+    """
+    Alias -> configuración de cada réplica de lectura. En las pruebas cada
+    réplica es un espejo de 'default' (TEST.MIRROR), así que ve sus datos.
+    """
+    perfil = perfil or os.environ.get('ALAMOS_BD_PERFIL', 'sqlite')
+    if destinos is None:
+        destinos = [d.strip() for d in os.environ.get('ALAMOS_BD_REPLICAS', '').split(',') if d.strip()]
+    configuraciones = {}
+    for numero, destino in enumerate(destinos, start=1):
+        if perfil == 'sqlite':
+            configuracion = perfil_sqlite(destino)
+        else:
+            configuracion = {**perfil_postgresql(), 'HOST': destino}
+        configuracion['TEST'] = {'MIRROR': 'default'}
+        configuraciones[f'replica{numero}'] = configuracion
+    return configuraciones
+
+
+def bases_de_datos(ruta_sqlite, perfil=None):
+    """DATABASES completo: 'default' (primaria) y las réplicas configuradas"""
+    return {'default': base_de_datos(ruta_sqlite, perfil), **replicas(perfil)}
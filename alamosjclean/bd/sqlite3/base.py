@@ -0,0 +1,38 @@
+"""
+Motor SQLite con PRAGMAs configurables y transacciones BEGIN IMMEDIATE.
+
+OPTIONS admite, además de los parámetros de ``sqlite3.connect()``:
+
+    pragmas                 dict de PRAGMA -> valor aplicados a cada conexión nueva
+    transaccion_inmediata   si es True, atomic() empieza con BEGIN IMMEDIATE
+
+Con el BEGIN diferido por defecto, una transacción que lee y después escribe
+(como ``agenda.agendar``) puede fallar de inmediato con "database is locked" al
+intentar promover su bloqueo, sin que el busy_timeout ayude. BEGIN IMMEDIATE
+toma el bloqueo de escritura al empezar, así que las transacciones concurrentes
+esperan su turno; también hace efectivo en SQLite el select_for_update() que
+la agenda usa para serializar las reservas.
+"""
+from django.db.backends.sqlite3 import base
+
+OPCIONES_PROPIAS = ('pragmas', 'transaccion_inmediata')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        for opcion in OPCIONES_PROPIAS:
+            kwargs.pop(opcion, None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for pragma, valor in self.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            conn.execute(f'PRAGMA {pragma} = {valor}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.settings_dict['OPTIONS'].get('transaccion_inmediata'):
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -0,0 +1,42 @@
+"""
+Caché de las sesiones (``CACHES['sesiones']``) según la variable de entorno
+``ALAMOS_CACHE_SESIONES``.
+
+    redis://host:6379/1       RedisCache de Django (requiere redis)
+    memcached://host:11211    PyMemcacheCache (requiere pymemcache)
+    (vacía)                   LocMemCache del proceso; solo con un worker
+
+``authentication.sesiones`` sirve las sesiones desde esta caché: con una caché
+por proceso, un logout, ``flush()`` o ``cycle_key()`` atendido por un worker no
+se ve en los demás hasta ``SESION_CACHE_TTL``. Por eso con ``ALAMOS_WORKERS``
+> 1 la caché local es un error de configuración (``authentication.E001``).
+
+Este módulo se importa desde settings, así que no debe importar nada de django.
+"""
+import os
+
+LOCMEM = 'django.core.cache.backends.locmem.LocMemCache'
+
+BACKENDS = {
+    'redis://': 'django.core.cache.backends.redis.RedisCache',
+    'rediss://': 'django.core.cache.backends.redis.RedisCache',
+    'memcached://': 'django.core.cache.backends.memcached.PyMemcacheCache',
+}
+
+
+def workers():
+    """Procesos del servidor que atienden peticiones (``ALAMOS_WORKERS``)"""
+    return max(1, int(os.environ.get('ALAMOS_WORKERS', 1)))
+
+
+def cache_sesiones(url=None):
+    """Configuración de CACHES['sesiones'] para ``url`` o ALAMOS_CACHE_SESIONES"""
+    url = os.environ.get('ALAMOS_CACHE_SESIONES', '') if url is None else url
+    if not url:
+        return {'BACKEND': LOCMEM, 'LOCATION': 'sesiones'}
+    for esquema, backend in BACKENDS.items():
+        if url.startswith(esquema):
+            # Memcached recibe host:puerto; Redis, la URL completa
+            ubicacion = url[len(esquema):] if esquema == 'memcached://' else url
+            return {'BACKEND': backend, 'LOCATION': ubicacion}
+    raise ValueError(f'ALAMOS_CACHE_SESIONES no reconocida: {url} (use redis://... o memcached://...)')
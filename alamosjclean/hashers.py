@@ -0,0 +1,52 @@
+"""
+Perfiles de hashing de contraseñas seleccionables con la variable de entorno
+``ALAMOS_HASHER_PERFIL``.
+
+    auto    (defecto) argon2 si argon2-cffi está instalado; si no, scrypt
+    argon2  Argon2id (requiere argon2-cffi)
+    scrypt  scrypt de hashlib (OpenSSL), sin dependencias
+    pbkdf2  PBKDF2-SHA256, el hasher por defecto de Django
+
+El primer hasher de la lista hashea las contraseñas nuevas; el resto solo
+verifica las existentes, que Django rehace con el preferido en el siguiente
+login correcto. Los parámetros de cada uno están en authentication/hashers.py.
+
+Este módulo se importa desde settings, así que no debe importar nada de django.
+"""
+import importlib.util
+import os
+
+HASHERS = {
+    'argon2': 'authentication.hashers.Argon2Hasher',
+    'scrypt': 'authentication.hashers.ScryptHasher',
+    'pbkdf2': 'authentication.hashers.PBKDF2Hasher',
+}
+
+# Formatos que solo se verifican (hashes creados con la configuración por defecto de Django)
+HEREDADOS = [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+
+def argon2_disponible():
+    return importlib.util.find_spec('argon2') is not None
+
+
+def perfil_hashers(perfil=None):
+    """Valor de PASSWORD_HASHERS para el perfil indicado o el de ALAMOS_HASHER_PERFIL"""
+    perfil = perfil or os.environ.get('ALAMOS_HASHER_PERFIL', 'auto')
+    if perfil == 'auto':
+        perfil = 'argon2' if argon2_disponible() else 'scrypt'
+    if perfil not in HASHERS:
+        raise ValueError(f'Perfil de hashing desconocido: {perfil} (opciones: auto, {", ".join(HASHERS)})')
+    if perfil == 'argon2' and not argon2_disponible():
+        raise ValueError('El perfil de hashing argon2 requiere argon2-cffi (pip install argon2-cffi)')
+
+    preferido = HASHERS[perfil]
+    # argon2 solo se lista si está instalado: sin la librería no puede verificar
+    restantes = [
+        ruta for nombre, ruta in HASHERS.items()
+        if ruta != preferido and (nombre != 'argon2' or argon2_disponible())
+    ]
+    return [preferido] + restantes + HEREDADOS
@@ -0,0 +1,54 @@
+"""
+Paginación con conteo estimado para listados grandes del admin.
+
+``COUNT(*)`` sobre una tabla de cientos de miles de filas recorre la tabla
+entera en cada página del changelist. Sin filtros, ``PaginadorEstimado`` usa
+las estadísticas del planificador (``pg_class.reltuples`` en PostgreSQL,
+``sqlite_stat1`` en SQLite tras un ANALYZE) si la tabla supera
+``ADMIN_CONTEO_ESTIMADO_MINIMO`` filas; con filtros, o si no hay
+estadísticas, cuenta normalmente.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+CONTEO_ESTIMADO_MINIMO_DEFECTO = 10000
+
+
+def estimar_filas(modelo, alias):
+    """Filas aproximadas de la tabla del modelo, o None si no hay estadísticas"""
+    conexion = connections[alias]
+    tabla = modelo._meta.db_table
+    try:
+        with conexion.cursor() as cursor:
+            if conexion.vendor == 'postgresql':
+                # to_regclass devuelve NULL en lugar de fallar (y abortar la transacción)
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)', [
+                    conexion.ops.quote_name(tabla)
+                ])
+                fila = cursor.fetchone()
+                # -1 (o 0 en versiones antiguas) si la tabla nunca se analizó
+                return fila[0] if fila and fila[0] > 0 else None
+            if conexion.vendor == 'sqlite':
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [tabla])
+                # El primer número de cada fila es el total de filas de la tabla
+                filas = [int(stat.split()[0]) for stat, in cursor.fetchall() if stat]
+                return max(filas) if filas else None
+    except DatabaseError:
+        # sqlite_stat1 no existe hasta el primer ANALYZE
+        return None
+    return None
+
+
+class PaginadorEstimado(Paginator):
+    @cached_property
+    def count(self):
+        consulta = self.object_list
+        if isinstance(consulta, QuerySet) and not consulta.query.where and not consulta.query.distinct:
+            minimo = getattr(settings, 'ADMIN_CONTEO_ESTIMADO_MINIMO', CONTEO_ESTIMADO_MINIMO_DEFECTO)
+            estimado = estimar_filas(consulta.model, consulta.db)
+            if estimado is not None and estimado >= minimo:
+                return estimado
+        return super().count
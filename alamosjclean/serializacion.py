@@ -0,0 +1,128 @@
+"""
+Serialización JSON compartida por las vistas de la API.
+
+``Serializador`` convierte filas de ``values_list()`` en dicts con las
+conversiones de cada columna resueltas una sola vez al construirlo: las
+etiquetas de choices salen de una tabla precalculada (no de
+``get_*_display()`` por fila) y las fechas y decimales se pasan a texto sin
+instanciar el modelo.
+
+``dumps`` y ``RespuestaJSON`` codifican con orjson si está instalado y con el
+módulo json de la biblioteca estándar si no. Los tipos que orjson no conoce
+(Decimal, lazy strings) y las fechas pasan por ``DjangoJSONEncoder``, así que
+ambos backends producen los mismos valores que ``JsonResponse``.
+"""
+import json
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models.constants import LOOKUP_SEP
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # Dependencia opcional: sin ella se usa json de la stdlib
+    orjson = None
+
+_codificador = DjangoJSONEncoder()
+
+
+def backend():
+    """Backend en uso: 'orjson' o 'json' (SERIALIZACION_JSON_BACKEND lo fuerza)"""
+    preferido = getattr(settings, 'SERIALIZACION_JSON_BACKEND', 'auto')
+    if preferido == 'json' or orjson is None:
+        return 'json'
+    return 'orjson'
+
+
+def dumps(datos):
+    """Codifica ``datos`` como JSON compacto en UTF-8 (bytes)"""
+    if backend() == 'orjson':
+        return orjson.dumps(datos, default=_codificador.default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(datos, cls=DjangoJSONEncoder, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class RespuestaJSON(HttpResponse):
+    """Equivalente a JsonResponse (para dicts) con el backend de ``dumps``"""
+
+    def __init__(self, datos, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(datos), **kwargs)
+
+
+def _texto_fecha(valor):
+    return None if valor is None else valor.isoformat()
+
+
+def _texto_decimal(valor):
+    return None if valor is None else str(valor)
+
+
+def _campo(modelo, lookup):
+    """Campo final de un lookup como 'cuadrilla__nombre', o None si no es un campo"""
+    campo = None
+    for parte in lookup.split(LOOKUP_SEP):
+        try:
+            campo = modelo._meta.get_field(parte)
+        except FieldDoesNotExist:
+            return None
+        if campo.is_relation and campo.related_model is not None:
+            modelo = campo.related_model
+    return campo
+
+
+def _conversion(campo):
+    """Función que pasa el valor de la columna a un tipo JSON, o None si ya lo es"""
+    if campo is None:
+        return None
+    if campo.choices:
+        etiquetas = {clave: str(etiqueta) for clave, etiqueta in campo.flatchoices}
+        return lambda valor: etiquetas.get(valor, valor)
+    if isinstance(campo, (models.DateTimeField, models.DateField, models.TimeField)):
+        return _texto_fecha
+    if isinstance(campo, models.DecimalField):
+        return _texto_decimal
+    return None
+
+
+class Serializador:
+    """
+    Convierte filas de ``values_list(*serializador.lookups)`` en dicts.
+
+    ``columnas`` son nombres de campo o pares (clave de salida, lookup), p. ej.
+    ('cuadrilla', 'cuadrilla__nombre').
+    """
+
+    def __init__(self, modelo, columnas):
+        pares = [(c, c) if isinstance(c, str) else tuple(c) for c in columnas]
+        self.claves = tuple(clave for clave, _ in pares)
+        self.lookups = tuple(lookup for _, lookup in pares)
+        self._conversiones = tuple(_conversion(_campo(modelo, lookup)) for lookup in self.lookups)
+        self._pares = tuple(zip(self.claves, self._conversiones))
+
+    def indice(self, clave):
+        """Posición de ``clave`` en las tuplas (p. ej. para armar un cursor)"""
+        return self.claves.index(clave)
+
+    def fila(self, valores):
+        return {
+            clave: valor if conversion is None else conversion(valor)
+            for (clave, conversion), valor in zip(self._pares, valores)
+        }
+
+    def filas(self, filas):
+        fila = self.fila
+        return [fila(valores) for valores in filas]
+
+    def instancia(self, objeto):
+        """Serializa una instancia ya cargada siguiendo los lookups por atributos"""
+        valores = []
+        for lookup in self.lookups:
+            valor = objeto
+            for parte in lookup.split(LOOKUP_SEP):
+                valor = getattr(valor, parte, None) if valor is not None else None
+            valores.append(valor)
+        return self.fila(valores)
+
@@ -12,6 +12,10 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 
+from alamosjclean.bd import bases_de_datos, retraso_lectura_eventos
+from alamosjclean.caches import cache_sesiones, workers
+from alamosjclean.hashers import perfil_hashers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -40,20 +44,27 @@ INSTALLED_APPS = [
     'corsheaders',
     'authentication',
     'servicios',
+    'estaticos',
+    'metricas',
 ]
 
 MIDDLEWARE = [
+    'metricas.middleware.MetricasMiddleware',  # Primero: mide también el resto de middlewares
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'servicios.routers.FijacionPrimariaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'servicios.eventos.ActorEventosMiddleware',  # Autor de los eventos de auditoría
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'alamosjclean.urls'
+# Bajo ASGI (alamosjclean.asgi) las rutas con versión asíncrona usan sus vistas async
+URLCONF_ASGI = 'alamosjclean.urls_asgi'
 
 TEMPLATES = [
     {
@@ -72,18 +83,41 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'alamosjclean.wsgi.application'
+ASGI_APPLICATION = 'alamosjclean.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+# Perfil según ALAMOS_BD_PERFIL: 'sqlite' (WAL, defecto) o 'postgresql'
+# (conexiones persistentes), más las réplicas de ALAMOS_BD_REPLICAS.
+# El pool de conexiones de PostgreSQL solo se activa en Django >= 5.1; con
+# Django 4.2 no hay pool y conviene pgbouncer delante.
+# Ver alamosjclean/bd/__init__.py
+
+DATABASES = bases_de_datos(BASE_DIR / 'db.sqlite3')
+
+# Las lecturas de servicios van a las réplicas (si hay); tras un POST/PUT/PATCH/DELETE
+# el cliente lee de la primaria durante REPLICA_FIJACION_SEGUNDOS
+DATABASE_ROUTERS = ['servicios.routers.RouterReplicas']
+REPLICA_FIJACION_SEGUNDOS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Las sesiones van en su propia caché, que con varios workers debe ser compartida:
+# ALAMOS_CACHE_SESIONES=redis://... o memcached://... (ver alamosjclean/caches.py)
 
-DATABASES = {
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'alamosjclean',
+    },
+    'sesiones': cache_sesiones(),
 }
 
+# Procesos del servidor (ALAMOS_WORKERS); con más de uno la caché de sesiones no puede ser local
+SERVIDOR_WORKERS = workers()
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -104,6 +138,33 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/4.2/topics/auth/passwords/
+# Perfil según ALAMOS_HASHER_PERFIL: 'auto' (argon2 si está instalado argon2-cffi,
+# si no scrypt), 'argon2', 'scrypt' o 'pbkdf2'. Los hashes existentes se rehacen
+# con el perfil elegido en el siguiente login. Ver alamosjclean/hashers.py
+
+PASSWORD_HASHERS = perfil_hashers()
+
+# Los hashes se calculan en un pool de procesos (authentication/hashers.py)
+HASHING_PROCESOS = None  # None = uno por núcleo; 0 = en el hilo de la petición
+HASHING_COLA_MAXIMA = 64  # Hashes esperando proceso; con la cola llena el login espera
+HASHING_ESPERA_MAXIMA = 2  # Segundos de espera por un cupo antes de responder 503
+
+
+# Authentication backends
+# UsuarioCacheBackend evita la consulta a 'usuarios' en cada petición autenticada.
+# ModelBackend se mantiene para que las sesiones iniciadas con él sigan siendo válidas.
+
+AUTHENTICATION_BACKENDS = [
+    'authentication.backends.UsuarioCacheBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+USUARIO_CACHE_TTL = 60  # Segundos que un usuario vive en la caché del proceso
+USUARIO_CACHE_TAMANO_MAXIMO = 1024  # Usuarios en caché antes de desalojar el menos usado
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -124,10 +185,18 @@ STATICFILES_DIRS = [
     BASE_DIR,  # Directorio raíz del proyecto donde están los archivos estáticos
 ]
 
+# Archivos del frontend con hash y precomprimidos (manage.py construir_estaticos).
+# Para generar también .br instalar el paquete opcional 'brotli'.
+ESTATICOS_BUILD_DIR = BASE_DIR / 'build' / 'estaticos'
+
 # Media files (uploaded files)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Procesamiento de fotos de perfil (variantes WebP/JPEG) en hilos de fondo
+FOTOS_PERFIL_ASINCRONO = True
+FOTOS_PERFIL_WORKERS = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -164,7 +233,7 @@ CSRF_TRUSTED_ORIGINS = [
 
 # Configuración de cookies de sesión
 SESSION_COOKIE_NAME = 'sessionid'
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+SESSION_ENGINE = 'authentication.sesiones'  # Caché en memoria con escritura diferida en django_session
 SESSION_COOKIE_SAMESITE = 'Lax'
 SESSION_COOKIE_SECURE = False
 SESSION_COOKIE_HTTPONLY = False
@@ -172,6 +241,54 @@ SESSION_COOKIE_DOMAIN = None  # Permitir cookies para cualquier dominio
 SESSION_COOKIE_AGE = 86400  # 24 horas
 SESSION_SAVE_EVERY_REQUEST = True
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
+SESSION_CACHE_ALIAS = 'sesiones'
+SESION_UMBRAL_RENOVACION = 300  # Segundos que puede atrasarse la expiración guardada antes de reescribirla
+SESION_CACHE_TTL = 300  # Segundos que una sesión vive en la caché antes de releerse de la BD
+
+# Facturación en lote (manage.py generar_facturas)
+FACTURACION_PREFIJO = 'FV'  # numero_factura = prefijo + número de 10 dígitos
+FACTURACION_DIAS_VENCIMIENTO = 30
+
+# Backend de pub/sub para el stream de seguimiento (SSE); reemplazable por uno
+# que reparta mensajes entre varios workers
+SEGUIMIENTO_PUBSUB_BACKEND = 'servicios.pubsub.BackendMemoria'
+
+# Geocodificación de direcciones para el despacho por cercanía. El proveedor local
+# no usa red: nomenclatura urbana (cuadrícula de Bogotá) y un nomenclátor CSV
+GEOCODIFICACION_PROVEEDOR = 'servicios.geocodificacion.ProveedorLocal'
+GEOCODIFICACION_NOMENCLATOR = BASE_DIR / 'servicios' / 'datos' / 'nomenclator.csv'
+GEOCODIFICACION_CACHE = 'default'
+GEOCODIFICACION_CACHE_TTL = 30 * 24 * 3600  # Segundos; también se guardan las direcciones no encontradas
+
+# Registro de auditoría de servicios (tabla eventos_servicio, manage.py podar_eventos)
+EVENTOS_MESES_RETENCION = 12  # Meses completos que se conservan además del actual
+# Segundos de margen al leer eventos por cursor: 0 en SQLite, 5 en PostgreSQL (ALAMOS_EVENTOS_RETRASO_LECTURA).
+# Debe superar la transacción de escritura más larga o un evento confirmado tarde se salta
+EVENTOS_RETRASO_LECTURA = retraso_lectura_eventos()
+
+# Notificaciones (servicios/notificaciones.py): bandeja de salida que vacía manage.py enviar_notificaciones
+NOTIFICACIONES_CANALES = ['email']  # Canales de cada notificación nueva: 'email', 'sms'
+NOTIFICACIONES_TRANSPORTES = {
+    'email': 'servicios.notificaciones.TransporteEmail',
+    'sms': 'servicios.notificaciones.TransporteConsola',
+}
+NOTIFICACIONES_ARCHIVO = BASE_DIR / 'notificaciones.jsonl'  # Destino de TransporteArchivo
+NOTIFICACIONES_MAXIMO_INTENTOS = 8
+NOTIFICACIONES_ESPERA_BASE = 30  # Segundos antes del primer reintento; se duplica en cada uno
+NOTIFICACIONES_ESPERA_MAXIMA = 3600
+
+# Instrumentación por vista expuesta en /metricas/ (formato Prometheus)
+METRICAS_HABILITADAS = True
+METRICAS_MUESTREO = 1.0  # Fracción de peticiones instrumentadas (0 = ninguna)
+METRICAS_UMBRAL_N_MAS_1 = 5  # Repeticiones de una misma consulta que se reportan como N+1
+METRICAS_TOKEN = ''  # Bearer token del scraper; vacío = solo usuarios staff
+
+# Admin: sin filtros, las tablas con más filas que esto muestran un conteo estimado
+# (estadísticas de PostgreSQL o ANALYZE de SQLite) en lugar de COUNT(*)
+ADMIN_CONTEO_ESTIMADO_MINIMO = 10000
+
+# Codificador JSON de la API: 'auto' usa orjson si está instalado; 'json', la stdlib
+SERIALIZACION_JSON_BACKEND = 'auto'
 
 # Configuración de cookies CSRF
 CSRF_COOKIE_NAME = 'csrftoken'
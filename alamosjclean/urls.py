@@ -19,26 +19,18 @@ from django.urls import path, include
 from django.views.generic import TemplateView
 from django.conf import settings
 from django.conf.urls.static import static
-from django.http import FileResponse
-from django.shortcuts import get_object_or_404
-import os
-
-def serve_static_file(request, filename):
-    """Servir archivos estáticos desde el directorio raíz"""
-    file_path = os.path.join(settings.BASE_DIR, filename)
-    if os.path.exists(file_path):
-        return FileResponse(open(file_path, 'rb'))
-    else:
-        from django.http import Http404
-        raise Http404("File not found")
+from estaticos.views import servir_activo, servir_archivo_estable
+from metricas.views import metricas
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('authentication.urls')),
     path('api/servicios/', include('servicios.urls')),
-    path('styles.css', serve_static_file, {'filename': 'styles.css'}, name='styles'),
-    path('script.js', serve_static_file, {'filename': 'script.js'}, name='script'),
-    path('Logo2.png', serve_static_file, {'filename': 'Logo2.png'}, name='logo'),
+    path('metricas/', metricas, name='metricas'),
+    path('assets/<str:nombre>', servir_activo, name='activo'),
+    path('styles.css', servir_archivo_estable, {'filename': 'styles.css'}, name='styles'),
+    path('script.js', servir_archivo_estable, {'filename': 'script.js'}, name='script'),
+    path('Logo2.png', servir_archivo_estable, {'filename': 'Logo2.png'}, name='logo'),
     path('', TemplateView.as_view(template_name='index.html'), name='home'),
 ]
 
@@ -0,0 +1,51 @@
+"""
+URLconf del perfil ASGI: las mismas rutas, nombres y namespaces que
+``alamosjclean.urls``, con las vistas que tienen versión asíncrona
+reemplazadas por ella. ``alamosjclean.asgi`` la asigna a cada petición.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import URLPattern, URLResolver
+
+from authentication import views_async as authentication_async
+from servicios import views_async as servicios_async
+
+from .urls import urlpatterns as urlpatterns_wsgi
+
+# Nombre de ruta (con namespace) -> vista asíncrona
+VISTAS_ASINCRONAS = {
+    'authentication:login': authentication_async.login_usuario,
+    'authentication:verificar_sesion': authentication_async.verificar_sesion,
+    'servicios:agendar': servicios_async.agendar_servicio,
+    'servicios:mis_servicios': servicios_async.mis_servicios,
+    'servicios:cancelar': servicios_async.cancelar_servicio,
+}
+
+
+def _reemplazar_vistas(patrones, namespace=None, reemplazadas=None):
+    resultado = []
+    for patron in patrones:
+        if isinstance(patron, URLResolver):
+            interno = ':'.join(filter(None, [namespace, patron.namespace]))
+            resultado.append(URLResolver(
+                patron.pattern, _reemplazar_vistas(patron.url_patterns, interno, reemplazadas),
+                patron.default_kwargs, patron.app_name, patron.namespace,
+            ))
+            continue
+        nombre = ':'.join(filter(None, [namespace, patron.name]))
+        vista = VISTAS_ASINCRONAS.get(nombre) if patron.name else None
+        if vista is None:
+            resultado.append(patron)
+        else:
+            resultado.append(URLPattern(patron.pattern, vista, patron.default_args, patron.name))
+            reemplazadas.add(nombre)
+    return resultado
+
+
+_reemplazadas = set()
+urlpatterns = _reemplazar_vistas(urlpatterns_wsgi, reemplazadas=_reemplazadas)
+
+# Una ruta renombrada dejaría su vista asíncrona sin usar sin que nadie lo note
+if _reemplazadas != set(VISTAS_ASINCRONAS):
+    raise ImproperlyConfigured(
+        f'Rutas sin versión asíncrona: {", ".join(sorted(set(VISTAS_ASINCRONAS) - _reemplazadas))}'
+    )
@@ -1,3 +1,20 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin
 
-# Register your models here.
+from alamosjclean.paginacion import PaginadorEstimado
+
+from .models import Usuario
+
+
+@admin.register(Usuario)
+class UsuarioAdmin(UserAdmin):
+    fieldsets = UserAdmin.fieldsets + (
+        ('Perfil', {'fields': ('telefono', 'direccion', 'foto_perfil', 'activo', 'fecha_registro')}),
+    )
+    readonly_fields = ('fecha_registro',)
+    list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'activo')
+    list_filter = ('is_staff', 'is_superuser', 'activo')
+    # Lo usa el autocompletado de usuario en los servicios: prefijos, no LIKE '%...%'
+    search_fields = ('^username', '^email', '^first_name', '^last_name')
+    paginator = PaginadorEstimado
+    show_full_result_count = False
@@ -0,0 +1,119 @@
+"""
+Backend de autenticación con caché de usuarios en memoria del proceso.
+
+``get_user()`` se ejecuta en cada petición autenticada (AuthenticationMiddleware)
+y con ModelBackend cuesta una consulta a ``usuarios``. Aquí el usuario se sirve
+desde una caché LRU con TTL; las señales de guardado/borrado de Usuario la
+invalidan (ver ``authentication.signals``) y el TTL acota cuánto puede tardar en
+verse un cambio hecho por otro proceso.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth import get_user_model
+
+TTL_DEFECTO = 60
+TAMANO_MAXIMO_DEFECTO = 1024
+
+
+class CacheUsuarios:
+    """
+    Caché LRU de usuarios por id con TTL.
+
+    Cada invalidación avanza un contador de generación y se anota en el
+    usuario; una lectura que empezó antes de la última invalidación de su
+    usuario no guarda el resultado, porque puede estar desactualizado. Las
+    anotaciones se acotan a ``tamano_maximo`` como las entradas: al olvidar
+    la más antigua su generación pasa a ser el piso de todos los usuarios sin
+    anotación, así que una lectura de antes del piso no se guarda (se pierde
+    una entrada, nunca se guarda una desactualizada).
+    """
+
+    def __init__(self, ttl=TTL_DEFECTO, tamano_maximo=TAMANO_MAXIMO_DEFECTO):
+        self.ttl = ttl
+        self.tamano_maximo = tamano_maximo
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        self._generacion = 0
+        # usuario_id -> generación de su última invalidación, de la más antigua a la más reciente
+        self._invalidaciones = OrderedDict()
+        self._piso = 0
+
+    def _invalidado_en(self, usuario_id):
+        return self._invalidaciones.get(usuario_id, self._piso)
+
+    def obtener(self, usuario_id, cargar):
+        """
+        Devuelve una copia del usuario en caché o lo carga con ``cargar()``
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(usuario_id)
+            if entrada is not None:
+                expira, usuario = entrada
+                if expira > ahora:
+                    self._entradas.move_to_end(usuario_id)
+                    # Copia: cada petición puede modificar su instancia sin afectar a las demás
+                    return copy.copy(usuario)
+                del self._entradas[usuario_id]
+            inicio = self._generacion
+
+        usuario = cargar()
+        if usuario is None:
+            return None
+
+        with self._lock:
+            if self._invalidado_en(usuario_id) <= inicio:
+                self._entradas[usuario_id] = (ahora + self.ttl, copy.copy(usuario))
+                self._entradas.move_to_end(usuario_id)
+                while len(self._entradas) > self.tamano_maximo:
+                    self._entradas.popitem(last=False)
+        return usuario
+
+    def invalidar(self, usuario_id):
+        with self._lock:
+            self._generacion += 1
+            self._invalidaciones[usuario_id] = self._generacion
+            self._invalidaciones.move_to_end(usuario_id)
+            while len(self._invalidaciones) > self.tamano_maximo:
+                _, generacion = self._invalidaciones.popitem(last=False)
+                self._piso = max(self._piso, generacion)
+            self._entradas.pop(usuario_id, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._invalidaciones.clear()
+            self._piso = self._generacion
+
+
+cache_usuarios = CacheUsuarios(
+    ttl=getattr(settings, 'USUARIO_CACHE_TTL', TTL_DEFECTO),
+    tamano_maximo=getattr(settings, 'USUARIO_CACHE_TAMANO_MAXIMO', TAMANO_MAXIMO_DEFECTO),
+)
+
+
+class UsuarioCacheBackend(ModelBackend):
+    """
+    ModelBackend que resuelve ``get_user()`` desde ``cache_usuarios``
+    """
+
+    def get_user(self, user_id):
+        Usuario = get_user_model()
+        try:
+            user_id = Usuario._meta.pk.to_python(user_id)
+        except Exception:
+            return None
+
+        def cargar():
+            try:
+                return Usuario._default_manager.get(pk=user_id)
+            except Usuario.DoesNotExist:
+                return None
+
+        user = cache_usuarios.obtener(user_id, cargar)
+        return user if user is not None and self.user_can_authenticate(user) else None
@@ -0,0 +1,28 @@
+"""
+Comprobaciones de configuración (``manage.py check``)
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+MOTOR_SESIONES = 'authentication.sesiones'
+CACHE_LOCAL = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@register(Tags.caches)
+def cache_sesiones_compartida(app_configs=None, **kwargs):
+    """
+    Con varios workers las sesiones necesitan una caché compartida: con una
+    por proceso, un logout en un worker no se ve en los demás hasta que vence
+    SESION_CACHE_TTL y la sesión sigue autenticada ahí.
+    """
+    if settings.SESSION_ENGINE != MOTOR_SESIONES:
+        return []
+    workers = getattr(settings, 'SERVIDOR_WORKERS', 1)
+    backend = settings.CACHES.get(settings.SESSION_CACHE_ALIAS, {}).get('BACKEND')
+    if workers > 1 and backend == CACHE_LOCAL:
+        return [Error(
+            f'La caché de sesiones "{settings.SESSION_CACHE_ALIAS}" es local al proceso y hay {workers} workers',
+            hint='Defina ALAMOS_CACHE_SESIONES=redis://... o memcached://... (ver alamosjclean/caches.py)',
+            id='authentication.E001',
+        )]
+    return []
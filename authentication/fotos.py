@@ -0,0 +1,169 @@
+"""
+Procesamiento en segundo plano de las fotos de perfil.
+
+El registro solo guarda el archivo subido; después del commit se encola su
+procesamiento, que genera variantes redimensionadas en WebP y JPEG sin EXIF con
+nombres derivados del hash del contenido. Dos subidas idénticas comparten las
+mismas variantes y el archivo original se elimina al terminar.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .backends import cache_usuarios
+from .models import Usuario
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO = 'fotos_perfil'
+
+# Lado máximo en píxeles de cada variante
+TAMANOS = {
+    'pequena': 64,
+    'mediana': 256,
+    'grande': 1024,
+}
+
+FORMATOS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _obtener_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'FOTOS_PERFIL_WORKERS', 2),
+                    thread_name_prefix='fotos-perfil',
+                )
+    return _executor
+
+
+def nombre_variante(digest, tamano, formato):
+    extension = 'jpg' if formato == 'jpeg' else formato
+    return f'{DIRECTORIO}/{digest}_{tamano}.{extension}'
+
+
+def foto_perfil_url(usuario, tamano='mediana', formato='webp'):
+    """
+    URL de la variante pedida, o la del archivo subido si aún no se procesó
+    """
+    variante = (usuario.foto_perfil_variantes or {}).get(tamano, {}).get(formato)
+    if variante:
+        return default_storage.url(variante)
+    return usuario.foto_perfil.url if usuario.foto_perfil else None
+
+
+def foto_perfil_variantes_urls(usuario):
+    return {
+        tamano: {formato: default_storage.url(nombre) for formato, nombre in formatos.items()}
+        for tamano, formatos in (usuario.foto_perfil_variantes or {}).items()
+    }
+
+
+def _generar_variantes(contenido, digest):
+    imagen = Image.open(BytesIO(contenido))
+    # Aplicar la orientación EXIF antes de descartar los metadatos
+    imagen = ImageOps.exif_transpose(imagen)
+    if imagen.mode in ('RGBA', 'LA', 'P'):
+        imagen = imagen.convert('RGBA')
+        fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+        fondo.paste(imagen, mask=imagen.split()[-1])
+        imagen = fondo
+    elif imagen.mode != 'RGB':
+        imagen = imagen.convert('RGB')
+
+    variantes = {}
+    for tamano, lado in TAMANOS.items():
+        reducida = imagen.copy()
+        reducida.thumbnail((lado, lado), Image.LANCZOS)
+        variantes[tamano] = {}
+        for formato, (formato_pil, opciones) in FORMATOS.items():
+            nombre = nombre_variante(digest, tamano, formato)
+            if not default_storage.exists(nombre):
+                salida = BytesIO()
+                # Pillow no copia el EXIF al guardar si no se pasa explícitamente
+                reducida.save(salida, formato_pil, **opciones)
+                default_storage.save(nombre, ContentFile(salida.getvalue()))
+            variantes[tamano][formato] = nombre
+    return variantes
+
+
+def _variantes_existentes(digest):
+    variantes = {
+        tamano: {formato: nombre_variante(digest, tamano, formato) for formato in FORMATOS}
+        for tamano in TAMANOS
+    }
+    if all(default_storage.exists(nombre) for formatos in variantes.values() for nombre in formatos.values()):
+        return variantes
+    return None
+
+
+def procesar_foto_perfil(usuario_id):
+    """
+    Genera las variantes de la foto de perfil del usuario y actualiza sus campos
+    """
+    usuario = Usuario.objects.filter(pk=usuario_id).only('foto_perfil', 'foto_perfil_hash').first()
+    if usuario is None or not usuario.foto_perfil:
+        return
+    nombre_original = usuario.foto_perfil.name
+
+    with usuario.foto_perfil.open('rb') as archivo:
+        contenido = archivo.read()
+    digest = hashlib.sha256(contenido).hexdigest()[:32]
+    if usuario.foto_perfil_hash == digest:
+        return
+
+    try:
+        variantes = _variantes_existentes(digest) or _generar_variantes(contenido, digest)
+    except (OSError, Image.DecompressionBombError) as e:
+        logger.warning('Foto de perfil inválida para el usuario %s: %s', usuario_id, e)
+        return
+
+    nombre_final = variantes['grande']['jpeg']
+    # Update condicional: si el usuario subió otra foto mientras tanto, no pisarla
+    actualizados = Usuario.objects.filter(pk=usuario_id, foto_perfil=nombre_original).update(
+        foto_perfil=nombre_final,
+        foto_perfil_hash=digest,
+        foto_perfil_variantes=variantes,
+    )
+    # update() no dispara post_save
+    cache_usuarios.invalidar(usuario_id)
+    if actualizados and nombre_original != nombre_final:
+        default_storage.delete(nombre_original)
+
+
+def _procesar_en_segundo_plano(usuario_id):
+    try:
+        procesar_foto_perfil(usuario_id)
+    except Exception:
+        logger.exception('Error procesando la foto de perfil del usuario %s', usuario_id)
+    finally:
+        close_old_connections()
+
+
+def encolar_procesamiento(usuario_id):
+    """
+    Programa el procesamiento para después del commit sin bloquear la petición
+    """
+    def encolar():
+        if getattr(settings, 'FOTOS_PERFIL_ASINCRONO', True):
+            _obtener_executor().submit(_procesar_en_segundo_plano, usuario_id)
+        else:
+            procesar_foto_perfil(usuario_id)
+
+    transaction.on_commit(encolar)
@@ -0,0 +1,191 @@
+"""
+Hashers de contraseñas con parámetros ajustados que calculan el hash en un
+pool de procesos acotado.
+
+Cada hash ocupa un núcleo entre decenas y cientos de milisegundos; en el hilo
+de la petición, un pico de inicios de sesión deja sin hilos al worker. Aquí el
+cálculo corre en ``HASHING_PROCESOS`` procesos (por defecto uno por núcleo) y a
+lo sumo ``HASHING_COLA_MAXIMA`` hashes más esperan turno. Si no hay cupo en
+``HASHING_ESPERA_MAXIMA`` segundos se lanza PoolHashingSaturado y las vistas
+responden 503: mejor rechazar pronto que acumular logins que el cliente ya
+abandonó. Los tiempos de espera, la duración, los pendientes y los rechazos se
+publican en /metricas/.
+
+Los formatos son los de los hashers de Django (mismo ``algorithm``), así que
+los hashes existentes se siguen verificando y ``must_update`` los rehace con los
+parámetros actuales en el siguiente login correcto. El perfil se elige en
+alamosjclean/hashers.py.
+"""
+import base64
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from metricas.registro import registro
+
+from . import kdf
+
+COLA_MAXIMA_DEFECTO = 64
+ESPERA_MAXIMA_DEFECTO = 2.0
+
+
+class PoolHashingSaturado(Exception):
+    """No hubo cupo en el pool de hashing dentro de la espera máxima"""
+
+
+class PoolHashing:
+    """
+    ProcessPoolExecutor con admisión acotada. Con ``procesos=0`` el hash se
+    calcula en el hilo que lo pide, con el mismo límite de concurrencia.
+    """
+
+    def __init__(self, procesos=None, cola_maxima=COLA_MAXIMA_DEFECTO, espera_maxima=ESPERA_MAXIMA_DEFECTO):
+        self.procesos = (os.cpu_count() or 1) if procesos is None else procesos
+        self.espera_maxima = espera_maxima
+        self._cupos = threading.BoundedSemaphore(max(self.procesos, 1) + cola_maxima)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _obtener_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn: los hijos no heredan los hilos ni las conexiones del worker
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.procesos, mp_context=multiprocessing.get_context('spawn'),
+                    )
+        return self._executor
+
+    def ejecutar(self, algoritmo, funcion, *args):
+        etiquetas = (('algoritmo', algoritmo),)
+        inicio = time.perf_counter()
+        if not self._cupos.acquire(timeout=self.espera_maxima):
+            registro.incrementar('hashing_rechazos_total', etiquetas)
+            raise PoolHashingSaturado('Demasiados hashes de contraseña en curso')
+        admitido = time.perf_counter()
+        registro.observar('hashing_espera_segundos', etiquetas, admitido - inicio)
+        registro.incrementar('hashing_pendientes', etiquetas)
+        try:
+            if self.procesos == 0:
+                return funcion(*args)
+            try:
+                return self._obtener_executor().submit(funcion, *args).result()
+            except BrokenProcessPool:
+                # Murió un proceso hijo: el siguiente hash arranca un pool nuevo
+                with self._lock:
+                    self._executor = None
+                raise
+        finally:
+            self._cupos.release()
+            registro.incrementar('hashing_pendientes', etiquetas, -1)
+            registro.observar('hashing_duracion_segundos', etiquetas, time.perf_counter() - admitido)
+
+    def cerrar(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def obtener_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PoolHashing(
+                    procesos=getattr(settings, 'HASHING_PROCESOS', None),
+                    cola_maxima=getattr(settings, 'HASHING_COLA_MAXIMA', COLA_MAXIMA_DEFECTO),
+                    espera_maxima=getattr(settings, 'HASHING_ESPERA_MAXIMA', ESPERA_MAXIMA_DEFECTO),
+                )
+    return _pool
+
+
+def _olvidar_pool_heredado():
+    # Tras un fork (gunicorn --preload) el executor del padre no sirve en el hijo
+    global _pool
+    _pool = None
+
+
+os.register_at_fork(after_in_child=_olvidar_pool_heredado)
+
+
+@receiver(setting_changed)
+def _reiniciar_pool(*, setting, **kwargs):
+    global _pool
+    if setting.startswith('HASHING_') and _pool is not None:
+        _pool.cerrar()
+        _pool = None
+
+
+class PBKDF2Hasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 con las iteraciones de Django"""
+
+    def encode(self, password, salt, iterations=None):
+        self._check_encode_args(password, salt)
+        iterations = iterations or self.iterations
+        hash_ = obtener_pool().ejecutar(
+            self.algorithm, kdf.pbkdf2, self.digest().name, password.encode(), salt.encode(), iterations,
+        )
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return '%s$%d$%s$%s' % (self.algorithm, iterations, salt, hash_)
+
+
+class ScryptHasher(ScryptPasswordHasher):
+    """
+    scrypt con N=2**15 (32 MiB por hash, el doble que el defecto de Django).
+    Cuesta una fracción del tiempo de CPU de PBKDF2 con 600.000 iteraciones y
+    además exige memoria, lo que encarece los ataques con GPU.
+    """
+
+    work_factor = 2 ** 15
+    block_size = 8
+    parallelism = 1
+    # OpenSSL rechaza por defecto más de 32 MiB, justo lo que necesita N=2**15
+    maxmem = 64 * 1024 * 1024
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        self._check_encode_args(password, salt)
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        hash_ = obtener_pool().ejecutar(
+            self.algorithm, kdf.scrypt, password.encode(), salt.encode(), n, r, p, self.maxmem,
+        )
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return '%s$%d$%s$%d$%d$%s' % (self.algorithm, n, salt, r, p, hash_)
+
+
+class Argon2Hasher(Argon2PasswordHasher):
+    """
+    Argon2id con 19 MiB y 2 pasadas (mínimo recomendado por OWASP) y un solo
+    carril: el paralelismo lo dan los procesos del pool, no cada hash.
+    """
+
+    time_cost = 2
+    memory_cost = 19 * 1024
+    parallelism = 1
+
+    def encode(self, password, salt):
+        params = self.params()
+        datos = obtener_pool().ejecutar(
+            self.algorithm, kdf.argon2_hash, password.encode(), salt.encode(),
+            params.time_cost, params.memory_cost, params.parallelism, params.hash_len,
+        )
+        return self.algorithm + datos
+
+    def verify(self, password, encoded):
+        algorithm, rest = encoded.split('$', 1)
+        assert algorithm == self.algorithm
+        return obtener_pool().ejecutar(self.algorithm, kdf.argon2_verificar, '$' + rest, password)
@@ -0,0 +1,35 @@
+"""
+Derivación de claves que ejecutan los procesos de ``authentication.hashers``.
+
+Solo depende de la stdlib (y de argon2-cffi si está instalado): los procesos
+hijos importan este módulo sin cargar Django.
+"""
+import hashlib
+
+
+def pbkdf2(algoritmo, password, salt, iteraciones):
+    return hashlib.pbkdf2_hmac(algoritmo, password, salt, iteraciones)
+
+
+def scrypt(password, salt, n, r, p, maxmem):
+    return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p, maxmem=maxmem, dklen=64)
+
+
+def argon2_hash(password, salt, time_cost, memory_cost, parallelism, hash_len):
+    """Hash Argon2id codificado ($argon2id$v=19$m=...,t=...,p=...$salt$hash)"""
+    from argon2.low_level import Type, hash_secret
+
+    return hash_secret(
+        password, salt, time_cost=time_cost, memory_cost=memory_cost,
+        parallelism=parallelism, hash_len=hash_len, type=Type.ID,
+    ).decode('ascii')
+
+
+def argon2_verificar(codificado, password):
+    from argon2 import PasswordHasher
+    from argon2.exceptions import VerificationError
+
+    try:
+        return PasswordHasher().verify(codificado, password)
+    except VerificationError:
+        return False
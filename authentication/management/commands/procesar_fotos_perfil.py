@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from authentication.fotos import procesar_foto_perfil
+from authentication.models import Usuario
+
+
+class Command(BaseCommand):
+    help = 'Genera las variantes de las fotos de perfil que aún no se han procesado'
+
+    def handle(self, *args, **options):
+        pendientes = (
+            Usuario.objects.exclude(foto_perfil='').exclude(foto_perfil__isnull=True)
+            .filter(foto_perfil_hash='')
+            .values_list('id', flat=True)
+        )
+        total = 0
+        # Se materializan los ids para no leer y escribir la tabla con el mismo cursor abierto
+        for usuario_id in list(pendientes):
+            procesar_foto_perfil(usuario_id)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f'{total} fotos de perfil procesadas'))
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0002_usuario_foto_perfil'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='foto_perfil_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=32, verbose_name='Hash de la Foto de Perfil'),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='foto_perfil_variantes',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Variantes de la Foto de Perfil'),
+        ),
+    ]
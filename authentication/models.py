@@ -8,6 +8,8 @@ class Usuario(AbstractUser):
     telefono = models.CharField(max_length=15, blank=True, null=True, verbose_name="Teléfono")
     direccion = models.TextField(blank=True, null=True, verbose_name="Dirección")
     foto_perfil = models.ImageField(upload_to='fotos_perfil/', blank=True, null=True, verbose_name="Foto de Perfil")
+    foto_perfil_hash = models.CharField(max_length=32, blank=True, db_index=True, verbose_name="Hash de la Foto de Perfil")
+    foto_perfil_variantes = models.JSONField(default=dict, blank=True, verbose_name="Variantes de la Foto de Perfil")
     fecha_registro = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Registro")
     activo = models.BooleanField(default=True, verbose_name="Usuario Activo")
     
@@ -0,0 +1,107 @@
+"""
+Backend de sesiones en memoria con persistencia diferida en la base de datos.
+
+Las sesiones se leen desde la caché ``SESSION_CACHE_ALIAS`` y solo se escriben en
+``django_session`` cuando sus datos cambian o cuando la expiración guardada quedó
+más de ``SESION_UMBRAL_RENOVACION`` segundos por detrás de la nueva. Con
+``SESSION_SAVE_EVERY_REQUEST = True`` esto convierte una escritura por petición
+en, como mucho, una escritura por sesión cada umbral.
+
+Migración: usa la misma tabla ``django_session`` que el backend ``db``, así que
+las sesiones activas siguen siendo válidas al cambiar ``SESSION_ENGINE`` (se
+cargan desde la base de datos en el primer acceso) y se puede volver al backend
+``db`` sin invalidarlas.
+
+Con varios procesos la caché debe ser compartida (``ALAMOS_CACHE_SESIONES``,
+ver alamosjclean/caches.py): con ``LocMemCache`` una sesión cerrada en un
+worker seguiría autenticada en los demás hasta ``SESION_CACHE_TTL``. Si
+``SERVIDOR_WORKERS`` > 1 y la caché es local, el motor no se carga
+(``authentication.E001``).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.core.exceptions import ImproperlyConfigured
+
+from .checks import cache_sesiones_compartida
+
+KEY_PREFIX = 'authentication.sesiones'
+
+UMBRAL_RENOVACION_DEFECTO = 300
+CACHE_TTL_DEFECTO = 300
+
+# SessionMiddleware importa el motor al arrancar: un servidor mal configurado no llega a atender
+for _error in cache_sesiones_compartida():
+    raise ImproperlyConfigured(f'{_error.msg}. {_error.hint}')
+
+
+class SessionStore(CachedDBStore):
+    """
+    Sesiones en caché que omiten las escrituras que solo renuevan la expiración
+    """
+
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        # Datos y expiración tal como están guardados en la base de datos
+        self._datos_persistidos = None
+        self._expiracion_persistida = None
+
+    @property
+    def umbral_renovacion(self):
+        return timedelta(seconds=getattr(settings, 'SESION_UMBRAL_RENOVACION', UMBRAL_RENOVACION_DEFECTO))
+
+    def _timeout_cache(self, expiracion):
+        ttl = getattr(settings, 'SESION_CACHE_TTL', CACHE_TTL_DEFECTO)
+        return max(0, min(ttl, self.get_expiry_age(expiry=expiracion)))
+
+    def _recordar_persistido(self, datos, expiracion):
+        self._datos_persistidos = dict(datos)
+        self._expiracion_persistida = expiracion
+        self._cache.set(
+            self.cache_key,
+            {'datos': self._datos_persistidos, 'expira': expiracion},
+            self._timeout_cache(expiracion),
+        )
+
+    def load(self):
+        try:
+            entrada = self._cache.get(self.cache_key)
+        except Exception:
+            entrada = None
+
+        if entrada is not None:
+            self._datos_persistidos = entrada['datos']
+            self._expiracion_persistida = entrada['expira']
+            return dict(entrada['datos'])
+
+        s = self._get_session_from_db()
+        if not s:
+            return {}
+        datos = self.decode(s.session_data)
+        self._recordar_persistido(datos, s.expire_date)
+        return datos
+
+    def _requiere_escritura(self):
+        if self._expiracion_persistida is None:
+            return True
+        if self._get_session() != self._datos_persistidos:
+            return True
+        return self.get_expiry_date() - self._expiracion_persistida >= self.umbral_renovacion
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        if not must_create and not self._requiere_escritura():
+            return
+        # Se salta CachedDBStore.save para guardar datos y expiración juntos en la caché
+        super(CachedDBStore, self).save(must_create)
+        self._recordar_persistido(self._get_session(), self.get_expiry_date())
+
+    def delete(self, session_key=None):
+        super().delete(session_key)
+        if session_key is None or session_key == self.session_key:
+            self._datos_persistidos = None
+            self._expiracion_persistida = None
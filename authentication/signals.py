@@ -0,0 +1,14 @@
+"""
+Señales de la app authentication
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import cache_usuarios
+from .models import Usuario
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_cache_usuario(sender, instance, **kwargs):
+    cache_usuarios.invalidar(instance.pk)
@@ -1,3 +1,348 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from alamosjclean.caches import cache_sesiones
+from alamosjclean.hashers import HASHERS, perfil_hashers
+from metricas.registro import registro
+from . import hashers
+from .backends import cache_usuarios
+from .checks import cache_sesiones_compartida
+from .sesiones import SessionStore
 
 # Create your tests here.
+
+
+class VerificarSesionTests(TestCase):
+    """
+    Pruebas del endpoint de verificación de sesión
+    """
+
+    def setUp(self):
+        self.usuario = get_user_model().objects.create_user(
+            username='cliente', password='clave-segura-123', first_name='Ana'
+        )
+        self.client.force_login(self.usuario)
+
+    def test_responde_304_si_el_etag_coincide(self):
+        respuesta = self.client.get('/api/auth/verificar-sesion/')
+        self.assertTrue(respuesta.json()['autenticado'])
+        etag = respuesta['ETag']
+        respuesta = self.client.get('/api/auth/verificar-sesion/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_etag_cambia_con_el_perfil(self):
+        etag = self.client.get('/api/auth/verificar-sesion/')['ETag']
+        self.usuario.first_name = 'Ana María'
+        self.usuario.save()
+        respuesta = self.client.get('/api/auth/verificar-sesion/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+
+
+class SesionesEnCacheTests(TestCase):
+    """
+    Pruebas del backend de sesiones con escritura diferida
+    """
+
+    def setUp(self):
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        self.usuario = get_user_model().objects.create_user(username='cliente', password='clave-segura-123')
+        self.client.force_login(self.usuario)
+
+    def _escrituras_de_sesion(self, consultas):
+        return [
+            q['sql'] for q in consultas.captured_queries
+            if 'django_session' in q['sql'] and not q['sql'].startswith('SELECT')
+        ]
+
+    def test_peticiones_sin_cambios_no_escriben_la_sesion(self):
+        with CaptureQueriesContext(connection) as consultas:
+            for _ in range(5):
+                self.assertEqual(self.client.get('/api/auth/verificar-sesion/').status_code, 200)
+        self.assertEqual(self._escrituras_de_sesion(consultas), [])
+
+    @override_settings(SESION_UMBRAL_RENOVACION=0)
+    def test_renueva_la_expiracion_al_superar_el_umbral(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get('/api/auth/verificar-sesion/')
+        self.assertEqual(len(self._escrituras_de_sesion(consultas)), 1)
+
+    def test_sesion_existente_en_bd_sigue_valida(self):
+        # Simula una sesión creada antes del cambio de backend: solo existe en la BD
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        datos = self.client.get('/api/auth/verificar-sesion/').json()
+        self.assertTrue(datos['autenticado'])
+
+    def test_logout_elimina_la_sesion(self):
+        self.client.post('/api/auth/logout/')
+        datos = self.client.get('/api/auth/verificar-sesion/').json()
+        self.assertFalse(datos['autenticado'])
+
+    def test_sesion_borrada_en_un_store_no_la_sirve_otro(self):
+        # Cada store es un worker distinto que comparte la caché de sesiones
+        origen = SessionStore()
+        origen['usuario'] = 'cliente'
+        origen.save()
+        clave = origen.session_key
+        self.assertEqual(SessionStore(clave).load(), {'usuario': 'cliente'})
+
+        origen.delete()
+        self.assertEqual(SessionStore(clave).load(), {})
+        self.assertFalse(SessionStore(clave).exists(clave))
+
+    def test_cycle_key_invalida_la_clave_anterior_en_otros_stores(self):
+        origen = SessionStore()
+        origen['usuario'] = 'cliente'
+        origen.save()
+        anterior = origen.session_key
+        self.assertEqual(SessionStore(anterior).load(), {'usuario': 'cliente'})
+
+        origen.cycle_key()
+        self.assertEqual(SessionStore(anterior).load(), {})
+        self.assertEqual(SessionStore(origen.session_key).load(), {'usuario': 'cliente'})
+
+
+class CacheSesionesCompartidaTests(TestCase):
+    """
+    Pruebas de la comprobación de la caché de sesiones con varios workers
+    """
+
+    def _ids(self):
+        return [error.id for error in cache_sesiones_compartida()]
+
+    @override_settings(SERVIDOR_WORKERS=4)
+    def test_cache_local_con_varios_workers_es_un_error(self):
+        self.assertEqual(self._ids(), ['authentication.E001'])
+
+    @override_settings(SERVIDOR_WORKERS=1)
+    def test_cache_local_con_un_worker_es_valida(self):
+        self.assertEqual(self._ids(), [])
+
+    def test_cache_compartida_con_varios_workers_es_valida(self):
+        caches_compartidas = {**settings.CACHES, 'sesiones': cache_sesiones('redis://127.0.0.1:6379/1')}
+        with override_settings(SERVIDOR_WORKERS=4, CACHES=caches_compartidas):
+            self.assertEqual(self._ids(), [])
+
+    @override_settings(SERVIDOR_WORKERS=4, SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_otro_motor_de_sesiones_no_se_comprueba(self):
+        self.assertEqual(self._ids(), [])
+
+    def test_url_de_la_cache_de_sesiones(self):
+        self.assertEqual(cache_sesiones('')['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+        self.assertEqual(
+            cache_sesiones('redis://redis:6379/1'),
+            {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://redis:6379/1'},
+        )
+        self.assertEqual(
+            cache_sesiones('memcached://memcached:11211'),
+            {'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache', 'LOCATION': 'memcached:11211'},
+        )
+        with self.assertRaises(ValueError):
+            cache_sesiones('http://cache')
+
+
+class CacheUsuariosTests(TestCase):
+    """
+    Pruebas de la caché de usuarios del backend de autenticación
+    """
+
+    def setUp(self):
+        cache_usuarios.limpiar()
+        self.usuario = get_user_model().objects.create_user(
+            username='cliente', password='clave-segura-123', telefono='3001234567'
+        )
+        self.client.force_login(self.usuario)
+
+    def _consultas_usuarios(self):
+        with CaptureQueriesContext(connection) as consultas:
+            datos = self.client.get('/api/auth/verificar-sesion/').json()
+        return datos, [q for q in consultas.captured_queries if 'FROM "usuarios"' in q['sql']]
+
+    def test_peticiones_autenticadas_no_consultan_usuarios(self):
+        self._consultas_usuarios()
+        datos, consultas = self._consultas_usuarios()
+        self.assertEqual(consultas, [])
+        self.assertEqual(datos['usuario']['telefono'], '3001234567')
+
+    def test_guardar_usuario_invalida_la_cache(self):
+        self._consultas_usuarios()
+        self.usuario.telefono = '3109876543'
+        self.usuario.save()
+        datos, consultas = self._consultas_usuarios()
+        self.assertEqual(len(consultas), 1)
+        self.assertEqual(datos['usuario']['telefono'], '3109876543')
+
+    def test_usuario_inactivo_pierde_la_sesion(self):
+        self._consultas_usuarios()
+        self.usuario.is_active = False
+        self.usuario.save()
+        datos, _ = self._consultas_usuarios()
+        self.assertFalse(datos['autenticado'])
+
+    def test_desaloja_el_menos_usado(self):
+        cache = type(cache_usuarios)(ttl=60, tamano_maximo=2)
+        for usuario_id in (1, 2, 3):
+            cache.obtener(usuario_id, lambda: object())
+        self.assertEqual(list(cache._entradas), [2, 3])
+
+    def test_invalidaciones_acotadas_sin_guardar_lecturas_viejas(self):
+        cache = type(cache_usuarios)(ttl=60, tamano_maximo=2)
+        for usuario_id in range(100):
+            cache.invalidar(usuario_id)
+        self.assertEqual(list(cache._invalidaciones), [98, 99])
+
+        # Lectura que empezó antes de una invalidación ya olvidada: no se guarda
+        def cargar_e_invalidar():
+            cache.invalidar(7)
+            cache.invalidar(8)
+            cache.invalidar(9)
+            return object()
+        cache.obtener(7, cargar_e_invalidar)
+        self.assertNotIn(7, cache._entradas)
+
+        cache.obtener(7, lambda: object())
+        self.assertIn(7, cache._entradas)
+
+
+class FotosPerfilTests(TestCase):
+    """
+    Pruebas del procesamiento de fotos de perfil
+    """
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media, FOTOS_PERFIL_ASINCRONO=False)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def _foto(self):
+        imagen = Image.new('RGB', (2000, 1500), (30, 120, 200))
+        exif = Image.Exif()
+        exif[0x010F] = 'Camara de prueba'
+        salida = BytesIO()
+        imagen.save(salida, 'JPEG', exif=exif.tobytes())
+        return SimpleUploadedFile('camara.jpg', salida.getvalue(), content_type='image/jpeg')
+
+    def _registrar(self, username):
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post('/api/auth/registro/', {
+                'username': username, 'email': f'{username}@example.com', 'password': 'clave-segura-123',
+                'first_name': 'Ana', 'last_name': 'Gómez', 'profilePhoto': self._foto(),
+            })
+        self.assertEqual(respuesta.status_code, 200)
+        return get_user_model().objects.get(username=username)
+
+    def test_genera_variantes_sin_exif_con_nombre_por_hash(self):
+        usuario = self._registrar('ana')
+        self.assertEqual(len(usuario.foto_perfil_hash), 32)
+        self.assertEqual(usuario.foto_perfil.name, usuario.foto_perfil_variantes['grande']['jpeg'])
+        with default_storage.open(usuario.foto_perfil_variantes['mediana']['jpeg']) as archivo:
+            variante = Image.open(archivo)
+            self.assertEqual(max(variante.size), 256)
+            self.assertEqual(len(variante.getexif()), 0)
+        self.assertFalse(default_storage.exists('fotos_perfil/camara.jpg'))
+
+    def test_subidas_identicas_comparten_variantes(self):
+        ana = self._registrar('ana')
+        luis = self._registrar('luis')
+        self.assertEqual(ana.foto_perfil_variantes, luis.foto_perfil_variantes)
+
+    def test_login_devuelve_la_variante(self):
+        usuario = self._registrar('ana')
+        respuesta = self.client.post(
+            '/api/auth/login/', {'username': 'ana', 'password': 'clave-segura-123'}, content_type='application/json'
+        )
+        datos = respuesta.json()['user']
+        self.assertEqual(datos['foto_perfil'], default_storage.url(usuario.foto_perfil_variantes['mediana']['webp']))
+        self.assertIn('pequena', datos['foto_perfil_variantes'])
+
+
+@override_settings(ROOT_URLCONF='alamosjclean.urls_asgi')
+class VistasAsincronasTests(TestCase):
+    """
+    login y verificar-sesion asíncronos del perfil ASGI
+    """
+
+    def setUp(self):
+        self.usuario = get_user_model().objects.create_user(
+            username='cliente', password='clave-segura-123', first_name='Ana'
+        )
+
+    async def test_login_y_verificar_sesion(self):
+        respuesta = await self.async_client.get('/api/auth/verificar-sesion/')
+        self.assertFalse(respuesta.json()['autenticado'])
+
+        respuesta = await self.async_client.post('/api/auth/login/', {
+            'username': 'cliente', 'password': 'incorrecta',
+        }, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 401)
+        respuesta = await self.async_client.post('/api/auth/login/', {
+            'username': 'cliente', 'password': 'clave-segura-123',
+        }, content_type='application/json')
+        self.assertEqual(respuesta.json()['user']['username'], 'cliente')
+
+        respuesta = await self.async_client.get('/api/auth/verificar-sesion/')
+        self.assertEqual(respuesta.json()['usuario']['first_name'], 'Ana')
+        respuesta = await self.async_client.get(
+            '/api/auth/verificar-sesion/', headers={'If-None-Match': respuesta['ETag']}
+        )
+        self.assertEqual(respuesta.status_code, 304)
+
+
+@override_settings(PASSWORD_HASHERS=perfil_hashers('scrypt'))
+class HashingTests(TestCase):
+    """
+    Pruebas del perfil de hashers y del pool de procesos
+    """
+
+    def setUp(self):
+        self.usuario = get_user_model().objects.create_user(username='cliente', password='clave-segura-123')
+
+    def _login(self):
+        return self.client.post('/api/auth/login/', {
+            'username': 'cliente', 'password': 'clave-segura-123',
+        }, content_type='application/json')
+
+    def test_perfil_prefiere_su_hasher_y_verifica_los_demas(self):
+        perfil = perfil_hashers('pbkdf2')
+        self.assertEqual(perfil[0], HASHERS['pbkdf2'])
+        self.assertIn(HASHERS['scrypt'], perfil)
+        with self.assertRaises(ValueError):
+            perfil_hashers('md5')
+
+    def test_rehace_hashes_antiguos_al_iniciar_sesion(self):
+        self.usuario.password = make_password('clave-segura-123', hasher='pbkdf2_sha256')
+        self.usuario.save(update_fields=['password'])
+
+        self.assertEqual(self._login().status_code, 200)
+        self.usuario.refresh_from_db()
+        self.assertTrue(self.usuario.password.startswith('scrypt$32768$'))
+        self.assertEqual(self._login().status_code, 200)
+
+    def test_hashea_en_otro_proceso(self):
+        self.assertNotEqual(hashers.obtener_pool().ejecutar('prueba', os.getpid), os.getpid())
+
+    def test_pool_saturado_responde_503(self):
+        pool = hashers.PoolHashing(procesos=0, cola_maxima=0, espera_maxima=0)
+        pool._cupos.acquire()
+        rechazos = registro.valor('hashing_rechazos_total', algoritmo='scrypt') or 0
+
+        with mock.patch.object(hashers, '_pool', pool):
+            respuesta = self._login()
+
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertEqual(respuesta['Retry-After'], '1')
+        self.assertEqual(registro.valor('hashing_rechazos_total', algoritmo='scrypt'), rechazos + 1)
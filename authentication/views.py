@@ -1,13 +1,30 @@
 from django.shortcuts import render
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods
 from django.contrib.auth import get_user_model
+from alamosjclean.serializacion import RespuestaJSON
+import hashlib
 import json
+import logging
+
+from .fotos import encolar_procesamiento, foto_perfil_url, foto_perfil_variantes_urls
+from .hashers import PoolHashingSaturado
 
 Usuario = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+def _respuesta_saturado():
+    """503 cuando el pool de hashing de contraseñas no tiene cupo"""
+    respuesta = RespuestaJSON({
+        'success': False,
+        'message': 'Servicio ocupado, intenta de nuevo en unos segundos'
+    }, status=503)
+    respuesta['Retry-After'] = '1'
+    return respuesta
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -30,20 +47,20 @@ def registro_usuario(request):
         required_fields = ['username', 'email', 'password', 'first_name', 'last_name']
         for field in required_fields:
             if not data.get(field):
-                return JsonResponse({
+                return RespuestaJSON({
                     'success': False,
                     'message': f'El campo {field} es requerido'
                 }, status=400)
         
         # Verificar si el usuario ya existe
         if Usuario.objects.filter(username=data['username']).exists():
-            return JsonResponse({
+            return RespuestaJSON({
                 'success': False,
                 'message': 'El nombre de usuario ya existe'
             }, status=400)
         
         if Usuario.objects.filter(email=data['email']).exists():
-            return JsonResponse({
+            return RespuestaJSON({
                 'success': False,
                 'message': 'El email ya está registrado'
             }, status=400)
@@ -56,31 +73,70 @@ def registro_usuario(request):
             first_name=data['first_name'],
             last_name=data['last_name'],
             telefono=data.get('telefono', ''),
-            direccion=data.get('direccion', '')
+            direccion=data.get('direccion', ''),
+            foto_perfil=foto_perfil
         )
         
-        # Agregar foto de perfil si se proporcionó
+        # Las variantes de la foto se generan en segundo plano, sin bloquear el registro
         if foto_perfil:
-            usuario.foto_perfil = foto_perfil
-            usuario.save()
+            encolar_procesamiento(usuario.id)
         
-        return JsonResponse({
+        return RespuestaJSON({
             'success': True,
             'message': 'Usuario registrado exitosamente',
             'user_id': usuario.id
         })
         
     except json.JSONDecodeError:
-        return JsonResponse({
+        return RespuestaJSON({
             'success': False,
             'message': 'Datos JSON inválidos'
         }, status=400)
+    except PoolHashingSaturado:
+        return _respuesta_saturado()
     except Exception as e:
-        return JsonResponse({
+        return RespuestaJSON({
             'success': False,
             'message': f'Error interno del servidor: {str(e)}'
         }, status=500)
 
+def _usuario_a_dict(user):
+    """Datos del usuario que devuelve el login"""
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'telefono': user.telefono,
+        'direccion': user.direccion,
+        'foto_perfil': foto_perfil_url(user),
+        'foto_perfil_variantes': foto_perfil_variantes_urls(user)
+    }
+
+
+def _datos_verificar_sesion(user):
+    """Cuerpo de la respuesta de verificar_sesion"""
+    if not user.is_authenticated:
+        return {
+            'success': True,
+            'autenticado': False,
+            'usuario': None
+        }
+    return {
+        'success': True,
+        'autenticado': True,
+        'usuario': {
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'telefono': getattr(user, 'telefono', ''),
+            'direccion': getattr(user, 'direccion', '')
+        }
+    }
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def login_usuario(request):
@@ -93,7 +149,7 @@ def login_usuario(request):
         password = data.get('password')
         
         if not username or not password:
-            return JsonResponse({
+            return RespuestaJSON({
                 'success': False,
                 'message': 'Username y password son requeridos'
             }, status=400)
@@ -107,52 +163,31 @@ def login_usuario(request):
                 # Forzar la creación de la sesión
                 request.session.save()
                 
-                # Debug: imprimir información de la sesión después del login
-                print(f"Login successful - Session key: {request.session.session_key}")
-                print(f"User: {user}")
-                print(f"Session items after login: {dict(request.session.items())}")
-                
-                return JsonResponse({
+                return RespuestaJSON({
                     'success': True,
                     'message': 'Login exitoso',
-                    'user': {
-                        'id': user.id,
-                        'username': user.username,
-                        'email': user.email,
-                        'first_name': user.first_name,
-                        'last_name': user.last_name,
-                        'telefono': user.telefono,
-                        'direccion': user.direccion,
-                        'foto_perfil': user.foto_perfil.url if user.foto_perfil else None
-                    }
+                    'user': _usuario_a_dict(user)
                 })
             else:
-                return JsonResponse({
+                return RespuestaJSON({
                     'success': False,
                     'message': 'Usuario inactivo'
                 }, status=401)
         else:
-            return JsonResponse({
+            return RespuestaJSON({
                 'success': False,
                 'message': 'Credenciales inválidas'
             }, status=401)
             
     except json.JSONDecodeError:
-        return JsonResponse({
-            'success': False,
-            'message': 'Datos JSON inválidos'
-        }, status=400)
-    except Exception as e:
-        return JsonResponse({
-            'success': False,
-            'message': f'Error interno del servidor: {str(e)}'
-        }, status=500)
-        return JsonResponse({
+        return RespuestaJSON({
             'success': False,
             'message': 'Datos JSON inválidos'
         }, status=400)
+    except PoolHashingSaturado:
+        return _respuesta_saturado()
     except Exception as e:
-        return JsonResponse({
+        return RespuestaJSON({
             'success': False,
             'message': f'Error interno del servidor: {str(e)}'
         }, status=500)
@@ -165,63 +200,48 @@ def logout_usuario(request):
     try:
         if request.user.is_authenticated:
             logout(request)
-            return JsonResponse({
+            return RespuestaJSON({
                 'success': True,
                 'message': 'Logout exitoso'
             })
         else:
-            return JsonResponse({
+            return RespuestaJSON({
                 'success': False,
                 'message': 'Usuario no autenticado'
             }, status=401)
             
     except Exception as e:
-        return JsonResponse({
+        return RespuestaJSON({
             'success': False,
             'message': f'Error interno del servidor: {str(e)}'
         }, status=500)
 
+def _etag_verificar_sesion(request):
+    """
+    Validador de verificar_sesion a partir del usuario ya cargado por el middleware,
+    sin consultas adicionales
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return 'anonimo'
+    base = '|'.join(str(valor) for valor in (
+        user.pk, user.username, user.email, user.first_name, user.last_name,
+        getattr(user, 'telefono', ''), getattr(user, 'direccion', ''),
+    ))
+    return hashlib.md5(base.encode()).hexdigest()
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_verificar_sesion)
 def verificar_sesion(request):
     """
     Endpoint para verificar si el usuario está autenticado
     """
     try:
-        # Debug: imprimir información de la sesión y headers
-        print(f"=== VERIFICAR SESION DEBUG ===")
-        print(f"Session key: {request.session.session_key}")
-        print(f"User authenticated: {request.user.is_authenticated}")
-        print(f"User: {request.user}")
-        print(f"Session items: {dict(request.session.items())}")
-        print(f"Cookies: {request.COOKIES}")
-        print(f"Headers: {dict(request.headers)}")
-        print(f"Method: {request.method}")
-        print(f"Origin: {request.headers.get('Origin', 'No Origin')}")
-        print(f"Referer: {request.headers.get('Referer', 'No Referer')}")
-        print(f"================================")
-        
-        if request.user.is_authenticated:
-            return JsonResponse({
-                'success': True,
-                'autenticado': True,
-                'usuario': {
-                    'id': request.user.id,
-                    'username': request.user.username,
-                    'email': request.user.email,
-                    'first_name': request.user.first_name,
-                    'last_name': request.user.last_name,
-                    'telefono': getattr(request.user, 'telefono', ''),
-                    'direccion': getattr(request.user, 'direccion', '')
-                }
-            })
-        else:
-            return JsonResponse({
-                'success': True,
-                'autenticado': False,
-                'usuario': None
-            })
+        return RespuestaJSON(_datos_verificar_sesion(request.user))
     except Exception as e:
-        print(f"Error en verificar_sesion: {str(e)}")
-        return JsonResponse({
+        logger.exception('Error en verificar_sesion')
+        return RespuestaJSON({
             'success': False,
             'message': f'Error interno del servidor: {str(e)}'
         }, status=500)
@@ -0,0 +1,94 @@
+"""
+Versiones asíncronas de login_usuario y verificar_sesion para el perfil ASGI
+(``alamosjclean.urls_asgi``).
+
+Django 4.2 no tiene API asíncrona de autenticación ni de sesiones: authenticate
+(hash de la contraseña y consulta del usuario), login y el guardado de la
+sesión corren con ``sync_to_async``, fuera del event loop.
+"""
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import authenticate, login
+
+from alamosjclean.asincrono import cargar_usuario, condicion, control_cache, exento_csrf, requiere_metodos
+from alamosjclean.serializacion import RespuestaJSON
+
+from .hashers import PoolHashingSaturado
+from .views import _datos_verificar_sesion, _etag_verificar_sesion, _respuesta_saturado, _usuario_a_dict
+
+logger = logging.getLogger(__name__)
+
+
+def _iniciar_sesion(request, user):
+    login(request, user)
+    # Forzar la creación de la sesión
+    request.session.save()
+
+
+@exento_csrf
+@requiere_metodos(["POST"])
+async def login_usuario(request):
+    """
+    Endpoint para login de usuarios
+    """
+    try:
+        data = json.loads(request.body)
+        username = data.get('username')
+        password = data.get('password')
+
+        if not username or not password:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'Username y password son requeridos'
+            }, status=400)
+
+        user = await sync_to_async(authenticate)(request, username=username, password=password)
+
+        if user is None:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'Credenciales inválidas'
+            }, status=401)
+        if not user.is_active:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'Usuario inactivo'
+            }, status=401)
+
+        await sync_to_async(_iniciar_sesion)(request, user)
+        return RespuestaJSON({
+            'success': True,
+            'message': 'Login exitoso',
+            'user': _usuario_a_dict(user)
+        })
+
+    except json.JSONDecodeError:
+        return RespuestaJSON({
+            'success': False,
+            'message': 'Datos JSON inválidos'
+        }, status=400)
+    except PoolHashingSaturado:
+        return _respuesta_saturado()
+    except Exception as e:
+        return RespuestaJSON({
+            'success': False,
+            'message': f'Error interno del servidor: {str(e)}'
+        }, status=500)
+
+
+@control_cache(private=True, no_cache=True)
+@condicion(etag_func=_etag_verificar_sesion)
+async def verificar_sesion(request):
+    """
+    Endpoint para verificar si el usuario está autenticado
+    """
+    try:
+        return RespuestaJSON(_datos_verificar_sesion(await cargar_usuario(request)))
+    except Exception as e:
+        logger.exception('Error en verificar_sesion')
+        return RespuestaJSON({
+            'success': False,
+            'message': f'Error interno del servidor: {str(e)}'
+        }, status=500)
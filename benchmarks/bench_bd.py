@@ -0,0 +1,162 @@
+"""
+Benchmark de escrituras concurrentes: creación de reservas (agenda.agendar)
+desde varios hilos con cada perfil de base de datos.
+
+Perfiles:
+    sqlite-clasico  motor sqlite3 de Django sin ajustes (journal DELETE, BEGIN diferido)
+    sqlite          perfil de settings: WAL, synchronous=NORMAL, mmap, BEGIN IMMEDIATE
+    postgresql      perfil de settings con conexiones persistentes; usa las variables
+                    ALAMOS_BD_* y crea/destruye una base test_<nombre>
+
+Cada perfil corre en un subproceso (Django solo se configura una vez por
+proceso). El resultado es JSON con throughput, latencias y errores por perfil.
+
+Uso:
+    python benchmarks/bench_bd.py --hilos 8 --reservas 100 [--perfiles sqlite-clasico sqlite postgresql]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as hora, timedelta, timezone as dt_timezone
+
+from comun import configurar, percentil
+
+PERFILES = ('sqlite-clasico', 'sqlite', 'postgresql')
+
+
+def _configurar_perfil(perfil, directorio):
+    from alamosjclean.bd import perfil_postgresql
+
+    ruta = os.path.join(directorio, 'bench.sqlite3')
+    if perfil == 'sqlite-clasico':
+        configurar(ruta, {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ruta, 'OPTIONS': {'timeout': 20}})
+        return None
+    if perfil == 'sqlite':
+        configurar(ruta)
+        return None
+
+    configurar(None, perfil_postgresql(), migrar=False)
+    from django.db import connection
+    nombre_original = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    return lambda: connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+
+def _sembrar_cuadrillas():
+    from django.contrib.auth import get_user_model
+
+    from servicios.models import Cuadrilla, ServicioAgendado, TurnoCuadrilla
+
+    tipos = [tipo for tipo, _ in ServicioAgendado.TIPOS_SERVICIO]
+    cuadrilla = Cuadrilla.objects.create(nombre='Cuadrilla bench', tipos_servicio=tipos)
+    TurnoCuadrilla.objects.bulk_create([
+        TurnoCuadrilla(cuadrilla=cuadrilla, dia_semana=dia, hora_inicio=hora(0, 0), hora_fin=hora(23, 59))
+        for dia in range(7)
+    ])
+    return get_user_model().objects.create_user(username='bench_bd', password='x')
+
+
+def ejecutar_perfil(perfil, hilos, reservas):
+    """Mide un perfil en el proceso actual y devuelve su resultado"""
+    with tempfile.TemporaryDirectory() as directorio:
+        limpiar = _configurar_perfil(perfil, directorio)
+        try:
+            return _medir(hilos, reservas)
+        finally:
+            from django.db import connections
+            connections.close_all()
+            if limpiar:
+                limpiar()
+
+
+def _medir(hilos, reservas):
+    from django.db import OperationalError, close_old_connections
+    from django.utils import timezone
+
+    from servicios import agenda
+
+    usuario = _sembrar_cuadrillas()
+    manana = timezone.localdate() + timedelta(days=1)
+
+    def trabajar(numero_hilo):
+        latencias, errores = [], 0
+        for i in range(reservas):
+            # Un día distinto por reserva: ninguna choca con otra por capacidad
+            dia = manana + timedelta(days=numero_hilo * reservas + i)
+            inicio = time.perf_counter()
+            try:
+                agenda.agendar(
+                    usuario=usuario, tipo_servicio='residencial', descripcion='Bench',
+                    direccion_servicio='Calle 1',
+                    fecha_servicio=timezone.make_aware(datetime.combine(dia, hora(8, 0))),
+                )
+            except OperationalError:
+                errores += 1
+            latencias.append(time.perf_counter() - inicio)
+        close_old_connections()
+        return latencias, errores
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        parciales = list(pool.map(trabajar, range(hilos)))
+    duracion = time.perf_counter() - inicio
+
+    latencias = sorted(latencia for parcial, _ in parciales for latencia in parcial)
+    errores = sum(errores for _, errores in parciales)
+    return {
+        'reservas': len(latencias),
+        'errores': errores,
+        'reservas_por_segundo': round((len(latencias) - errores) / duracion, 1),
+        'p50_ms': round(percentil(latencias, 50) * 1000, 3),
+        'p95_ms': round(percentil(latencias, 95) * 1000, 3),
+        'p99_ms': round(percentil(latencias, 99) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Escrituras concurrentes por perfil de base de datos')
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--reservas', type=int, default=100, help='Reservas por hilo')
+    parser.add_argument('--perfiles', nargs='+', choices=PERFILES, default=['sqlite-clasico', 'sqlite'])
+    parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto, stdout)')
+    parser.add_argument('--ejecutar-perfil', choices=PERFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.ejecutar_perfil:
+        print(json.dumps(ejecutar_perfil(args.ejecutar_perfil, args.hilos, args.reservas)))
+        return
+
+    resultados = {}
+    for perfil in args.perfiles:
+        proceso = subprocess.run(
+            [sys.executable, __file__, '--ejecutar-perfil', perfil,
+             '--hilos', str(args.hilos), '--reservas', str(args.reservas)],
+            capture_output=True, text=True,
+        )
+        if proceso.returncode != 0:
+            resultados[perfil] = {'error': proceso.stderr.strip().splitlines()[-1:]}
+            continue
+        resultados[perfil] = json.loads(proceso.stdout.strip().splitlines()[-1])
+
+    informe = {
+        'fecha': datetime.now(dt_timezone.utc).isoformat(),
+        'parametros': {'hilos': args.hilos, 'reservas_por_hilo': args.reservas},
+        'entorno': {'python': platform.python_version(), 'plataforma': platform.platform()},
+        'perfiles': resultados,
+    }
+    texto = json.dumps(informe, indent=2)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Throughput con conexiones concurrentes: perfil WSGI (vistas síncronas,
+wsgiref con un hilo por conexión) contra perfil ASGI (vistas asíncronas de
+``alamosjclean.urls_asgi`` sobre uvicorn).
+
+Para cada servidor y cada nivel de concurrencia abre N clientes HTTP con
+sesión iniciada que repiten el endpoint durante ``--segundos`` y reporta
+peticiones por segundo, errores y latencia p50/p95/p99.
+
+Uso:
+    python benchmarks/bench_concurrencia.py --concurrencia 8 32 64 --segundos 10 \\
+        --endpoints mis_servicios verificar_sesion --salida concurrencia.json
+
+El perfil asgi requiere uvicorn (pip install uvicorn); sin él solo se mide wsgi.
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+from bench_endpoints import ClienteHTTP, iniciar_servidor_asgi, iniciar_servidor_wsgi
+from comun import configurar, percentil, sembrar_datos, sin_salida
+
+RUTAS = {
+    'mis_servicios': ('GET', '/api/servicios/mis-servicios/?limite=50'),
+    'verificar_sesion': ('GET', '/api/auth/verificar-sesion/'),
+}
+
+
+def medir(puerto, usuarios, endpoint, concurrencia, segundos):
+    metodo, ruta = RUTAS[endpoint]
+    clientes = []
+    for usuario in usuarios[:concurrencia]:
+        cliente = ClienteHTTP(puerto)
+        cliente.login(usuario.username)
+        clientes.append(cliente)
+
+    fin = threading.Event()
+
+    def ejecutar(cliente):
+        latencias, errores = [], 0
+        while not fin.is_set():
+            inicio = time.perf_counter()
+            try:
+                status, _ = cliente.peticion(metodo, ruta)
+            except OSError:
+                status = 599
+            latencias.append(time.perf_counter() - inicio)
+            if status >= 400:
+                errores += 1
+        return latencias, errores
+
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        inicio = time.perf_counter()
+        futuros = [pool.submit(ejecutar, cliente) for cliente in clientes]
+        time.sleep(segundos)
+        fin.set()
+        parciales = [futuro.result() for futuro in futuros]
+        duracion = time.perf_counter() - inicio
+
+    latencias = sorted(latencia for parcial in parciales for latencia in parcial[0])
+    return {
+        'peticiones': len(latencias),
+        'errores': sum(parcial[1] for parcial in parciales),
+        'throughput_rps': round(len(latencias) / duracion, 1),
+        'p50_ms': round(percentil(latencias, 50) * 1000, 2),
+        'p95_ms': round(percentil(latencias, 95) * 1000, 2),
+        'p99_ms': round(percentil(latencias, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput concurrente WSGI contra ASGI')
+    parser.add_argument('--concurrencia', type=int, nargs='+', default=[8, 32, 64])
+    parser.add_argument('--segundos', type=float, default=10, help='Duración de cada medición')
+    parser.add_argument('--endpoints', nargs='+', choices=RUTAS, default=list(RUTAS))
+    parser.add_argument('--servicios-por-usuario', type=int, default=100)
+    parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto, stdout)')
+    args = parser.parse_args()
+
+    servidores = {'wsgi': iniciar_servidor_wsgi}
+    try:
+        import uvicorn  # noqa: F401
+        servidores['asgi'] = iniciar_servidor_asgi
+    except ImportError:
+        pass
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        configurar(os.path.join(directorio, 'bench.sqlite3'))
+        usuarios = sembrar_datos(max(args.concurrencia), args.servicios_por_usuario)
+
+        with sin_salida():
+            for servidor, iniciar in servidores.items():
+                puerto, detener = iniciar()
+                resultados[servidor] = {
+                    endpoint: {
+                        str(concurrencia): medir(puerto, usuarios, endpoint, concurrencia, args.segundos)
+                        for concurrencia in args.concurrencia
+                    }
+                    for endpoint in args.endpoints
+                }
+                detener()
+
+    informe = {
+        'fecha': datetime.now(dt_timezone.utc).isoformat(),
+        'parametros': {
+            'concurrencia': args.concurrencia, 'segundos': args.segundos,
+            'servicios_por_usuario': args.servicios_por_usuario,
+        },
+        'entorno': {'python': platform.python_version(), 'plataforma': platform.platform()},
+        'servidores': resultados,
+    }
+    texto = json.dumps(informe, indent=2)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
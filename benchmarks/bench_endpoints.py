@@ -0,0 +1,286 @@
+"""
+Benchmark de los endpoints de authentication y servicios.
+
+Carga un volumen realista de datos (usuarios, servicios, seguimientos y
+facturas) en una base SQLite temporal y ejecuta registro, login,
+verificar-sesion, agendar, mis-servicios y cancelar, reportando latencia
+p50/p95/p99, consultas por petición y throughput. El resultado se escribe en
+JSON para comparar entre versiones.
+
+Modos:
+    cliente  Django test client en el mismo proceso (cuenta consultas SQL)
+    wsgi     servidor WSGI real (wsgiref con hilos) sobre HTTP
+    asgi     servidor ASGI real (requiere uvicorn instalado) sobre HTTP
+
+Uso:
+    python benchmarks/bench_endpoints.py --modo cliente --iteraciones 200 \\
+        --concurrencia 4 --usuarios 200 --servicios-por-usuario 100 --salida resultados.json
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from http.cookies import SimpleCookie
+
+from comun import PASSWORD_BENCH, configurar, percentil, sembrar_datos, sin_salida
+
+ENDPOINTS = ('registro', 'login', 'verificar_sesion', 'agendar', 'mis_servicios', 'cancelar')
+
+
+class ClientePrueba:
+    """Adaptador sobre django.test.Client"""
+
+    def __init__(self):
+        from django.test import Client
+        self.client = Client()
+
+    def login(self, username):
+        from django.contrib.auth import get_user_model
+        self.client.force_login(get_user_model().objects.get(username=username))
+
+    def peticion(self, metodo, ruta, cuerpo=None):
+        kwargs = {'content_type': 'application/json'}
+        if cuerpo is not None:
+            kwargs['data'] = json.dumps(cuerpo)
+        respuesta = getattr(self.client, metodo.lower())(ruta, **kwargs)
+        return respuesta.status_code, len(respuesta.content)
+
+
+class ClienteHTTP:
+    """Adaptador HTTP con cookies contra un servidor real"""
+
+    def __init__(self, puerto):
+        self.puerto = puerto
+        self.cookies = {}
+
+    def login(self, username):
+        status, _ = self.peticion('POST', '/api/auth/login/', {'username': username, 'password': PASSWORD_BENCH})
+        if status != 200:
+            raise RuntimeError(f'No se pudo iniciar sesión como {username}: {status}')
+
+    def peticion(self, metodo, ruta, cuerpo=None):
+        conexion = http.client.HTTPConnection('127.0.0.1', self.puerto, timeout=60)
+        headers = {'Content-Type': 'application/json'}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        datos = json.dumps(cuerpo).encode() if cuerpo is not None else None
+        try:
+            conexion.request(metodo, ruta, body=datos, headers=headers)
+            respuesta = conexion.getresponse()
+            contenido = respuesta.read()
+            for cabecera in respuesta.headers.get_all('Set-Cookie') or []:
+                cookie = SimpleCookie()
+                cookie.load(cabecera)
+                self.cookies.update({k: m.value for k, m in cookie.items()})
+            return respuesta.status, len(contenido)
+        finally:
+            conexion.close()
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor_wsgi():
+    from socketserver import ThreadingMixIn
+    from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+    from alamosjclean.wsgi import application
+
+    class Servidor(ThreadingMixIn, WSGIServer):
+        daemon_threads = True
+
+    class Manejador(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    puerto = _puerto_libre()
+    servidor = make_server('127.0.0.1', puerto, application, server_class=Servidor, handler_class=Manejador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return puerto, servidor.shutdown
+
+
+def iniciar_servidor_asgi():
+    import uvicorn
+
+    from alamosjclean.asgi import application
+
+    puerto = _puerto_libre()
+    servidor = uvicorn.Server(uvicorn.Config(application, host='127.0.0.1', port=puerto, log_level='warning'))
+    threading.Thread(target=servidor.run, daemon=True).start()
+    while not servidor.started:
+        time.sleep(0.05)
+
+    def detener():
+        servidor.should_exit = True
+    return puerto, detener
+
+
+def _fecha_futura(n):
+    inicio = datetime.now(dt_timezone.utc) + timedelta(days=400 + n % 300, hours=n % 10)
+    return inicio.replace(microsecond=0).isoformat()
+
+
+def escenarios(cliente, username, secuencia, servicios_cancelables):
+    """Funciones sin argumentos que ejecutan una petición de cada endpoint"""
+    def registro():
+        n = next(secuencia)
+        return cliente.peticion('POST', '/api/auth/registro/', {
+            'username': f'nuevo{n}', 'email': f'nuevo{n}@example.com', 'password': PASSWORD_BENCH,
+            'first_name': 'Nuevo', 'last_name': str(n),
+        })
+
+    def login():
+        return cliente.peticion('POST', '/api/auth/login/', {'username': username, 'password': PASSWORD_BENCH})
+
+    def verificar_sesion():
+        return cliente.peticion('GET', '/api/auth/verificar-sesion/')
+
+    def agendar():
+        return cliente.peticion('POST', '/api/servicios/agendar/', {
+            'tipo_servicio': 'residencial', 'descripcion': 'Limpieza general',
+            'direccion_servicio': 'Calle 10 # 20-30', 'fecha_servicio': _fecha_futura(next(secuencia)),
+        })
+
+    def mis_servicios():
+        return cliente.peticion('GET', '/api/servicios/mis-servicios/?limite=50')
+
+    def cancelar():
+        return cliente.peticion('PUT', f'/api/servicios/cancelar/{servicios_cancelables.pop()}/')
+
+    return {
+        'registro': registro, 'login': login, 'verificar_sesion': verificar_sesion,
+        'agendar': agendar, 'mis_servicios': mis_servicios, 'cancelar': cancelar,
+    }
+
+
+def medir_endpoint(nombre, clientes, iteraciones, contar_consultas):
+    """
+    Ejecuta ``iteraciones`` peticiones por cliente en paralelo (un hilo por cliente)
+    """
+    from django.db import close_old_connections, connection
+    from django.test.utils import CaptureQueriesContext
+
+    def ejecutar(escenario):
+        latencias, consultas, errores, bytes_respuesta = [], 0, 0, 0
+        for _ in range(iteraciones):
+            inicio = time.perf_counter()
+            if contar_consultas:
+                with CaptureQueriesContext(connection) as capturadas:
+                    status, tamano = escenario[nombre]()
+                consultas += len(capturadas.captured_queries)
+            else:
+                status, tamano = escenario[nombre]()
+            latencias.append(time.perf_counter() - inicio)
+            bytes_respuesta += tamano
+            if status >= 400:
+                errores += 1
+        close_old_connections()
+        return latencias, consultas, errores, bytes_respuesta
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(clientes)) as pool:
+        parciales = list(pool.map(ejecutar, clientes))
+    duracion = time.perf_counter() - inicio
+
+    latencias = sorted(latencia for parcial in parciales for latencia in parcial[0])
+    total = len(latencias)
+    return {
+        'peticiones': total,
+        'errores': sum(parcial[2] for parcial in parciales),
+        'p50_ms': round(percentil(latencias, 50) * 1000, 3),
+        'p95_ms': round(percentil(latencias, 95) * 1000, 3),
+        'p99_ms': round(percentil(latencias, 99) * 1000, 3),
+        'throughput_rps': round(total / duracion, 1),
+        'consultas_por_peticion': round(sum(p[1] for p in parciales) / total, 2) if contar_consultas else None,
+        'bytes_por_respuesta': round(sum(p[3] for p in parciales) / total, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de endpoints de authentication y servicios')
+    parser.add_argument('--modo', choices=('cliente', 'wsgi', 'asgi'), default='cliente')
+    parser.add_argument('--iteraciones', type=int, default=100, help='Peticiones por hilo y endpoint')
+    parser.add_argument('--concurrencia', type=int, default=4, help='Hilos (clientes) simultáneos')
+    parser.add_argument('--usuarios', type=int, default=200)
+    parser.add_argument('--servicios-por-usuario', type=int, default=100)
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto, stdout)')
+    args = parser.parse_args()
+    if args.modo == 'asgi':
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            parser.error('el modo asgi requiere uvicorn (pip install uvicorn)')
+
+    with tempfile.TemporaryDirectory() as directorio:
+        configurar(os.path.join(directorio, 'bench.sqlite3'))
+        from django.utils import timezone
+        from servicios.models import ServicioAgendado
+
+        inicio_siembra = time.perf_counter()
+        usuarios = sembrar_datos(args.usuarios, args.servicios_por_usuario)
+        siembra_s = time.perf_counter() - inicio_siembra
+
+        detener = None
+        if args.modo == 'wsgi':
+            puerto, detener = iniciar_servidor_wsgi()
+        elif args.modo == 'asgi':
+            puerto, detener = iniciar_servidor_asgi()
+
+        secuencia = itertools.count()
+        clientes = []
+        for usuario in usuarios[:args.concurrencia]:
+            cliente = ClientePrueba() if args.modo == 'cliente' else ClienteHTTP(puerto)
+            with sin_salida():
+                cliente.login(usuario.username)
+            # Servicios que este cliente podrá cancelar, uno por iteración
+            cancelables = [
+                ServicioAgendado.objects.create(
+                    usuario=usuario, tipo_servicio='residencial', descripcion='Cancelable',
+                    direccion_servicio='Calle 1', fecha_servicio=timezone.now() + timedelta(days=500 + i),
+                ).id
+                for i in range(args.iteraciones)
+            ] if 'cancelar' in args.endpoints else []
+            clientes.append(escenarios(cliente, usuario.username, secuencia, cancelables))
+
+        resultados = {}
+        with sin_salida():
+            for nombre in args.endpoints:
+                resultados[nombre] = medir_endpoint(
+                    nombre, clientes, args.iteraciones, contar_consultas=args.modo == 'cliente'
+                )
+        if detener:
+            detener()
+
+    informe = {
+        'fecha': datetime.now(dt_timezone.utc).isoformat(),
+        'modo': args.modo,
+        'parametros': {
+            'iteraciones': args.iteraciones, 'concurrencia': args.concurrencia,
+            'usuarios': args.usuarios, 'servicios_por_usuario': args.servicios_por_usuario,
+            'siembra_segundos': round(siembra_s, 2),
+        },
+        'entorno': {'python': platform.python_version(), 'plataforma': platform.platform()},
+        'endpoints': resultados,
+    }
+    texto = json.dumps(informe, indent=2)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark de verificación de contraseñas (el costo de CPU de cada login) por
+perfil de hashing.
+
+Para cada hasher mide:
+    secuencial    verificaciones seguidas en el hilo principal: logins/s por núcleo
+    pool          --hilos peticiones simultáneas contra el pool de --procesos
+                  procesos: logins/s totales y por proceso, latencia p50/p99
+
+``django-pbkdf2`` es el hasher por defecto de Django (600.000 iteraciones en el
+hilo de la petición), la referencia a superar. argon2 solo se mide si
+argon2-cffi está instalado.
+
+Uso:
+    python benchmarks/bench_hashing.py --procesos 4 --hilos 16 --logins 400
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+from comun import configurar, percentil
+
+PASSWORD = 'clave-bench-123'
+
+
+def _hashers():
+    from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+    from alamosjclean.hashers import argon2_disponible
+    from authentication.hashers import Argon2Hasher, PBKDF2Hasher, ScryptHasher
+
+    hashers = {'django-pbkdf2': PBKDF2PasswordHasher(), 'pbkdf2': PBKDF2Hasher(), 'scrypt': ScryptHasher()}
+    if argon2_disponible():
+        hashers['argon2'] = Argon2Hasher()
+    return hashers
+
+
+def medir_secuencial(hasher, codificado, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        assert hasher.verify(PASSWORD, codificado)
+        tiempos.append(time.perf_counter() - inicio)
+    mediana = sorted(tiempos)[len(tiempos) // 2]
+    return {
+        'mediana_ms': round(mediana * 1000, 2),
+        'logins_por_segundo_por_nucleo': round(1 / mediana, 1),
+    }
+
+
+def medir_pool(hasher, codificado, logins, hilos):
+    def verificar(_):
+        inicio = time.perf_counter()
+        assert hasher.verify(PASSWORD, codificado)
+        return time.perf_counter() - inicio
+
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        list(pool.map(verificar, range(hilos)))  # Calentamiento: arranca los procesos
+        inicio = time.perf_counter()
+        latencias = sorted(pool.map(verificar, range(logins)))
+        duracion = time.perf_counter() - inicio
+    return {
+        'logins_por_segundo': round(logins / duracion, 1),
+        'p50_ms': round(percentil(latencias, 50) * 1000, 2),
+        'p99_ms': round(percentil(latencias, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Logins por segundo y por núcleo según el hasher')
+    parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--hilos', type=int, default=None, help='Logins simultáneos (por defecto 4 por proceso)')
+    parser.add_argument('--logins', type=int, default=400)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto, stdout)')
+    args = parser.parse_args()
+    hilos = args.hilos or 4 * args.procesos
+
+    with tempfile.TemporaryDirectory() as directorio:
+        configurar(os.path.join(directorio, 'bench.sqlite3'), migrar=False)
+        from authentication import hashers as modulo
+
+        resultados = {}
+        for nombre, hasher in _hashers().items():
+            modulo._pool = modulo.PoolHashing(procesos=0, cola_maxima=hilos)
+            codificado = hasher.encode(PASSWORD, hasher.salt())
+            resultado = {'secuencial': medir_secuencial(hasher, codificado, args.repeticiones)}
+            if nombre != 'django-pbkdf2':
+                modulo._pool = modulo.PoolHashing(procesos=args.procesos, cola_maxima=hilos, espera_maxima=60)
+                pool = medir_pool(hasher, codificado, args.logins, hilos)
+                pool['logins_por_segundo_por_proceso'] = round(pool['logins_por_segundo'] / args.procesos, 1)
+                resultado['pool'] = pool
+                modulo._pool.cerrar()
+            resultados[nombre] = resultado
+
+    informe = {
+        'fecha': datetime.now(dt_timezone.utc).isoformat(),
+        'parametros': {
+            'procesos': args.procesos, 'hilos': hilos, 'logins': args.logins, 'repeticiones': args.repeticiones,
+        },
+        'entorno': {
+            'python': platform.python_version(), 'plataforma': platform.platform(), 'nucleos': os.cpu_count(),
+        },
+        'hashers': resultados,
+    }
+    texto = json.dumps(informe, indent=2)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
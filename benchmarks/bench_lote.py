@@ -0,0 +1,110 @@
+"""
+Benchmark de agendamiento en lote: POST /api/servicios/agendar-lote/ con N
+reservas (recurrencias diarias repartidas en varias franjas) contra una
+cuadrilla con turno todo el día, sobre el perfil sqlite.
+
+El objetivo es 1.000 reservas bastante por debajo de un segundo; el resultado
+es JSON con la mediana y el mínimo de las repeticiones y las consultas por lote.
+
+Uso:
+    python benchmarks/bench_lote.py --reservas 1000 --repeticiones 5
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime, time as hora, timedelta, timezone as dt_timezone
+
+from comun import PASSWORD_BENCH, configurar, sin_salida
+
+FRANJAS = ('00:00:00', '06:00:00', '12:00:00', '18:00:00')
+
+
+def _preparar():
+    from django.contrib.auth import get_user_model
+
+    from servicios.models import Cuadrilla, TurnoCuadrilla
+
+    cuadrilla = Cuadrilla.objects.create(nombre='Cuadrilla bench', tipos_servicio=['empresarial'])
+    TurnoCuadrilla.objects.bulk_create([
+        TurnoCuadrilla(cuadrilla=cuadrilla, dia_semana=dia, hora_inicio=hora(0, 0), hora_fin=hora(23, 59))
+        for dia in range(7)
+    ])
+    return get_user_model().objects.create_user(username='bench-lote', password=PASSWORD_BENCH)
+
+
+def _cuerpo(reservas, desde):
+    """Recurrencias diarias en las franjas, una por franja, que suman ``reservas``"""
+    servicios = []
+    for indice, franja in enumerate(FRANJAS):
+        repeticiones = reservas // len(FRANJAS) + (indice < reservas % len(FRANJAS))
+        if repeticiones:
+            servicios.append({
+                'tipo_servicio': 'empresarial', 'descripcion': 'Oficina', 'direccion_servicio': 'Sede',
+                'fecha_servicio': f'{desde.isoformat()}T{franja}',
+                'recurrencia': {'frecuencia': 'diaria', 'repeticiones': repeticiones},
+            })
+    return {'servicios': servicios}
+
+
+def medir(reservas, repeticiones):
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from django.utils import timezone
+
+    usuario = _preparar()
+    cliente = Client()
+    cliente.force_login(usuario)
+    tiempos, consultas = [], None
+    for repeticion in range(repeticiones + 1):
+        # Cada repetición en días libres: la primera es calentamiento
+        desde = timezone.localdate() + timedelta(days=7 + repeticion * (reservas + 1))
+        cuerpo = _cuerpo(reservas, desde)
+        with sin_salida(), CaptureQueriesContext(connection) as capturadas:
+            inicio = time.perf_counter()
+            datos = cliente.post('/api/servicios/agendar-lote/', cuerpo, content_type='application/json').json()
+            duracion = time.perf_counter() - inicio
+        if datos.get('creados') != reservas:
+            raise RuntimeError(f'Se crearon {datos.get("creados")} de {reservas} reservas')
+        if repeticion:
+            tiempos.append(duracion)
+            consultas = len(capturadas)
+    return {
+        'mediana_ms': round(statistics.median(tiempos) * 1000, 1),
+        'minimo_ms': round(min(tiempos) * 1000, 1),
+        'reservas_por_segundo': round(reservas / statistics.median(tiempos)),
+        'consultas_por_lote': consultas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Agendamiento de N reservas en un solo lote')
+    parser.add_argument('--reservas', type=int, default=1000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto, stdout)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        configurar(os.path.join(directorio, 'bench.sqlite3'))
+        resultado = medir(args.reservas, args.repeticiones)
+
+    informe = {
+        'fecha': datetime.now(dt_timezone.utc).isoformat(),
+        'parametros': {'reservas': args.reservas, 'repeticiones': args.repeticiones},
+        'entorno': {'python': platform.python_version(), 'plataforma': platform.platform()},
+        'resultado': resultado,
+    }
+    texto = json.dumps(informe, indent=2)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
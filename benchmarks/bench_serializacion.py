@@ -0,0 +1,125 @@
+"""
+Micro-benchmark de serialización de servicios (sin base de datos).
+
+Compara, para N servicios:
+    instancias      dict armado por instancia con get_*_display() + JsonResponse
+    serializador    Serializador sobre tuplas de values_list + stdlib json
+    serializador-orjson  lo mismo con orjson (si está instalado)
+
+Uso:
+    python benchmarks/bench_serializacion.py --servicios 10000 --repeticiones 20
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from comun import configurar
+
+
+def _datos(cantidad):
+    from servicios.models import Cuadrilla, ServicioAgendado
+    from servicios.views import SERIALIZADOR_SERVICIO
+
+    tipos = [tipo for tipo, _ in ServicioAgendado.TIPOS_SERVICIO]
+    estados = [estado for estado, _ in ServicioAgendado.ESTADOS_SERVICIO]
+    base = datetime(2025, 1, 1, 8, 0, tzinfo=dt_timezone.utc)
+    cuadrilla = Cuadrilla(nombre='Cuadrilla Norte')
+    tuplas, instancias = [], []
+    for n in range(cantidad):
+        campos = {
+            'id': n, 'tipo_servicio': tipos[n % len(tipos)], 'descripcion': f'Limpieza {n}',
+            'direccion_servicio': f'Calle {n} # 10-20', 'fecha_servicio': base + timedelta(hours=n),
+            'estado': estados[n % len(estados)], 'version': 1 + n % 3, 'precio_estimado': Decimal('150000.00'),
+            'fecha_creacion': base - timedelta(days=1, seconds=n),
+        }
+        # Las tuplas siguen los lookups del serializador, igual que values_list en la vista
+        valores = {**campos, 'cuadrilla__nombre': cuadrilla.nombre}
+        tuplas.append(tuple(valores[lookup] for lookup in SERIALIZADOR_SERVICIO.lookups))
+        instancias.append(ServicioAgendado(cuadrilla=cuadrilla, **campos))
+    return tuplas, instancias
+
+
+def _por_instancias(instancias):
+    from django.http import JsonResponse
+
+    return JsonResponse({'success': True, 'servicios': [
+        {
+            'id': servicio.id,
+            'tipo_servicio': servicio.get_tipo_servicio_display(),
+            'descripcion': servicio.descripcion,
+            'direccion_servicio': servicio.direccion_servicio,
+            'fecha_servicio': servicio.fecha_servicio.isoformat(),
+            'estado': servicio.get_estado_display(),
+            'version': servicio.version,
+            'precio_estimado': str(servicio.precio_estimado) if servicio.precio_estimado else None,
+            'fecha_creacion': servicio.fecha_creacion.isoformat(),
+            'cuadrilla': servicio.cuadrilla.nombre if servicio.cuadrilla else None,
+        }
+        for servicio in instancias
+    ]}).content
+
+
+def _por_serializador(tuplas):
+    from alamosjclean.serializacion import RespuestaJSON
+    from servicios.views import SERIALIZADOR_SERVICIO
+
+    return RespuestaJSON({'success': True, 'servicios': SERIALIZADOR_SERVICIO.filas(tuplas)}).content
+
+
+def _medir(funcion, argumento, repeticiones):
+    funcion(argumento)  # Calentamiento
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cuerpo = funcion(argumento)
+        tiempos.append(time.perf_counter() - inicio)
+    return {
+        'mediana_ms': round(statistics.median(tiempos) * 1000, 2),
+        'minimo_ms': round(min(tiempos) * 1000, 2),
+        'bytes': len(cuerpo),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serialización de N servicios por estrategia')
+    parser.add_argument('--servicios', type=int, default=10000)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto, stdout)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        configurar(os.path.join(directorio, 'bench.sqlite3'), migrar=False)
+        from django.conf import settings
+
+        from alamosjclean import serializacion
+
+        tuplas, instancias = _datos(args.servicios)
+        resultados = {'instancias': _medir(_por_instancias, instancias, args.repeticiones)}
+        settings.SERIALIZACION_JSON_BACKEND = 'json'
+        resultados['serializador'] = _medir(_por_serializador, tuplas, args.repeticiones)
+        if serializacion.orjson is not None:
+            settings.SERIALIZACION_JSON_BACKEND = 'auto'
+            resultados['serializador-orjson'] = _medir(_por_serializador, tuplas, args.repeticiones)
+
+    informe = {
+        'fecha': datetime.now(dt_timezone.utc).isoformat(),
+        'parametros': {'servicios': args.servicios, 'repeticiones': args.repeticiones},
+        'entorno': {'python': platform.python_version(), 'plataforma': platform.platform()},
+        'estrategias': resultados,
+    }
+    texto = json.dumps(informe, indent=2)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark de peticiones/segundo a /api/auth/verificar-sesion/ con el backend de
+sesiones ``db`` (escritura en cada petición) frente a ``authentication.sesiones``.
+
+Uso:
+    python benchmarks/bench_sesiones.py [--peticiones 2000] [--hilos 4]
+
+Usa una base SQLite temporal en disco para que el bloqueo de escritura de SQLite
+se refleje en los resultados.
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from comun import configurar, sin_salida
+
+MOTORES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache+escritura diferida': 'authentication.sesiones',
+}
+
+
+def medir(motor, peticiones, hilos):
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.cache import cache
+    from django.test import Client
+
+    settings.SESSION_ENGINE = motor
+    cache.clear()
+    Usuario = get_user_model()
+
+    clientes = []
+    for i in range(hilos):
+        usuario, _ = Usuario.objects.get_or_create(username=f'bench{i}')
+        cliente = Client()
+        cliente.force_login(usuario)
+        clientes.append(cliente)
+
+    por_hilo = peticiones // hilos
+
+    def ejecutar(cliente):
+        for _ in range(por_hilo):
+            cliente.get('/api/auth/verificar-sesion/')
+
+    # verificar_sesion imprime trazas de depuración; no medir la consola
+    with sin_salida():
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            list(pool.map(ejecutar, clientes))
+        duracion = time.perf_counter() - inicio
+    return por_hilo * hilos / duracion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--peticiones', type=int, default=2000)
+    parser.add_argument('--hilos', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        configurar(os.path.join(directorio, 'bench.sqlite3'))
+        for nombre, motor in MOTORES.items():
+            rps = medir(motor, args.peticiones, args.hilos)
+            print(f'{nombre:28s} {rps:10.1f} peticiones/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Utilidades compartidas por los benchmarks: configuración de Django sobre una
+base SQLite temporal, carga de datos de prueba y estadísticas de latencia.
+"""
+import contextlib
+import io
+import os
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alamosjclean.settings')
+
+PASSWORD_BENCH = 'clave-bench-123'
+
+
+def configurar(ruta_bd, base_datos=None, migrar=True):
+    """
+    Inicializa Django contra una base SQLite nueva en ``ruta_bd`` (perfil
+    sqlite de settings) o contra ``base_datos`` si se indica, y la migra
+    """
+    import django
+    from django.conf import settings
+
+    from alamosjclean.bd import perfil_sqlite
+
+    settings.DATABASES['default'] = base_datos or perfil_sqlite(ruta_bd)
+    settings.ALLOWED_HOSTS = ['testserver', '127.0.0.1', 'localhost']
+    settings.DEBUG = False
+    django.setup()
+
+    if migrar:
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0)
+
+
+@contextlib.contextmanager
+def sin_salida():
+    """Descarta lo que las vistas impriman en consola durante la medición"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return None
+    k = (len(valores_ordenados) - 1) * p / 100
+    inferior = int(k)
+    superior = min(inferior + 1, len(valores_ordenados) - 1)
+    return valores_ordenados[inferior] + (valores_ordenados[superior] - valores_ordenados[inferior]) * (k - inferior)
+
+
+def sembrar_datos(usuarios=100, servicios_por_usuario=50, prefijo='bench'):
+    """
+    Crea usuarios, servicios en todos los estados, seguimientos y facturas con
+    bulk_create. La contraseña se hashea una sola vez y se reutiliza.
+    Devuelve la lista de usuarios creados.
+    """
+    from datetime import timedelta
+
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.utils import timezone
+
+    from servicios.facturacion import conciliar
+    from servicios.models import FacturacionServicio, SeguimientoServicio, ServicioAgendado
+
+    Usuario = get_user_model()
+    password = make_password(PASSWORD_BENCH)
+    Usuario.objects.bulk_create([
+        Usuario(
+            username=f'{prefijo}{i}', email=f'{prefijo}{i}@example.com', password=password,
+            first_name='Cliente', last_name=str(i), telefono='3000000000', direccion=f'Calle {i}',
+        )
+        for i in range(usuarios)
+    ], batch_size=500)
+    creados = list(Usuario.objects.filter(username__startswith=prefijo).order_by('id'))
+
+    tipos = [tipo for tipo, _ in ServicioAgendado.TIPOS_SERVICIO]
+    estados = [estado for estado, _ in ServicioAgendado.ESTADOS_SERVICIO]
+    ahora = timezone.now()
+    servicios = []
+    for usuario in creados:
+        for n in range(servicios_por_usuario):
+            tipo = tipos[n % len(tipos)]
+            inicio = ahora + timedelta(days=n - servicios_por_usuario // 2, hours=n % 9)
+            servicios.append(ServicioAgendado(
+                usuario=usuario, tipo_servicio=tipo, descripcion=f'Servicio {n} de {usuario.username}',
+                direccion_servicio=f'Carrera {n} # {usuario.pk}-{n}', fecha_servicio=inicio,
+                fecha_fin_servicio=inicio + ServicioAgendado.DURACIONES_SERVICIO[tipo],
+                estado=estados[n % len(estados)], precio_estimado=Decimal('150000.00') + n,
+            ))
+    ServicioAgendado.objects.bulk_create(servicios, batch_size=1000)
+
+    en_proceso = ServicioAgendado.objects.filter(
+        usuario__in=creados, estado='en_proceso'
+    ).values_list('id', flat=True)
+    SeguimientoServicio.objects.bulk_create([
+        SeguimientoServicio(servicio_id=servicio_id, equipo_asignado='Equipo bench', progreso_porcentaje=50)
+        for servicio_id in en_proceso
+    ], batch_size=1000)
+
+    completados = ServicioAgendado.objects.filter(
+        usuario__in=creados, estado='completado'
+    ).values_list('id', 'precio_estimado')
+    FacturacionServicio.objects.bulk_create([
+        FacturacionServicio(
+            servicio_id=servicio_id, monto_total=precio, monto_pagado=precio if servicio_id % 2 else 0,
+            estado_pago='pagado' if servicio_id % 2 else 'pendiente',
+            fecha_vencimiento=(ahora + timedelta(days=30)).date(),
+            numero_factura=f'B{servicio_id:010d}',
+        )
+        for servicio_id, precio in completados
+    ], batch_size=1000)
+    # bulk_create no actualiza los resúmenes de facturación
+    conciliar()
+    return creados
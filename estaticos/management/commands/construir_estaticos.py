@@ -0,0 +1,66 @@
+import gzip
+import json
+import os
+import shutil
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from estaticos.manifiesto import (
+    ARCHIVOS_FRONTEND, NOMBRE_MANIFIESTO, directorio_build, hash_contenido, nombre_con_hash, registro,
+    tipo_contenido,
+)
+
+try:
+    import brotli
+except ImportError:  # Dependencia opcional: sin ella solo se genera gzip
+    brotli = None
+
+# Tipos que vale la pena comprimir (el PNG ya está comprimido)
+TIPOS_COMPRIMIBLES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+
+class Command(BaseCommand):
+    help = 'Genera copias con hash, versiones gzip/brotli y el manifiesto de los archivos del frontend'
+
+    def handle(self, *args, **options):
+        destino = directorio_build()
+        if os.path.isdir(destino):
+            shutil.rmtree(destino)
+        os.makedirs(destino)
+
+        manifiesto = {}
+        for logico in ARCHIVOS_FRONTEND:
+            with open(os.path.join(settings.BASE_DIR, logico), 'rb') as archivo:
+                contenido = archivo.read()
+            digest = hash_contenido(contenido)
+            nombre = nombre_con_hash(logico, digest)
+            tipo = tipo_contenido(logico)
+            with open(os.path.join(destino, nombre), 'wb') as archivo:
+                archivo.write(contenido)
+
+            codificaciones = {}
+            if tipo.startswith(TIPOS_COMPRIMIBLES):
+                comprimidos = {'gzip': (gzip.compress(contenido, compresslevel=9, mtime=0), '.gz')}
+                if brotli is not None:
+                    comprimidos['br'] = (brotli.compress(contenido, quality=11), '.br')
+                for codificacion, (datos, extension) in comprimidos.items():
+                    # Solo se guarda la versión comprimida si realmente ahorra bytes
+                    if len(datos) < len(contenido):
+                        with open(os.path.join(destino, nombre + extension), 'wb') as archivo:
+                            archivo.write(datos)
+                        codificaciones[codificacion] = nombre + extension
+
+            manifiesto[logico] = {
+                'nombre': nombre,
+                'hash': digest,
+                'tipo': tipo,
+                'tamano': len(contenido),
+                'codificaciones': codificaciones,
+            }
+            self.stdout.write(f'{logico} -> {nombre} {sorted(codificaciones)}')
+
+        with open(os.path.join(destino, NOMBRE_MANIFIESTO), 'w', encoding='utf-8') as archivo:
+            json.dump(manifiesto, archivo, indent=2)
+        registro.reiniciar()
+        self.stdout.write(self.style.SUCCESS(f'Manifiesto escrito en {destino}'))
@@ -0,0 +1,183 @@
+"""
+Manifiesto de los archivos estáticos del frontend (styles.css, script.js, Logo2.png).
+
+``construir_estaticos`` copia cada archivo con su hash en el nombre, genera las
+versiones gzip/brotli y escribe ``manifest.json``. En ejecución el manifiesto se
+lee una sola vez y los metadatos quedan en memoria: servir un archivo no hace
+ninguna llamada al sistema de archivos aparte del open().
+
+Sin build (desarrollo) los archivos se sirven desde la raíz del proyecto y se
+editan en caliente: cada petición hace un stat() y el hash se recalcula cuando
+cambian la fecha de modificación o el tamaño.
+"""
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+ARCHIVOS_FRONTEND = ('styles.css', 'script.js', 'Logo2.png')
+
+NOMBRE_MANIFIESTO = 'manifest.json'
+
+# Codificaciones en orden de preferencia y extensión de su archivo precomprimido
+CODIFICACIONES = (
+    ('br', '.br'),
+    ('gzip', '.gz'),
+)
+
+
+@dataclass(frozen=True)
+class Activo:
+    """Metadatos en memoria de un archivo servible"""
+    nombre: str
+    ruta: str
+    tipo: str
+    etag: str
+    codificaciones: dict = field(default_factory=dict)
+    # (mtime_ns, tamaño) del archivo fuente; None si viene del build
+    firma: tuple = None
+
+
+def directorio_build():
+    return str(getattr(settings, 'ESTATICOS_BUILD_DIR', settings.BASE_DIR / 'build' / 'estaticos'))
+
+
+def hash_contenido(contenido):
+    return hashlib.sha256(contenido).hexdigest()[:12]
+
+
+def nombre_con_hash(nombre, digest):
+    base, extension = os.path.splitext(nombre)
+    return f'{base}.{digest}{extension}'
+
+
+def etag_codificado(etag, codificacion):
+    """ETag propio de cada codificación: '"hash"' -> '"hash-gz"'"""
+    if codificacion is None:
+        return etag
+    return f'{etag[:-1]}-{dict(CODIFICACIONES)[codificacion].lstrip(".")}"'
+
+
+def _firma(estado):
+    return estado.st_mtime_ns, estado.st_size
+
+
+def activo_fuente(logico):
+    """Activo sin build leído de la raíz del proyecto, o None si no existe"""
+    ruta = os.path.join(settings.BASE_DIR, logico)
+    try:
+        # La firma se toma antes de leer: si el archivo cambia entre medio, el
+        # siguiente stat() ya no coincide y se vuelve a calcular
+        firma = _firma(os.stat(ruta))
+        with open(ruta, 'rb') as archivo:
+            digest = hash_contenido(archivo.read())
+    except FileNotFoundError:
+        return None
+    return Activo(nombre=logico, ruta=ruta, tipo=tipo_contenido(logico), etag=f'"{digest}"', firma=firma)
+
+
+def tipo_contenido(nombre):
+    tipo, _ = mimetypes.guess_type(nombre)
+    tipo = tipo or 'application/octet-stream'
+    if tipo.startswith('text/') or tipo in ('application/javascript', 'text/javascript'):
+        tipo += '; charset=utf-8'
+    return tipo
+
+
+class _Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cargado = False
+        self.por_nombre_logico = {}
+        self.por_nombre_hash = {}
+
+    def _cargar(self):
+        directorio = directorio_build()
+        try:
+            with open(os.path.join(directorio, NOMBRE_MANIFIESTO), encoding='utf-8') as archivo:
+                manifiesto = json.load(archivo)
+        except FileNotFoundError:
+            manifiesto = {}
+
+        for logico, datos in manifiesto.items():
+            activo = Activo(
+                nombre=datos['nombre'],
+                ruta=os.path.join(directorio, datos['nombre']),
+                tipo=datos['tipo'],
+                etag=f'"{datos["hash"]}"',
+                codificaciones={
+                    codificacion: os.path.join(directorio, nombre)
+                    for codificacion, nombre in datos.get('codificaciones', {}).items()
+                },
+            )
+            self.por_nombre_logico[logico] = activo
+            self.por_nombre_hash[activo.nombre] = activo
+
+        # Sin build, los archivos del frontend se sirven desde la raíz del proyecto
+        for logico in ARCHIVOS_FRONTEND:
+            if logico in self.por_nombre_logico:
+                continue
+            activo = activo_fuente(logico)
+            if activo is not None:
+                self.por_nombre_logico[logico] = activo
+        self._cargado = True
+
+    def refrescar(self, activo):
+        """El activo sin build vigente: recalculado si el archivo cambió"""
+        try:
+            firma = _firma(os.stat(activo.ruta))
+        except FileNotFoundError:
+            firma = None
+        if firma == activo.firma:
+            return activo
+        with self._lock:
+            actual = self.por_nombre_logico.get(activo.nombre)
+            if actual is not None and actual.firma != activo.firma:
+                # Otro hilo ya lo recalculó
+                return actual
+            nuevo = activo_fuente(activo.nombre)
+            if nuevo is None:
+                self.por_nombre_logico.pop(activo.nombre, None)
+            else:
+                self.por_nombre_logico[activo.nombre] = nuevo
+            return nuevo
+
+    def asegurar_cargado(self):
+        if not self._cargado:
+            with self._lock:
+                if not self._cargado:
+                    self._cargar()
+
+    def reiniciar(self):
+        with self._lock:
+            self._cargado = False
+            self.por_nombre_logico = {}
+            self.por_nombre_hash = {}
+
+
+registro = _Registro()
+
+
+def activo_logico(nombre):
+    registro.asegurar_cargado()
+    activo = registro.por_nombre_logico.get(nombre)
+    if activo is not None and activo.firma is not None:
+        activo = registro.refrescar(activo)
+    return activo
+
+
+def activo_con_hash(nombre):
+    registro.asegurar_cargado()
+    return registro.por_nombre_hash.get(nombre)
+
+
+def url_activo(nombre):
+    """URL con hash si existe build; si no, la ruta estable del archivo"""
+    activo = activo_logico(nombre)
+    if activo is not None and activo.nombre != nombre:
+        return f'/assets/{activo.nombre}'
+    return f'/{nombre}'
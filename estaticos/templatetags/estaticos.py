@@ -0,0 +1,11 @@
+from django import template
+
+from estaticos.manifiesto import url_activo
+
+register = template.Library()
+
+
+@register.simple_tag
+def activo(nombre):
+    """URL del archivo del frontend, con hash cuando existe el build"""
+    return url_activo(nombre)
@@ -0,0 +1,103 @@
+import gzip
+import os
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .manifiesto import activo_logico, registro
+
+
+class ActivosSinBuildTests(TestCase):
+    """
+    Sin build los archivos se sirven con su nombre estable
+    """
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajustes = override_settings(ESTATICOS_BUILD_DIR=directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        registro.reiniciar()
+        self.addCleanup(registro.reiniciar)
+
+    def test_index_usa_nombres_estables(self):
+        contenido = self.client.get('/').content.decode()
+        self.assertIn('href="/styles.css"', contenido)
+
+    def test_archivo_estable_se_revalida_con_etag(self):
+        respuesta = self.client.get('/styles.css')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Cache-Control'], 'public, no-cache')
+        respuesta = self.client.get('/styles.css', HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_archivo_editado_cambia_de_etag(self):
+        raiz = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, raiz, ignore_errors=True)
+        ruta = os.path.join(raiz, 'styles.css')
+        with open(ruta, 'w') as archivo:
+            archivo.write('body { color: red; }')
+        with override_settings(BASE_DIR=Path(raiz)):
+            etag = self.client.get('/styles.css')['ETag']
+            with open(ruta, 'w') as archivo:
+                archivo.write('body { color: blue; }')
+
+            respuesta = self.client.get('/styles.css', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(b''.join(respuesta.streaming_content), b'body { color: blue; }')
+            self.assertNotEqual(respuesta['ETag'], etag)
+            self.assertEqual(self.client.get('/styles.css', HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 304)
+
+
+class ActivosConBuildTests(TestCase):
+    """
+    Pruebas de los archivos con hash y precomprimidos
+    """
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajustes = override_settings(ESTATICOS_BUILD_DIR=directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        call_command('construir_estaticos', stdout=StringIO())
+        self.addCleanup(registro.reiniciar)
+        self.css = activo_logico('styles.css')
+
+    def test_index_apunta_a_nombres_con_hash(self):
+        contenido = self.client.get('/').content.decode()
+        self.assertIn(f'href="/assets/{self.css.nombre}"', contenido)
+        self.assertIn(f'src="/assets/{activo_logico("script.js").nombre}"', contenido)
+
+    def test_sirve_gzip_inmutable_si_el_cliente_lo_acepta(self):
+        respuesta = self.client.get(f'/assets/{self.css.nombre}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', respuesta['Cache-Control'])
+        self.assertIn('Accept-Encoding', respuesta['Vary'])
+        with open(self.css.ruta, 'rb') as original:
+            self.assertEqual(gzip.decompress(b''.join(respuesta.streaming_content)), original.read())
+
+    def test_cada_codificacion_tiene_su_etag(self):
+        url = f'/assets/{self.css.nombre}'
+        original = self.client.get(url)['ETag']
+        comprimido = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+        self.assertEqual(original, self.css.etag)
+        self.assertEqual(comprimido, f'{self.css.etag[:-1]}-gz"')
+        # El ETag de la versión gzip no valida la copia sin comprimir
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=comprimido).status_code, 200)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=comprimido, HTTP_ACCEPT_ENCODING='gzip').status_code, 304
+        )
+
+    def test_sin_accept_encoding_sirve_el_original(self):
+        respuesta = self.client.get(f'/assets/{self.css.nombre}')
+        self.assertFalse(respuesta.has_header('Content-Encoding'))
+        self.assertTrue(respuesta['Content-Type'].startswith('text/css'))
+
+    def test_nombre_desconocido_devuelve_404(self):
+        self.assertEqual(self.client.get('/assets/styles.000000000000.css').status_code, 404)
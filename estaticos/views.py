@@ -0,0 +1,61 @@
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_http_methods
+
+from .manifiesto import CODIFICACIONES, activo_con_hash, activo_logico, etag_codificado
+
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+CACHE_REVALIDAR = 'public, no-cache'
+
+
+def _codificaciones_aceptadas(request):
+    aceptadas = set()
+    for parte in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        nombre, _, parametros = parte.strip().partition(';')
+        if parametros.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        aceptadas.add(nombre.strip().lower())
+    return aceptadas
+
+
+def _responder(request, activo, cache_control):
+    """
+    Sirve un activo eligiendo la versión precomprimida que acepte el cliente
+    """
+    if activo is None:
+        raise Http404("File not found")
+
+    ruta, codificacion = activo.ruta, None
+    aceptadas = _codificaciones_aceptadas(request)
+    for nombre, _ in CODIFICACIONES:
+        if nombre in activo.codificaciones and nombre in aceptadas:
+            ruta, codificacion = activo.codificaciones[nombre], nombre
+            break
+    # Cada codificación es una representación distinta con su propio ETag
+    etag = etag_codificado(activo.etag, codificacion)
+
+    if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+        respuesta = HttpResponseNotModified()
+    else:
+        # FileResponse usa wsgi.file_wrapper (sendfile) cuando el servidor lo ofrece
+        respuesta = FileResponse(open(ruta, 'rb'), content_type=activo.tipo, filename=activo.nombre)
+        if codificacion:
+            respuesta['Content-Encoding'] = codificacion
+
+    respuesta['ETag'] = etag
+    respuesta['Cache-Control'] = cache_control
+    if activo.codificaciones:
+        patch_vary_headers(respuesta, ('Accept-Encoding',))
+    return respuesta
+
+
+@require_http_methods(["GET", "HEAD"])
+def servir_activo(request, nombre):
+    """Archivos con hash en el nombre: su contenido nunca cambia"""
+    return _responder(request, activo_con_hash(nombre), CACHE_INMUTABLE)
+
+
+@require_http_methods(["GET", "HEAD"])
+def servir_archivo_estable(request, filename):
+    """Nombres sin hash (styles.css, ...): el navegador revalida con ETag"""
+    return _responder(request, activo_logico(filename), CACHE_REVALIDAR)
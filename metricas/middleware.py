@@ -0,0 +1,192 @@
+"""
+Middleware de instrumentación: latencia, consultas SQL, tamaño de respuesta y
+escrituras de sesión por vista.
+
+Debe ir primero en MIDDLEWARE para que la medición incluya el guardado de la
+sesión y el resto de middlewares. Solo se instrumenta una fracción
+``METRICAS_MUESTREO`` de las peticiones; las que no se muestrean pasan sin más
+costo que un número aleatorio, y con ``METRICAS_HABILITADAS = False`` el
+middleware se desactiva al arrancar.
+"""
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .registro import registro
+
+logger = logging.getLogger(__name__)
+
+MUESTREO_DEFECTO = 1.0
+
+# Ejecuciones de la misma sentencia en una petición a partir de las cuales se
+# considera un patrón N+1
+UMBRAL_N_MAS_1_DEFECTO = 5
+
+VISTA_SIN_RUTA = '<sin_ruta>'
+
+
+@dataclass
+class Medicion:
+    vista: str
+    metodo: str
+    estado: int
+    duracion: float
+    consultas: int
+    tiempo_consultas: float
+    bytes_respuesta: int = None
+    escrituras_sesion: int = 0
+    # (repeticiones, sql) de la sentencia más repetida si supera el umbral
+    n_mas_1: tuple = None
+
+
+def _es_lote(sql, many):
+    """
+    executemany o INSERT de varias filas: los bulk_create se parten en tandas
+    del mismo tamaño con el mismo SQL, y esas repeticiones no son un N+1
+    """
+    return many or (sql.lstrip()[:6].upper() == 'INSERT' and '), (' in sql)
+
+
+class _ContadorConsultas:
+    """
+    Wrapper de ``connection.execute_wrapper``. El SQL que recibe todavía tiene
+    los parámetros sin sustituir, así que la misma consulta con distintos ids
+    cuenta como la misma sentencia. Las sentencias en lote cuentan como
+    consultas pero no para la detección de N+1.
+    """
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo = 0.0
+        self.escrituras_sesion = 0
+        self.por_sentencia = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo += time.perf_counter() - inicio
+            self.consultas += 1
+            if not _es_lote(sql, many):
+                self.por_sentencia[sql] = self.por_sentencia.get(sql, 0) + 1
+            if '"django_session"' in sql and sql.lstrip()[:6].upper() in ('INSERT', 'UPDATE'):
+                self.escrituras_sesion += 1
+
+    def mas_repetida(self):
+        if not self.por_sentencia:
+            return None
+        sql, repeticiones = max(self.por_sentencia.items(), key=lambda item: item[1])
+        return repeticiones, sql
+
+
+def _nombre_vista(request):
+    coincidencia = getattr(request, 'resolver_match', None)
+    if coincidencia is None:
+        return VISTA_SIN_RUTA
+    return coincidencia.view_name or coincidencia._func_path
+
+
+def _bytes_respuesta(response):
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+def _enganchar(contador):
+    for conexion in connections.all():
+        conexion.execute_wrappers.append(contador)
+
+
+def _soltar(contador):
+    for conexion in connections.all():
+        if contador in conexion.execute_wrappers:
+            conexion.execute_wrappers.remove(contador)
+
+
+class MetricasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICAS_HABILITADAS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.muestreo = getattr(settings, 'METRICAS_MUESTREO', MUESTREO_DEFECTO)
+        self.umbral_n_mas_1 = getattr(settings, 'METRICAS_UMBRAL_N_MAS_1', UMBRAL_N_MAS_1_DEFECTO)
+        # Bajo ASGI con vistas async la cadena es asíncrona: evitar el salto a un hilo
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def _muestrear(self):
+        return self.muestreo > 0 and (self.muestreo >= 1 or random.random() < self.muestreo)
+
+    @contextmanager
+    def _instrumentar(self):
+        contador = _ContadorConsultas()
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(contador))
+            yield contador
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        if not self._muestrear():
+            return self.get_response(request)
+
+        inicio = time.perf_counter()
+        with self._instrumentar() as contador:
+            response = self.get_response(request)
+        self._registrar(request, response, contador, time.perf_counter() - inicio)
+        return response
+
+    async def __acall__(self, request):
+        if not self._muestrear():
+            return await self.get_response(request)
+
+        # El ORM de las vistas async corre en el hilo de sync_to_async de la
+        # petición, con conexiones propias de ese hilo: el contador se engancha ahí
+        contador = _ContadorConsultas()
+        inicio = time.perf_counter()
+        await sync_to_async(_enganchar)(contador)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_soltar)(contador)
+        self._registrar(request, response, contador, time.perf_counter() - inicio)
+        return response
+
+    def _registrar(self, request, response, contador, duracion):
+        vista = _nombre_vista(request)
+        if vista == 'metricas':
+            return
+
+        n_mas_1 = contador.mas_repetida()
+        if n_mas_1 is not None and n_mas_1[0] < self.umbral_n_mas_1:
+            n_mas_1 = None
+        if n_mas_1 is not None:
+            logger.warning(
+                'Posible N+1 en %s %s: %d ejecuciones de %s',
+                request.method, vista, n_mas_1[0], n_mas_1[1][:300],
+            )
+
+        registro.registrar_peticion(Medicion(
+            vista=vista,
+            metodo=request.method,
+            estado=response.status_code,
+            duracion=duracion,
+            consultas=contador.consultas,
+            tiempo_consultas=contador.tiempo,
+            bytes_respuesta=_bytes_respuesta(response),
+            escrituras_sesion=contador.escrituras_sesion,
+            n_mas_1=n_mas_1,
+        ))
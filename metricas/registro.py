@@ -0,0 +1,151 @@
+"""
+Registro en memoria de las métricas por vista y su exposición en formato de
+texto de Prometheus.
+
+Todo vive en el proceso: cada worker expone sus propios contadores y es
+Prometheus quien los suma. Las etiquetas se limitan al nombre de la vista, el
+método y el código de estado para que la cardinalidad no crezca con las URLs.
+"""
+import threading
+from bisect import bisect_left
+
+# Límites superiores (le) de cada histograma
+BUCKETS_DURACION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+PREFIJO = 'alamos'
+
+
+class Histograma:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)
+        self.suma = 0
+        self.cantidad = 0
+
+    def observar(self, valor):
+        self.conteos[bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.cantidad += 1
+
+    def acumulados(self):
+        """Pares (le, conteo acumulado) incluyendo +Inf"""
+        total = 0
+        for limite, conteo in zip(self.buckets + ('+Inf',), self.conteos):
+            total += conteo
+            yield limite, total
+
+
+# nombre: (tipo, ayuda, buckets o None para contadores)
+DEFINICIONES = {
+    'peticiones_total': ('counter', 'Peticiones atendidas', None),
+    'peticion_duracion_segundos': ('histogram', 'Latencia de la petición completa', BUCKETS_DURACION),
+    'consultas_bd': ('histogram', 'Consultas SQL por petición', BUCKETS_CONSULTAS),
+    'consultas_bd_segundos_total': ('counter', 'Tiempo acumulado en consultas SQL', None),
+    'respuesta_bytes': ('histogram', 'Tamaño del cuerpo serializado de la respuesta', BUCKETS_BYTES),
+    'sesion_escrituras_total': ('counter', 'Escrituras de la sesión en django_session', None),
+    'n_mas_1_total': ('counter', 'Peticiones con la misma consulta repetida (patrón N+1)', None),
+    'hashing_pendientes': ('gauge', 'Hashes de contraseña en curso o esperando en el pool', None),
+    'hashing_espera_segundos': ('histogram', 'Espera por un cupo del pool de hashing', BUCKETS_DURACION),
+    'hashing_duracion_segundos': ('histogram', 'Duración del hash de una contraseña en el pool', BUCKETS_DURACION),
+    'hashing_rechazos_total': ('counter', 'Hashes rechazados con el pool de hashing saturado', None),
+}
+
+
+def _formatear_etiquetas(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ''
+    texto = ','.join(
+        '{}="{}"'.format(nombre, str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for nombre, valor in pares
+    )
+    return '{' + texto + '}'
+
+
+def _formatear_numero(valor):
+    if isinstance(valor, float):
+        return repr(valor)
+    return str(valor)
+
+
+class Registro:
+    """
+    Contadores e histogramas indexados por (métrica, etiquetas)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {nombre: {} for nombre in DEFINICIONES}
+        # Última consulta repetida detectada por vista, para diagnóstico
+        self.ultimos_n_mas_1 = {}
+
+    def incrementar(self, nombre, etiquetas, valor=1):
+        with self._lock:
+            self._incrementar(nombre, etiquetas, valor)
+
+    def observar(self, nombre, etiquetas, valor):
+        with self._lock:
+            self._observar(nombre, etiquetas, valor)
+
+    def registrar_peticion(self, medicion):
+        """Vuelca de una vez todo lo medido en una petición"""
+        vista = (('vista', medicion.vista),)
+        with self._lock:
+            self._incrementar(
+                'peticiones_total', vista + (('metodo', medicion.metodo), ('estado', medicion.estado))
+            )
+            self._observar('peticion_duracion_segundos', vista + (('metodo', medicion.metodo),), medicion.duracion)
+            self._observar('consultas_bd', vista, medicion.consultas)
+            self._incrementar('consultas_bd_segundos_total', vista, medicion.tiempo_consultas)
+            if medicion.bytes_respuesta is not None:
+                self._observar('respuesta_bytes', vista, medicion.bytes_respuesta)
+            if medicion.escrituras_sesion:
+                self._incrementar('sesion_escrituras_total', vista, medicion.escrituras_sesion)
+            if medicion.n_mas_1:
+                self._incrementar('n_mas_1_total', vista)
+                self.ultimos_n_mas_1[medicion.vista] = medicion.n_mas_1
+
+    def _incrementar(self, nombre, etiquetas, valor=1):
+        series = self._series[nombre]
+        series[etiquetas] = series.get(etiquetas, 0) + valor
+
+    def _observar(self, nombre, etiquetas, valor):
+        series = self._series[nombre]
+        histograma = series.get(etiquetas)
+        if histograma is None:
+            histograma = series[etiquetas] = Histograma(DEFINICIONES[nombre][2])
+        histograma.observar(valor)
+
+    def valor(self, nombre, **etiquetas):
+        """Valor de un contador o el histograma de una serie (para pruebas y diagnóstico)"""
+        with self._lock:
+            return self._series[nombre].get(tuple(etiquetas.items()))
+
+    def exportar(self):
+        """Todas las series en formato de texto de Prometheus (versión 0.0.4)"""
+        lineas = []
+        with self._lock:
+            for nombre, (tipo, ayuda, _) in DEFINICIONES.items():
+                completo = f'{PREFIJO}_{nombre}'
+                lineas.append(f'# HELP {completo} {ayuda}')
+                lineas.append(f'# TYPE {completo} {tipo}')
+                for etiquetas, serie in sorted(self._series[nombre].items(), key=lambda item: item[0]):
+                    if tipo in ('counter', 'gauge'):
+                        lineas.append(f'{completo}{_formatear_etiquetas(etiquetas)} {_formatear_numero(serie)}')
+                        continue
+                    for limite, acumulado in serie.acumulados():
+                        le = (('le', limite if limite == '+Inf' else _formatear_numero(limite)),)
+                        lineas.append(f'{completo}_bucket{_formatear_etiquetas(etiquetas, le)} {acumulado}')
+                    lineas.append(f'{completo}_sum{_formatear_etiquetas(etiquetas)} {_formatear_numero(serie.suma)}')
+                    lineas.append(f'{completo}_count{_formatear_etiquetas(etiquetas)} {serie.cantidad}')
+        return '\n'.join(lineas) + '\n'
+
+    def reiniciar(self):
+        with self._lock:
+            self._series = {nombre: {} for nombre in DEFINICIONES}
+            self.ultimos_n_mas_1 = {}
+
+
+registro = Registro()
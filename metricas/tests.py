@@ -0,0 +1,112 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from .middleware import MetricasMiddleware
+from .registro import registro
+
+Usuario = get_user_model()
+
+
+class MetricasMiddlewareTests(TestCase):
+    def setUp(self):
+        registro.reiniciar()
+        self.addCleanup(registro.reiniciar)
+
+    def test_registra_latencia_consultas_y_bytes_por_vista(self):
+        respuesta = self.client.get('/api/auth/verificar-sesion/')
+        self.assertEqual(respuesta.status_code, 200)
+
+        vista = 'authentication:verificar_sesion'
+        self.assertEqual(registro.valor('peticiones_total', vista=vista, metodo='GET', estado=200), 1)
+        self.assertEqual(registro.valor('peticion_duracion_segundos', vista=vista, metodo='GET').cantidad, 1)
+        self.assertEqual(registro.valor('consultas_bd', vista=vista).cantidad, 1)
+        self.assertEqual(registro.valor('respuesta_bytes', vista=vista).suma, len(respuesta.content))
+
+    def test_cuenta_escrituras_de_sesion(self):
+        Usuario.objects.create_user(username='ana', password='clave-segura-123')
+        self.client.post(
+            '/api/auth/login/', {'username': 'ana', 'password': 'clave-segura-123'},
+            content_type='application/json',
+        )
+        self.assertGreaterEqual(registro.valor('sesion_escrituras_total', vista='authentication:login'), 1)
+
+    def test_detecta_consultas_repetidas(self):
+        def vista_n_mas_1(request):
+            request.resolver_match = type('Coincidencia', (), {'view_name': 'prueba_n_mas_1'})()
+            for usuario_id in range(6):
+                list(Usuario.objects.filter(pk=usuario_id))
+            return HttpResponse('ok')
+
+        with self.assertLogs('metricas.middleware', level='WARNING'):
+            MetricasMiddleware(vista_n_mas_1)(RequestFactory().get('/'))
+
+        self.assertEqual(registro.valor('n_mas_1_total', vista='prueba_n_mas_1'), 1)
+        repeticiones, sql = registro.ultimos_n_mas_1['prueba_n_mas_1']
+        self.assertEqual(repeticiones, 6)
+        self.assertIn('"usuarios"', sql)
+
+    def test_bulk_create_en_tandas_no_es_n_mas_1(self):
+        def vista_lote(request):
+            request.resolver_match = type('Coincidencia', (), {'view_name': 'prueba_lote'})()
+            Usuario.objects.bulk_create([Usuario(username=f'u{n}') for n in range(12)], batch_size=2)
+            return HttpResponse('ok')
+
+        with self.assertNoLogs('metricas.middleware', level='WARNING'):
+            MetricasMiddleware(vista_lote)(RequestFactory().get('/'))
+
+        self.assertIsNone(registro.valor('n_mas_1_total', vista='prueba_lote'))
+        self.assertEqual(registro.valor('consultas_bd', vista='prueba_lote').suma, 6)
+
+    @override_settings(ROOT_URLCONF='alamosjclean.urls_asgi')
+    async def test_instrumenta_vistas_asincronas(self):
+        usuario = await Usuario.objects.acreate(username='ana')
+        await sync_to_async(self.async_client.force_login)(usuario)
+        respuesta = await self.async_client.get('/api/servicios/mis-servicios/')
+        self.assertEqual(respuesta.status_code, 200)
+
+        # La cadena es asíncrona: las consultas de los sync_to_async también cuentan
+        vista = 'servicios:mis_servicios'
+        self.assertEqual(registro.valor('peticiones_total', vista=vista, metodo='GET', estado=200), 1)
+        self.assertGreaterEqual(registro.valor('consultas_bd', vista=vista).suma, 2)
+
+    @override_settings(METRICAS_MUESTREO=0)
+    def test_sin_muestreo_no_instrumenta(self):
+        middleware = MetricasMiddleware(lambda request: HttpResponse('ok'))
+        middleware(RequestFactory().get('/'))
+        self.assertEqual(len(connection.execute_wrappers), 0)
+        self.assertNotIn('alamos_peticiones_total{', registro.exportar())
+
+
+class EndpointMetricasTests(TestCase):
+    def setUp(self):
+        registro.reiniciar()
+        self.addCleanup(registro.reiniciar)
+
+    def test_requiere_staff(self):
+        self.assertEqual(self.client.get('/metricas/').status_code, 403)
+
+    def test_formato_prometheus(self):
+        staff = Usuario.objects.create_user(username='admin', password='clave-segura-123', is_staff=True)
+        self.client.get('/api/auth/verificar-sesion/')
+        self.client.force_login(staff)
+
+        respuesta = self.client.get('/metricas/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta['Content-Type'].startswith('text/plain; version=0.0.4'))
+        contenido = respuesta.content.decode()
+        self.assertIn('# TYPE alamos_peticion_duracion_segundos histogram', contenido)
+        self.assertIn(
+            'alamos_peticion_duracion_segundos_bucket{vista="authentication:verificar_sesion",metodo="GET",le="+Inf"} 1',
+            contenido,
+        )
+        # El propio endpoint no se mide
+        self.assertNotIn('vista="metricas"', contenido)
+
+    @override_settings(METRICAS_TOKEN='secreto')
+    def test_token_bearer(self):
+        self.assertEqual(self.client.get('/metricas/').status_code, 403)
+        respuesta = self.client.get('/metricas/', HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(respuesta.status_code, 200)
@@ -0,0 +1,33 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_http_methods
+
+from .registro import registro
+
+TIPO_CONTENIDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _autorizado(request):
+    """
+    Con ``METRICAS_TOKEN`` se exige ``Authorization: Bearer <token>`` (para el
+    scraper de Prometheus); sin él, solo el personal autenticado puede leerlas
+    """
+    token = getattr(settings, 'METRICAS_TOKEN', '')
+    if token:
+        cabecera = request.headers.get('Authorization', '')
+        return hmac.compare_digest(cabecera, f'Bearer {token}')
+    return request.user.is_authenticated and request.user.is_staff
+
+
+@never_cache
+@require_http_methods(["GET"])
+def metricas(request):
+    """
+    Endpoint con las métricas del proceso en formato de texto de Prometheus
+    """
+    if not _autorizado(request):
+        return HttpResponseForbidden('No autorizado', content_type='text/plain; charset=utf-8')
+    return HttpResponse(registro.exportar(), content_type=TIPO_CONTENIDO)
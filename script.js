@@ -1110,6 +1110,55 @@ function stopSessionRenewal() {
     }
 }
 
+// Stream de seguimiento (Server-Sent Events): el servidor envía solo los cambios
+let trackingStream;
+
+function startTrackingStream() {
+    if (trackingStream || typeof EventSource === 'undefined') {
+        return;
+    }
+    
+    trackingStream = new EventSource('http://127.0.0.1:8000/api/servicios/seguimiento/stream/', {
+        withCredentials: true
+    });
+    
+    trackingStream.addEventListener('inicial', (event) => {
+        JSON.parse(event.data).forEach(seguimiento => {
+            applyTrackingChanges(seguimiento.servicio_id, seguimiento);
+        });
+    });
+    
+    trackingStream.addEventListener('seguimiento', (event) => {
+        const data = JSON.parse(event.data);
+        applyTrackingChanges(data.servicio_id, data.cambios);
+    });
+}
+
+function stopTrackingStream() {
+    if (trackingStream) {
+        trackingStream.close();
+        trackingStream = null;
+    }
+}
+
+function applyTrackingChanges(serviceId, changes) {
+    const service = services.find(s => s.id === serviceId);
+    if (!service) return;
+    
+    if (changes.progreso_porcentaje !== undefined) {
+        service.progress = changes.progreso_porcentaje;
+    }
+    if (changes.ubicacion_actual !== undefined) {
+        service.location = changes.ubicacion_actual;
+    }
+    if (changes.tareas_completadas !== undefined) {
+        service.checklist = changes.tareas_completadas;
+    }
+    
+    updateServiceStatus();
+    updateServicesTab();
+}
+
 // Función para obtener CSRF token
 async function getCSRFToken() {
     try {
@@ -1174,6 +1223,7 @@ async function checkSession() {
                 startSessionRenewal();
                 
                 await loadUserServices();
+                startTrackingStream();
             } else {
                 // Sesión no válida, limpiar datos locales
                 currentUser = null;
@@ -1204,6 +1254,7 @@ async function logout() {
     try {
         // Detener renovación de sesión
         stopSessionRenewal();
+        stopTrackingStream();
         
         const response = await fetch('http://127.0.0.1:8000/api/auth/logout/', {
             method: 'POST',
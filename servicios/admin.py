@@ -1,3 +1,102 @@
 from django.contrib import admin
 
-# Register your models here.
+from alamosjclean.paginacion import PaginadorEstimado
+
+from .models import (
+    Cuadrilla, FacturacionServicio, HistorialServicio, RecaudoMensual, ResumenFacturacion, SecuenciaFacturacion,
+    SeguimientoServicio, ServicioAgendado, TurnoCuadrilla,
+)
+
+
+class AdminTablaGrande(admin.ModelAdmin):
+    """
+    Base para tablas que crecen sin límite: conteo estimado sin filtros y sin
+    el segundo COUNT(*) del total cuando se filtra
+    """
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    list_per_page = 50
+
+
+class TurnoCuadrillaInline(admin.TabularInline):
+    model = TurnoCuadrilla
+    extra = 0
+
+
+@admin.register(Cuadrilla)
+class CuadrillaAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'activa')
+    list_filter = ('activa',)
+    search_fields = ('nombre',)
+    inlines = [TurnoCuadrillaInline]
+
+
+@admin.register(ServicioAgendado)
+class ServicioAgendadoAdmin(AdminTablaGrande):
+    list_display = ('id', 'tipo_servicio', 'usuario', 'estado', 'fecha_servicio', 'cuadrilla', 'precio_estimado')
+    # El __str__ del usuario y de la cuadrilla sale del mismo JOIN
+    list_select_related = ('usuario', 'cuadrilla')
+    # estado usa serv_estado_fcrea_id_idx; cuadrilla, serv_cuadrilla_fserv_idx
+    list_filter = ('estado', 'cuadrilla')
+    # Búsquedas exactas sobre columnas indexadas en lugar de LIKE '%...%'
+    search_fields = ('=id', '=usuario__username')
+    search_help_text = 'Id del servicio o nombre de usuario exacto'
+    autocomplete_fields = ('usuario',)
+    readonly_fields = ('version', 'fecha_creacion', 'fecha_actualizacion')
+
+
+class AdminDeServicio(AdminTablaGrande):
+    """Modelos 1-1 con ServicioAgendado, cuyo __str__ incluye servicio y usuario"""
+    list_select_related = ('servicio__usuario',)
+    raw_id_fields = ('servicio',)
+    search_fields = ('=servicio__id',)
+    ordering = ('-id',)
+
+
+@admin.register(HistorialServicio)
+class HistorialServicioAdmin(AdminDeServicio):
+    list_display = ('servicio', 'fecha_inicio', 'fecha_finalizacion', 'calificacion')
+
+
+@admin.register(SeguimientoServicio)
+class SeguimientoServicioAdmin(AdminDeServicio):
+    list_display = ('servicio', 'equipo_asignado', 'progreso_porcentaje', 'tiempo_estimado_finalizacion')
+
+
+@admin.register(FacturacionServicio)
+class FacturacionServicioAdmin(AdminDeServicio):
+    list_display = ('numero_factura', 'servicio', 'monto_total', 'monto_pagado', 'estado_pago', 'fecha_vencimiento')
+    # fact_estado_venc_idx empieza por estado_pago
+    list_filter = ('estado_pago',)
+    search_fields = ('=numero_factura', '=servicio__id')
+    search_help_text = 'Número de factura o id del servicio exacto'
+
+
+class AdminResumen(AdminTablaGrande):
+    """Tablas derivadas: se corrigen con conciliar_facturacion, no a mano"""
+    list_select_related = ('usuario',)
+    search_fields = ('=usuario__username',)
+    ordering = ('-mes',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ResumenFacturacion)
+class ResumenFacturacionAdmin(AdminResumen):
+    list_display = ('usuario', 'mes', 'estado_pago', 'cantidad', 'monto_total', 'monto_pagado')
+    list_filter = ('estado_pago',)
+
+
+@admin.register(RecaudoMensual)
+class RecaudoMensualAdmin(AdminResumen):
+    list_display = ('usuario', 'mes', 'cantidad', 'monto_pagado')
+
+
+@admin.register(SecuenciaFacturacion)
+class SecuenciaFacturacionAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'siguiente')
+    readonly_fields = ('siguiente',)
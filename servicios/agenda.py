@@ -0,0 +1,297 @@
+"""
+Agenda de cuadrillas: disponibilidad y admisión de servicios según capacidad.
+
+La ocupación de cada cuadrilla en un rango se carga con una sola consulta sobre
+el índice (cuadrilla, fecha_servicio) y se organiza en un ``IndiceIntervalos``
+por cuadrilla, que responde "¿está libre [inicio, fin)?" y admite nuevos
+intervalos en O(log n).
+"""
+import random
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import eventos, geocodificacion, notificaciones
+from .models import Cuadrilla, ServicioAgendado
+
+# Separación entre horarios candidatos al listar disponibilidad
+INTERVALO_HORARIOS = timedelta(minutes=30)
+
+# Días que puede abarcar una consulta de disponibilidad
+MAXIMO_DIAS_DISPONIBILIDAD = 31
+
+
+class SinDisponibilidad(Exception):
+    """No hay una cuadrilla libre para el horario pedido"""
+
+
+class _Nodo:
+    __slots__ = ('inicio', 'fin', 'max_fin', 'prioridad', 'izquierdo', 'derecho')
+
+    def __init__(self, inicio, fin):
+        self.inicio = inicio
+        self.fin = fin
+        self.max_fin = fin
+        self.prioridad = random.random()
+        self.izquierdo = None
+        self.derecho = None
+
+    def actualizar(self):
+        self.max_fin = self.fin
+        for hijo in (self.izquierdo, self.derecho):
+            if hijo is not None and hijo.max_fin > self.max_fin:
+                self.max_fin = hijo.max_fin
+
+
+def _dividir(nodo, inicio):
+    """(nodos con inicio < ``inicio``, nodos con inicio >= ``inicio``)"""
+    if nodo is None:
+        return None, None
+    if nodo.inicio < inicio:
+        nodo.derecho, derecha = _dividir(nodo.derecho, inicio)
+        nodo.actualizar()
+        return nodo, derecha
+    izquierda, nodo.izquierdo = _dividir(nodo.izquierdo, inicio)
+    nodo.actualizar()
+    return izquierda, nodo
+
+
+def _insertar(nodo, nuevo):
+    if nodo is None:
+        return nuevo
+    if nuevo.prioridad > nodo.prioridad:
+        nuevo.izquierdo, nuevo.derecho = _dividir(nodo, nuevo.inicio)
+        nuevo.actualizar()
+        return nuevo
+    if nuevo.inicio < nodo.inicio:
+        nodo.izquierdo = _insertar(nodo.izquierdo, nuevo)
+    else:
+        nodo.derecho = _insertar(nodo.derecho, nuevo)
+    nodo.actualizar()
+    return nodo
+
+
+class IndiceIntervalos:
+    """
+    Intervalos en un treap ordenado por inicio; cada nodo guarda el mayor fin
+    de su subárbol.
+
+    Alguno solapa [a, b) si entre los de inicio < b hay un fin > a. Bajando
+    desde la raíz, cada nodo con inicio < b cubre también su subárbol
+    izquierdo, así que la consulta y la inserción recorren un solo camino:
+    O(log n) esperado.
+    """
+
+    def __init__(self, intervalos=()):
+        self._raiz = None
+        self._cantidad = 0
+        for inicio, fin in intervalos:
+            self.agregar(inicio, fin)
+
+    def esta_libre(self, inicio, fin):
+        nodo = self._raiz
+        while nodo is not None:
+            if nodo.inicio < fin:
+                if nodo.fin > inicio or (nodo.izquierdo is not None and nodo.izquierdo.max_fin > inicio):
+                    return False
+                nodo = nodo.derecho
+            else:
+                nodo = nodo.izquierdo
+        return True
+
+    def agregar(self, inicio, fin):
+        self._raiz = _insertar(self._raiz, _Nodo(inicio, fin))
+        self._cantidad += 1
+
+    def __len__(self):
+        return self._cantidad
+
+
+def duracion_servicio(tipo_servicio):
+    return ServicioAgendado.DURACIONES_SERVICIO[tipo_servicio]
+
+
+def cuadrillas_para(tipo_servicio, bloquear=False):
+    """Cuadrillas activas que atienden el tipo, con sus turnos precargados"""
+    cuadrillas = Cuadrilla.objects.filter(activa=True).prefetch_related('turnos')
+    if bloquear:
+        cuadrillas = cuadrillas.select_for_update()
+    # Las cuadrillas son pocas: el filtro por tipo (JSON) se hace en Python
+    return [c for c in cuadrillas if tipo_servicio in c.tipos_servicio]
+
+
+def indices_ocupacion(cuadrilla_ids, desde, hasta):
+    """
+    Un IndiceIntervalos por cuadrilla con los servicios que ocupan [desde, hasta)
+    """
+    indices = {cuadrilla_id: [] for cuadrilla_id in cuadrilla_ids}
+    # El servicio más largo empieza como mucho esta cantidad antes de 'desde'
+    margen = max(ServicioAgendado.DURACIONES_SERVICIO.values())
+    ocupados = ServicioAgendado.objects.filter(
+        cuadrilla_id__in=cuadrilla_ids,
+        fecha_servicio__gte=desde - margen,
+        fecha_servicio__lt=hasta,
+        estado__in=ServicioAgendado.ESTADOS_OCUPAN_CUADRILLA,
+    ).values_list('cuadrilla_id', 'fecha_servicio', 'fecha_fin_servicio', 'tipo_servicio')
+    for cuadrilla_id, inicio, fin, tipo in ocupados:
+        indices[cuadrilla_id].append((inicio, fin or inicio + duracion_servicio(tipo)))
+    return {cuadrilla_id: IndiceIntervalos(intervalos) for cuadrilla_id, intervalos in indices.items()}
+
+
+def _ventanas_turno(cuadrilla, dia):
+    """Ventanas [inicio, fin) aware de los turnos de la cuadrilla en el día local dado"""
+    for turno in cuadrilla.turnos.all():
+        if turno.dia_semana == dia.weekday():
+            yield (
+                timezone.make_aware(datetime.combine(dia, turno.hora_inicio)),
+                timezone.make_aware(datetime.combine(dia, turno.hora_fin)),
+            )
+
+
+def _en_turno(cuadrilla, inicio, fin):
+    dia = timezone.localtime(inicio).date()
+    return any(
+        ventana_inicio <= inicio and fin <= ventana_fin
+        for ventana_inicio, ventana_fin in _ventanas_turno(cuadrilla, dia)
+    )
+
+
+def horarios_disponibles(tipo_servicio, desde, dias=7, limite=None):
+    """
+    Horarios libres para el tipo de servicio en ``dias`` días a partir de la fecha
+    local ``desde``, con la cantidad de cuadrillas libres en cada uno
+    """
+    duracion = duracion_servicio(tipo_servicio)
+    cuadrillas = cuadrillas_para(tipo_servicio)
+    if not cuadrillas:
+        return []
+
+    inicio_rango = timezone.make_aware(datetime.combine(desde, datetime.min.time()))
+    fin_rango = inicio_rango + timedelta(days=dias)
+    indices = indices_ocupacion([c.id for c in cuadrillas], inicio_rango, fin_rango)
+    ahora = timezone.now()
+
+    libres = {}
+    for numero_dia in range(dias):
+        dia = desde + timedelta(days=numero_dia)
+        for cuadrilla in cuadrillas:
+            indice = indices[cuadrilla.id]
+            for ventana_inicio, ventana_fin in _ventanas_turno(cuadrilla, dia):
+                inicio = ventana_inicio
+                while inicio + duracion <= ventana_fin:
+                    if inicio >= ahora and indice.esta_libre(inicio, inicio + duracion):
+                        libres[inicio] = libres.get(inicio, 0) + 1
+                    inicio += INTERVALO_HORARIOS
+
+    horarios = [
+        {'inicio': inicio, 'fin': inicio + duracion, 'cuadrillas_libres': cantidad}
+        for inicio, cantidad in sorted(libres.items())
+    ]
+    return horarios[:limite] if limite else horarios
+
+
+def _elegir_cuadrilla(cuadrillas, indices, inicio, fin):
+    en_turno = [c for c in cuadrillas if _en_turno(c, inicio, fin)]
+    if not en_turno:
+        raise SinDisponibilidad('No hay cuadrillas en turno para ese horario')
+    for cuadrilla in en_turno:
+        if indices[cuadrilla.id].esta_libre(inicio, fin):
+            return cuadrilla
+    raise SinDisponibilidad('No hay cuadrillas disponibles para ese horario')
+
+
+def _crear(**campos):
+    servicio = ServicioAgendado.objects.create(**campos)
+    # El aviso al cliente se encola en la misma transacción que la reserva
+    notificaciones.encolar([notificaciones.notificacion('servicio_agendado', servicio.usuario_id, servicio.id)])
+    return servicio
+
+
+def agendar(**campos):
+    """
+    Crea el ServicioAgendado asignándole una cuadrilla libre y en turno.
+
+    La comprobación y el INSERT ocurren en la misma transacción con las
+    cuadrillas bloqueadas, de modo que dos reservas simultáneas no pueden
+    ocupar la misma franja. Si ninguna cuadrilla atiende el tipo, el servicio se
+    crea sin asignar (la capacidad de ese tipo no está modelada).
+    """
+    tipo_servicio = campos['tipo_servicio']
+    inicio = campos['fecha_servicio']
+    fin = inicio + duracion_servicio(tipo_servicio)
+    campos['fecha_fin_servicio'] = fin
+
+    with transaction.atomic():
+        cuadrillas = cuadrillas_para(tipo_servicio, bloquear=True)
+        if not cuadrillas:
+            return _crear(**campos)
+
+        indices = indices_ocupacion([c.id for c in cuadrillas], inicio, fin)
+        cuadrilla = _elegir_cuadrilla(cuadrillas, indices, inicio, fin)
+        return _crear(cuadrilla=cuadrilla, **campos)
+
+
+def agendar_lote(lista_campos, atomico=False):
+    """
+    Admite muchos servicios con una sola lectura de ocupación y un bulk_create.
+
+    Devuelve, en el mismo orden, el ServicioAgendado creado o la excepción
+    SinDisponibilidad de cada elemento. Con ``atomico`` no se crea nada si
+    alguno falla.
+    """
+    if not lista_campos:
+        return []
+    # bulk_create no emite pre_save: se geocodifica aquí, antes de bloquear las cuadrillas
+    ubicaciones = [geocodificacion.geocodificar(campos.get('direccion_servicio')) for campos in lista_campos]
+
+    with transaction.atomic():
+        bloqueadas = list(Cuadrilla.objects.filter(activa=True).prefetch_related('turnos').select_for_update())
+        por_tipo = {
+            tipo: [c for c in bloqueadas if tipo in c.tipos_servicio]
+            for tipo in {campos['tipo_servicio'] for campos in lista_campos}
+        }
+
+        intervalos = []
+        for campos in lista_campos:
+            inicio = campos['fecha_servicio']
+            intervalos.append((inicio, inicio + duracion_servicio(campos['tipo_servicio'])))
+        indices = indices_ocupacion(
+            [c.id for c in bloqueadas],
+            min(inicio for inicio, _ in intervalos),
+            max(fin for _, fin in intervalos),
+        )
+
+        resultados = []
+        nuevos = []
+        for campos, (inicio, fin), ubicacion in zip(lista_campos, intervalos, ubicaciones):
+            servicio = ServicioAgendado(fecha_fin_servicio=fin, **campos)
+            geocodificacion.asignar(servicio, ubicacion)
+            cuadrillas = por_tipo[campos['tipo_servicio']]
+            if cuadrillas:
+                try:
+                    servicio.cuadrilla = _elegir_cuadrilla(cuadrillas, indices, inicio, fin)
+                except SinDisponibilidad as e:
+                    resultados.append(e)
+                    continue
+                # Las reservas del propio lote también ocupan la cuadrilla
+                indices[servicio.cuadrilla.id].agregar(inicio, fin)
+            resultados.append(servicio)
+            nuevos.append(servicio)
+
+        if atomico and len(nuevos) != len(resultados):
+            return resultados
+        ServicioAgendado.objects.bulk_create(nuevos, batch_size=500)
+        # bulk_create no emite post_save: los eventos de alta se insertan aquí
+        eventos.registrar([
+            eventos.evento_de(servicio, 'creado', eventos.instantanea(servicio)) for servicio in nuevos
+        ])
+        # Un solo aviso por cliente con todo lo que se le agendó
+        por_usuario = {}
+        for servicio in nuevos:
+            por_usuario.setdefault(servicio.usuario_id, []).append(servicio.id)
+        notificaciones.encolar([
+            notificaciones.notificacion('servicios_agendados', usuario_id, datos={'cantidad': len(ids), 'servicios': ids})
+            for usuario_id, ids in por_usuario.items()
+        ])
+    return resultados
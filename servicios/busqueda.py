@@ -0,0 +1,262 @@
+"""
+Índice de búsqueda de servicios por descripción y dirección.
+
+    SQLite      tabla FTS5 ``servicios_busqueda`` (rowid = id del servicio) con
+                el tokenizer unicode61 y remove_diacritics 2; orden por bm25
+    PostgreSQL  tabla ``servicios_busqueda`` (servicio_id, tsvector con la
+                configuración 'spanish' sobre el texto sin tildes) con índice
+                GIN; orden por ts_rank
+    Otros       icontains término a término: recorrido completo, sin tildes
+                equivalentes ni orden por relevancia
+
+El índice se mantiene con triggers y no con señales, así que también quedan
+indexados los bulk_create, los update() y las cargas por SQL. La consulta se
+normaliza igual que el texto (minúsculas, sin tildes ni eñes) y cada término se
+busca como prefijo: "limp" encuentra "Limpieza" y "via" encuentra "Vía".
+
+En SQLite algunas migraciones de servicios_agendados rehacen la tabla y con
+ella se pierden los triggers; ``manage.py reconstruir_busqueda`` los vuelve a
+crear y reindexa por lotes.
+"""
+import re
+import unicodedata
+
+from django.db import connections, router, transaction
+from django.db.models import Q
+
+from .models import ServicioAgendado
+
+# Términos considerados de una consulta; el resto se ignora
+MAXIMO_TERMINOS = 8
+
+TAMANO_LOTE_DEFECTO = 5000
+
+SQL_SQLITE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS servicios_busqueda USING fts5(
+        descripcion, direccion_servicio, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS servicios_busqueda_insertar AFTER INSERT ON servicios_agendados BEGIN
+        INSERT INTO servicios_busqueda (rowid, descripcion, direccion_servicio)
+        VALUES (new.id, new.descripcion, new.direccion_servicio);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS servicios_busqueda_actualizar AFTER UPDATE ON servicios_agendados
+    WHEN old.descripcion IS NOT new.descripcion OR old.direccion_servicio IS NOT new.direccion_servicio BEGIN
+        DELETE FROM servicios_busqueda WHERE rowid = old.id;
+        INSERT INTO servicios_busqueda (rowid, descripcion, direccion_servicio)
+        VALUES (new.id, new.descripcion, new.direccion_servicio);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS servicios_busqueda_eliminar AFTER DELETE ON servicios_agendados BEGIN
+        DELETE FROM servicios_busqueda WHERE rowid = old.id;
+    END
+    """,
+]
+
+SQL_SQLITE_ELIMINAR = [
+    'DROP TRIGGER IF EXISTS servicios_busqueda_insertar',
+    'DROP TRIGGER IF EXISTS servicios_busqueda_actualizar',
+    'DROP TRIGGER IF EXISTS servicios_busqueda_eliminar',
+    'DROP TABLE IF EXISTS servicios_busqueda',
+]
+
+SQL_POSTGRESQL = [
+    """
+    CREATE TABLE IF NOT EXISTS servicios_busqueda (
+        servicio_id bigint PRIMARY KEY REFERENCES servicios_agendados (id) ON DELETE CASCADE,
+        documento tsvector NOT NULL
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS servicios_busqueda_documento_gin ON servicios_busqueda USING GIN (documento)',
+    # translate() en lugar de la extensión unaccent: es IMMUTABLE y no requiere permisos
+    """
+    CREATE OR REPLACE FUNCTION servicios_busqueda_documento(descripcion text, direccion text)
+    RETURNS tsvector LANGUAGE sql IMMUTABLE AS $$
+        SELECT setweight(to_tsvector('spanish', translate(lower(descripcion), 'áéíóúüñ', 'aeiouun')), 'A')
+            || setweight(to_tsvector('spanish', translate(lower(direccion), 'áéíóúüñ', 'aeiouun')), 'B')
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION servicios_busqueda_sincronizar() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO servicios_busqueda (servicio_id, documento)
+        VALUES (NEW.id, servicios_busqueda_documento(NEW.descripcion, NEW.direccion_servicio))
+        ON CONFLICT (servicio_id) DO UPDATE SET documento = EXCLUDED.documento;
+        RETURN NULL;
+    END
+    $$
+    """,
+    'DROP TRIGGER IF EXISTS servicios_busqueda_insertar ON servicios_agendados',
+    """
+    CREATE TRIGGER servicios_busqueda_insertar AFTER INSERT ON servicios_agendados
+    FOR EACH ROW EXECUTE FUNCTION servicios_busqueda_sincronizar()
+    """,
+    'DROP TRIGGER IF EXISTS servicios_busqueda_actualizar ON servicios_agendados',
+    """
+    CREATE TRIGGER servicios_busqueda_actualizar AFTER UPDATE ON servicios_agendados
+    FOR EACH ROW WHEN (
+        OLD.descripcion IS DISTINCT FROM NEW.descripcion
+        OR OLD.direccion_servicio IS DISTINCT FROM NEW.direccion_servicio
+    ) EXECUTE FUNCTION servicios_busqueda_sincronizar()
+    """,
+]
+
+SQL_POSTGRESQL_ELIMINAR = [
+    'DROP TRIGGER IF EXISTS servicios_busqueda_insertar ON servicios_agendados',
+    'DROP TRIGGER IF EXISTS servicios_busqueda_actualizar ON servicios_agendados',
+    'DROP FUNCTION IF EXISTS servicios_busqueda_sincronizar()',
+    'DROP TABLE IF EXISTS servicios_busqueda',
+    'DROP FUNCTION IF EXISTS servicios_busqueda_documento(text, text)',
+]
+
+# Lote de reindexación: (borrar el rango, indexar el rango) con parámetros (desde, hasta)
+SQL_LOTE = {
+    'sqlite': [
+        'DELETE FROM servicios_busqueda WHERE rowid > %s AND rowid <= %s',
+        """
+        INSERT INTO servicios_busqueda (rowid, descripcion, direccion_servicio)
+        SELECT id, descripcion, direccion_servicio FROM servicios_agendados WHERE id > %s AND id <= %s
+        """,
+    ],
+    'postgresql': [
+        # Las filas huérfanas las borra el ON DELETE CASCADE
+        None,
+        """
+        INSERT INTO servicios_busqueda (servicio_id, documento)
+        SELECT id, servicios_busqueda_documento(descripcion, direccion_servicio)
+        FROM servicios_agendados WHERE id > %s AND id <= %s
+        ON CONFLICT (servicio_id) DO UPDATE SET documento = EXCLUDED.documento
+        """,
+    ],
+}
+
+SQL_BUSCAR = {
+    'sqlite': """
+        SELECT s.id FROM servicios_busqueda JOIN servicios_agendados s ON s.id = servicios_busqueda.rowid
+        WHERE servicios_busqueda MATCH %s {filtro}
+        ORDER BY servicios_busqueda.rank, s.id DESC LIMIT %s OFFSET %s
+    """,
+    'postgresql': """
+        SELECT s.id FROM servicios_busqueda b JOIN servicios_agendados s ON s.id = b.servicio_id
+        WHERE b.documento @@ to_tsquery('spanish', %s) {filtro}
+        ORDER BY ts_rank(b.documento, to_tsquery('spanish', %s)) DESC, s.id DESC LIMIT %s OFFSET %s
+    """,
+}
+
+
+def normalizar(texto):
+    """Minúsculas sin tildes, diéresis ni eñes (lo mismo que hace el índice)"""
+    descompuesto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(caracter for caracter in descompuesto if not unicodedata.combining(caracter))
+
+
+def terminos(consulta):
+    """Palabras alfanuméricas normalizadas de la consulta, sin repetir"""
+    vistos = dict.fromkeys(re.findall(r'[^\W_]+', normalizar(consulta or '')))
+    return list(vistos)[:MAXIMO_TERMINOS]
+
+
+def soportado(conexion):
+    return conexion.vendor in ('sqlite', 'postgresql')
+
+
+def _ejecutar(conexion, sentencias, parametros=None):
+    with conexion.cursor() as cursor:
+        for sql in sentencias:
+            if sql is not None:
+                cursor.execute(sql, parametros)
+
+
+def instalar(conexion):
+    """Crea la tabla y los triggers que falten (idempotente)"""
+    if conexion.vendor == 'sqlite':
+        _ejecutar(conexion, SQL_SQLITE)
+    elif conexion.vendor == 'postgresql':
+        _ejecutar(conexion, SQL_POSTGRESQL)
+
+
+def desinstalar(conexion):
+    if conexion.vendor == 'sqlite':
+        _ejecutar(conexion, SQL_SQLITE_ELIMINAR)
+    elif conexion.vendor == 'postgresql':
+        _ejecutar(conexion, SQL_POSTGRESQL_ELIMINAR)
+
+
+def indexar_rango(conexion, desde, hasta):
+    """Reindexa los servicios con desde < id <= hasta"""
+    _ejecutar(conexion, SQL_LOTE[conexion.vendor], [desde, hasta])
+
+
+def reconstruir(using='default', tamano_lote=TAMANO_LOTE_DEFECTO, progreso=None):
+    """
+    Reindexa todos los servicios en lotes por rango de id, cada uno en su
+    propia transacción, sin dejar de buscar mientras tanto: cada lote borra y
+    vuelve a indexar su rango, y lo que se escriba entre lotes lo indexan los
+    triggers. Devuelve la cantidad de servicios indexados.
+    """
+    conexion = connections[using]
+    if not soportado(conexion):
+        return 0
+    instalar(conexion)
+    ids = ServicioAgendado.objects.using(using).order_by('id').values_list('id', flat=True)
+
+    desde, total = 0, 0
+    while True:
+        lote = list(ids.filter(id__gt=desde)[:tamano_lote])
+        if not lote:
+            break
+        hasta = lote[-1]
+        with transaction.atomic(using=using):
+            indexar_rango(conexion, desde, hasta)
+        desde, total = hasta, total + len(lote)
+        if progreso:
+            progreso(total)
+
+    if conexion.vendor == 'sqlite':
+        with transaction.atomic(using=using):
+            # Servicios borrados por encima del último lote; no hay ids mayores en la tabla
+            _ejecutar(conexion, [
+                'DELETE FROM servicios_busqueda WHERE rowid > %s '
+                'AND rowid NOT IN (SELECT id FROM servicios_agendados WHERE id > %s)'
+            ], [desde, desde])
+        _ejecutar(conexion, ["INSERT INTO servicios_busqueda (servicios_busqueda) VALUES ('optimize')"])
+    return total
+
+
+def buscar(consulta, limite, desplazamiento=0, estado=None, using=None):
+    """
+    Ids de los servicios que contienen todos los términos de ``consulta``, del
+    más al menos relevante (y del más reciente al más antiguo a igual
+    relevancia), desde ``desplazamiento`` y hasta ``limite``
+    """
+    palabras = terminos(consulta)
+    if not palabras:
+        return []
+    using = using or router.db_for_read(ServicioAgendado)
+    conexion = connections[using]
+
+    if not soportado(conexion):
+        servicios = ServicioAgendado.objects.using(using)
+        for palabra in palabras:
+            servicios = servicios.filter(Q(descripcion__icontains=palabra) | Q(direccion_servicio__icontains=palabra))
+        if estado:
+            servicios = servicios.filter(estado=estado)
+        return list(servicios.order_by('-fecha_creacion', '-id').values_list('id', flat=True)[
+            desplazamiento:desplazamiento + limite
+        ])
+
+    filtro, extra = ('AND s.estado = %s', [estado]) if estado else ('', [])
+    if conexion.vendor == 'sqlite':
+        expresion = ' '.join(f'"{palabra}"*' for palabra in palabras)
+        parametros = [expresion, *extra, limite, desplazamiento]
+    else:
+        expresion = ' & '.join(f'{palabra}:*' for palabra in palabras)
+        parametros = [expresion, *extra, expresion, limite, desplazamiento]
+    with conexion.cursor() as cursor:
+        cursor.execute(SQL_BUSCAR[conexion.vendor].format(filtro=filtro), parametros)
+        return [fila[0] for fila in cursor.fetchall()]
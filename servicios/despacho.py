@@ -0,0 +1,121 @@
+"""
+Despacho por cercanía: cuadrillas más próximas a un servicio y rutas del día.
+
+Servicios y cuadrillas guardan su geohash (servicios.geo) con índice B-tree,
+de modo que "lo que hay cerca de este punto" son 9 rangos de prefijo (la celda
+y sus vecinas) y no un recorrido de la tabla. La búsqueda empieza con celdas
+pequeñas y se amplía hasta tener suficientes candidatas a una distancia que
+las celdas cubren por completo; el orden final es por distancia real.
+"""
+from datetime import datetime, timedelta
+from functools import reduce
+from itertools import groupby
+from operator import or_
+
+from django.db.models import Q
+from django.utils import timezone
+
+from . import geo
+from .models import Cuadrilla, ServicioAgendado
+
+# Precisiones de geohash probadas, de celdas de ~1 km a celdas de ~150 km
+PRECISIONES_BUSQUEDA = (6, 5, 4, 3)
+
+PRECISION_RUTAS_DEFECTO = 5
+
+COLUMNAS_CUADRILLA = ('id', 'nombre', 'tipos_servicio', 'latitud', 'longitud', 'ubicacion_actualizada')
+
+
+def _filtro_celdas(celdas):
+    return reduce(or_, (
+        Q(geohash__gte=desde, geohash__lt=hasta)
+        for desde, hasta in map(geo.rango_prefijo, celdas)
+    ))
+
+
+def _radio_cubierto_km(geohash):
+    """
+    Distancia hasta la que la celda y sus vecinas contienen todos los puntos:
+    la menor dimensión de la celda (el punto puede estar en su borde)
+    """
+    lat_min, lat_max, lon_min, lon_max = geo.caja(geohash)
+    latitud = (lat_min + lat_max) / 2
+    alto = geo.distancia_km(lat_min, lon_min, lat_max, lon_min)
+    ancho = geo.distancia_km(latitud, lon_min, latitud, lon_max)
+    return min(alto, ancho)
+
+
+def _ordenar_por_distancia(filas, latitud, longitud, tipo_servicio):
+    cuadrillas = []
+    for fila in filas:
+        cuadrilla = dict(zip(COLUMNAS_CUADRILLA, fila))
+        if tipo_servicio and tipo_servicio not in cuadrilla['tipos_servicio']:
+            continue
+        cuadrilla['distancia_km'] = round(
+            geo.distancia_km(latitud, longitud, cuadrilla['latitud'], cuadrilla['longitud']), 3
+        )
+        cuadrillas.append(cuadrilla)
+    cuadrillas.sort(key=lambda cuadrilla: (cuadrilla['distancia_km'], cuadrilla['id']))
+    return cuadrillas
+
+
+def cuadrillas_cercanas(latitud, longitud, tipo_servicio=None, cantidad=3):
+    """
+    Las ``cantidad`` cuadrillas activas con posición conocida más cercanas al
+    punto (que atiendan ``tipo_servicio``, si se indica), con su distancia en km
+    """
+    activas = Cuadrilla.objects.filter(activa=True).exclude(geohash='')
+    for precision in PRECISIONES_BUSQUEDA:
+        celda = geo.codificar(latitud, longitud, precision)
+        filas = activas.filter(_filtro_celdas(geo.vecinas(celda))).values_list(*COLUMNAS_CUADRILLA)
+        cuadrillas = _ordenar_por_distancia(filas, latitud, longitud, tipo_servicio)
+        # Una cuadrilla fuera de las celdas podría estar más cerca que la
+        # k-ésima encontrada si esta queda más lejos que el radio cubierto
+        if len(cuadrillas) >= cantidad and cuadrillas[cantidad - 1]['distancia_km'] <= _radio_cubierto_km(celda):
+            return cuadrillas[:cantidad]
+
+    # Más allá de ~150 km: las cuadrillas son pocas, se comparan todas
+    return _ordenar_por_distancia(activas.values_list(*COLUMNAS_CUADRILLA), latitud, longitud, tipo_servicio)[:cantidad]
+
+
+def rutas_del_dia(dia, precision=PRECISION_RUTAS_DEFECTO):
+    """
+    Agrupa los servicios no cancelados del día local ``dia`` por celda de
+    geohash de ``precision`` caracteres. Cada ruta trae sus servicios en orden
+    de hora, el centro de sus servicios y la cuadrilla activa más cercana a
+    ese centro. Devuelve (rutas, cantidad de servicios sin ubicación).
+    """
+    inicio = timezone.make_aware(datetime.combine(dia, datetime.min.time()))
+    del_dia = ServicioAgendado.objects.filter(
+        fecha_servicio__gte=inicio,
+        fecha_servicio__lt=inicio + timedelta(days=1),
+    ).exclude(estado='cancelado')
+    sin_ubicacion = del_dia.filter(geohash='').count()
+    filas = del_dia.exclude(geohash='').order_by('geohash', 'fecha_servicio').values_list(
+        'id', 'geohash', 'latitud', 'longitud', 'fecha_servicio', 'tipo_servicio', 'cuadrilla_id',
+    )
+
+    rutas = []
+    for celda, grupo in groupby(filas, key=lambda fila: fila[1][:precision]):
+        grupo = sorted(grupo, key=lambda fila: (fila[4], fila[0]))
+        latitud = sum(fila[2] for fila in grupo) / len(grupo)
+        longitud = sum(fila[3] for fila in grupo) / len(grupo)
+        cercanas = cuadrillas_cercanas(latitud, longitud, cantidad=1)
+        rutas.append({
+            'celda': celda,
+            'latitud': round(latitud, 6),
+            'longitud': round(longitud, 6),
+            'servicios': [
+                {
+                    'id': servicio_id,
+                    'fecha_servicio': fecha_servicio,
+                    'tipo_servicio': tipo_servicio,
+                    'cuadrilla_id': cuadrilla_id,
+                }
+                for servicio_id, _, _, _, fecha_servicio, tipo_servicio, cuadrilla_id in grupo
+            ],
+            'cuadrilla_sugerida': cercanas[0] if cercanas else None,
+        })
+    # Las rutas más cargadas primero
+    rutas.sort(key=lambda ruta: (-len(ruta['servicios']), ruta['celda']))
+    return rutas, sin_ubicacion
@@ -0,0 +1,146 @@
+"""
+Emisión de facturas en lote y barrido de facturas vencidas.
+
+Los números de factura salen de ``SecuenciaFacturacion``: cada lote reserva de
+una vez tantos números como facturas va a crear, dentro de la misma
+transacción que las inserta. El bloqueo de la secuencia se toma una vez por
+lote (no por factura) y, como la reserva se revierte junto con el lote, la
+numeración no deja huecos.
+
+El barrido pasa a 'vencido' las facturas pendientes o parciales cuya fecha de
+vencimiento ya pasó con un UPDATE por lote de ids, sobre el índice
+(estado_pago, fecha_vencimiento), en lugar de un save() por factura.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import eventos, facturacion, notificaciones
+from .models import FacturacionServicio, SecuenciaFacturacion, ServicioAgendado
+
+SECUENCIA_FACTURAS = 'factura'
+
+PREFIJO_DEFECTO = 'FV'
+DIAS_VENCIMIENTO_DEFECTO = 30
+LOTE_DEFECTO = 500
+
+ESTADOS_POR_VENCER = ('pendiente', 'parcial')
+
+
+def formatear_numero(numero):
+    prefijo = getattr(settings, 'FACTURACION_PREFIJO', PREFIJO_DEFECTO)
+    return f'{prefijo}{numero:010d}'
+
+
+def _bloquear_secuencia(nombre):
+    if not transaction.get_connection().in_atomic_block:
+        raise transaction.TransactionManagementError('La secuencia solo se reserva dentro de una transacción')
+    secuencia, _ = SecuenciaFacturacion.objects.select_for_update().get_or_create(nombre=nombre)
+    return secuencia
+
+
+def _avanzar(secuencia, cantidad):
+    primero = secuencia.siguiente
+    secuencia.siguiente = primero + cantidad
+    secuencia.save(update_fields=['siguiente'])
+    return primero
+
+
+def reservar_numeros(cantidad, nombre=SECUENCIA_FACTURAS):
+    """
+    Reserva ``cantidad`` números consecutivos y devuelve el primero. Debe
+    llamarse dentro de la transacción que los usa: la fila de la secuencia
+    queda bloqueada hasta el commit.
+    """
+    return _avanzar(_bloquear_secuencia(nombre), cantidad)
+
+
+def _servicios_por_facturar():
+    return ServicioAgendado.objects.filter(
+        estado='completado', facturacionservicio__isnull=True, precio_estimado__isnull=False,
+    )
+
+
+def generar_facturas(dias_vencimiento=None, lote=LOTE_DEFECTO, hoy=None):
+    """
+    Crea las facturas de los servicios completados que aún no tienen, en lotes
+    de ``lote`` con un bulk_create cada uno. Devuelve cuántas creó y cuántos
+    servicios quedaron sin facturar por no tener precio.
+    """
+    if dias_vencimiento is None:
+        dias_vencimiento = getattr(settings, 'FACTURACION_DIAS_VENCIMIENTO', DIAS_VENCIMIENTO_DEFECTO)
+    vencimiento = (hoy or timezone.localdate()) + timedelta(days=dias_vencimiento)
+
+    creadas = 0
+    ultimo_id = 0
+    while True:
+        with transaction.atomic():
+            # Bloquear la secuencia antes de leer serializa dos generaciones simultáneas
+            secuencia = _bloquear_secuencia(SECUENCIA_FACTURAS)
+            pendientes = list(
+                _servicios_por_facturar().filter(id__gt=ultimo_id).order_by('id')
+                .values_list('id', 'precio_estimado')[:lote]
+            )
+            if not pendientes:
+                break
+            primero = _avanzar(secuencia, len(pendientes))
+
+            facturas = [
+                FacturacionServicio(
+                    servicio_id=servicio_id,
+                    monto_total=precio,
+                    fecha_vencimiento=vencimiento,
+                    numero_factura=formatear_numero(primero + posicion),
+                )
+                for posicion, (servicio_id, precio) in enumerate(pendientes)
+            ]
+            FacturacionServicio.objects.bulk_create(facturas)
+            # bulk_create no dispara post_save: los resúmenes y los eventos se actualizan aquí
+            facturacion.aplicar_cambios([(None, facturacion.valores_factura(f)) for f in facturas])
+            eventos.registrar([eventos.evento_de(f, 'creado', eventos.instantanea(f)) for f in facturas])
+        creadas += len(facturas)
+        ultimo_id = pendientes[-1][0]
+
+    sin_precio = ServicioAgendado.objects.filter(
+        estado='completado', facturacionservicio__isnull=True, precio_estimado__isnull=True,
+    ).count()
+    return {'creadas': creadas, 'sin_precio': sin_precio}
+
+
+def marcar_vencidas(hoy=None, lote=1000):
+    """
+    Pasa a 'vencido' las facturas pendientes o parciales con vencimiento
+    anterior a ``hoy``. Devuelve cuántas cambió.
+    """
+    hoy = hoy or timezone.localdate()
+    total = 0
+    while True:
+        with transaction.atomic():
+            filas = list(
+                FacturacionServicio.objects.select_for_update(of=('self',))
+                .filter(estado_pago__in=ESTADOS_POR_VENCER, fecha_vencimiento__lt=hoy)
+                .order_by()
+                .values('id', 'numero_factura', 'servicio__usuario_id', *facturacion.CAMPOS_FACTURA)[:lote]
+            )
+            if not filas:
+                break
+            ids = [fila.pop('id') for fila in filas]
+            avisos = [
+                notificaciones.notificacion('factura_vencida', fila.pop('servicio__usuario_id'), fila['servicio_id'], {
+                    'numero_factura': fila.pop('numero_factura'),
+                    'monto_pendiente': fila['monto_total'] - fila['monto_pagado'],
+                    'fecha_vencimiento': fila['fecha_vencimiento'],
+                })
+                for fila in filas
+            ]
+            FacturacionServicio.objects.filter(pk__in=ids).update(estado_pago='vencido')
+            facturacion.aplicar_cambios([(fila, {**fila, 'estado_pago': 'vencido'}) for fila in filas])
+            eventos.registrar([
+                eventos.evento('factura', factura_id, fila['servicio_id'], 'actualizado', {'estado_pago': 'vencido'})
+                for factura_id, fila in zip(ids, filas)
+            ])
+            notificaciones.encolar(avisos)
+        total += len(ids)
+    return total
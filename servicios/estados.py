@@ -0,0 +1,197 @@
+"""
+Máquina de estados de ServicioAgendado.
+
+    pendiente ──> confirmado ──> en_proceso ──> completado
+        └────────────┴──────────────┴─────────> cancelado
+
+Cada transición es un único UPDATE condicional
+
+    UPDATE servicios_agendados
+       SET estado = <destino>, version = version + 1, fecha_actualizacion = <ahora>
+     WHERE id IN (...) AND estado IN (<orígenes válidos>) [AND version = <esperada>]
+
+que solo escribe esas tres columnas, sin leer antes la fila ni bloquearla con
+SELECT FOR UPDATE. Si otra petición cambió el estado entre la lectura del
+cliente y la escritura, el WHERE ya no coincide y la transición se rechaza en
+lugar de pisar el cambio. Con la ``version`` que el cliente leyó, cualquier
+cambio de estado intermedio se detecta aunque el destino siga siendo válido.
+
+En PostgreSQL y SQLite >= 3.35 el UPDATE devuelve (RETURNING) los servicios
+que cambió con su nueva versión; en otros motores se hace un UPDATE por
+servicio.
+
+Los UPDATE no emiten pre_save/post_save; los eventos de auditoría de los
+servicios que cambiaron y los avisos a sus clientes (confirmación y
+cancelación) se insertan con un bulk_create en la misma transacción.
+"""
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import eventos, notificaciones
+from .models import ServicioAgendado
+
+TRANSICIONES = {
+    'pendiente': ('confirmado', 'cancelado'),
+    'confirmado': ('en_proceso', 'cancelado'),
+    'en_proceso': ('completado', 'cancelado'),
+    'completado': (),
+    'cancelado': (),
+}
+
+# Estados desde los que se puede llegar a cada destino
+ORIGENES = {
+    destino: tuple(origen for origen, destinos in TRANSICIONES.items() if destino in destinos)
+    for destino, _ in ServicioAgendado.ESTADOS_SERVICIO
+}
+
+# Servicios por sentencia en las transiciones en lote
+TAMANO_LOTE = 500
+
+
+class TransicionInvalida(Exception):
+    """El estado actual del servicio no admite el destino pedido"""
+
+    def __init__(self, estado, destino):
+        self.estado = estado
+        self.destino = destino
+        super().__init__(f'No se puede pasar un servicio {estado} a {destino}')
+
+
+class ConflictoVersion(Exception):
+    """El servicio cambió de estado después de que el cliente lo leyó"""
+
+    def __init__(self, version):
+        self.version = version
+        super().__init__(f'El servicio cambió (versión actual {version})')
+
+
+def _soporta_returning(conexion):
+    if conexion.vendor == 'postgresql':
+        return True
+    return conexion.vendor == 'sqlite' and conexion.Database.sqlite_version_info >= (3, 35)
+
+
+def _actualizar(ids, destino, version=None, usuario_id=None, using=None):
+    """Aplica la transición a los ``ids`` que la admiten; devuelve [(id, nueva versión)]"""
+    if not ids or not ORIGENES[destino]:
+        return []
+    using = using or router.db_for_write(ServicioAgendado)
+    with transaction.atomic(using=using):
+        filas = _actualizar_filas(ids, destino, version, usuario_id, using)
+        eventos.registrar([
+            eventos.evento('servicio', servicio_id, servicio_id, 'actualizado', {'estado': destino, 'version': nueva})
+            for servicio_id, nueva, _ in filas
+        ], using=using)
+        if destino in notificaciones.TIPO_POR_ESTADO:
+            notificaciones.encolar([
+                notificaciones.notificacion(notificaciones.TIPO_POR_ESTADO[destino], cliente_id, servicio_id)
+                for servicio_id, _, cliente_id in filas
+            ], using=using)
+    return [(servicio_id, nueva) for servicio_id, nueva, _ in filas]
+
+
+def _actualizar_filas(ids, destino, version, usuario_id, using):
+    origenes = ORIGENES[destino]
+    conexion = connections[using]
+    ahora = timezone.now()
+
+    if not _soporta_returning(conexion):
+        servicios = ServicioAgendado.objects.using(using).filter(estado__in=origenes)
+        if version is not None:
+            servicios = servicios.filter(version=version)
+        if usuario_id is not None:
+            servicios = servicios.filter(usuario_id=usuario_id)
+        aplicados = []
+        for servicio_id in ids:
+            if servicios.filter(id=servicio_id).update(
+                estado=destino, version=F('version') + 1, fecha_actualizacion=ahora,
+            ):
+                aplicados.append(servicio_id)
+        return list(
+            ServicioAgendado.objects.using(using).filter(id__in=aplicados).values_list('id', 'version', 'usuario_id')
+        )
+
+    nombre = conexion.ops.quote_name
+    condiciones, extra = [], []
+    if version is not None:
+        condiciones.append(f'AND {nombre("version")} = %s')
+        extra.append(version)
+    if usuario_id is not None:
+        condiciones.append(f'AND {nombre("usuario_id")} = %s')
+        extra.append(usuario_id)
+
+    filas = []
+    with conexion.cursor() as cursor:
+        for inicio in range(0, len(ids), TAMANO_LOTE):
+            lote = ids[inicio:inicio + TAMANO_LOTE]
+            cursor.execute(
+                f'UPDATE {nombre(ServicioAgendado._meta.db_table)} '
+                f'SET {nombre("estado")} = %s, {nombre("version")} = {nombre("version")} + 1, '
+                f'{nombre("fecha_actualizacion")} = %s '
+                f'WHERE {nombre("id")} IN ({", ".join(["%s"] * len(lote))}) '
+                f'AND {nombre("estado")} IN ({", ".join(["%s"] * len(origenes))}) {" ".join(condiciones)} '
+                f'RETURNING {nombre("id")}, {nombre("version")}, {nombre("usuario_id")}',
+                [destino, conexion.ops.adapt_datetimefield_value(ahora), *lote, *origenes, *extra],
+            )
+            filas.extend(cursor.fetchall())
+    return filas
+
+
+def aplicar(servicio_id, destino, version=None, usuario=None, using=None):
+    """
+    Pasa el servicio a ``destino`` si puede y devuelve su nueva versión, o None
+    si no se aplicó (``rechazo`` explica por qué). Con ``version`` solo si sigue
+    en esa versión; con ``usuario``, solo si es suyo.
+    """
+    usuario_id = usuario.pk if usuario is not None else None
+    filas = _actualizar([servicio_id], destino, version, usuario_id, using)
+    return filas[0][1] if filas else None
+
+
+def rechazo(actual, destino):
+    """
+    Excepción que explica una transición no aplicada a partir del (estado,
+    versión) actual del servicio, o None si no existe
+    """
+    if actual is None:
+        return ServicioAgendado.DoesNotExist('Servicio no encontrado')
+    estado, version_actual = actual
+    if estado not in ORIGENES[destino]:
+        return TransicionInvalida(estado, destino)
+    # El estado admite el destino: lo que no coincidió es la versión
+    return ConflictoVersion(version_actual)
+
+
+def transicionar(servicio_id, destino, version=None, usuario=None, using=None):
+    """
+    Como ``aplicar``, pero si no se aplica lanza ServicioAgendado.DoesNotExist,
+    TransicionInvalida o ConflictoVersion.
+    """
+    nueva = aplicar(servicio_id, destino, version, usuario, using)
+    if nueva is not None:
+        return nueva
+
+    # No se aplicó: una lectura para explicar por qué
+    servicios = ServicioAgendado.objects.using(using or router.db_for_write(ServicioAgendado))
+    if usuario is not None:
+        servicios = servicios.filter(usuario_id=usuario.pk)
+    raise rechazo(servicios.filter(id=servicio_id).values_list('estado', 'version').first(), destino)
+
+
+def transicionar_lote(ids, destino, using=None):
+    """
+    Pasa a ``destino`` todos los servicios de ``ids`` que lo admiten, sin
+    bloquearlos. Devuelve ({id: nueva versión}, {id: estado actual}) con los
+    aplicados y los rechazados; el estado es None si el servicio no existe.
+    """
+    ids = list(dict.fromkeys(ids))
+    aplicados = dict(_actualizar(ids, destino, using=using))
+    pendientes = [servicio_id for servicio_id in ids if servicio_id not in aplicados]
+    rechazados = dict.fromkeys(pendientes)
+    if pendientes:
+        rechazados.update(
+            ServicioAgendado.objects.using(using or router.db_for_write(ServicioAgendado))
+            .filter(id__in=pendientes).values_list('id', 'estado')
+        )
+    return aplicados, rechazados
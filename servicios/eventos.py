@@ -0,0 +1,267 @@
+"""
+Registro de auditoría de servicios, seguimientos y facturas.
+
+Cada alta, cambio o baja agrega una fila a ``eventos_servicio`` con el autor
+(el usuario de la petición en curso) y solo los campos que cambiaron, con su
+valor nuevo; el valor anterior es el del evento previo de la misma entidad. La
+fila se inserta en la misma transacción que el cambio (los save() de los tres
+modelos son atómicos), así que no hay cambios sin evento ni eventos de cambios
+revertidos, y no agrega un commit propio a la petición. Los caminos en lote
+(agendar_lote, transiciones de estado, emisión de facturas) insertan sus
+eventos con un solo bulk_create.
+
+El id es una secuencia creciente: los consumidores leen desde el último id que
+procesaron (``leer``). En PostgreSQL dos transacciones pueden confirmarse en
+orden distinto al de sus ids; ``leer`` solo entrega eventos con más de
+``EVENTOS_RETRASO_LECTURA`` segundos para no saltar uno que todavía no era
+visible. El margen debe superar la transacción de escritura más larga (un
+agendar_lote o una emisión de facturas grande): un evento cuya transacción
+tarda más en confirmarse puede perderse. Con el perfil postgresql vale
+``RETRASO_EVENTOS_POSTGRESQL`` (alamosjclean/bd) y, si la setting no está
+definida, se usa ese mismo valor cuando el motor es PostgreSQL.
+
+La tabla es de solo inserción: un trigger rechaza los UPDATE. Los meses más
+antiguos que ``EVENTOS_MESES_RETENCION`` se borran por rangos de id con
+``manage.py podar_eventos``.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Max
+from django.utils import timezone
+
+from alamosjclean.bd import RETRASO_EVENTOS_POSTGRESQL
+
+from .models import EventoServicio, FacturacionServicio, ServicioAgendado, SeguimientoServicio
+
+# Campos registrados de cada entidad (atributos del modelo)
+CAMPOS = {
+    'servicio': (
+        'tipo_servicio', 'descripcion', 'direccion_servicio', 'fecha_servicio', 'fecha_fin_servicio',
+        'cuadrilla_id', 'estado', 'version', 'precio_estimado',
+    ),
+    'seguimiento': (
+        'equipo_asignado', 'progreso_porcentaje', 'tareas_completadas',
+        'ubicacion_actual', 'tiempo_estimado_finalizacion',
+    ),
+    'factura': (
+        'numero_factura', 'monto_total', 'monto_pagado', 'estado_pago',
+        'fecha_vencimiento', 'fecha_pago', 'metodo_pago',
+    ),
+}
+
+ENTIDADES = {
+    ServicioAgendado: 'servicio',
+    SeguimientoServicio: 'seguimiento',
+    FacturacionServicio: 'factura',
+}
+
+LIMITE_LECTURA_DEFECTO = 100
+LIMITE_LECTURA_MAXIMO = 1000
+MESES_RETENCION_DEFECTO = 12
+TAMANO_LOTE = 500
+TAMANO_LOTE_PODA = 10000
+
+SQL_SQLITE = [
+    """
+    CREATE TRIGGER IF NOT EXISTS eventos_servicio_solo_insercion BEFORE UPDATE ON eventos_servicio BEGIN
+        SELECT RAISE(ABORT, 'eventos_servicio es de solo inserción');
+    END
+    """,
+]
+
+SQL_SQLITE_ELIMINAR = ['DROP TRIGGER IF EXISTS eventos_servicio_solo_insercion']
+
+SQL_POSTGRESQL = [
+    """
+    CREATE OR REPLACE FUNCTION eventos_servicio_rechazar_update() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        RAISE EXCEPTION 'eventos_servicio es de solo inserción';
+    END
+    $$
+    """,
+    'DROP TRIGGER IF EXISTS eventos_servicio_solo_insercion ON eventos_servicio',
+    """
+    CREATE TRIGGER eventos_servicio_solo_insercion BEFORE UPDATE ON eventos_servicio
+    FOR EACH ROW EXECUTE FUNCTION eventos_servicio_rechazar_update()
+    """,
+]
+
+SQL_POSTGRESQL_ELIMINAR = [
+    'DROP TRIGGER IF EXISTS eventos_servicio_solo_insercion ON eventos_servicio',
+    'DROP FUNCTION IF EXISTS eventos_servicio_rechazar_update()',
+]
+
+_peticion = ContextVar('peticion_eventos', default=None)
+
+
+def _ejecutar(conexion, sentencias):
+    with conexion.cursor() as cursor:
+        for sql in sentencias:
+            cursor.execute(sql)
+
+
+def instalar(conexion):
+    """Trigger que rechaza los UPDATE (idempotente)"""
+    if conexion.vendor == 'sqlite':
+        _ejecutar(conexion, SQL_SQLITE)
+    elif conexion.vendor == 'postgresql':
+        _ejecutar(conexion, SQL_POSTGRESQL)
+
+
+def desinstalar(conexion):
+    if conexion.vendor == 'sqlite':
+        _ejecutar(conexion, SQL_SQLITE_ELIMINAR)
+    elif conexion.vendor == 'postgresql':
+        _ejecutar(conexion, SQL_POSTGRESQL_ELIMINAR)
+
+
+@contextmanager
+def en_peticion(request):
+    """Atribuye al usuario de ``request`` los eventos registrados dentro del bloque"""
+    token = _peticion.set(request)
+    try:
+        yield
+    finally:
+        _peticion.reset(token)
+
+
+def actor():
+    """Id del usuario autenticado de la petición en curso, o None"""
+    request = _peticion.get()
+    usuario = getattr(request, 'user', None)
+    if usuario is None or not usuario.is_authenticated:
+        return None
+    return usuario.pk
+
+
+class ActorEventosMiddleware:
+    """
+    Hace visible la petición a los eventos que se registren mientras se
+    atiende. Va después de AuthenticationMiddleware; el usuario se resuelve
+    solo si la petición registra algún evento.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        with en_peticion(request):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        # La ContextVar viaja a los hilos de sync_to_async de esta petición
+        with en_peticion(request):
+            return await self.get_response(request)
+
+
+def instantanea(instance):
+    """Valores de los campos registrados ya cargados (los diferidos se omiten)"""
+    valores = instance.__dict__
+    return {
+        campo: list(valores[campo]) if isinstance(valores[campo], list) else valores[campo]
+        for campo in CAMPOS[ENTIDADES[type(instance)]]
+        if campo in valores
+    }
+
+
+def delta(anteriores, actuales):
+    """Campos de ``actuales`` con valor distinto al de ``anteriores`` (todos si es None)"""
+    if anteriores is None:
+        return dict(actuales)
+    return {
+        campo: valor for campo, valor in actuales.items()
+        if campo not in anteriores or anteriores[campo] != valor
+    }
+
+
+def evento(entidad, entidad_id, servicio_id, accion, cambios=None):
+    return EventoServicio(
+        servicio_id=servicio_id,
+        entidad=entidad,
+        entidad_id=entidad_id,
+        accion=accion,
+        actor_id=actor(),
+        cambios=cambios or {},
+        fecha=timezone.now(),
+    )
+
+
+def evento_de(instance, accion, cambios=None):
+    """Evento de un servicio, seguimiento o factura"""
+    entidad = ENTIDADES[type(instance)]
+    servicio_id = instance.pk if entidad == 'servicio' else instance.servicio_id
+    return evento(entidad, instance.pk, servicio_id, accion, cambios)
+
+
+def registrar(eventos, using=None):
+    """Inserta los eventos con un solo INSERT por lote, en la transacción en curso"""
+    if eventos:
+        EventoServicio.objects.using(using).bulk_create(eventos, batch_size=TAMANO_LOTE)
+
+
+def retraso_lectura():
+    """Segundos de margen de ``leer``: EVENTOS_RETRASO_LECTURA o el del motor"""
+    retraso = getattr(settings, 'EVENTOS_RETRASO_LECTURA', None)
+    if retraso is None:
+        vendor = connections[router.db_for_read(EventoServicio)].vendor
+        retraso = RETRASO_EVENTOS_POSTGRESQL if vendor == 'postgresql' else 0
+    return retraso
+
+
+def leer(cursor=0, limite=LIMITE_LECTURA_DEFECTO, servicio_id=None):
+    """
+    Eventos con id mayor que ``cursor``, en orden, hasta ``limite``. Devuelve
+    (eventos, hay_mas).
+    """
+    eventos = EventoServicio.objects.filter(id__gt=cursor)
+    if servicio_id is not None:
+        eventos = eventos.filter(servicio_id=servicio_id)
+    retraso = retraso_lectura()
+    if retraso:
+        eventos = eventos.filter(fecha__lte=timezone.now() - timedelta(seconds=retraso))
+    columnas = ('id', 'servicio_id', 'entidad', 'entidad_id', 'accion', 'actor_id', 'cambios', 'fecha')
+    filas = list(eventos.order_by('id').values_list(*columnas)[:limite + 1])
+    return [dict(zip(columnas, fila)) for fila in filas[:limite]], len(filas) > limite
+
+
+def inicio_mes_retenido(meses, hoy=None):
+    """Primer instante del mes más antiguo que se conserva"""
+    hoy = hoy or timezone.localdate()
+    indice = hoy.year * 12 + hoy.month - 1 - meses
+    primero = hoy.replace(year=indice // 12, month=indice % 12 + 1, day=1)
+    return timezone.make_aware(datetime.combine(primero, datetime.min.time()))
+
+
+def podar(meses=None, tamano_lote=TAMANO_LOTE_PODA, hoy=None):
+    """
+    Borra los eventos de los meses anteriores a los ``meses`` más recientes
+    (además del actual) por rangos de id, cada rango en su propia sentencia.
+    Devuelve cuántos borró.
+    """
+    if meses is None:
+        meses = getattr(settings, 'EVENTOS_MESES_RETENCION', MESES_RETENCION_DEFECTO)
+    corte = inicio_mes_retenido(meses, hoy)
+    # Las fechas crecen con el id: todo lo anterior al corte es un prefijo de ids
+    hasta = EventoServicio.objects.filter(fecha__lt=corte).aggregate(ultimo=Max('id'))['ultimo']
+    if hasta is None:
+        return 0
+    desde = EventoServicio.objects.order_by('id').values_list('id', flat=True).first() - 1
+    borrados = 0
+    while desde < hasta:
+        limite = min(desde + tamano_lote, hasta)
+        borrados += EventoServicio.objects.filter(id__gt=desde, id__lte=limite).delete()[0]
+        desde = limite
+    return borrados
@@ -0,0 +1,277 @@
+"""
+Exportación en streaming de servicios, historial y facturas a CSV o XLSX.
+
+Las filas se leen con ``values_list(...).iterator(chunk_size)`` (cursor del
+lado del servidor en PostgreSQL, fetchmany en SQLite) con los datos
+relacionados resueltos en el mismo JOIN, sin instanciar modelos ni cargar el
+queryset completo. Cada formato es un generador de bytes que se puede pasar a
+``StreamingHttpResponse`` o escribir en un archivo, con memoria constante sin
+importar cuántas filas haya.
+
+El XLSX se escribe a mano (hoja con cadenas en línea dentro de un ZIP en
+streaming) porque los escritores habituales necesitan un archivo con seek.
+"""
+import csv
+import io
+import re
+import zipfile
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import FacturacionServicio, HistorialServicio, ServicioAgendado
+
+# Filas por viaje a la base de datos
+TAMANO_BLOQUE = 2000
+
+# Filas que se acumulan antes de entregar un fragmento al cliente
+FILAS_POR_FRAGMENTO = 500
+
+
+@dataclass(frozen=True)
+class Exportacion:
+    modelo: type
+    # (encabezado, lookup de values_list)
+    columnas: tuple
+    # Campo por el que se filtra desde/hasta y si es DateTimeField
+    campo_fecha: str
+    fecha_hora: bool = True
+    anotaciones: dict = None
+
+    @property
+    def encabezados(self):
+        return [encabezado for encabezado, _ in self.columnas]
+
+
+EXPORTACIONES = {
+    'servicios': Exportacion(
+        modelo=ServicioAgendado,
+        columnas=(
+            ('id', 'id'),
+            ('usuario', 'usuario__username'),
+            ('email', 'usuario__email'),
+            ('tipo_servicio', 'tipo_servicio'),
+            ('estado', 'estado'),
+            ('fecha_servicio', 'fecha_servicio'),
+            ('fecha_fin_servicio', 'fecha_fin_servicio'),
+            ('direccion_servicio', 'direccion_servicio'),
+            ('descripcion', 'descripcion'),
+            ('precio_estimado', 'precio_estimado'),
+            ('cuadrilla', 'cuadrilla__nombre'),
+            ('fecha_creacion', 'fecha_creacion'),
+        ),
+        campo_fecha='fecha_servicio',
+    ),
+    'historial': Exportacion(
+        modelo=HistorialServicio,
+        columnas=(
+            ('servicio_id', 'servicio_id'),
+            ('usuario', 'servicio__usuario__username'),
+            ('tipo_servicio', 'servicio__tipo_servicio'),
+            ('fecha_inicio', 'fecha_inicio'),
+            ('fecha_finalizacion', 'fecha_finalizacion'),
+            ('calificacion', 'calificacion'),
+            ('comentarios_cliente', 'comentarios_cliente'),
+            ('reporte_trabajo', 'reporte_trabajo'),
+        ),
+        campo_fecha='fecha_finalizacion',
+    ),
+    'facturas': Exportacion(
+        modelo=FacturacionServicio,
+        columnas=(
+            ('numero_factura', 'numero_factura'),
+            ('servicio_id', 'servicio_id'),
+            ('usuario', 'servicio__usuario__username'),
+            ('monto_total', 'monto_total'),
+            ('monto_pagado', 'monto_pagado'),
+            ('monto_pendiente', 'saldo'),
+            ('estado_pago', 'estado_pago'),
+            ('fecha_vencimiento', 'fecha_vencimiento'),
+            ('fecha_pago', 'fecha_pago'),
+            ('metodo_pago', 'metodo_pago'),
+        ),
+        campo_fecha='fecha_vencimiento',
+        fecha_hora=False,
+        anotaciones={'saldo': F('monto_total') - F('monto_pagado')},
+    ),
+}
+
+
+def filas(tipo, desde=None, hasta=None, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Tuplas de la exportación ``tipo`` con ``desde``/``hasta`` (fechas,
+    inclusivas) aplicados al campo de fecha, en orden de id
+    """
+    exportacion = EXPORTACIONES[tipo]
+    consulta = exportacion.modelo.objects.all()
+    if exportacion.anotaciones:
+        consulta = consulta.annotate(**exportacion.anotaciones)
+    campo = exportacion.campo_fecha
+    if exportacion.fecha_hora:
+        # Rango sobre el DateTimeField (usa su índice, a diferencia de __date)
+        if desde:
+            consulta = consulta.filter(**{f'{campo}__gte': timezone.make_aware(datetime.combine(desde, time.min))})
+        if hasta:
+            consulta = consulta.filter(
+                **{f'{campo}__lt': timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))}
+            )
+    else:
+        if desde:
+            consulta = consulta.filter(**{f'{campo}__gte': desde})
+        if hasta:
+            consulta = consulta.filter(**{f'{campo}__lte': hasta})
+    lookups = [lookup for _, lookup in exportacion.columnas]
+    return consulta.order_by('pk').values_list(*lookups).iterator(chunk_size=tamano_bloque)
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).isoformat() if timezone.is_aware(valor) else valor.isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _celda_csv(valor):
+    texto = _texto(valor)
+    # Evitar que Excel interprete como fórmula un texto escrito por el cliente
+    if isinstance(valor, str) and texto[:1] in ('=', '+', '-', '@'):
+        return "'" + texto
+    return texto
+
+
+class _Eco:
+    """Objeto tipo archivo que devuelve lo escrito (para csv.writer)"""
+
+    def write(self, valor):
+        return valor
+
+
+def generar_csv(encabezados, filas_datos):
+    """Fragmentos UTF-8 (con BOM, para Excel) de un CSV"""
+    escritor = csv.writer(_Eco())
+    yield ('\ufeff' + escritor.writerow(encabezados)).encode('utf-8')
+    fragmento = []
+    for fila in filas_datos:
+        fragmento.append(escritor.writerow([_celda_csv(valor) for valor in fila]))
+        if len(fragmento) >= FILAS_POR_FRAGMENTO:
+            yield ''.join(fragmento).encode('utf-8')
+            fragmento = []
+    if fragmento:
+        yield ''.join(fragmento).encode('utf-8')
+
+
+class _BufferSalida(io.RawIOBase):
+    """Destino sin seek para ZipFile; acumula lo escrito hasta que se vacía"""
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+# Caracteres de control que XML 1.0 no admite
+_CARACTERES_INVALIDOS_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+XLSX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{nombre}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+XLSX_HOJA_INICIO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+XLSX_HOJA_FIN = '</sheetData></worksheet>'
+
+
+def _celda_xlsx(valor):
+    if isinstance(valor, bool):
+        valor = int(valor)
+    if isinstance(valor, (int, float, Decimal)):
+        return f'<c><v>{valor}</v></c>'
+    texto = escape(_CARACTERES_INVALIDOS_XML.sub('', _texto(valor)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila_xlsx(valores):
+    return '<row>' + ''.join(_celda_xlsx(valor) for valor in valores) + '</row>'
+
+
+def generar_xlsx(encabezados, filas_datos, nombre_hoja='Datos'):
+    """Fragmentos de un libro XLSX de una hoja, generado en streaming"""
+    salida = _BufferSalida()
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as libro:
+        libro.writestr('[Content_Types].xml', XLSX_CONTENT_TYPES)
+        libro.writestr('_rels/.rels', XLSX_RELS)
+        libro.writestr('xl/workbook.xml', XLSX_WORKBOOK.format(nombre=escape(nombre_hoja)))
+        libro.writestr('xl/_rels/workbook.xml.rels', XLSX_WORKBOOK_RELS)
+        # Tamaño desconocido de antemano: ZIP64 por si supera 4 GB
+        with libro.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja:
+            hoja.write((XLSX_HOJA_INICIO + _fila_xlsx(encabezados)).encode('utf-8'))
+            fragmento = []
+            for fila in filas_datos:
+                fragmento.append(_fila_xlsx(fila))
+                if len(fragmento) >= FILAS_POR_FRAGMENTO:
+                    hoja.write(''.join(fragmento).encode('utf-8'))
+                    fragmento = []
+                    yield salida.vaciar()
+            hoja.write((''.join(fragmento) + XLSX_HOJA_FIN).encode('utf-8'))
+    yield salida.vaciar()
+
+
+FORMATOS = {
+    'csv': (generar_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (generar_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def exportar(tipo, formato, desde=None, hasta=None):
+    """Generador de bytes de la exportación en el formato pedido"""
+    generador, _ = FORMATOS[formato]
+    return generador(EXPORTACIONES[tipo].encabezados, filas(tipo, desde, hasta))
@@ -0,0 +1,241 @@
+"""
+Resúmenes incrementales de facturación (cartera por cobrar).
+
+Cada factura aporta una fila a ``ResumenFacturacion`` (usuario, mes, estado) y,
+si tiene pagos, a ``RecaudoMensual`` (usuario, mes del pago). Al guardar o
+borrar una factura se resta su aporte anterior y se suma el nuevo con UPDATE
+... SET campo = campo + delta dentro de la transacción del guardado, de modo
+que los reportes leen unas pocas filas en lugar de recorrer todas las facturas.
+
+``update()`` y ``bulk_create()`` no disparan señales: quien los use debe llamar
+a ``conciliar(usuario_ids)`` para los usuarios afectados. ``conciliar()`` sin
+argumentos recalcula todo y corrige las diferencias (tarea nocturna
+``manage.py conciliar_facturacion``).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import FacturacionServicio, RecaudoMensual, ResumenFacturacion, ServicioAgendado
+
+CAMPOS_FACTURA = ('servicio_id', 'fecha_vencimiento', 'estado_pago', 'monto_total', 'monto_pagado', 'fecha_pago')
+
+CERO = Decimal('0')
+
+# Columnas acumuladas de cada tabla de resumen
+CAMPOS_RESUMEN = {
+    ResumenFacturacion: ('cantidad', 'monto_total', 'monto_pagado'),
+    RecaudoMensual: ('cantidad', 'monto_pagado'),
+}
+
+
+def valores_factura(factura):
+    """
+    Campos de la factura que determinan su aporte, o None si alguno está
+    diferido (leerlo costaría una consulta)
+    """
+    if any(campo not in factura.__dict__ for campo in CAMPOS_FACTURA):
+        return None
+    return {campo: factura.__dict__[campo] for campo in CAMPOS_FACTURA}
+
+
+def _primer_dia(fecha):
+    return fecha.replace(day=1)
+
+
+def aportes(valores, usuario_id, fecha_servicio):
+    """
+    Deltas {(modelo, clave): {campo: valor}} que una factura suma a los resúmenes
+    """
+    if valores is None or usuario_id is None:
+        return {}
+    fecha_mes = valores['fecha_vencimiento'] or timezone.localdate(fecha_servicio)
+    monto_pagado = Decimal(valores['monto_pagado'] or 0)
+    resultado = {
+        (ResumenFacturacion, (usuario_id, _primer_dia(fecha_mes), valores['estado_pago'])): {
+            'cantidad': 1,
+            'monto_total': Decimal(valores['monto_total']),
+            'monto_pagado': monto_pagado,
+        },
+    }
+    if valores['fecha_pago'] and monto_pagado:
+        mes_pago = _primer_dia(timezone.localdate(valores['fecha_pago']))
+        resultado[(RecaudoMensual, (usuario_id, mes_pago))] = {'cantidad': 1, 'monto_pagado': monto_pagado}
+    return resultado
+
+
+def _clave_a_filtro(modelo, clave):
+    if modelo is ResumenFacturacion:
+        usuario_id, mes, estado_pago = clave
+        return {'usuario_id': usuario_id, 'mes': mes, 'estado_pago': estado_pago}
+    usuario_id, mes = clave
+    return {'usuario_id': usuario_id, 'mes': mes}
+
+
+def _sumar(modelo, clave, deltas):
+    filtro = _clave_a_filtro(modelo, clave)
+    incrementos = {campo: F(campo) + valor for campo, valor in deltas.items()}
+    if modelo.objects.filter(**filtro).update(**incrementos):
+        return
+    if deltas.get('cantidad', 0) < 0:
+        # Restar de una fila que no existe (p. ej. ya borrada en cascada con el usuario)
+        return
+    try:
+        with transaction.atomic():
+            modelo.objects.create(**filtro, **deltas)
+    except IntegrityError:
+        # Otra transacción creó la fila entre el UPDATE y el INSERT
+        modelo.objects.filter(**filtro).update(**incrementos)
+
+
+def aplicar_cambio(anteriores, actuales):
+    """
+    Resta el aporte ``anteriores`` y suma ``actuales`` (dicts de valores_factura o
+    None). Debe llamarse dentro de la transacción que modifica la factura.
+    """
+    aplicar_cambios([(anteriores, actuales)])
+
+
+def aplicar_cambios(pares):
+    """
+    Como aplicar_cambio para muchas facturas: una consulta de servicios y un
+    UPDATE por fila de resumen afectada, no por factura
+    """
+    servicio_ids = {v['servicio_id'] for par in pares for v in par if v is not None}
+    servicios = {
+        servicio_id: (usuario_id, fecha_servicio)
+        for servicio_id, usuario_id, fecha_servicio in ServicioAgendado.objects.filter(
+            pk__in=servicio_ids
+        ).values_list('id', 'usuario_id', 'fecha_servicio')
+    }
+
+    deltas = defaultdict(lambda: defaultdict(Decimal))
+    for anteriores, actuales in pares:
+        for valores, signo in ((anteriores, -1), (actuales, 1)):
+            if valores is None:
+                continue
+            usuario_id, fecha_servicio = servicios.get(valores['servicio_id'], (None, None))
+            for destino, campos in aportes(valores, usuario_id, fecha_servicio).items():
+                for campo, valor in campos.items():
+                    deltas[destino][campo] += signo * valor
+
+    for (modelo, clave), campos in deltas.items():
+        campos = {campo: valor for campo, valor in campos.items() if valor}
+        if campos:
+            _sumar(modelo, clave, campos)
+        if campos.get('cantidad', 0) < 0:
+            modelo.objects.filter(**_clave_a_filtro(modelo, clave), cantidad=0).delete()
+
+
+def _esperado(usuario_ids):
+    facturas = FacturacionServicio.objects.all()
+    if usuario_ids is not None:
+        facturas = facturas.filter(servicio__usuario_id__in=usuario_ids)
+
+    mes = TruncMonth(
+        Coalesce('fecha_vencimiento', TruncDate('servicio__fecha_servicio')), output_field=DateField()
+    )
+    resumen = {
+        (ResumenFacturacion, (fila['servicio__usuario_id'], fila['mes'], fila['estado_pago'])): {
+            'cantidad': fila['cantidad'],
+            'monto_total': fila['monto_total'],
+            'monto_pagado': fila['monto_pagado'],
+        }
+        for fila in facturas.annotate(mes=mes).values('servicio__usuario_id', 'mes', 'estado_pago').annotate(
+            cantidad=Count('id'), monto_total=Sum('monto_total'), monto_pagado=Sum('monto_pagado'),
+        ).order_by()
+    }
+    recaudo = {
+        (RecaudoMensual, (fila['servicio__usuario_id'], fila['mes'])): {
+            'cantidad': fila['cantidad'],
+            'monto_pagado': fila['monto_pagado'],
+        }
+        for fila in facturas.filter(fecha_pago__isnull=False, monto_pagado__gt=0).annotate(
+            mes=TruncMonth('fecha_pago', output_field=DateField()),
+        ).values('servicio__usuario_id', 'mes').annotate(
+            cantidad=Count('id'), monto_pagado=Sum('monto_pagado'),
+        ).order_by()
+    }
+    return {**resumen, **recaudo}
+
+
+def _guardado(modelo, usuario_ids):
+    filas = modelo.objects.all()
+    if usuario_ids is not None:
+        filas = filas.filter(usuario_id__in=usuario_ids)
+    guardado = {}
+    for fila in filas:
+        clave = (fila.usuario_id, fila.mes, fila.estado_pago) if modelo is ResumenFacturacion else (fila.usuario_id, fila.mes)
+        guardado[(modelo, clave)] = (fila, {campo: getattr(fila, campo) for campo in CAMPOS_RESUMEN[modelo]})
+    return guardado
+
+
+def conciliar(usuario_ids=None):
+    """
+    Recalcula los resúmenes desde las facturas (de todos los usuarios o de los
+    indicados) y corrige las filas que no coinciden. Devuelve cuántas filas
+    creó, actualizó y eliminó.
+    """
+    resultado = {'creadas': 0, 'actualizadas': 0, 'eliminadas': 0}
+    with transaction.atomic():
+        esperado = _esperado(usuario_ids)
+        for modelo in (ResumenFacturacion, RecaudoMensual):
+            guardado = _guardado(modelo, usuario_ids)
+            nuevas, modificadas = [], []
+            for destino, campos in esperado.items():
+                if destino[0] is not modelo:
+                    continue
+                if destino not in guardado:
+                    nuevas.append(modelo(**_clave_a_filtro(modelo, destino[1]), **campos))
+                    continue
+                fila, actuales = guardado.pop(destino)
+                if actuales != campos:
+                    for campo, valor in campos.items():
+                        setattr(fila, campo, valor)
+                    modificadas.append(fila)
+            modelo.objects.bulk_create(nuevas, batch_size=500)
+            modelo.objects.bulk_update(modificadas, CAMPOS_RESUMEN[modelo], batch_size=500)
+            # Las que sobran (o quedaron en cero) ya no tienen facturas
+            sobrantes = [fila.pk for fila, _ in guardado.values()]
+            modelo.objects.filter(pk__in=sobrantes).delete()
+            resultado['creadas'] += len(nuevas)
+            resultado['actualizadas'] += len(modificadas)
+            resultado['eliminadas'] += len(sobrantes)
+    return resultado
+
+
+def cartera(usuario_id=None, desde=None, hasta=None):
+    """
+    Totales de cartera desde los resúmenes: por estado, por mes y recaudo mensual
+    """
+    resumenes = ResumenFacturacion.objects.all()
+    recaudos = RecaudoMensual.objects.all()
+    if usuario_id is not None:
+        resumenes = resumenes.filter(usuario_id=usuario_id)
+        recaudos = recaudos.filter(usuario_id=usuario_id)
+    if desde:
+        resumenes = resumenes.filter(mes__gte=desde)
+        recaudos = recaudos.filter(mes__gte=desde)
+    if hasta:
+        resumenes = resumenes.filter(mes__lte=hasta)
+        recaudos = recaudos.filter(mes__lte=hasta)
+
+    por_estado = {
+        fila['estado_pago']: fila
+        for fila in resumenes.values('estado_pago').annotate(
+            facturas=Sum('cantidad'), total=Sum('monto_total'), pagado=Sum('monto_pagado'),
+        ).order_by()
+    }
+    # Los alias no repiten el nombre de las columnas: F() los resolvería a las sumas
+    por_mes = resumenes.values('mes').annotate(
+        facturas=Sum('cantidad'),
+        total=Sum('monto_total'),
+        pagado=Sum('monto_pagado'),
+        vencido=Coalesce(Sum(F('monto_total') - F('monto_pagado'), filter=Q(estado_pago='vencido')), CERO),
+    ).order_by('mes')
+    recaudo = recaudos.values('mes').annotate(facturas=Sum('cantidad'), pagado=Sum('monto_pagado')).order_by('mes')
+    return por_estado, list(por_mes), list(recaudo)
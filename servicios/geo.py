@@ -0,0 +1,91 @@
+"""
+Geohash y distancias para el despacho de cuadrillas.
+
+Un geohash de precisión p es una celda rectangular; los puntos cercanos
+comparten prefijo, así que "servicios/cuadrillas en esta celda" es un rango
+[prefijo, prefijo + '~') sobre un índice B-tree, sin recorrer la tabla. Como
+dos puntos a metros de distancia pueden caer en celdas vecinas con prefijos
+distintos, las búsquedas cubren la celda y sus 8 vecinas.
+
+Tamaño aproximado de la celda en el ecuador:
+    4: 39 x 19,5 km   5: 4,9 x 4,9 km   6: 1,2 x 0,61 km   7: 153 x 153 m
+"""
+import math
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION_MAXIMA = 12
+RADIO_TIERRA_KM = 6371.0088
+
+
+def codificar(latitud, longitud, precision=PRECISION_MAXIMA):
+    """Geohash de ``precision`` caracteres del punto"""
+    rango_lat, rango_lon = [-90.0, 90.0], [-180.0, 180.0]
+    caracteres, bits, valor, es_longitud = [], 0, 0, True
+    while len(caracteres) < precision:
+        rango, coordenada = (rango_lon, longitud) if es_longitud else (rango_lat, latitud)
+        medio = (rango[0] + rango[1]) / 2
+        valor <<= 1
+        if coordenada >= medio:
+            valor |= 1
+            rango[0] = medio
+        else:
+            rango[1] = medio
+        es_longitud = not es_longitud
+        bits += 1
+        if bits == 5:
+            caracteres.append(BASE32[valor])
+            bits, valor = 0, 0
+    return ''.join(caracteres)
+
+
+def caja(geohash):
+    """(lat_min, lat_max, lon_min, lon_max) de la celda"""
+    rango_lat, rango_lon = [-90.0, 90.0], [-180.0, 180.0]
+    es_longitud = True
+    for caracter in geohash:
+        valor = BASE32.index(caracter)
+        for desplazamiento in range(4, -1, -1):
+            rango = rango_lon if es_longitud else rango_lat
+            medio = (rango[0] + rango[1]) / 2
+            if valor >> desplazamiento & 1:
+                rango[0] = medio
+            else:
+                rango[1] = medio
+            es_longitud = not es_longitud
+    return rango_lat[0], rango_lat[1], rango_lon[0], rango_lon[1]
+
+
+def centro(geohash):
+    lat_min, lat_max, lon_min, lon_max = caja(geohash)
+    return (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
+
+
+def vecinas(geohash):
+    """La celda y sus 8 vecinas, de la misma precisión"""
+    lat_min, lat_max, lon_min, lon_max = caja(geohash)
+    alto, ancho = lat_max - lat_min, lon_max - lon_min
+    latitud, longitud = (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
+    celdas = []
+    for d_lat in (-1, 0, 1):
+        for d_lon in (-1, 0, 1):
+            lat = latitud + d_lat * alto
+            if not -90 < lat < 90:
+                continue
+            lon = (longitud + d_lon * ancho + 180) % 360 - 180
+            celda = codificar(lat, lon, len(geohash))
+            if celda not in celdas:
+                celdas.append(celda)
+    return celdas
+
+
+def rango_prefijo(prefijo):
+    """Límites [desde, hasta) de los geohash que empiezan por ``prefijo``"""
+    return prefijo, prefijo + '~'
+
+
+def distancia_km(lat1, lon1, lat2, lon2):
+    """Distancia de gran círculo (haversine)"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi, d_lambda = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(math.sqrt(a))
@@ -0,0 +1,182 @@
+"""
+Geocodificación de direcciones sin llamadas de red.
+
+El proveedor se elige con ``GEOCODIFICACION_PROVEEDOR`` (ruta de la clase).
+ProveedorLocal, el de defecto, resuelve en este orden:
+
+1. Coordenadas escritas en el texto: "4.6486, -74.0628" (p. ej. las que
+   reporta el GPS de una cuadrilla en ``ubicacion_actual``).
+2. La nomenclatura urbana: "Calle 72 # 10-34" está sobre la calle 72, a 34 m
+   de la esquina con la carrera 10. Con el origen, la rotación y el largo de
+   cuadra de la cuadrícula de la ciudad (``GEOCODIFICACION_CUADRICULA``) se
+   convierte en coordenadas aproximadas, suficientes para comparar distancias.
+3. Lugares del nomenclátor local (``GEOCODIFICACION_NOMENCLATOR``, CSV con
+   nombre,latitud,longitud): barrios, conjuntos, centros comerciales. Gana el
+   nombre más largo contenido en la dirección.
+
+Los resultados, también los fallidos, se guardan en la caché
+``GEOCODIFICACION_CACHE`` por dirección normalizada, así que un proveedor
+remoto solo se consultaría una vez por dirección.
+"""
+import csv
+import hashlib
+import math
+import re
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+from . import geo
+from .busqueda import normalizar
+
+PROVEEDOR_POR_DEFECTO = 'servicios.geocodificacion.ProveedorLocal'
+NOMENCLATOR_POR_DEFECTO = Path(__file__).resolve().parent / 'datos' / 'nomenclator.csv'
+CACHE_TTL_DEFECTO = 30 * 24 * 3600
+
+# Cuadrícula de Bogotá: la calle 0 con carrera 0 y el giro de la cuadrícula
+# respecto al norte (las carreras avanzan hacia el nor-noreste)
+CUADRICULA_DEFECTO = {
+    'latitud': 4.5867,
+    'longitud': -74.0742,
+    'rotacion_grados': 22,
+    'metros_por_calle': 110,
+    'metros_por_carrera': 95,
+}
+
+METROS_POR_GRADO = 111320
+
+# Abreviaturas de vías que corren como calles (oriente-occidente) o como carreras
+VIAS_CALLE = ('avenida calle', 'av calle', 'calle', 'clle', 'cll', 'cl', 'ac', 'diagonal', 'diag', 'dg')
+VIAS_CARRERA = (
+    'avenida carrera', 'av carrera', 'carrera', 'cra', 'kra', 'crr', 'cr', 'kr', 'ak',
+    'transversal', 'trans', 'tv', 'tr',
+)
+
+_PATRON_COORDENADAS = re.compile(r'(-?\d{1,2}\.\d+)\s*,\s*(-?\d{1,3}\.\d+)')
+_PATRON_NOMENCLATURA = re.compile(
+    r'\b(?P<via>{vias})\.?\s*(?P<principal>\d+)\s*(?P<letra1>[a-z](?![a-z]))?\s*(?:bis\b)?\s*(?:(?:sur|este)\b)?\s*'
+    r'(?:#|no\.?|nro\.?|numero)?\s*(?P<cruce>\d+)\s*(?P<letra2>[a-z](?![a-z]))?\s*(?:bis\b)?\s*'
+    r'-\s*(?P<placa>\d+)'.format(vias='|'.join(sorted(VIAS_CALLE + VIAS_CARRERA, key=len, reverse=True)))
+)
+
+
+def _numero(numero, letra):
+    # 72A queda entre la calle 72 y la 73
+    return int(numero) + (0.3 if letra else 0)
+
+
+class ProveedorLocal:
+    """
+    Geocodificador sin red: coordenadas explícitas, nomenclatura urbana y
+    nomenclátor local
+    """
+
+    def __init__(self, nomenclator=None, cuadricula=None):
+        ruta = nomenclator or getattr(settings, 'GEOCODIFICACION_NOMENCLATOR', NOMENCLATOR_POR_DEFECTO)
+        self.cuadricula = {**CUADRICULA_DEFECTO, **(cuadricula or getattr(settings, 'GEOCODIFICACION_CUADRICULA', {}))}
+        self.lugares = []
+        if ruta and Path(ruta).exists():
+            with open(ruta, encoding='utf-8', newline='') as archivo:
+                for fila in csv.DictReader(archivo):
+                    nombre = ' '.join(re.findall(r'[^\W_]+', normalizar(fila['nombre'])))
+                    self.lugares.append((nombre, float(fila['latitud']), float(fila['longitud'])))
+            # Primero los nombres más largos: "parque de la 93" antes que "93"
+            self.lugares.sort(key=lambda lugar: len(lugar[0]), reverse=True)
+
+    def geocodificar(self, direccion):
+        """(latitud, longitud) o None si la dirección no se reconoce"""
+        coordenadas = _PATRON_COORDENADAS.search(direccion)
+        if coordenadas:
+            latitud, longitud = float(coordenadas.group(1)), float(coordenadas.group(2))
+            if -90 <= latitud <= 90 and -180 <= longitud <= 180:
+                return latitud, longitud
+
+        texto = normalizar(direccion)
+        ubicacion = self._por_nomenclatura(texto)
+        if ubicacion:
+            return ubicacion
+
+        palabras = ' ' + ' '.join(re.findall(r'[^\W_]+', texto)) + ' '
+        for nombre, latitud, longitud in self.lugares:
+            if f' {nombre} ' in palabras:
+                return latitud, longitud
+        return None
+
+    def _por_nomenclatura(self, texto):
+        coincidencia = _PATRON_NOMENCLATURA.search(texto)
+        if not coincidencia:
+            return None
+        principal = _numero(coincidencia['principal'], coincidencia['letra1'])
+        cruce = _numero(coincidencia['cruce'], coincidencia['letra2'])
+        placa = int(coincidencia['placa'])
+
+        c = self.cuadricula
+        if coincidencia['via'] in VIAS_CALLE:
+            calle, carrera, norte, oeste = principal, cruce, 0, placa
+        else:
+            calle, carrera, norte, oeste = cruce, principal, placa, 0
+        # Al sur de la calle 0 y al oriente de la carrera 0 la numeración se repite
+        if re.search(r'\bsur\b', texto):
+            calle, norte = -calle, -norte
+        if re.search(r'\beste\b', texto):
+            carrera, oeste = -carrera, -oeste
+
+        # Metros sobre los ejes de la cuadrícula y giro a norte/oriente reales
+        eje_norte = calle * c['metros_por_calle'] + norte
+        eje_oeste = carrera * c['metros_por_carrera'] + oeste
+        giro = math.radians(c['rotacion_grados'])
+        metros_norte = eje_norte * math.cos(giro) + eje_oeste * math.sin(giro)
+        metros_oriente = eje_norte * math.sin(giro) - eje_oeste * math.cos(giro)
+
+        latitud = c['latitud'] + metros_norte / METROS_POR_GRADO
+        longitud = c['longitud'] + metros_oriente / (METROS_POR_GRADO * math.cos(math.radians(latitud)))
+        return round(latitud, 6), round(longitud, 6)
+
+
+_proveedor = None
+_proveedor_lock = threading.Lock()
+
+
+def obtener_proveedor():
+    """Devuelve la instancia única del proveedor configurado"""
+    global _proveedor
+    if _proveedor is None:
+        with _proveedor_lock:
+            if _proveedor is None:
+                _proveedor = import_string(getattr(settings, 'GEOCODIFICACION_PROVEEDOR', PROVEEDOR_POR_DEFECTO))()
+    return _proveedor
+
+
+def geocodificar(direccion):
+    """(latitud, longitud) de la dirección, pasando por la caché"""
+    if not direccion or not direccion.strip():
+        return None
+    cache = caches[getattr(settings, 'GEOCODIFICACION_CACHE', 'default')]
+    clave = 'geocodificacion:' + hashlib.md5(' '.join(normalizar(direccion).split()).encode()).hexdigest()
+    guardado = cache.get(clave)
+    if guardado is not None:
+        # () marca una dirección que ya se intentó sin éxito
+        return tuple(guardado) or None
+    ubicacion = obtener_proveedor().geocodificar(direccion)
+    cache.set(clave, tuple(ubicacion or ()), getattr(settings, 'GEOCODIFICACION_CACHE_TTL', CACHE_TTL_DEFECTO))
+    return ubicacion
+
+
+def asignar(objeto, ubicacion):
+    """Copia (latitud, longitud) y su geohash a un servicio o una cuadrilla"""
+    if ubicacion is None:
+        objeto.latitud = objeto.longitud = None
+        objeto.geohash = ''
+    else:
+        objeto.latitud, objeto.longitud = ubicacion
+        objeto.geohash = geo.codificar(*ubicacion)
+
+
+def ubicar(objeto, direccion):
+    """Geocodifica ``direccion`` y la asigna a ``objeto``"""
+    ubicacion = geocodificar(direccion)
+    asignar(objeto, ubicacion)
+    return ubicacion
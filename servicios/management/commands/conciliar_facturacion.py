@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from servicios.facturacion import conciliar
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula los resúmenes de facturación desde las facturas y corrige las diferencias '
+        '(programar cada noche, p. ej. con cron)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', type=int, action='append', help='Conciliar solo este usuario (repetible)')
+
+    def handle(self, *args, **options):
+        resultado = conciliar(options['usuario'])
+        mensaje = (
+            f"{resultado['creadas']} filas creadas, {resultado['actualizadas']} actualizadas, "
+            f"{resultado['eliminadas']} eliminadas"
+        )
+        if any(resultado.values()):
+            self.stdout.write(self.style.WARNING(f'Resúmenes corregidos: {mensaje}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Resúmenes de facturación al día'))
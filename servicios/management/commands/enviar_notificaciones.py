@@ -0,0 +1,48 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from servicios import notificaciones
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker de la bandeja de notificaciones: envía por lotes las pendientes y reprograma '
+        'las que fallan con espera exponencial. Termina con SIGTERM/SIGINT al acabar el lote en curso.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=notificaciones.TAMANO_LOTE_DEFECTO)
+        parser.add_argument('--intervalo', type=float, default=5.0, help='Segundos de espera con la bandeja vacía')
+        parser.add_argument('--maximo-intentos', type=int, default=None)
+        parser.add_argument('--una-vez', action='store_true', help='Vacía la bandeja y termina')
+
+    def handle(self, *args, **options):
+        detener = threading.Event()
+        if not options['una_vez']:
+            for senal in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(senal, lambda *_: detener.set())
+
+        totales = {'enviadas': 0, 'reintentos': 0, 'fallidas': 0}
+        while not detener.is_set():
+            close_old_connections()
+            resultado = notificaciones.procesar_lote(options['lote'], options['maximo_intentos'])
+            for clave, cantidad in resultado.items():
+                totales[clave] += cantidad
+            procesadas = sum(resultado.values())
+            if procesadas:
+                self.stdout.write(
+                    f"{resultado['enviadas']} enviadas, {resultado['reintentos']} reprogramadas, "
+                    f"{resultado['fallidas']} fallidas"
+                )
+            elif options['una_vez']:
+                break
+            else:
+                detener.wait(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Notificaciones enviadas: {totales['enviadas']}, reprogramadas: {totales['reintentos']}, "
+            f"fallidas: {totales['fallidas']}"
+        ))
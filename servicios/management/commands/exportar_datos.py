@@ -0,0 +1,39 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from servicios import exportacion
+
+
+def _fecha(valor):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor}. Use YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'Exporta servicios, historial o facturas a CSV o XLSX sin cargar todas las filas en memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=sorted(exportacion.EXPORTACIONES))
+        parser.add_argument('--formato', choices=sorted(exportacion.FORMATOS), default='csv')
+        parser.add_argument('--salida', help='Archivo de destino (por defecto, la salida estándar)')
+        parser.add_argument('--desde', type=_fecha, help='Fecha inicial YYYY-MM-DD (inclusiva)')
+        parser.add_argument('--hasta', type=_fecha, help='Fecha final YYYY-MM-DD (inclusiva)')
+
+    def handle(self, *args, **options):
+        fragmentos = exportacion.exportar(options['tipo'], options['formato'], options['desde'], options['hasta'])
+        if not options['salida']:
+            for fragmento in fragmentos:
+                sys.stdout.buffer.write(fragmento)
+            sys.stdout.buffer.flush()
+            return
+
+        total = 0
+        with open(options['salida'], 'wb') as archivo:
+            for fragmento in fragmentos:
+                archivo.write(fragmento)
+                total += len(fragmento)
+        self.stdout.write(self.style.SUCCESS(f"{options['salida']} escrito ({total} bytes)"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from servicios.emision import LOTE_DEFECTO, generar_facturas, marcar_vencidas
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera en lote las facturas de los servicios completados y marca como vencidas las '
+        'facturas pendientes cuya fecha de vencimiento pasó (programar a diario)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias-vencimiento', type=int, help='Días hasta el vencimiento de las nuevas facturas')
+        parser.add_argument('--lote', type=int, default=LOTE_DEFECTO, help='Facturas por transacción')
+        parser.add_argument('--solo-vencidas', action='store_true', help='Solo marcar las facturas vencidas')
+
+    def handle(self, *args, **options):
+        if not options['solo_vencidas']:
+            resultado = generar_facturas(dias_vencimiento=options['dias_vencimiento'], lote=options['lote'])
+            self.stdout.write(self.style.SUCCESS(f"{resultado['creadas']} facturas generadas"))
+            if resultado['sin_precio']:
+                self.stdout.write(self.style.WARNING(
+                    f"{resultado['sin_precio']} servicios completados sin precio estimado no se facturaron"
+                ))
+        vencidas = marcar_vencidas()
+        self.stdout.write(self.style.SUCCESS(f'{vencidas} facturas marcadas como vencidas'))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from servicios import geocodificacion
+from servicios.models import ServicioAgendado
+
+TAMANO_LOTE_DEFECTO = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Geocodifica por lotes los servicios sin ubicación (los anteriores a la geocodificación '
+        'automática o con direcciones que cambió el nomenclátor)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE_DEFECTO, help='Servicios por transacción')
+        parser.add_argument('--todos', action='store_true', help='Vuelve a geocodificar también los ya ubicados')
+
+    def handle(self, *args, **options):
+        servicios = ServicioAgendado.objects.order_by('id')
+        if not options['todos']:
+            servicios = servicios.filter(geohash='')
+        servicios = servicios.only('id', 'direccion_servicio', 'latitud', 'longitud', 'geohash')
+
+        desde, revisados, ubicados = 0, 0, 0
+        while True:
+            lote = list(servicios.filter(id__gt=desde)[:options['lote']])
+            if not lote:
+                break
+            for servicio in lote:
+                if geocodificacion.ubicar(servicio, servicio.direccion_servicio) is not None:
+                    ubicados += 1
+            with transaction.atomic():
+                # bulk_update no pasa por pre_save ni toca fecha_actualizacion
+                ServicioAgendado.objects.bulk_update(lote, ['latitud', 'longitud', 'geohash'])
+            desde, revisados = lote[-1].id, revisados + len(lote)
+            self.stdout.write(f'{revisados} servicios revisados')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Servicios ubicados: {ubicados} de {revisados}'
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from servicios import eventos
+
+
+class Command(BaseCommand):
+    help = (
+        'Borra los eventos de auditoría de los meses anteriores a la retención '
+        '(EVENTOS_MESES_RETENCION), por rangos de id'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=None, help='Meses completos que se conservan además del actual')
+        parser.add_argument('--lote', type=int, default=eventos.TAMANO_LOTE_PODA, help='Ids por sentencia DELETE')
+
+    def handle(self, *args, **options):
+        borrados = eventos.podar(options['meses'], options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'Eventos borrados: {borrados}'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from servicios import busqueda
+
+
+class Command(BaseCommand):
+    help = (
+        'Vuelve a crear los triggers del índice de búsqueda de servicios y reindexa por lotes '
+        '(sin bloquear las búsquedas ni las reservas mientras corre)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=busqueda.TAMANO_LOTE_DEFECTO, help='Servicios por transacción')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        if not busqueda.soportado(connections[options['database']]):
+            self.stdout.write(self.style.WARNING(
+                'El motor de base de datos no tiene índice de búsqueda: se usa icontains'
+            ))
+            return
+        total = busqueda.reconstruir(
+            options['database'], options['lote'],
+            progreso=lambda total: self.stdout.write(f'{total} servicios indexados'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Índice de búsqueda reconstruido: {total} servicios'))
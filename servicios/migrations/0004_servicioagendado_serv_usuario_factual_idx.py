@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios', '0003_servicioagendado_serv_usuario_fcrea_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='servicioagendado',
+            index=models.Index(fields=['usuario', 'fecha_actualizacion'], name='serv_usuario_factual_idx'),
+        ),
+    ]
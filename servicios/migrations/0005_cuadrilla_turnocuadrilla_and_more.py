@@ -0,0 +1,81 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+from datetime import timedelta
+
+
+DURACIONES_SERVICIO = {
+    'residencial': timedelta(hours=3),
+    'empresarial': timedelta(hours=4),
+    'especializado': timedelta(hours=5),
+    'postobra': timedelta(hours=6),
+}
+
+
+def calcular_fecha_fin_servicio(apps, schema_editor):
+    ServicioAgendado = apps.get_model('servicios', 'ServicioAgendado')
+    for tipo, duracion in DURACIONES_SERVICIO.items():
+        ServicioAgendado.objects.filter(tipo_servicio=tipo, fecha_fin_servicio__isnull=True).update(
+            fecha_fin_servicio=models.F('fecha_servicio') + duracion
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios', '0004_servicioagendado_serv_usuario_factual_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cuadrilla',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True, verbose_name='Nombre')),
+                ('tipos_servicio', models.JSONField(default=list, help_text='Claves de ServicioAgendado.TIPOS_SERVICIO que atiende la cuadrilla', verbose_name='Tipos de Servicio')),
+                ('activa', models.BooleanField(default=True, verbose_name='Activa')),
+            ],
+            options={
+                'verbose_name': 'Cuadrilla',
+                'verbose_name_plural': 'Cuadrillas',
+                'db_table': 'cuadrillas',
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TurnoCuadrilla',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.IntegerField(choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')], verbose_name='Día de la Semana')),
+                ('hora_inicio', models.TimeField(verbose_name='Hora de Inicio')),
+                ('hora_fin', models.TimeField(verbose_name='Hora de Fin')),
+            ],
+            options={
+                'verbose_name': 'Turno de Cuadrilla',
+                'verbose_name_plural': 'Turnos de Cuadrillas',
+                'db_table': 'turnos_cuadrilla',
+                'ordering': ['cuadrilla', 'dia_semana', 'hora_inicio'],
+            },
+        ),
+        migrations.AddField(
+            model_name='servicioagendado',
+            name='fecha_fin_servicio',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Fecha y Hora de Fin del Servicio'),
+        ),
+        migrations.AddField(
+            model_name='turnocuadrilla',
+            name='cuadrilla',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='turnos', to='servicios.cuadrilla', verbose_name='Cuadrilla'),
+        ),
+        migrations.AddField(
+            model_name='servicioagendado',
+            name='cuadrilla',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='servicios', to='servicios.cuadrilla', verbose_name='Cuadrilla Asignada'),
+        ),
+        migrations.AddIndex(
+            model_name='servicioagendado',
+            index=models.Index(fields=['cuadrilla', 'fecha_servicio'], name='serv_cuadrilla_fserv_idx'),
+        ),
+        migrations.RunPython(calcular_fecha_fin_servicio, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:00
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+import django.db.models.deletion
+
+
+def calcular_resumenes(apps, schema_editor):
+    """Resúmenes iniciales a partir de las facturas existentes"""
+    FacturacionServicio = apps.get_model('servicios', 'FacturacionServicio')
+    ResumenFacturacion = apps.get_model('servicios', 'ResumenFacturacion')
+    RecaudoMensual = apps.get_model('servicios', 'RecaudoMensual')
+    facturas = FacturacionServicio.objects.using(schema_editor.connection.alias)
+
+    mes = TruncMonth(Coalesce('fecha_vencimiento', TruncDate('servicio__fecha_servicio')), output_field=DateField())
+    ResumenFacturacion.objects.bulk_create([
+        ResumenFacturacion(
+            usuario_id=fila['servicio__usuario_id'], mes=fila['mes'], estado_pago=fila['estado_pago'],
+            cantidad=fila['cantidad'], monto_total=fila['monto_total'], monto_pagado=fila['monto_pagado'],
+        )
+        for fila in facturas.annotate(mes=mes).values('servicio__usuario_id', 'mes', 'estado_pago').annotate(
+            cantidad=Count('id'), monto_total=Sum('monto_total'), monto_pagado=Sum('monto_pagado'),
+        ).order_by()
+    ], batch_size=500)
+    RecaudoMensual.objects.bulk_create([
+        RecaudoMensual(
+            usuario_id=fila['servicio__usuario_id'], mes=fila['mes'],
+            cantidad=fila['cantidad'], monto_pagado=fila['monto_pagado'],
+        )
+        for fila in facturas.filter(fecha_pago__isnull=False, monto_pagado__gt=0).annotate(
+            mes=TruncMonth('fecha_pago', output_field=DateField()),
+        ).values('servicio__usuario_id', 'mes').annotate(
+            cantidad=Count('id'), monto_pagado=Sum('monto_pagado'),
+        ).order_by()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('servicios', '0005_cuadrilla_turnocuadrilla_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecaudoMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(verbose_name='Mes')),
+                ('cantidad', models.IntegerField(default=0, verbose_name='Facturas')),
+                ('monto_pagado', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Monto Pagado')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recaudos_mensuales', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Recaudo Mensual',
+                'verbose_name_plural': 'Recaudos Mensuales',
+                'db_table': 'recaudo_mensual',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenFacturacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(verbose_name='Mes')),
+                ('estado_pago', models.CharField(choices=[('pendiente', 'Pendiente'), ('pagado', 'Pagado'), ('parcial', 'Pago Parcial'), ('vencido', 'Vencido')], max_length=15, verbose_name='Estado del Pago')),
+                ('cantidad', models.IntegerField(default=0, verbose_name='Facturas')),
+                ('monto_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Monto Total')),
+                ('monto_pagado', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Monto Pagado')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_facturacion', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Facturación',
+                'verbose_name_plural': 'Resúmenes de Facturación',
+                'db_table': 'resumen_facturacion',
+                'indexes': [models.Index(fields=['mes', 'estado_pago'], name='resumen_fact_mes_estado_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumenfacturacion',
+            constraint=models.UniqueConstraint(fields=('usuario', 'mes', 'estado_pago'), name='resumen_fact_usuario_mes_estado_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='recaudomensual',
+            index=models.Index(fields=['mes'], name='recaudo_mes_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recaudomensual',
+            constraint=models.UniqueConstraint(fields=('usuario', 'mes'), name='recaudo_usuario_mes_uniq'),
+        ),
+        migrations.RunPython(calcular_resumenes, migrations.RunPython.noop),
+    ]
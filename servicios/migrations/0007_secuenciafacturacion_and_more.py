@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios', '0006_recaudomensual_resumenfacturacion_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaFacturacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=30, unique=True, verbose_name='Nombre')),
+                ('siguiente', models.PositiveBigIntegerField(default=1, verbose_name='Siguiente Número')),
+            ],
+            options={
+                'verbose_name': 'Secuencia de Facturación',
+                'verbose_name_plural': 'Secuencias de Facturación',
+                'db_table': 'secuencias_facturacion',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='facturacionservicio',
+            index=models.Index(fields=['estado_pago', 'fecha_vencimiento'], name='fact_estado_venc_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios', '0007_secuenciafacturacion_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='servicioagendado',
+            index=models.Index(fields=['-fecha_creacion', '-id'], name='serv_fcrea_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicioagendado',
+            index=models.Index(fields=['estado', '-fecha_creacion', '-id'], name='serv_estado_fcrea_id_idx'),
+        ),
+    ]
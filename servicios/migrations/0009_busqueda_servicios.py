@@ -0,0 +1,30 @@
+from django.db import migrations
+
+from servicios import busqueda
+
+
+def crear_indice(apps, schema_editor):
+    """Tabla de búsqueda, triggers y servicios existentes"""
+    conexion = schema_editor.connection
+    if not busqueda.soportado(conexion):
+        return
+    busqueda.instalar(conexion)
+    ServicioAgendado = apps.get_model('servicios', 'ServicioAgendado')
+    ultimo = ServicioAgendado.objects.using(conexion.alias).order_by('-id').values_list('id', flat=True).first()
+    if ultimo:
+        busqueda.indexar_rango(conexion, 0, ultimo)
+
+
+def eliminar_indice(apps, schema_editor):
+    busqueda.desinstalar(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios', '0008_servicioagendado_serv_fcrea_id_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
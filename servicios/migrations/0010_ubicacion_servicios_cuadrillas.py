@@ -0,0 +1,66 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:30
+
+from django.db import migrations, models
+
+from servicios import busqueda
+
+
+def reinstalar_busqueda(apps, schema_editor):
+    # SQLite rehace servicios_agendados al agregar columnas con defecto y se
+    # pierden los triggers del índice de búsqueda (0009)
+    if busqueda.soportado(schema_editor.connection):
+        busqueda.instalar(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios', '0009_busqueda_servicios'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cuadrilla',
+            name='geohash',
+            field=models.CharField(blank=True, default='', max_length=12, verbose_name='Geohash'),
+        ),
+        migrations.AddField(
+            model_name='cuadrilla',
+            name='latitud',
+            field=models.FloatField(blank=True, null=True, verbose_name='Latitud'),
+        ),
+        migrations.AddField(
+            model_name='cuadrilla',
+            name='longitud',
+            field=models.FloatField(blank=True, null=True, verbose_name='Longitud'),
+        ),
+        migrations.AddField(
+            model_name='cuadrilla',
+            name='ubicacion_actualizada',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Posición Actualizada'),
+        ),
+        migrations.AddField(
+            model_name='servicioagendado',
+            name='geohash',
+            field=models.CharField(blank=True, default='', max_length=12, verbose_name='Geohash'),
+        ),
+        migrations.AddField(
+            model_name='servicioagendado',
+            name='latitud',
+            field=models.FloatField(blank=True, null=True, verbose_name='Latitud'),
+        ),
+        migrations.AddField(
+            model_name='servicioagendado',
+            name='longitud',
+            field=models.FloatField(blank=True, null=True, verbose_name='Longitud'),
+        ),
+        migrations.AddIndex(
+            model_name='cuadrilla',
+            index=models.Index(fields=['geohash'], name='cuadrilla_geohash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicioagendado',
+            index=models.Index(fields=['fecha_servicio', 'geohash'], name='serv_fserv_geohash_idx'),
+        ),
+        migrations.RunPython(reinstalar_busqueda, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:34
+
+from django.db import migrations, models
+
+from servicios import busqueda
+
+
+def reinstalar_busqueda(apps, schema_editor):
+    # SQLite rehace servicios_agendados para agregar la columna (ver 0010)
+    if busqueda.soportado(schema_editor.connection):
+        busqueda.instalar(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios', '0010_ubicacion_servicios_cuadrillas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicioagendado',
+            name='version',
+            field=models.PositiveIntegerField(default=1, verbose_name='Versión'),
+        ),
+        migrations.RunPython(reinstalar_busqueda, migrations.RunPython.noop),
+    ]
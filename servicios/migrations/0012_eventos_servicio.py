@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:37
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.utils.timezone
+
+from servicios import eventos
+
+
+def crear_trigger(apps, schema_editor):
+    eventos.instalar(schema_editor.connection)
+
+
+def eliminar_trigger(apps, schema_editor):
+    eventos.desinstalar(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios', '0011_version_servicio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoServicio',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('servicio_id', models.BigIntegerField(verbose_name='Servicio')),
+                ('entidad', models.CharField(choices=[('servicio', 'Servicio'), ('seguimiento', 'Seguimiento'), ('factura', 'Factura')], max_length=12, verbose_name='Entidad')),
+                ('entidad_id', models.BigIntegerField(verbose_name='Id de la Entidad')),
+                ('accion', models.CharField(choices=[('creado', 'Creado'), ('actualizado', 'Actualizado'), ('eliminado', 'Eliminado')], max_length=12, verbose_name='Acción')),
+                ('actor_id', models.BigIntegerField(blank=True, null=True, verbose_name='Usuario que hizo el cambio')),
+                ('cambios', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Cambios')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+            ],
+            options={
+                'verbose_name': 'Evento de Servicio',
+                'verbose_name_plural': 'Eventos de Servicios',
+                'db_table': 'eventos_servicio',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['servicio_id', 'id'], name='evento_servicio_id_idx'), models.Index(fields=['fecha'], name='evento_fecha_idx')],
+            },
+        ),
+        migrations.RunPython(crear_trigger, eliminar_trigger),
+    ]
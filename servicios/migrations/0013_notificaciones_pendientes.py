@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:41
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('servicios', '0012_eventos_servicio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacionPendiente',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('servicio_agendado', 'Servicio agendado'), ('servicios_agendados', 'Servicios agendados en lote'), ('servicio_confirmado', 'Servicio confirmado'), ('servicio_cancelado', 'Servicio cancelado'), ('factura_vencida', 'Factura vencida')], max_length=20, verbose_name='Tipo')),
+                ('datos', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Datos')),
+                ('canales', models.JSONField(default=list, verbose_name='Canales Pendientes')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviada', 'Enviada'), ('fallida', 'Fallida')], default='pendiente', max_length=10, verbose_name='Estado')),
+                ('intentos', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próximo Intento')),
+                ('ultimo_error', models.TextField(blank=True, verbose_name='Último Error')),
+                ('fecha_creacion', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha de Creación')),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Envío')),
+                ('servicio', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='servicios.servicioagendado', verbose_name='Servicio')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Destinatario')),
+            ],
+            options={
+                'verbose_name': 'Notificación Pendiente',
+                'verbose_name_plural': 'Notificaciones Pendientes',
+                'db_table': 'notificaciones_pendientes',
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='notif_estado_prox_idx')],
+            },
+        ),
+    ]
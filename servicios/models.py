@@ -1,5 +1,75 @@
-from django.db import models
+from datetime import timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
+
+
+class Cuadrilla(models.Model):
+    """
+    Equipo de trabajo que atiende servicios de uno o varios tipos
+    """
+    nombre = models.CharField(max_length=100, unique=True, verbose_name="Nombre")
+    tipos_servicio = models.JSONField(
+        default=list,
+        verbose_name="Tipos de Servicio",
+        help_text="Claves de ServicioAgendado.TIPOS_SERVICIO que atiende la cuadrilla"
+    )
+    activa = models.BooleanField(default=True, verbose_name="Activa")
+    # Última posición reportada en el seguimiento de sus servicios (servicios.despacho)
+    latitud = models.FloatField(null=True, blank=True, verbose_name="Latitud")
+    longitud = models.FloatField(null=True, blank=True, verbose_name="Longitud")
+    geohash = models.CharField(max_length=12, blank=True, default='', verbose_name="Geohash")
+    ubicacion_actualizada = models.DateTimeField(null=True, blank=True, verbose_name="Posición Actualizada")
+    
+    class Meta:
+        verbose_name = "Cuadrilla"
+        verbose_name_plural = "Cuadrillas"
+        db_table = "cuadrillas"
+        ordering = ['nombre']
+        indexes = [
+            # Cuadrillas cercanas a un punto: rangos de prefijo de geohash
+            models.Index(fields=['geohash'], name='cuadrilla_geohash_idx'),
+        ]
+    
+    def __str__(self):
+        return self.nombre
+
+
+class TurnoCuadrilla(models.Model):
+    """
+    Franja semanal en la que una cuadrilla está disponible
+    """
+    DIAS_SEMANA = [
+        (0, 'Lunes'),
+        (1, 'Martes'),
+        (2, 'Miércoles'),
+        (3, 'Jueves'),
+        (4, 'Viernes'),
+        (5, 'Sábado'),
+        (6, 'Domingo'),
+    ]
+    
+    cuadrilla = models.ForeignKey(
+        Cuadrilla,
+        on_delete=models.CASCADE,
+        related_name='turnos',
+        verbose_name="Cuadrilla"
+    )
+    dia_semana = models.IntegerField(choices=DIAS_SEMANA, verbose_name="Día de la Semana")
+    hora_inicio = models.TimeField(verbose_name="Hora de Inicio")
+    hora_fin = models.TimeField(verbose_name="Hora de Fin")
+    
+    class Meta:
+        verbose_name = "Turno de Cuadrilla"
+        verbose_name_plural = "Turnos de Cuadrillas"
+        db_table = "turnos_cuadrilla"
+        ordering = ['cuadrilla', 'dia_semana', 'hora_inicio']
+    
+    def __str__(self):
+        return f"{self.cuadrilla} - {self.get_dia_semana_display()} {self.hora_inicio:%H:%M}-{self.hora_fin:%H:%M}"
+
 
 class ServicioAgendado(models.Model):
     """
@@ -20,6 +90,17 @@ class ServicioAgendado(models.Model):
         ('cancelado', 'Cancelado'),
     ]
     
+    # Duración estimada de cada tipo de servicio (ocupa a la cuadrilla asignada)
+    DURACIONES_SERVICIO = {
+        'residencial': timedelta(hours=3),
+        'empresarial': timedelta(hours=4),
+        'especializado': timedelta(hours=5),
+        'postobra': timedelta(hours=6),
+    }
+    
+    # Estados en los que el servicio ocupa a su cuadrilla
+    ESTADOS_OCUPAN_CUADRILLA = ['pendiente', 'confirmado', 'en_proceso']
+    
     usuario = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
         on_delete=models.CASCADE, 
@@ -33,6 +114,19 @@ class ServicioAgendado(models.Model):
     descripcion = models.TextField(verbose_name="Descripción del Servicio")
     direccion_servicio = models.TextField(verbose_name="Dirección del Servicio")
     fecha_servicio = models.DateTimeField(verbose_name="Fecha y Hora del Servicio")
+    fecha_fin_servicio = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Fecha y Hora de Fin del Servicio"
+    )
+    cuadrilla = models.ForeignKey(
+        Cuadrilla,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='servicios',
+        verbose_name="Cuadrilla Asignada"
+    )
     estado = models.CharField(
         max_length=15, 
         choices=ESTADOS_SERVICIO, 
@@ -46,6 +140,12 @@ class ServicioAgendado(models.Model):
         blank=True,
         verbose_name="Precio Estimado"
     )
+    # Se incrementa con cada cambio de estado (servicios.estados)
+    version = models.PositiveIntegerField(default=1, verbose_name="Versión")
+    # Ubicación geocodificada de direccion_servicio (servicios.geocodificacion)
+    latitud = models.FloatField(null=True, blank=True, verbose_name="Latitud")
+    longitud = models.FloatField(null=True, blank=True, verbose_name="Longitud")
+    geohash = models.CharField(max_length=12, blank=True, default='', verbose_name="Geohash")
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
     fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
     
@@ -54,9 +154,31 @@ class ServicioAgendado(models.Model):
         verbose_name_plural = "Servicios Agendados"
         db_table = "servicios_agendados"
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Soporta la paginación por keyset de mis_servicios
+            models.Index(fields=['usuario', '-fecha_creacion', '-id'], name='serv_usuario_fcrea_id_idx'),
+            # Índice cubriente para el validador de GET condicional (MAX/COUNT por usuario)
+            models.Index(fields=['usuario', 'fecha_actualizacion'], name='serv_usuario_factual_idx'),
+            # Consultas de ocupación por cuadrilla y rango de fechas de la agenda
+            models.Index(fields=['cuadrilla', 'fecha_servicio'], name='serv_cuadrilla_fserv_idx'),
+            # Listado del admin (orden por defecto, sin filtros y filtrado por estado)
+            models.Index(fields=['-fecha_creacion', '-id'], name='serv_fcrea_id_idx'),
+            models.Index(fields=['estado', '-fecha_creacion', '-id'], name='serv_estado_fcrea_id_idx'),
+            # Servicios de un día agrupados por celda para armar rutas
+            models.Index(fields=['fecha_servicio', 'geohash'], name='serv_fserv_geohash_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_tipo_servicio_display()} - {self.usuario.username} ({self.estado})"
+    
+    def save(self, *args, **kwargs):
+        # El evento de auditoría se escribe en post_save, dentro de la misma transacción
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
 
 
 class HistorialServicio(models.Model):
@@ -133,6 +255,14 @@ class SeguimientoServicio(models.Model):
     
     def __str__(self):
         return f"Seguimiento - {self.servicio} ({self.progreso_porcentaje}%)"
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
 
 
 class FacturacionServicio(models.Model):
@@ -194,10 +324,217 @@ class FacturacionServicio(models.Model):
         verbose_name_plural = "Facturaciones de Servicios"
         db_table = "facturacion_servicios"
         ordering = ['-fecha_pago']
+        indexes = [
+            # Barrido de facturas vencidas (estado_pago IN (...) AND fecha_vencimiento < hoy)
+            models.Index(fields=['estado_pago', 'fecha_vencimiento'], name='fact_estado_venc_idx'),
+        ]
     
     def __str__(self):
         return f"Factura {self.numero_factura} - {self.servicio}"
     
+    def save(self, *args, **kwargs):
+        # Los resúmenes y el evento se actualizan en post_save, dentro de la misma transacción
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+    
+    @property
+    def monto_pendiente(self):
+        return self.monto_total - self.monto_pagado
+
+
+class SecuenciaFacturacion(models.Model):
+    """
+    Contador de numeración de facturas. Se reservan bloques de números dentro de
+    la transacción que crea las facturas (ver servicios.emision), así que si esta
+    se revierte el contador también y la numeración queda sin huecos.
+    """
+    nombre = models.CharField(max_length=30, unique=True, verbose_name="Nombre")
+    siguiente = models.PositiveBigIntegerField(default=1, verbose_name="Siguiente Número")
+    
+    class Meta:
+        verbose_name = "Secuencia de Facturación"
+        verbose_name_plural = "Secuencias de Facturación"
+        db_table = "secuencias_facturacion"
+    
+    def __str__(self):
+        return f"{self.nombre}: {self.siguiente}"
+
+
+class ResumenFacturacion(models.Model):
+    """
+    Totales de facturación por usuario, mes y estado de pago, mantenidos de forma
+    incremental al guardar o borrar facturas (ver servicios.facturacion).
+
+    El mes es el de la fecha de vencimiento o, si la factura no tiene, el de la
+    fecha del servicio.
+    """
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='resumenes_facturacion',
+        verbose_name="Usuario"
+    )
+    mes = models.DateField(verbose_name="Mes")
+    estado_pago = models.CharField(
+        max_length=15,
+        choices=FacturacionServicio.ESTADOS_PAGO,
+        verbose_name="Estado del Pago"
+    )
+    cantidad = models.IntegerField(default=0, verbose_name="Facturas")
+    monto_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Monto Total")
+    monto_pagado = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Monto Pagado")
+    
+    class Meta:
+        verbose_name = "Resumen de Facturación"
+        verbose_name_plural = "Resúmenes de Facturación"
+        db_table = "resumen_facturacion"
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'mes', 'estado_pago'], name='resumen_fact_usuario_mes_estado_uniq'),
+        ]
+        indexes = [
+            # Cartera global por mes sin recorrer todos los usuarios
+            models.Index(fields=['mes', 'estado_pago'], name='resumen_fact_mes_estado_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.usuario_id} {self.mes:%Y-%m} {self.estado_pago}: {self.cantidad}"
+    
     @property
     def monto_pendiente(self):
         return self.monto_total - self.monto_pagado
+
+
+class RecaudoMensual(models.Model):
+    """
+    Monto pagado por usuario y mes de la fecha de pago de cada factura
+    """
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='recaudos_mensuales',
+        verbose_name="Usuario"
+    )
+    mes = models.DateField(verbose_name="Mes")
+    cantidad = models.IntegerField(default=0, verbose_name="Facturas")
+    monto_pagado = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Monto Pagado")
+    
+    class Meta:
+        verbose_name = "Recaudo Mensual"
+        verbose_name_plural = "Recaudos Mensuales"
+        db_table = "recaudo_mensual"
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'mes'], name='recaudo_usuario_mes_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['mes'], name='recaudo_mes_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.usuario_id} {self.mes:%Y-%m}: {self.monto_pagado}"
+
+
+class EventoServicio(models.Model):
+    """
+    Registro de solo inserción de los cambios de servicios, seguimientos y
+    facturas (ver servicios.eventos). El id es la secuencia desde la que leen
+    los consumidores.
+    """
+    ENTIDADES = [
+        ('servicio', 'Servicio'),
+        ('seguimiento', 'Seguimiento'),
+        ('factura', 'Factura'),
+    ]
+    
+    ACCIONES = [
+        ('creado', 'Creado'),
+        ('actualizado', 'Actualizado'),
+        ('eliminado', 'Eliminado'),
+    ]
+    
+    id = models.BigAutoField(primary_key=True)
+    # Sin claves foráneas: el evento sobrevive al servicio y a su autor
+    servicio_id = models.BigIntegerField(verbose_name="Servicio")
+    entidad = models.CharField(max_length=12, choices=ENTIDADES, verbose_name="Entidad")
+    entidad_id = models.BigIntegerField(verbose_name="Id de la Entidad")
+    accion = models.CharField(max_length=12, choices=ACCIONES, verbose_name="Acción")
+    actor_id = models.BigIntegerField(null=True, blank=True, verbose_name="Usuario que hizo el cambio")
+    cambios = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name="Cambios")
+    fecha = models.DateTimeField(default=timezone.now, verbose_name="Fecha")
+    
+    class Meta:
+        verbose_name = "Evento de Servicio"
+        verbose_name_plural = "Eventos de Servicios"
+        db_table = "eventos_servicio"
+        ordering = ['id']
+        indexes = [
+            # Historial de un servicio en orden
+            models.Index(fields=['servicio_id', 'id'], name='evento_servicio_id_idx'),
+            # Poda por mes
+            models.Index(fields=['fecha'], name='evento_fecha_idx'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.id} {self.entidad} {self.entidad_id} {self.accion}"
+
+
+class NotificacionPendiente(models.Model):
+    """
+    Bandeja de salida de notificaciones (ver servicios.notificaciones). La fila
+    se inserta en la transacción del cambio que la origina y la envía el
+    proceso ``manage.py enviar_notificaciones``.
+    """
+    TIPOS = [
+        ('servicio_agendado', 'Servicio agendado'),
+        ('servicios_agendados', 'Servicios agendados en lote'),
+        ('servicio_confirmado', 'Servicio confirmado'),
+        ('servicio_cancelado', 'Servicio cancelado'),
+        ('factura_vencida', 'Factura vencida'),
+    ]
+    
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('enviada', 'Enviada'),
+        ('fallida', 'Fallida'),
+    ]
+    
+    id = models.BigAutoField(primary_key=True)
+    tipo = models.CharField(max_length=20, choices=TIPOS, verbose_name="Tipo")
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Destinatario"
+    )
+    servicio = models.ForeignKey(
+        ServicioAgendado,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Servicio"
+    )
+    datos = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder, verbose_name="Datos")
+    # Canales que faltan por enviar; se quitan a medida que se envían
+    canales = models.JSONField(default=list, verbose_name="Canales Pendientes")
+    estado = models.CharField(max_length=10, choices=ESTADOS, default='pendiente', verbose_name="Estado")
+    intentos = models.PositiveSmallIntegerField(default=0, verbose_name="Intentos")
+    proximo_intento = models.DateTimeField(default=timezone.now, verbose_name="Próximo Intento")
+    ultimo_error = models.TextField(blank=True, verbose_name="Último Error")
+    fecha_creacion = models.DateTimeField(default=timezone.now, verbose_name="Fecha de Creación")
+    fecha_envio = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Envío")
+    
+    class Meta:
+        verbose_name = "Notificación Pendiente"
+        verbose_name_plural = "Notificaciones Pendientes"
+        db_table = "notificaciones_pendientes"
+        indexes = [
+            # Lote siguiente del worker: estado = 'pendiente' AND proximo_intento <= ahora
+            models.Index(fields=['estado', 'proximo_intento'], name='notif_estado_prox_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} - {self.usuario_id} ({self.estado})"
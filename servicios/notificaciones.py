@@ -0,0 +1,261 @@
+"""
+Notificaciones por correo o SMS con bandeja de salida transaccional.
+
+Las peticiones no envían nada: agregan filas a ``notificaciones_pendientes``
+con un solo INSERT (un bulk_create en los caminos en lote) dentro de la
+transacción del cambio, así que si el cambio se revierte la notificación
+también, y la latencia del proveedor nunca llega a la petición.
+
+``manage.py enviar_notificaciones`` vacía la bandeja por lotes:
+
+1. Toma un lote con un UPDATE condicional que corre su ``proximo_intento``
+   al vencimiento de un arriendo; ese instante identifica las filas tomadas, así
+   que varios workers no envían la misma notificación sin bloquear filas.
+2. Envía fuera de toda transacción por el transporte de cada canal
+   (``NOTIFICACIONES_TRANSPORTES``).
+3. Guarda el resultado con un bulk_update: enviada, o un reintento con espera
+   exponencial (``NOTIFICACIONES_ESPERA_BASE`` * 2^(intentos - 1), con tope y
+   jitter) hasta ``NOTIFICACIONES_MAXIMO_INTENTOS``, después fallida.
+
+Los canales ya enviados se quitan de la fila, de modo que un reintento no repite
+el correo si lo que falló fue el SMS. Si un worker muere con un lote tomado, el
+arriendo vence y otro lo retoma: la entrega es al menos una vez.
+"""
+import json
+import random
+import sys
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import NotificacionPendiente
+
+CANALES_DEFECTO = ('email',)
+TRANSPORTES_DEFECTO = {
+    'email': 'servicios.notificaciones.TransporteEmail',
+    'sms': 'servicios.notificaciones.TransporteConsola',
+}
+MAXIMO_INTENTOS_DEFECTO = 8
+ESPERA_BASE_DEFECTO = 30
+ESPERA_MAXIMA_DEFECTO = 3600
+TAMANO_LOTE_DEFECTO = 100
+# Tiempo que un worker tiene para enviar un lote antes de que otro lo retome
+ARRIENDO = timedelta(minutes=5)
+
+# Tipo de notificación de cada transición de estado que se avisa al cliente
+TIPO_POR_ESTADO = {
+    'confirmado': 'servicio_confirmado',
+    'cancelado': 'servicio_cancelado',
+}
+
+# (asunto, cuerpo) por tipo; los campos salen de ``contexto``
+MENSAJES = {
+    'servicio_agendado': (
+        'Servicio agendado',
+        'Hola {nombre}, su servicio de {tipo_servicio} quedó agendado para el {fecha_servicio} en {direccion}.',
+    ),
+    'servicios_agendados': (
+        'Servicios agendados',
+        'Hola {nombre}, se agendaron {cantidad} servicios. Puede consultarlos en Mis servicios.',
+    ),
+    'servicio_confirmado': (
+        'Servicio confirmado',
+        'Hola {nombre}, confirmamos su servicio de {tipo_servicio} del {fecha_servicio} en {direccion}.',
+    ),
+    'servicio_cancelado': (
+        'Servicio cancelado',
+        'Hola {nombre}, su servicio de {tipo_servicio} del {fecha_servicio} fue cancelado.',
+    ),
+    'factura_vencida': (
+        'Factura vencida',
+        'Hola {nombre}, la factura {numero_factura} por ${monto_pendiente} venció el {fecha_vencimiento}.',
+    ),
+}
+
+# Atributo del usuario con la dirección de cada canal
+DESTINATARIOS = {
+    'email': 'email',
+    'sms': 'telefono',
+}
+
+
+class Transporte:
+    """Envía un mensaje por un canal; lanza una excepción si no pudo"""
+
+    def enviar(self, destinatario, asunto, cuerpo):
+        raise NotImplementedError
+
+
+class TransporteEmail(Transporte):
+    """Correo con el EMAIL_BACKEND de Django (locmem en las pruebas)"""
+
+    def enviar(self, destinatario, asunto, cuerpo):
+        send_mail(asunto, cuerpo, None, [destinatario])
+
+
+class TransporteConsola(Transporte):
+    """Escribe el mensaje en la salida estándar; para desarrollo"""
+
+    def __init__(self, salida=None):
+        self.salida = salida or sys.stdout
+
+    def enviar(self, destinatario, asunto, cuerpo):
+        self.salida.write(f'[{destinatario}] {asunto}: {cuerpo}\n')
+        self.salida.flush()
+
+
+class TransporteArchivo(Transporte):
+    """Agrega cada mensaje como una línea JSON a ``NOTIFICACIONES_ARCHIVO``"""
+
+    def __init__(self, ruta=None):
+        self.ruta = ruta or settings.NOTIFICACIONES_ARCHIVO
+        self._lock = threading.Lock()
+
+    def enviar(self, destinatario, asunto, cuerpo):
+        linea = json.dumps({'destinatario': destinatario, 'asunto': asunto, 'cuerpo': cuerpo}, ensure_ascii=False)
+        with self._lock, open(self.ruta, 'a', encoding='utf-8') as archivo:
+            archivo.write(linea + '\n')
+
+
+_transportes = {}
+_transportes_lock = threading.Lock()
+
+
+def obtener_transporte(canal):
+    """Instancia única del transporte configurado para ``canal``"""
+    if canal not in _transportes:
+        with _transportes_lock:
+            if canal not in _transportes:
+                rutas = {**TRANSPORTES_DEFECTO, **getattr(settings, 'NOTIFICACIONES_TRANSPORTES', {})}
+                _transportes[canal] = import_string(rutas[canal])()
+    return _transportes[canal]
+
+
+def notificacion(tipo, usuario_id, servicio_id=None, datos=None):
+    """NotificacionPendiente sin guardar, con los canales configurados"""
+    return NotificacionPendiente(
+        tipo=tipo,
+        usuario_id=usuario_id,
+        servicio_id=servicio_id,
+        datos=datos or {},
+        canales=list(getattr(settings, 'NOTIFICACIONES_CANALES', CANALES_DEFECTO)),
+    )
+
+
+def encolar(notificaciones, using=None):
+    """Inserta las notificaciones con un solo INSERT, en la transacción en curso"""
+    if notificaciones:
+        NotificacionPendiente.objects.using(using).bulk_create(notificaciones, batch_size=500)
+
+
+def espera(intentos):
+    """Espera antes del siguiente intento: exponencial con tope y ±10 % de jitter"""
+    base = getattr(settings, 'NOTIFICACIONES_ESPERA_BASE', ESPERA_BASE_DEFECTO)
+    maxima = getattr(settings, 'NOTIFICACIONES_ESPERA_MAXIMA', ESPERA_MAXIMA_DEFECTO)
+    segundos = min(base * 2 ** (intentos - 1), maxima)
+    return timedelta(seconds=segundos * random.uniform(0.9, 1.1))
+
+
+def tomar_lote(tamano=TAMANO_LOTE_DEFECTO, ahora=None):
+    """Notificaciones vencidas tomadas por este worker hasta que venza el arriendo"""
+    ahora = ahora or timezone.now()
+    vencidas = NotificacionPendiente.objects.filter(estado='pendiente', proximo_intento__lte=ahora)
+    ids = list(vencidas.order_by('proximo_intento', 'id').values_list('id', flat=True)[:tamano])
+    if not ids:
+        return []
+    # Microsegundos al azar: dos workers con el mismo reloj no comparten marca
+    arriendo = ahora + ARRIENDO + timedelta(microseconds=random.randrange(1, 10 ** 6))
+    vencidas.filter(id__in=ids).update(proximo_intento=arriendo)
+    return list(
+        NotificacionPendiente.objects.filter(id__in=ids, proximo_intento=arriendo)
+        .select_related('usuario', 'servicio').order_by('id')
+    )
+
+
+def contexto(pendiente):
+    """Campos de los mensajes: destinatario, servicio y ``datos``"""
+    usuario = pendiente.usuario
+    valores = {'nombre': usuario.first_name or usuario.username, **pendiente.datos}
+    servicio = pendiente.servicio
+    if servicio is not None:
+        valores.update({
+            'tipo_servicio': servicio.get_tipo_servicio_display(),
+            'fecha_servicio': f'{timezone.localtime(servicio.fecha_servicio):%Y-%m-%d %H:%M}',
+            'direccion': servicio.direccion_servicio,
+        })
+    return valores
+
+
+class MensajeInvalido(Exception):
+    """La plantilla del tipo no se puede armar con los datos de la notificación"""
+
+
+def mensaje(pendiente):
+    """(asunto, cuerpo) de la notificación; lanza MensajeInvalido"""
+    try:
+        asunto, cuerpo = MENSAJES[pendiente.tipo]
+        valores = contexto(pendiente)
+        return asunto.format(**valores), cuerpo.format(**valores)
+    except (KeyError, IndexError, ValueError, AttributeError) as e:
+        raise MensajeInvalido(f'{type(e).__name__}: {e}') from e
+
+
+def _enviar(pendiente):
+    """Envía los canales que faltan; devuelve el último error o '' si no hubo"""
+    asunto, cuerpo = mensaje(pendiente)
+    error = ''
+    for canal in list(pendiente.canales):
+        destinatario = getattr(pendiente.usuario, DESTINATARIOS.get(canal, ''), None)
+        try:
+            if destinatario:
+                obtener_transporte(canal).enviar(destinatario, asunto, cuerpo)
+        except Exception as e:
+            error = f'{canal}: {e}'
+            continue
+        # Enviado o sin dirección para ese canal: no se reintenta
+        pendiente.canales.remove(canal)
+    return error
+
+
+def procesar_lote(tamano=TAMANO_LOTE_DEFECTO, maximo_intentos=None):
+    """
+    Toma, envía y registra un lote. Devuelve la cantidad de notificaciones
+    enviadas, reprogramadas y fallidas.
+    """
+    if maximo_intentos is None:
+        maximo_intentos = getattr(settings, 'NOTIFICACIONES_MAXIMO_INTENTOS', MAXIMO_INTENTOS_DEFECTO)
+    resultado = {'enviadas': 0, 'reintentos': 0, 'fallidas': 0}
+    lote = tomar_lote(tamano)
+    for pendiente in lote:
+        try:
+            error = _enviar(pendiente)
+        except MensajeInvalido as e:
+            # Reintentar no lo arregla: falla solo esta fila, el resto del lote sigue
+            pendiente.estado, pendiente.ultimo_error = 'fallida', f'mensaje: {e}'
+            pendiente.intentos += 1
+            resultado['fallidas'] += 1
+            continue
+        ahora = timezone.now()
+        if not pendiente.canales:
+            pendiente.estado, pendiente.fecha_envio, pendiente.ultimo_error = 'enviada', ahora, ''
+            resultado['enviadas'] += 1
+            continue
+        pendiente.intentos += 1
+        pendiente.ultimo_error = error
+        if pendiente.intentos >= maximo_intentos:
+            pendiente.estado = 'fallida'
+            resultado['fallidas'] += 1
+        else:
+            pendiente.proximo_intento = ahora + espera(pendiente.intentos)
+            resultado['reintentos'] += 1
+    if lote:
+        with transaction.atomic():
+            NotificacionPendiente.objects.bulk_update(lote, [
+                'canales', 'estado', 'intentos', 'proximo_intento', 'ultimo_error', 'fecha_envio',
+            ])
+    return resultado
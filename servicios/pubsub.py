@@ -0,0 +1,101 @@
+"""
+Pub/sub en proceso para publicar cambios de seguimiento a los clientes suscritos.
+
+El backend se elige con el setting ``SEGUIMIENTO_PUBSUB_BACKEND`` (ruta de import
+de la clase), de modo que el backend en memoria puede reemplazarse por uno que
+reparta los mensajes entre varios workers sin tocar publicadores ni suscriptores.
+"""
+import asyncio
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+BACKEND_POR_DEFECTO = 'servicios.pubsub.BackendMemoria'
+
+# Mensajes pendientes por suscriptor antes de descartar los más antiguos
+TAMANO_COLA_SUSCRIPTOR = 100
+
+
+def canal_usuario(usuario_id):
+    """Nombre del canal con los eventos de un usuario"""
+    return f'usuario:{usuario_id}'
+
+
+class Suscripcion:
+    """
+    Suscripción de un consumidor asíncrono a un canal
+    """
+
+    def __init__(self, backend, canal, loop, tamano_cola=TAMANO_COLA_SUSCRIPTOR):
+        self.backend = backend
+        self.canal = canal
+        self.loop = loop
+        self.cola = asyncio.Queue(maxsize=tamano_cola)
+
+    def entregar(self, mensaje):
+        """Encola un mensaje; debe ejecutarse en el loop del suscriptor"""
+        if self.cola.full():
+            # Un cliente lento no debe bloquear al publicador: se descarta lo más antiguo
+            self.cola.get_nowait()
+        self.cola.put_nowait(mensaje)
+
+    async def recibir(self):
+        return await self.cola.get()
+
+    def cerrar(self):
+        self.backend.desuscribir(self)
+
+
+class BackendMemoria:
+    """
+    Backend en memoria del proceso; seguro para publicar desde hilos síncronos
+    (vistas WSGI, señales) hacia suscriptores que viven en un event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscripciones = {}
+
+    async def suscribir(self, canal):
+        suscripcion = Suscripcion(self, canal, asyncio.get_running_loop())
+        with self._lock:
+            self._suscripciones.setdefault(canal, set()).add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        with self._lock:
+            suscripciones = self._suscripciones.get(suscripcion.canal)
+            if suscripciones is not None:
+                suscripciones.discard(suscripcion)
+                if not suscripciones:
+                    del self._suscripciones[suscripcion.canal]
+
+    def publicar(self, canal, mensaje):
+        with self._lock:
+            suscripciones = list(self._suscripciones.get(canal, ()))
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion.entregar, mensaje)
+            except RuntimeError:
+                # El loop del suscriptor ya se cerró
+                self.desuscribir(suscripcion)
+
+    def cantidad_suscriptores(self, canal):
+        with self._lock:
+            return len(self._suscripciones.get(canal, ()))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def obtener_backend():
+    """Devuelve la instancia única del backend configurado"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                ruta = getattr(settings, 'SEGUIMIENTO_PUBSUB_BACKEND', BACKEND_POR_DEFECTO)
+                _backend = import_string(ruta)()
+    return _backend
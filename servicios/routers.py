@@ -0,0 +1,133 @@
+"""
+Réplicas de lectura para los modelos de servicios.
+
+``RouterReplicas`` envía las lecturas de ServicioAgendado, HistorialServicio,
+SeguimientoServicio, FacturacionServicio y sus resúmenes a una réplica al
+azar; las escrituras y el resto de modelos van a 'default'. Las lecturas se quedan en la primaria:
+
+- dentro de una transacción abierta en 'default' (p. ej. la comprobación de
+  capacidad de ``agenda.agendar`` debe ver lo último escrito)
+- durante una petición POST/PUT/PATCH/DELETE
+- durante ``REPLICA_FIJACION_SEGUNDOS`` después de una escritura del mismo
+  cliente, para que vea lo que acaba de crear aunque la réplica vaya atrasada.
+  La fijación viaja en una cookie y no en la sesión para no escribirla en
+  django_session en cada petición.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+MODELOS_REPLICADOS = frozenset({
+    'servicios.servicioagendado',
+    'servicios.historialservicio',
+    'servicios.seguimientoservicio',
+    'servicios.facturacionservicio',
+    'servicios.resumenfacturacion',
+    'servicios.recaudomensual',
+})
+
+METODOS_ESCRITURA = frozenset({'POST', 'PUT', 'PATCH', 'DELETE'})
+
+COOKIE_FIJACION = 'bd_primaria'
+
+FIJACION_SEGUNDOS_DEFECTO = 10
+
+_primaria_fijada = ContextVar('primaria_fijada', default=False)
+
+
+def alias_replicas():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+def primaria_fijada():
+    return _primaria_fijada.get()
+
+
+@contextmanager
+def usar_primaria():
+    """Lee de la primaria dentro del bloque"""
+    token = _primaria_fijada.set(True)
+    try:
+        yield
+    finally:
+        _primaria_fijada.reset(token)
+
+
+class RouterReplicas:
+    def __init__(self, replicas=None):
+        self.replicas = list(replicas) if replicas is not None else alias_replicas()
+
+    def db_for_read(self, model, **hints):
+        if not self.replicas or model._meta.label_lower not in MODELOS_REPLICADOS:
+            return None
+        # Los objetos relacionados se leen de donde vino la instancia
+        instancia = hints.get('instance')
+        if instancia is not None and instancia._state.db:
+            return instancia._state.db
+        if _primaria_fijada.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(self.replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Todas las bases contienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas se copian desde la primaria fuera de Django
+        return db == DEFAULT_DB_ALIAS
+
+
+class FijacionPrimariaMiddleware:
+    """
+    Fija las lecturas a la primaria en las peticiones de escritura y durante
+    unos segundos después de ellas (read-your-writes)
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not alias_replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.segundos = getattr(settings, 'REPLICA_FIJACION_SEGUNDOS', FIJACION_SEGUNDOS_DEFECTO)
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def _fijar(self, request):
+        return request.method in METODOS_ESCRITURA or COOKIE_FIJACION in request.COOKIES
+
+    def _marcar(self, request, response):
+        if request.method in METODOS_ESCRITURA and response.status_code < 400:
+            response.set_cookie(
+                COOKIE_FIJACION, '1', max_age=self.segundos, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        if not self._fijar(request):
+            return self.get_response(request)
+
+        with usar_primaria():
+            response = self.get_response(request)
+        return self._marcar(request, response)
+
+    async def __acall__(self, request):
+        if not self._fijar(request):
+            return await self.get_response(request)
+
+        # La ContextVar viaja a los hilos de sync_to_async de esta petición
+        with usar_primaria():
+            response = await self.get_response(request)
+        return self._marcar(request, response)
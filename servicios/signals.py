@@ -0,0 +1,173 @@
+"""
+Señales de la app servicios
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import eventos, facturacion, geocodificacion
+from .models import Cuadrilla, FacturacionServicio, ServicioAgendado, SeguimientoServicio
+from .pubsub import canal_usuario, obtener_backend
+
+# Campos de SeguimientoServicio que se publican como deltas
+CAMPOS_SEGUIMIENTO = (
+    'equipo_asignado', 'progreso_porcentaje', 'tareas_completadas',
+    'ubicacion_actual', 'tiempo_estimado_finalizacion',
+)
+
+
+def _valores_seguimiento(instance):
+    return {campo: getattr(instance, campo) for campo in CAMPOS_SEGUIMIENTO}
+
+
+def _serializar_valor(valor):
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    if isinstance(valor, list):
+        return list(valor)
+    return valor
+
+
+@receiver(post_init, sender=SeguimientoServicio)
+def guardar_valores_originales_seguimiento(sender, instance, **kwargs):
+    instance._valores_originales = _valores_seguimiento(instance)
+
+
+@receiver(post_save, sender=SeguimientoServicio)
+def publicar_delta_seguimiento(sender, instance, created, **kwargs):
+    """
+    Publica solo los campos que cambiaron al confirmarse la transacción
+    """
+    actuales = _valores_seguimiento(instance)
+    originales = {} if created else getattr(instance, '_valores_originales', {})
+    cambios = {
+        campo: _serializar_valor(valor)
+        for campo, valor in actuales.items()
+        if campo not in originales or originales[campo] != valor
+    }
+    instance._valores_originales = actuales
+    if not cambios:
+        return
+
+    servicio_id = instance.servicio_id
+    if cambios.get('ubicacion_actual'):
+        _actualizar_posicion_cuadrilla(servicio_id, instance.ubicacion_actual)
+
+    def publicar():
+        usuario_id = ServicioAgendado.objects.filter(pk=servicio_id).values_list('usuario_id', flat=True).first()
+        if usuario_id is None:
+            return
+        obtener_backend().publicar(canal_usuario(usuario_id), {
+            'tipo': 'seguimiento',
+            'servicio_id': servicio_id,
+            'cambios': cambios,
+        })
+
+    transaction.on_commit(publicar)
+
+
+def _actualizar_posicion_cuadrilla(servicio_id, ubicacion_actual):
+    """La ubicación reportada en el seguimiento es la posición de la cuadrilla asignada"""
+    cuadrilla_id = ServicioAgendado.objects.filter(pk=servicio_id).values_list('cuadrilla_id', flat=True).first()
+    if cuadrilla_id is None:
+        return
+    posicion = Cuadrilla()
+    if geocodificacion.ubicar(posicion, ubicacion_actual) is None:
+        return
+    Cuadrilla.objects.filter(pk=cuadrilla_id).update(
+        latitud=posicion.latitud, longitud=posicion.longitud, geohash=posicion.geohash,
+        ubicacion_actualizada=timezone.now(),
+    )
+
+
+@receiver(post_init, sender=ServicioAgendado)
+def guardar_direccion_original(sender, instance, **kwargs):
+    # Sin tocar el atributo si viene diferido (only/defer): evita una consulta por fila
+    instance._direccion_original = instance.__dict__.get('direccion_servicio')
+
+
+@receiver(pre_save, sender=ServicioAgendado)
+def geocodificar_servicio(sender, instance, update_fields=None, raw=False, **kwargs):
+    """
+    Ubica el servicio cuando es nuevo, cambió su dirección o aún no tiene
+    coordenadas. Con update_fields solo si incluye direccion_servicio.
+    """
+    if raw or (update_fields is not None and 'direccion_servicio' not in update_fields):
+        return
+    direccion = instance.direccion_servicio
+    if direccion == instance._direccion_original and instance.geohash:
+        return
+    geocodificacion.ubicar(instance, direccion)
+    instance._direccion_original = direccion
+    # update_fields no se puede ampliar desde aquí: las coordenadas van aparte
+    instance._ubicacion_pendiente = update_fields is not None
+
+
+@receiver(post_save, sender=ServicioAgendado)
+def guardar_ubicacion_pendiente(sender, instance, **kwargs):
+    if getattr(instance, '_ubicacion_pendiente', False):
+        instance._ubicacion_pendiente = False
+        ServicioAgendado.objects.filter(pk=instance.pk).update(
+            latitud=instance.latitud, longitud=instance.longitud, geohash=instance.geohash,
+        )
+
+
+def _conciliar_usuario_del_servicio(servicio_id):
+    usuario_id = ServicioAgendado.objects.filter(pk=servicio_id).values_list('usuario_id', flat=True).first()
+    if usuario_id is not None:
+        facturacion.conciliar([usuario_id])
+
+
+@receiver(post_init, sender=FacturacionServicio)
+def guardar_valores_originales_factura(sender, instance, **kwargs):
+    instance._valores_facturacion = facturacion.valores_factura(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=FacturacionServicio)
+def actualizar_resumen_factura(sender, instance, created, **kwargs):
+    """
+    Traslada el aporte de la factura a los resúmenes (FacturacionServicio.save
+    abre la transacción, así que factura y resúmenes se confirman juntos)
+    """
+    anteriores = None if created else instance._valores_facturacion
+    actuales = facturacion.valores_factura(instance)
+    if not created and anteriores is None:
+        # Factura cargada con campos diferidos: no se conoce su aporte anterior
+        _conciliar_usuario_del_servicio(instance.servicio_id)
+    elif anteriores != actuales:
+        facturacion.aplicar_cambio(anteriores, actuales)
+    instance._valores_facturacion = actuales
+
+
+@receiver(post_delete, sender=FacturacionServicio)
+def descontar_resumen_factura(sender, instance, **kwargs):
+    if instance._valores_facturacion is None:
+        _conciliar_usuario_del_servicio(instance.servicio_id)
+        return
+    facturacion.aplicar_cambio(instance._valores_facturacion, None)
+
+
+def guardar_instantanea_eventos(sender, instance, **kwargs):
+    instance._instantanea_eventos = eventos.instantanea(instance) if instance.pk else None
+
+
+def registrar_guardado(sender, instance, created, raw=False, **kwargs):
+    """Evento con los campos que cambiaron, en la transacción del save()"""
+    if raw:
+        return
+    actuales = eventos.instantanea(instance)
+    cambios = eventos.delta(None if created else instance._instantanea_eventos, actuales)
+    instance._instantanea_eventos = actuales
+    if created or cambios:
+        eventos.registrar([eventos.evento_de(instance, 'creado' if created else 'actualizado', cambios)])
+
+
+def registrar_borrado(sender, instance, **kwargs):
+    eventos.registrar([eventos.evento_de(instance, 'eliminado')])
+
+
+for _modelo in eventos.ENTIDADES:
+    post_init.connect(guardar_instantanea_eventos, sender=_modelo)
+    post_save.connect(registrar_guardado, sender=_modelo)
+    post_delete.connect(registrar_borrado, sender=_modelo)
@@ -0,0 +1,144 @@
+"""
+Endpoint ASGI de Server-Sent Events con el seguimiento de los servicios del usuario.
+
+Se monta directamente en ``alamosjclean.asgi`` para no ocupar un hilo del pool
+de Django por cada conexión abierta: cada cliente mantiene una sola conexión
+por la que solo viajan los cambios.
+"""
+import asyncio
+from http.cookies import SimpleCookie
+from importlib import import_module
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+
+from alamosjclean.serializacion import dumps
+
+from .models import SeguimientoServicio
+from .pubsub import canal_usuario, obtener_backend
+
+RUTA_SEGUIMIENTO = '/api/servicios/seguimiento/stream/'
+
+# Intervalo de los comentarios keep-alive para que proxies no cierren la conexión
+INTERVALO_KEEPALIVE = 15
+
+
+class _SolicitudSesion:
+    """Objeto mínimo con la sesión que necesita get_user()"""
+
+    def __init__(self, session):
+        self.session = session
+
+
+def _cookies(scope):
+    cookie = SimpleCookie()
+    for nombre, valor in scope.get('headers', []):
+        if nombre == b'cookie':
+            cookie.load(valor.decode('latin-1'))
+    return {clave: morsel.value for clave, morsel in cookie.items()}
+
+
+def _usuario_desde_cookie(session_key):
+    engine = import_module(settings.SESSION_ENGINE)
+    usuario = get_user(_SolicitudSesion(engine.SessionStore(session_key)))
+    return usuario if usuario.is_authenticated else None
+
+
+def _estado_inicial(usuario_id, servicio_id=None):
+    """Estado actual de los seguimientos activos, enviado al conectar"""
+    seguimientos = SeguimientoServicio.objects.filter(
+        servicio__usuario_id=usuario_id,
+        servicio__estado__in=['confirmado', 'en_proceso'],
+    )
+    if servicio_id is not None:
+        seguimientos = seguimientos.filter(servicio_id=servicio_id)
+    return list(seguimientos.values(
+        'servicio_id', 'equipo_asignado', 'progreso_porcentaje', 'tareas_completadas',
+        'ubicacion_actual', 'tiempo_estimado_finalizacion',
+    ))
+
+
+def _evento(nombre, datos, evento_id=None):
+    lineas = []
+    if evento_id is not None:
+        lineas.append(f'id: {evento_id}')
+    lineas.append(f'event: {nombre}')
+    lineas.append('data: ' + dumps(datos).decode())
+    return ('\n'.join(lineas) + '\n\n').encode()
+
+
+async def _responder_json(send, status, datos):
+    cuerpo = dumps(datos)
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(cuerpo)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': cuerpo})
+
+
+async def aplicacion_seguimiento(scope, receive, send):
+    """
+    Aplicación ASGI del stream de seguimiento. Parámetro opcional: servicio_id.
+    """
+    session_key = _cookies(scope).get(settings.SESSION_COOKIE_NAME)
+    usuario = await sync_to_async(_usuario_desde_cookie)(session_key) if session_key else None
+    if usuario is None:
+        await _responder_json(send, 401, {'success': False, 'message': 'Usuario no autenticado'})
+        return
+
+    parametros = parse_qs(scope.get('query_string', b'').decode())
+    servicio_id = None
+    if parametros.get('servicio_id'):
+        try:
+            servicio_id = int(parametros['servicio_id'][0])
+        except ValueError:
+            await _responder_json(send, 400, {'success': False, 'message': 'servicio_id inválido'})
+            return
+
+    # Suscribirse antes de leer el estado inicial para no perder cambios intermedios
+    suscripcion = await obtener_backend().suscribir(canal_usuario(usuario.pk))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        inicial = await sync_to_async(_estado_inicial)(usuario.pk, servicio_id)
+        await send({'type': 'http.response.body', 'body': _evento('inicial', inicial), 'more_body': True})
+
+        secuencia = 0
+        desconexion = asyncio.ensure_future(receive())
+        while True:
+            mensaje = asyncio.ensure_future(suscripcion.recibir())
+            listos, _ = await asyncio.wait(
+                {mensaje, desconexion}, timeout=INTERVALO_KEEPALIVE, return_when=asyncio.FIRST_COMPLETED
+            )
+            if desconexion in listos:
+                if desconexion.result()['type'] == 'http.disconnect':
+                    mensaje.cancel()
+                    break
+                # Mensaje http.request (cuerpo vacío del GET): seguir escuchando
+                desconexion = asyncio.ensure_future(receive())
+                if mensaje not in listos:
+                    mensaje.cancel()
+                    continue
+            if mensaje in listos:
+                datos = mensaje.result()
+                if servicio_id is not None and datos.get('servicio_id') != servicio_id:
+                    continue
+                secuencia += 1
+                cuerpo = _evento(datos.get('tipo', 'mensaje'), datos, secuencia)
+            else:
+                mensaje.cancel()
+                cuerpo = b': keep-alive\n\n'
+            await send({'type': 'http.response.body', 'body': cuerpo, 'more_body': True})
+        desconexion.cancel()
+    finally:
+        suscripcion.cerrar()
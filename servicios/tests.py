@@ -1,3 +1,1326 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import random
+import zipfile
+from unittest import mock, skipIf
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.core import mail
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from alamosjclean import bd, serializacion
+from alamosjclean.paginacion import PaginadorEstimado
+from alamosjclean.serializacion import Serializador
+from .agenda import IndiceIntervalos
+from . import busqueda, despacho, emision, estados, eventos, exportacion, facturacion, geo, notificaciones, views
+from .geocodificacion import ProveedorLocal
+from .models import (
+    Cuadrilla, EventoServicio, FacturacionServicio, NotificacionPendiente, RecaudoMensual, ResumenFacturacion,
+    SecuenciaFacturacion, ServicioAgendado, SeguimientoServicio, TurnoCuadrilla,
+)
+from .pubsub import canal_usuario, obtener_backend
+from .routers import COOKIE_FIJACION, FijacionPrimariaMiddleware, RouterReplicas, primaria_fijada, usar_primaria
+from .sse import RUTA_SEGUIMIENTO, aplicacion_seguimiento
 
-# Create your tests here.
+Usuario = get_user_model()
+
+
+class MisServiciosTests(TestCase):
+    """
+    Pruebas del listado paginado de servicios del usuario
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(username='cliente', password='clave-segura-123')
+        otro = Usuario.objects.create_user(username='otro', password='clave-segura-123')
+        ahora = timezone.now()
+        for i in range(7):
+            ServicioAgendado.objects.create(
+                usuario=cls.usuario,
+                tipo_servicio='empresarial' if i % 2 else 'residencial',
+                descripcion=f'Servicio {i}',
+                direccion_servicio=f'Calle {i}',
+                fecha_servicio=ahora + timedelta(days=i),
+                estado='cancelado' if i == 3 else 'pendiente',
+            )
+        ServicioAgendado.objects.create(
+            usuario=otro, tipo_servicio='residencial', descripcion='Ajeno',
+            direccion_servicio='Otra', fecha_servicio=ahora,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def test_listado_completo_sin_paginar(self):
+        respuesta = self.client.get('/api/servicios/mis-servicios/')
+        datos = respuesta.json()
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(datos['total'], 7)
+        self.assertNotIn('siguiente_cursor', datos)
+        self.assertEqual(datos['servicios'][0]['descripcion'], 'Servicio 6')
+
+    def test_paginacion_por_cursor_recorre_todo_sin_repetir(self):
+        vistos = []
+        cursor = None
+        while True:
+            params = {'limite': 3}
+            if cursor:
+                params['cursor'] = cursor
+            datos = self.client.get('/api/servicios/mis-servicios/', params).json()
+            vistos.extend(s['id'] for s in datos['servicios'])
+            cursor = datos['siguiente_cursor']
+            if not cursor:
+                break
+        esperado = list(
+            ServicioAgendado.objects.filter(usuario=self.usuario)
+            .order_by('-fecha_creacion', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(vistos, esperado)
+
+    def test_filtros_estado_y_tipo(self):
+        datos = self.client.get('/api/servicios/mis-servicios/', {'estado': 'cancelado'}).json()
+        self.assertEqual(datos['total'], 1)
+        self.assertEqual(datos['servicios'][0]['estado'], 'Cancelado')
+        datos = self.client.get('/api/servicios/mis-servicios/', {'tipo_servicio': 'empresarial'}).json()
+        self.assertEqual(datos['total'], 3)
+
+    def test_parametros_invalidos(self):
+        for params in ({'cursor': 'no-es-un-cursor'}, {'limite': '0'}, {'estado': 'x'}, {'desde': 'ayer'}):
+            respuesta = self.client.get('/api/servicios/mis-servicios/', params)
+            self.assertEqual(respuesta.status_code, 400, params)
+
+    def test_get_condicional_responde_304_hasta_que_cambia_un_servicio(self):
+        respuesta = self.client.get('/api/servicios/mis-servicios/')
+        etag = respuesta['ETag']
+        self.assertIn('no-cache', respuesta['Cache-Control'])
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get('/api/servicios/mis-servicios/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        # Solo la consulta agregada toca la tabla de servicios
+        sql_servicios = [q['sql'] for q in consultas.captured_queries if 'servicios_agendados' in q['sql']]
+        self.assertEqual(len(sql_servicios), 1)
+        self.assertIn('MAX(', sql_servicios[0])
+
+        servicio = ServicioAgendado.objects.filter(usuario=self.usuario).first()
+        servicio.estado = 'confirmado'
+        servicio.save()
+        respuesta = self.client.get('/api/servicios/mis-servicios/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_etag_distinto_por_filtro(self):
+        etag = self.client.get('/api/servicios/mis-servicios/')['ETag']
+        otro = self.client.get('/api/servicios/mis-servicios/', {'estado': 'cancelado'})['ETag']
+        self.assertNotEqual(etag, otro)
+
+
+class SeguimientoStreamTests(TestCase):
+    """
+    Pruebas del stream SSE de seguimiento
+    """
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='cliente', password='clave-segura-123')
+        self.servicio = ServicioAgendado.objects.create(
+            usuario=self.usuario, tipo_servicio='residencial', descripcion='Casa',
+            direccion_servicio='Calle 1', fecha_servicio=timezone.now(), estado='en_proceso',
+        )
+        self.seguimiento = SeguimientoServicio.objects.create(servicio=self.servicio, equipo_asignado='Equipo A')
+        self.client.force_login(self.usuario)
+
+    def _scope(self, cookie=True):
+        headers = []
+        if cookie:
+            session_cookie = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+            headers.append((b'cookie', f'{settings.SESSION_COOKIE_NAME}={session_cookie}'.encode()))
+        return {'type': 'http', 'path': RUTA_SEGUIMIENTO, 'query_string': b'', 'headers': headers}
+
+    def _actualizar_progreso(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            seguimiento = SeguimientoServicio.objects.get(pk=self.seguimiento.pk)
+            seguimiento.progreso_porcentaje = 40
+            seguimiento.save()
+
+    async def test_rechaza_sin_sesion(self):
+        comunicador = ApplicationCommunicator(aplicacion_seguimiento, self._scope(cookie=False))
+        await comunicador.send_input({'type': 'http.request', 'body': b''})
+        inicio = await comunicador.receive_output(timeout=5)
+        self.assertEqual(inicio['status'], 401)
+
+    async def test_envia_estado_inicial_y_solo_los_cambios(self):
+        comunicador = ApplicationCommunicator(aplicacion_seguimiento, self._scope())
+        await comunicador.send_input({'type': 'http.request', 'body': b''})
+        inicio = await comunicador.receive_output(timeout=5)
+        self.assertEqual(inicio['status'], 200)
+        inicial = await comunicador.receive_output(timeout=5)
+        self.assertIn(b'event: inicial', inicial['body'])
+        self.assertIn(b'Equipo A', inicial['body'])
+
+        await sync_to_async(self._actualizar_progreso)()
+        delta = await comunicador.receive_output(timeout=5)
+        self.assertIn(b'event: seguimiento', delta['body'])
+        datos = json.loads(delta['body'].decode().split('data: ', 1)[1])
+        self.assertEqual(datos['cambios'], {'progreso_porcentaje': 40})
+
+        await comunicador.send_input({'type': 'http.disconnect'})
+        await comunicador.wait(timeout=5)
+        self.assertEqual(obtener_backend().cantidad_suscriptores(canal_usuario(self.usuario.pk)), 0)
+
+
+class AgendaTests(TestCase):
+    """
+    Pruebas de la agenda de cuadrillas
+    """
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='cliente', password='clave-segura-123')
+        self.client.force_login(self.usuario)
+        hoy = timezone.localdate()
+        # Próximo lunes (al menos una semana después para que ningún horario esté en el pasado)
+        self.lunes = hoy + timedelta(days=7 - hoy.weekday() + 7)
+        cuadrilla = Cuadrilla.objects.create(nombre='Norte', tipos_servicio=['residencial'])
+        TurnoCuadrilla.objects.create(cuadrilla=cuadrilla, dia_semana=0, hora_inicio=time(8), hora_fin=time(17))
+
+    def _agendar(self, hora, tipo='residencial'):
+        return self.client.post('/api/servicios/agendar/', {
+            'tipo_servicio': tipo, 'descripcion': 'Limpieza', 'direccion_servicio': 'Calle 1',
+            'fecha_servicio': f'{self.lunes.isoformat()}T{hora}',
+        }, content_type='application/json')
+
+    def test_indice_intervalos(self):
+        indice = IndiceIntervalos([(10, 20), (30, 40)])
+        self.assertTrue(indice.esta_libre(20, 30))
+        self.assertFalse(indice.esta_libre(15, 25))
+        self.assertFalse(indice.esta_libre(0, 100))
+        indice.agregar(20, 30)
+        self.assertFalse(indice.esta_libre(25, 26))
+        self.assertEqual(len(indice), 3)
+
+    def test_indice_intervalos_coincide_con_busqueda_lineal(self):
+        azar = random.Random(7)
+        indice, intervalos = IndiceIntervalos(), []
+        for _ in range(300):
+            inicio = azar.randrange(1000)
+            fin = inicio + azar.randrange(1, 50)
+            libre = all(b <= inicio or a >= fin for a, b in intervalos)
+            self.assertEqual(indice.esta_libre(inicio, fin), libre)
+            if azar.random() < 0.5:
+                indice.agregar(inicio, fin)
+                intervalos.append((inicio, fin))
+        self.assertEqual(len(indice), len(intervalos))
+
+    def test_rechaza_sobrecupo_y_asigna_cuadrilla(self):
+        respuesta = self._agendar('08:00:00')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['servicio']['cuadrilla'], 'Norte')
+        self.assertEqual(self._agendar('09:00:00').status_code, 409)
+        self.assertEqual(self._agendar('11:00:00').status_code, 200)
+        # Fuera de turno
+        self.assertEqual(self._agendar('16:00:00').status_code, 409)
+
+    def test_servicio_cancelado_libera_la_franja(self):
+        self._agendar('08:00:00')
+        ServicioAgendado.objects.update(estado='cancelado')
+        self.assertEqual(self._agendar('08:00:00').status_code, 200)
+
+    def test_tipo_sin_cuadrillas_se_agenda_sin_asignar(self):
+        respuesta = self._agendar('08:00:00', tipo='postobra')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIsNone(respuesta.json()['servicio']['cuadrilla'])
+
+    def test_disponibilidad_de_la_semana(self):
+        self._agendar('11:00:00')
+        datos = self.client.get('/api/servicios/disponibilidad/', {
+            'tipo_servicio': 'residencial', 'desde': self.lunes.isoformat(),
+        }).json()
+        self.assertEqual(datos['duracion_minutos'], 180)
+        horas = [timezone.localtime(datetime.fromisoformat(h['inicio'])).strftime('%H:%M') for h in datos['horarios']]
+        # 08:00-14:00 cada 30 min, menos los que solapan 11:00-14:00
+        self.assertEqual(horas, ['08:00', '14:00'])
+
+    def test_disponibilidad_parametros_invalidos(self):
+        respuesta = self.client.get('/api/servicios/disponibilidad/', {'tipo_servicio': 'x'})
+        self.assertEqual(respuesta.status_code, 400)
+        respuesta = self.client.get('/api/servicios/disponibilidad/', {'tipo_servicio': 'residencial', 'dias': 90})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class AgendarLoteTests(TestCase):
+    """
+    Pruebas del agendamiento en lote
+    """
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='empresa', password='clave-segura-123')
+        self.client.force_login(self.usuario)
+        hoy = timezone.localdate()
+        self.lunes = hoy + timedelta(days=7 - hoy.weekday())
+
+    def _lote(self, servicios, **extra):
+        return self.client.post(
+            '/api/servicios/agendar-lote/', {'servicios': servicios, **extra}, content_type='application/json'
+        )
+
+    def _servicio(self, hora='08:00:00', **extra):
+        return {
+            'tipo_servicio': 'empresarial', 'descripcion': 'Oficina', 'direccion_servicio': 'Sede',
+            'fecha_servicio': f'{self.lunes.isoformat()}T{hora}', **extra,
+        }
+
+    def test_recurrencia_semanal_en_una_transaccion(self):
+        with CaptureQueriesContext(connection) as consultas:
+            datos = self._lote([
+                self._servicio(recurrencia={'frecuencia': 'semanal', 'repeticiones': 26}),
+                self._servicio(hora='14:00:00', recurrencia={'frecuencia': 'mensual', 'repeticiones': 6}),
+            ]).json()
+        self.assertEqual(datos['creados'], 32)
+        self.assertTrue(datos['success'])
+        self.assertEqual(ServicioAgendado.objects.filter(usuario=self.usuario).count(), 32)
+        inserts = [q for q in consultas.captured_queries if q['sql'].startswith('INSERT INTO "servicios_agendados"')]
+        self.assertEqual(len(inserts), 1)
+
+    def test_resultados_por_elemento_y_capacidad(self):
+        cuadrilla = Cuadrilla.objects.create(nombre='Sur', tipos_servicio=['empresarial'])
+        TurnoCuadrilla.objects.create(cuadrilla=cuadrilla, dia_semana=0, hora_inicio=time(8), hora_fin=time(18))
+        datos = self._lote([self._servicio(), self._servicio(), {'tipo_servicio': 'x'}]).json()
+        self.assertEqual(datos['creados'], 1)
+        self.assertEqual([r['success'] for r in datos['resultados']], [True, False, False])
+        self.assertEqual(datos['resultados'][0]['cuadrilla'], 'Sur')
+        self.assertIn('disponibles', datos['resultados'][1]['message'])
+
+    def test_lote_atomico_no_crea_nada_si_algo_falla(self):
+        datos = self._lote([self._servicio(), {'tipo_servicio': 'x'}], atomico=True).json()
+        self.assertEqual(datos['creados'], 0)
+        self.assertFalse(ServicioAgendado.objects.exists())
+
+    def test_recurrencia_sin_fechas_es_invalida(self):
+        anterior = (self.lunes - timedelta(days=1)).isoformat()
+        datos = self._lote([self._servicio(recurrencia={'frecuencia': 'semanal', 'hasta': anterior})]).json()
+        self.assertEqual(datos['resultados'], [
+            {'indice': 0, 'success': False, 'message': 'La recurrencia no produce fechas'},
+        ])
+
+    def test_mil_servicios_en_consultas_acotadas(self):
+        cuadrilla = Cuadrilla.objects.create(nombre='Sur', tipos_servicio=['empresarial'])
+        TurnoCuadrilla.objects.bulk_create([
+            TurnoCuadrilla(cuadrilla=cuadrilla, dia_semana=dia, hora_inicio=time(0), hora_fin=time(23, 59))
+            for dia in range(7)
+        ])
+        servicios = [
+            self._servicio(hora=hora, recurrencia={'frecuencia': 'diaria', 'repeticiones': 250})
+            for hora in ('00:00:00', '06:00:00', '12:00:00', '18:00:00')
+        ]
+        with CaptureQueriesContext(connection) as consultas:
+            datos = self._lote(servicios).json()
+
+        self.assertEqual(datos['creados'], 1000)
+        self.assertEqual(ServicioAgendado.objects.filter(cuadrilla=cuadrilla).count(), 1000)
+        # Una lectura de ocupación y INSERT por tandas: nada por servicio
+        # (la duración se mide en benchmarks/bench_lote.py)
+        self.assertLess(len(consultas), 50)
+        lecturas = [c['sql'] for c in consultas if c['sql'].startswith('SELECT') and '"servicios_agendados"' in c['sql']]
+        self.assertEqual(len(lecturas), 1)
+
+    def test_rechaza_lotes_demasiado_grandes(self):
+        respuesta = self._lote([self._servicio(recurrencia={'frecuencia': 'diaria', 'repeticiones': 5000})])
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_lote_grande_se_rechaza_sin_expandirlo_entero(self):
+        recurrente = self._servicio(recurrencia={'frecuencia': 'diaria', 'repeticiones': 1500})
+        with mock.patch('servicios.views._expandir_recurrencia', wraps=views._expandir_recurrencia) as expandir:
+            self.assertEqual(self._lote([self._servicio()] * (views.MAXIMO_LOTE + 1)).status_code, 400)
+            self.assertEqual(expandir.call_count, 0)
+
+            self.assertEqual(self._lote([recurrente] * 1000).status_code, 400)
+        # La segunda recurrencia ya supera el máximo y solo recibe el cupo restante
+        self.assertEqual(expandir.call_count, 2)
+        self.assertEqual(expandir.call_args.args[2], views.MAXIMO_LOTE - 1500)
+        self.assertFalse(ServicioAgendado.objects.exists())
+
+
+class PerfilBaseDatosTests(TransactionTestCase):
+    """
+    El perfil sqlite aplica los PRAGMAs y empieza las transacciones con BEGIN IMMEDIATE
+    """
+
+    def test_pragmas_de_conexion(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.DATABASES['default']['OPTIONS']['pragmas']['busy_timeout'])
+
+    def test_atomic_toma_el_bloqueo_de_escritura_al_empezar(self):
+        with CaptureQueriesContext(connection) as consultas:
+            with transaction.atomic():
+                Cuadrilla.objects.count()
+        self.assertEqual(consultas.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+    def test_tamano_pool_por_worker(self):
+        self.assertEqual(bd.tamano_pool(workers=4, hilos=8, conexiones_maximas=0), 8)
+        # 4 workers comparten 20 conexiones del servidor
+        self.assertEqual(bd.tamano_pool(workers=4, hilos=8, conexiones_maximas=20), 5)
+        self.assertEqual(bd.tamano_pool(workers=40, hilos=8, conexiones_maximas=20), 1)
+
+    def test_retraso_de_eventos_por_perfil(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(bd.retraso_lectura_eventos('sqlite'), 0)
+            self.assertEqual(bd.retraso_lectura_eventos('postgresql'), bd.RETRASO_EVENTOS_POSTGRESQL)
+            self.assertGreater(bd.RETRASO_EVENTOS_POSTGRESQL, 0)
+        with mock.patch.dict(os.environ, {'ALAMOS_EVENTOS_RETRASO_LECTURA': '10'}):
+            self.assertEqual(bd.retraso_lectura_eventos('postgresql'), 10)
+
+
+class RouterReplicasTests(SimpleTestCase):
+    def setUp(self):
+        self.router = RouterReplicas(replicas=['replica1'])
+
+    def test_lecturas_de_servicios_van_a_la_replica(self):
+        self.assertEqual(self.router.db_for_read(ServicioAgendado), 'replica1')
+        self.assertIsNone(self.router.db_for_read(get_user_model()))
+        self.assertEqual(self.router.db_for_write(ServicioAgendado), 'default')
+
+    def test_primaria_fijada_o_en_transaccion(self):
+        with usar_primaria():
+            self.assertEqual(self.router.db_for_read(ServicioAgendado), 'default')
+        connection.in_atomic_block = True
+        self.addCleanup(setattr, connection, 'in_atomic_block', False)
+        self.assertEqual(self.router.db_for_read(ServicioAgendado), 'default')
+
+    def test_sin_replicas_no_enruta(self):
+        self.assertIsNone(RouterReplicas(replicas=[]).db_for_read(ServicioAgendado))
+
+
+class FijacionPrimariaTests(SimpleTestCase):
+    def setUp(self):
+        self.vistas = []
+
+        def vista(request):
+            self.vistas.append(primaria_fijada())
+            return HttpResponse('ok')
+
+        with mock.patch('servicios.routers.alias_replicas', return_value=['replica1']):
+            self.middleware = FijacionPrimariaMiddleware(vista)
+
+    def test_escritura_fija_la_primaria_para_las_lecturas_siguientes(self):
+        respuesta = self.middleware(RequestFactory().post('/api/servicios/agendar/'))
+        self.assertEqual(respuesta.cookies[COOKIE_FIJACION]['max-age'], 10)
+
+        peticion = RequestFactory().get('/api/servicios/mis-servicios/')
+        self.middleware(peticion)
+        peticion.COOKIES[COOKIE_FIJACION] = '1'
+        self.middleware(peticion)
+
+        self.assertEqual(self.vistas, [True, False, True])
+        self.assertFalse(primaria_fijada())
+
+
+class ResumenFacturacionTests(TestCase):
+    """
+    Resúmenes incrementales de facturación y endpoints de cartera
+    """
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='cliente', password='clave-segura-123')
+        self.servicio = ServicioAgendado.objects.create(
+            usuario=self.usuario, tipo_servicio='residencial', descripcion='Casa',
+            direccion_servicio='Calle 1', fecha_servicio=timezone.now(),
+        )
+        self.marzo = date(2030, 3, 1)
+
+    def _factura(self, servicio=None, **extra):
+        campos = {
+            'servicio': servicio or self.servicio, 'monto_total': Decimal('300000.00'),
+            'fecha_vencimiento': date(2030, 3, 15), 'numero_factura': f'F{ServicioAgendado.objects.count()}',
+        }
+        return FacturacionServicio.objects.create(**{**campos, **extra})
+
+    def _resumen(self, estado_pago):
+        return ResumenFacturacion.objects.get(usuario=self.usuario, mes=self.marzo, estado_pago=estado_pago)
+
+    def test_guardar_y_borrar_facturas_actualiza_resumenes(self):
+        factura = self._factura()
+        self.assertEqual(self._resumen('pendiente').cantidad, 1)
+        self.assertEqual(self._resumen('pendiente').monto_total, Decimal('300000.00'))
+
+        factura = FacturacionServicio.objects.get(pk=factura.pk)
+        factura.monto_pagado = Decimal('100000.00')
+        factura.estado_pago = 'parcial'
+        factura.fecha_pago = timezone.make_aware(datetime(2030, 4, 2, 10))
+        factura.save()
+        self.assertFalse(ResumenFacturacion.objects.filter(estado_pago='pendiente').exists())
+        self.assertEqual(self._resumen('parcial').monto_pendiente, Decimal('200000.00'))
+        recaudo = RecaudoMensual.objects.get(usuario=self.usuario)
+        self.assertEqual((recaudo.mes, recaudo.monto_pagado), (date(2030, 4, 1), Decimal('100000.00')))
+
+        factura.delete()
+        self.assertFalse(ResumenFacturacion.objects.exists())
+        self.assertFalse(RecaudoMensual.objects.exists())
+
+    def test_conciliar_corrige_cambios_sin_senales(self):
+        factura = self._factura()
+        FacturacionServicio.objects.filter(pk=factura.pk).update(estado_pago='vencido')
+
+        self.assertEqual(facturacion.conciliar(), {'creadas': 1, 'actualizadas': 0, 'eliminadas': 1})
+        self.assertEqual(self._resumen('vencido').cantidad, 1)
+        self.assertEqual(facturacion.conciliar(), {'creadas': 0, 'actualizadas': 0, 'eliminadas': 0})
+
+    def test_resumen_del_usuario_lee_solo_los_resumenes(self):
+        self._factura()
+        otro_servicio = ServicioAgendado.objects.create(
+            usuario=self.usuario, tipo_servicio='postobra', descripcion='Obra',
+            direccion_servicio='Calle 2', fecha_servicio=timezone.now(),
+        )
+        self._factura(otro_servicio, estado_pago='vencido', monto_pagado=Decimal('50000.00'))
+        self.client.force_login(self.usuario)
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get('/api/servicios/facturacion/resumen/', {'desde': '2030-03'})
+        self.assertEqual(respuesta.status_code, 200)
+        datos = respuesta.json()
+        self.assertEqual(datos['total_pendiente'], '550000.00')
+        self.assertEqual(datos['total_vencido'], '250000.00')
+        self.assertEqual(datos['por_mes'][0]['mes'], '2030-03')
+        self.assertFalse([c for c in consultas.captured_queries if 'facturacion_servicios' in c['sql']])
+
+    def test_cartera_solo_para_personal(self):
+        self._factura(estado_pago='vencido')
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get('/api/servicios/facturacion/cartera/').status_code, 403)
+
+        staff = Usuario.objects.create_user(username='admin', password='clave-segura-123', is_staff=True)
+        self.client.force_login(staff)
+        datos = self.client.get('/api/servicios/facturacion/cartera/').json()
+        self.assertEqual(datos['clientes_vencidos'][0]['username'], 'cliente')
+        self.assertEqual(datos['clientes_vencidos'][0]['monto_vencido'], '300000.00')
+
+
+class EmisionFacturasTests(TestCase):
+    """
+    Generación en lote de facturas y barrido de vencidas
+    """
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='cliente', password='clave-segura-123')
+        for n in range(5):
+            ServicioAgendado.objects.create(
+                usuario=self.usuario, tipo_servicio='residencial', descripcion=f'Casa {n}',
+                direccion_servicio='Calle 1', fecha_servicio=timezone.now(), estado='completado',
+                precio_estimado=Decimal('100000.00') if n else None,
+            )
+
+    def test_genera_facturas_con_numeracion_consecutiva_por_bloques(self):
+        resultado = emision.generar_facturas(lote=3)
+
+        self.assertEqual(resultado, {'creadas': 4, 'sin_precio': 1})
+        numeros = sorted(FacturacionServicio.objects.values_list('numero_factura', flat=True))
+        self.assertEqual(numeros, [f'FV{n:010d}' for n in range(1, 5)])
+        self.assertEqual(SecuenciaFacturacion.objects.get(nombre='factura').siguiente, 5)
+        # Los resúmenes quedaron al día sin pasar por save()
+        self.assertEqual(facturacion.conciliar(), {'creadas': 0, 'actualizadas': 0, 'eliminadas': 0})
+        self.assertEqual(emision.generar_facturas()['creadas'], 0)
+
+    def test_marca_vencidas_con_un_update_por_lote(self):
+        emision.generar_facturas(dias_vencimiento=10)
+        factura = FacturacionServicio.objects.first()
+        factura.estado_pago = 'pagado'
+        factura.save()
+
+        with CaptureQueriesContext(connection) as consultas:
+            vencidas = emision.marcar_vencidas(hoy=timezone.localdate() + timedelta(days=11))
+
+        self.assertEqual(vencidas, 3)
+        self.assertEqual(FacturacionServicio.objects.filter(estado_pago='vencido').count(), 3)
+        updates = [c for c in consultas.captured_queries if c['sql'].startswith('UPDATE "facturacion_servicios"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(facturacion.conciliar(), {'creadas': 0, 'actualizadas': 0, 'eliminadas': 0})
+
+
+class ExportacionTests(TestCase):
+    """
+    Exportación en streaming a CSV y XLSX
+    """
+
+    def setUp(self):
+        self.staff = Usuario.objects.create_user(username='admin', password='clave-segura-123', is_staff=True)
+        self.cliente = Usuario.objects.create_user(username='cliente', password='clave-segura-123')
+        ayer = timezone.now() - timedelta(days=1)
+        for n, fecha in enumerate([ayer, ayer - timedelta(days=30)]):
+            ServicioAgendado.objects.create(
+                usuario=self.cliente, tipo_servicio='residencial', descripcion=f'=Casa {n}',
+                direccion_servicio='Calle 1 & 2', fecha_servicio=fecha, estado='completado',
+                precio_estimado=Decimal('100000.00'),
+            )
+
+    def _descargar(self, **parametros):
+        self.client.force_login(self.staff)
+        return self.client.get('/api/servicios/exportar/servicios/', parametros)
+
+    def test_csv_en_streaming_con_filtro_de_fechas(self):
+        desde = (timezone.localdate() - timedelta(days=2)).isoformat()
+        response = self._descargar(desde=desde)
+
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        contenido = b''.join(response.streaming_content).decode('utf-8-sig')
+        filas = list(csv.reader(io.StringIO(contenido)))
+        self.assertEqual(filas[0], exportacion.EXPORTACIONES['servicios'].encabezados)
+        self.assertEqual(len(filas), 2)
+        self.assertEqual(filas[1][1], 'cliente')
+        # Un texto que empieza por '=' no se exporta como fórmula
+        self.assertEqual(filas[1][8], "'=Casa 0")
+
+    def test_xlsx_es_un_libro_valido(self):
+        response = self._descargar(formato='xlsx')
+
+        libro = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(libro.testzip())
+        hoja = libro.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertEqual(hoja.count('<row>'), 3)
+        self.assertIn('Calle 1 &amp; 2', hoja)
+        self.assertIn('<v>100000.00</v>', hoja)
+
+    def test_xlsx_entrega_varios_fragmentos(self):
+        with mock.patch.object(exportacion, 'FILAS_POR_FRAGMENTO', 1):
+            fragmentos = list(exportacion.exportar('servicios', 'xlsx'))
+        self.assertGreater(len(fragmentos), 2)
+        zipfile.ZipFile(io.BytesIO(b''.join(fragmentos))).testzip()
+
+    def test_solo_personal_y_tipos_conocidos(self):
+        self.client.force_login(self.cliente)
+        self.assertEqual(self.client.get('/api/servicios/exportar/servicios/').status_code, 403)
+        self.assertEqual(self._descargar(formato='pdf').status_code, 404)
+        self.assertEqual(self._descargar(desde='ayer').status_code, 400)
+
+
+class AdminServiciosTests(TestCase):
+    """
+    Listados del admin con número de consultas constante
+    """
+
+    def setUp(self):
+        self.admin = Usuario.objects.create_superuser(username='admin', password='clave-segura-123')
+        self.cuadrilla = Cuadrilla.objects.create(nombre='Cuadrilla A', tipos_servicio=['residencial'])
+        self.client.force_login(self.admin)
+
+    def _crear_facturados(self, cantidad, desde=0):
+        for n in range(desde, desde + cantidad):
+            usuario = Usuario.objects.create_user(username=f'cliente{n}', password='clave-segura-123')
+            servicio = ServicioAgendado.objects.create(
+                usuario=usuario, tipo_servicio='residencial', descripcion='Casa', direccion_servicio='Calle 1',
+                fecha_servicio=timezone.now(), cuadrilla=self.cuadrilla, estado='completado',
+            )
+            FacturacionServicio.objects.create(servicio=servicio, monto_total=100, numero_factura=f'F{n}')
+
+    def _consultas(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(consultas)
+
+    def test_consultas_no_crecen_con_las_filas(self):
+        urls = [
+            '/admin/servicios/servicioagendado/',
+            '/admin/servicios/servicioagendado/?estado__exact=completado',
+            '/admin/servicios/facturacionservicio/',
+            '/admin/authentication/usuario/',
+        ]
+        self._crear_facturados(2)
+        # La primera petición carga cachés (content types, permisos)
+        self._consultas(urls[0])
+        pocas = [self._consultas(url) for url in urls]
+        self._crear_facturados(20, desde=2)
+        self.assertEqual([self._consultas(url) for url in urls], pocas)
+
+    @override_settings(ADMIN_CONTEO_ESTIMADO_MINIMO=5)
+    def test_conteo_estimado_sin_filtros(self):
+        self._crear_facturados(6)
+        consulta = ServicioAgendado.objects.all()
+        # Sin estadísticas cuenta de verdad
+        self.assertEqual(PaginadorEstimado(consulta, 10).count, 6)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self._crear_facturados(1, desde=6)
+        self.assertEqual(PaginadorEstimado(consulta, 10).count, 6)
+        self.assertEqual(PaginadorEstimado(consulta.filter(estado='completado'), 10).count, 7)
+
+
+class SerializacionTests(SimpleTestCase):
+    """
+    Serializador de filas y backends de JSON
+    """
+
+    def setUp(self):
+        self.serializador = Serializador(ServicioAgendado, (
+            'id', 'tipo_servicio', 'estado', 'fecha_servicio', 'precio_estimado', ('cuadrilla', 'cuadrilla__nombre'),
+        ))
+        self.fecha = datetime.fromisoformat('2025-03-01T08:30:00+00:00')
+
+    def test_fila_e_instancia_producen_lo_mismo(self):
+        esperado = {
+            'id': 7, 'tipo_servicio': 'Servicios Residenciales', 'estado': 'Pendiente',
+            'fecha_servicio': '2025-03-01T08:30:00+00:00', 'precio_estimado': '120.50', 'cuadrilla': 'Norte',
+        }
+        fila = (7, 'residencial', 'pendiente', self.fecha, Decimal('120.50'), 'Norte')
+        self.assertEqual(self.serializador.fila(fila), esperado)
+
+        servicio = ServicioAgendado(
+            id=7, tipo_servicio='residencial', estado='pendiente', fecha_servicio=self.fecha,
+            precio_estimado=Decimal('120.50'), cuadrilla=Cuadrilla(nombre='Norte'),
+        )
+        self.assertEqual(self.serializador.instancia(servicio), esperado)
+        self.assertIsNone(self.serializador.fila((1, 'x', 'x', None, None, None))['precio_estimado'])
+
+    def _decodificar(self, backend):
+        datos = {'mensaje': 'Álamos', 'monto': Decimal('1.10'), 'fecha': self.fecha, 'dia': self.fecha.date()}
+        with override_settings(SERIALIZACION_JSON_BACKEND=backend):
+            return json.loads(serializacion.dumps(datos))
+
+    def test_backend_stdlib_compatible_con_json_response(self):
+        self.assertEqual(self._decodificar('json'), {
+            'mensaje': 'Álamos', 'monto': '1.10', 'fecha': '2025-03-01T08:30:00Z', 'dia': '2025-03-01',
+        })
+
+    @skipIf(serializacion.orjson is None, 'orjson no está instalado')
+    def test_orjson_produce_los_mismos_valores(self):
+        self.assertEqual(self._decodificar('auto'), self._decodificar('json'))
+
+
+@override_settings(ROOT_URLCONF='alamosjclean.urls_asgi')
+class VistasAsincronasTests(TestCase):
+    """
+    Vistas async del perfil ASGI (mismas rutas que las síncronas)
+    """
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='cliente', password='clave-segura-123')
+        self.async_client.force_login(self.usuario)
+        self.fecha = (timezone.now() + timedelta(days=3)).replace(microsecond=0)
+
+    def test_rutas_resuelven_a_corrutinas(self):
+        from asgiref.sync import iscoroutinefunction
+        from django.urls import resolve, reverse
+
+        for nombre in ('servicios:agendar', 'servicios:mis_servicios', 'authentication:login'):
+            self.assertTrue(iscoroutinefunction(resolve(reverse(nombre)).func), nombre)
+        self.assertFalse(iscoroutinefunction(resolve(reverse('servicios:cartera')).func))
+
+    async def test_agendar_listar_y_cancelar(self):
+        respuesta = await self.async_client.post('/api/servicios/agendar/', {
+            'tipo_servicio': 'postobra', 'descripcion': 'Obra', 'direccion_servicio': 'Calle 1',
+            'fecha_servicio': self.fecha.isoformat(),
+        }, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200)
+        servicio_id = respuesta.json()['servicio']['id']
+
+        respuesta = await self.async_client.get('/api/servicios/mis-servicios/', {'limite': 10})
+        self.assertEqual([s['id'] for s in respuesta.json()['servicios']], [servicio_id])
+        self.assertEqual(respuesta['Cache-Control'], 'private, no-cache')
+        respuesta = await self.async_client.get(
+            '/api/servicios/mis-servicios/', {'limite': 10}, headers={'If-None-Match': respuesta['ETag']},
+        )
+        self.assertEqual(respuesta.status_code, 304)
+
+        respuesta = await self.async_client.put(f'/api/servicios/cancelar/{servicio_id}/')
+        self.assertTrue(respuesta.json()['success'])
+        servicio = await ServicioAgendado.objects.aget(pk=servicio_id)
+        self.assertEqual(servicio.estado, 'cancelado')
+        respuesta = await self.async_client.put(f'/api/servicios/cancelar/{servicio_id}/')
+        self.assertEqual(respuesta.status_code, 400)
+
+        # Rechazos explicados con la lectura asíncrona: versión vieja y servicio ajeno o inexistente
+        otro = await ServicioAgendado.objects.acreate(
+            usuario_id=servicio.usuario_id, tipo_servicio='residencial', descripcion='Casa',
+            direccion_servicio='Calle 2', fecha_servicio=self.fecha,
+        )
+        await ServicioAgendado.objects.filter(pk=otro.pk).aupdate(version=3)
+        respuesta = await self.async_client.put(
+            f'/api/servicios/cancelar/{otro.pk}/', {'version': 1}, content_type='application/json',
+        )
+        self.assertEqual((respuesta.status_code, respuesta.json()['version']), (409, 3))
+        respuesta = await self.async_client.put(f'/api/servicios/cancelar/{otro.pk + 100}/')
+        self.assertEqual(respuesta.status_code, 404)
+
+    async def test_metodo_y_login_requeridos(self):
+        respuesta = await self.async_client.get('/api/servicios/agendar/')
+        self.assertEqual(respuesta.status_code, 405)
+        await sync_to_async(self.async_client.logout)()
+        respuesta = await self.async_client.put('/api/servicios/cancelar/1/')
+        self.assertEqual(respuesta.status_code, 302)
+        respuesta = await self.async_client.get('/api/servicios/mis-servicios/')
+        self.assertEqual(respuesta.status_code, 401)
+
+
+class BusquedaTests(TestCase):
+    """
+    Índice de búsqueda por descripción y dirección
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = Usuario.objects.create_user(username='despacho', password='clave-segura-123', is_staff=True)
+        cliente = Usuario.objects.create_user(username='cliente', password='clave-segura-123')
+        fecha = timezone.now() + timedelta(days=3)
+        cls.oficina, cls.muebles, cls.cocina = ServicioAgendado.objects.bulk_create([
+            ServicioAgendado(
+                usuario=cliente, tipo_servicio='empresarial', descripcion='Limpieza de oficinas',
+                direccion_servicio='Vía 40 # 12-30', fecha_servicio=fecha,
+            ),
+            ServicioAgendado(
+                usuario=cliente, tipo_servicio='residencial', descripcion='Lavado de muebles',
+                direccion_servicio='Calle 5 # 2-10', fecha_servicio=fecha,
+            ),
+            ServicioAgendado(
+                usuario=cliente, tipo_servicio='residencial', descripcion='Limpieza profunda de cocina',
+                direccion_servicio='Avenida Núñez 10', fecha_servicio=fecha, estado='confirmado',
+            ),
+        ])
+
+    def _buscar(self, **parametros):
+        self.client.force_login(self.staff)
+        return self.client.get('/api/servicios/buscar/', parametros)
+
+    def _ids(self, **parametros):
+        return [servicio['id'] for servicio in self._buscar(**parametros).json()['servicios']]
+
+    def test_busca_por_prefijo_sin_tildes(self):
+        self.assertEqual(self._ids(q='via LIMP'), [self.oficina.id])
+        self.assertEqual(self._ids(q='nuñez'), [self.cocina.id])
+        self.assertEqual(self._ids(q='Nunez'), [self.cocina.id])
+        self.assertEqual(self._ids(q='limpieza', estado='confirmado'), [self.cocina.id])
+        self.assertEqual(self._ids(q='jardín'), [])
+
+    def test_pagina_los_resultados(self):
+        primera = self._buscar(q='limpieza', por_pagina=1).json()
+        segunda = self._buscar(q='limpieza', por_pagina=1, pagina=2).json()
+
+        self.assertTrue(primera['hay_mas'])
+        self.assertFalse(segunda['hay_mas'])
+        self.assertEqual(
+            {primera['servicios'][0]['id'], segunda['servicios'][0]['id']}, {self.oficina.id, self.cocina.id}
+        )
+        self.assertEqual(primera['servicios'][0]['usuario'], 'cliente')
+
+    def test_triggers_siguen_update_y_delete(self):
+        ServicioAgendado.objects.filter(id=self.muebles.id).update(descripcion='Poda de jardín')
+        self.assertEqual(self._ids(q='jardin'), [self.muebles.id])
+        self.assertEqual(self._ids(q='muebles'), [])
+
+        self.muebles.delete()
+        self.assertEqual(self._ids(q='jardin'), [])
+
+    def test_reconstruir_por_lotes(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER servicios_busqueda_insertar')
+            cursor.execute('DELETE FROM servicios_busqueda')
+        ServicioAgendado.objects.create(
+            usuario=self.muebles.usuario, tipo_servicio='postobra', descripcion='Retiro de escombros',
+            direccion_servicio='Carrera 7', fecha_servicio=timezone.now() + timedelta(days=4),
+        )
+        self.assertEqual(self._ids(q='escombros'), [])
+
+        salida = io.StringIO()
+        call_command('reconstruir_busqueda', lote=2, stdout=salida)
+
+        self.assertIn('4 servicios', salida.getvalue())
+        self.assertEqual(len(self._ids(q='escombros')), 1)
+        self.assertEqual(len(self._ids(q='limpieza')), 2)
+
+    def test_solo_personal_y_consulta_valida(self):
+        self.client.force_login(self.muebles.usuario)
+        self.assertEqual(self.client.get('/api/servicios/buscar/', {'q': 'limpieza'}).status_code, 403)
+        self.assertEqual(self._buscar(q=' ,; ').status_code, 400)
+        self.assertEqual(self._buscar(q='limpieza', pagina='x').status_code, 400)
+        self.assertEqual(busqueda.terminos('Vía  vía, Ñandú'), ['via', 'nandu'])
+
+
+class DespachoTests(TestCase):
+    """
+    Geocodificación de servicios, cuadrillas cercanas y rutas del día
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = Usuario.objects.create_user(username='despacho', password='clave-segura-123', is_staff=True)
+        cls.cliente = Usuario.objects.create_user(username='cliente', password='clave-segura-123')
+        cls.dia = timezone.localdate() + timedelta(days=2)
+        # Chapinero, Parque de la 93 y Kennedy (sur-occidente, ~12 km de las otras)
+        cls.chapinero = Cuadrilla.objects.create(
+            nombre='Chapinero', tipos_servicio=['residencial'], latitud=4.6486, longitud=-74.0628,
+            geohash=geo.codificar(4.6486, -74.0628),
+        )
+        cls.norte = Cuadrilla.objects.create(
+            nombre='Norte', tipos_servicio=['residencial', 'empresarial'], latitud=4.6766, longitud=-74.0483,
+            geohash=geo.codificar(4.6766, -74.0483),
+        )
+        cls.kennedy = Cuadrilla.objects.create(
+            nombre='Kennedy', tipos_servicio=['empresarial'], latitud=4.6280, longitud=-74.1510,
+            geohash=geo.codificar(4.6280, -74.1510),
+        )
+
+    def _servicio(self, direccion, hora=9, **campos):
+        return ServicioAgendado.objects.create(
+            usuario=self.cliente, tipo_servicio=campos.pop('tipo_servicio', 'residencial'),
+            descripcion='Limpieza', direccion_servicio=direccion,
+            fecha_servicio=timezone.make_aware(datetime.combine(self.dia, time(hora))), **campos
+        )
+
+    def test_geohash(self):
+        self.assertEqual(geo.codificar(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        lat_min, lat_max, lon_min, lon_max = geo.caja('u4pruydqqvj')
+        self.assertTrue(lat_min <= 57.64911 <= lat_max and lon_min <= 10.40744 <= lon_max)
+        vecinas = geo.vecinas('d2g6f')
+        self.assertEqual(len(vecinas), 9)
+        self.assertEqual(vecinas[4], 'd2g6f')
+        self.assertAlmostEqual(geo.distancia_km(4.6486, -74.0628, 4.6766, -74.0483), 3.5, delta=0.1)
+
+    def test_geocodifica_nomenclatura_y_lugares(self):
+        proveedor = ProveedorLocal()
+        latitud, longitud = proveedor.geocodificar('Calle 10 # 7-20, La Candelaria')
+        self.assertLess(geo.distancia_km(latitud, longitud, 4.5981, -74.0760), 0.3)
+        sur = proveedor.geocodificar('Cll 40 Sur No. 78-10')
+        self.assertLess(sur[0], 4.5867)
+        self.assertEqual(proveedor.geocodificar('Centro Comercial Andino, local 3'), (4.6668, -74.0526))
+        self.assertEqual(proveedor.geocodificar('Finca "El Retiro", 4.75, -74.2'), (4.75, -74.2))
+        self.assertIsNone(proveedor.geocodificar('Vereda sin nombre'))
+
+    def test_servicio_se_ubica_al_crear_y_al_cambiar_direccion(self):
+        servicio = self._servicio('Carrera 11 # 93-40')
+        servicio.refresh_from_db()
+        self.assertEqual(servicio.geohash[:6], geo.codificar(4.6766, -74.0483, 6))
+
+        servicio.direccion_servicio = 'Kennedy, manzana 4'
+        servicio.save(update_fields=['direccion_servicio'])
+        servicio.refresh_from_db()
+        self.assertEqual((servicio.latitud, servicio.longitud), (4.6280, -74.1510))
+
+        servicio.direccion_servicio = 'Vereda sin nombre'
+        servicio.save()
+        self.assertEqual(ServicioAgendado.objects.get(id=servicio.id).geohash, '')
+
+    def test_cuadrillas_cercanas_por_distancia_y_tipo(self):
+        cercanas = despacho.cuadrillas_cercanas(4.6668, -74.0526, cantidad=2)
+        self.assertEqual([c['nombre'] for c in cercanas], ['Norte', 'Chapinero'])
+        self.assertLess(cercanas[0]['distancia_km'], cercanas[1]['distancia_km'])
+
+        # Kennedy queda fuera de las celdas pequeñas: la búsqueda se amplía
+        empresariales = despacho.cuadrillas_cercanas(4.6668, -74.0526, 'empresarial', cantidad=2)
+        self.assertEqual([c['nombre'] for c in empresariales], ['Norte', 'Kennedy'])
+
+        Cuadrilla.objects.filter(id=self.norte.id).update(activa=False)
+        self.assertEqual(despacho.cuadrillas_cercanas(4.6668, -74.0526, cantidad=1)[0]['nombre'], 'Chapinero')
+
+    def test_seguimiento_actualiza_posicion_de_la_cuadrilla(self):
+        servicio = self._servicio('Chapinero', cuadrilla=self.kennedy)
+        with self.captureOnCommitCallbacks(execute=True):
+            SeguimientoServicio.objects.create(
+                servicio=servicio, equipo_asignado='Kennedy', ubicacion_actual='4.6950, -74.0310',
+            )
+        self.kennedy.refresh_from_db()
+        self.assertEqual((self.kennedy.latitud, self.kennedy.longitud), (4.695, -74.031))
+        self.assertIsNotNone(self.kennedy.ubicacion_actualizada)
+
+    def test_rutas_del_dia(self):
+        primero = self._servicio('Carrera 11 # 93-40', hora=14)
+        segundo = self._servicio('Parque de la 93', hora=8)
+        lejano = self._servicio('Kennedy', tipo_servicio='empresarial')
+        self._servicio('Vereda sin nombre')
+        self._servicio('Parque de la 93', estado='cancelado')
+
+        self.client.force_login(self.staff)
+        datos = self.client.get('/api/servicios/rutas/', {'fecha': self.dia.isoformat(), 'precision': 5}).json()
+
+        self.assertEqual(datos['sin_ubicacion'], 1)
+        self.assertEqual(len(datos['rutas']), 2)
+        norte, sur = datos['rutas']
+        self.assertEqual([s['id'] for s in norte['servicios']], [segundo.id, primero.id])
+        self.assertEqual(norte['cuadrilla_sugerida']['nombre'], 'Norte')
+        self.assertEqual([s['id'] for s in sur['servicios']], [lejano.id])
+        self.assertEqual(sur['cuadrilla_sugerida']['nombre'], 'Kennedy')
+
+    def test_vistas_solo_personal(self):
+        servicio = self._servicio('Andino')
+        sin_ubicacion = self._servicio('Vereda sin nombre')
+
+        self.client.force_login(self.cliente)
+        self.assertEqual(self.client.get(f'/api/servicios/cuadrillas-cercanas/{servicio.id}/').status_code, 403)
+        self.assertEqual(self.client.get('/api/servicios/rutas/').status_code, 403)
+
+        self.client.force_login(self.staff)
+        respuesta = self.client.get(f'/api/servicios/cuadrillas-cercanas/{servicio.id}/', {'cantidad': 1})
+        self.assertEqual([c['nombre'] for c in respuesta.json()['cuadrillas']], ['Norte'])
+        self.assertEqual(
+            self.client.get(f'/api/servicios/cuadrillas-cercanas/{sin_ubicacion.id}/').status_code, 400
+        )
+        faltante = self.client.get('/api/servicios/cuadrillas-cercanas/999999/')
+        self.assertEqual(faltante.status_code, 404)
+        self.assertEqual(faltante.json()['message'], 'Servicio no encontrado')
+        self.assertEqual(self.client.get('/api/servicios/rutas/', {'precision': 9}).status_code, 400)
+
+    def test_comando_geocodifica_servicios_sin_ubicacion(self):
+        servicio = self._servicio('Usaquén')
+        ServicioAgendado.objects.filter(id=servicio.id).update(latitud=None, longitud=None, geohash='')
+
+        salida = io.StringIO()
+        call_command('geocodificar_servicios', lote=1, stdout=salida)
+
+        servicio.refresh_from_db()
+        self.assertEqual((servicio.latitud, servicio.longitud), (4.6946, -74.0309))
+        self.assertIn('Servicios ubicados: 1 de 1', salida.getvalue())
+
+
+class EstadosTests(TestCase):
+    """
+    Transiciones de estado con UPDATE condicional y versión
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = Usuario.objects.create_user(username='despacho', password='clave-segura-123', is_staff=True)
+        cls.cliente = Usuario.objects.create_user(username='cliente', password='clave-segura-123')
+
+    def setUp(self):
+        fecha = timezone.now() + timedelta(days=1)
+        self.pendiente, self.confirmado, self.completado = ServicioAgendado.objects.bulk_create([
+            ServicioAgendado(
+                usuario=self.cliente, tipo_servicio='residencial', descripcion='Limpieza',
+                direccion_servicio='Calle 1', fecha_servicio=fecha, estado=estado,
+            )
+            for estado in ('pendiente', 'confirmado', 'completado')
+        ])
+
+    def _estado(self, servicio):
+        return ServicioAgendado.objects.values_list('estado', 'version').get(id=servicio.id)
+
+    def test_transiciones_validas_e_invalidas(self):
+        self.assertEqual(estados.transicionar(self.pendiente.id, 'confirmado'), 2)
+        self.assertEqual(estados.transicionar(self.pendiente.id, 'en_proceso'), 3)
+        self.assertEqual(self._estado(self.pendiente), ('en_proceso', 3))
+
+        with self.assertRaises(estados.TransicionInvalida):
+            estados.transicionar(self.completado.id, 'cancelado')
+        with self.assertRaises(estados.TransicionInvalida):
+            estados.transicionar(self.confirmado.id, 'pendiente')
+        with self.assertRaises(ServicioAgendado.DoesNotExist):
+            estados.transicionar(self.pendiente.id, 'cancelado', usuario=self.staff)
+        self.assertEqual(self._estado(self.completado), ('completado', 1))
+
+    def test_un_solo_update_que_no_pisa_otras_columnas(self):
+        ServicioAgendado.objects.filter(id=self.pendiente.id).update(descripcion='Editada por el despacho')
+        with CaptureQueriesContext(connection) as consultas:
+            estados.transicionar(self.pendiente.id, 'cancelado', version=1)
+
+        # Sin SELECT previo: el UPDATE, el evento de auditoría y el aviso, en la misma transacción
+        sentencias = [c['sql'].split()[0] for c in consultas if 'SAVEPOINT' not in c['sql']]
+        self.assertEqual(sentencias, ['UPDATE', 'INSERT', 'INSERT'])
+        self.assertEqual(ServicioAgendado.objects.get(id=self.pendiente.id).descripcion, 'Editada por el despacho')
+
+    def test_version_desactualizada_es_conflicto(self):
+        # Dos clientes leyeron la versión 1; el despacho confirma primero
+        estados.transicionar(self.pendiente.id, 'confirmado', version=1)
+        with self.assertRaises(estados.ConflictoVersion) as contexto:
+            estados.transicionar(self.pendiente.id, 'cancelado', version=1)
+
+        self.assertEqual(contexto.exception.version, 2)
+        self.assertEqual(self._estado(self.pendiente), ('confirmado', 2))
+
+    def test_transicion_en_lote(self):
+        aplicados, rechazados = estados.transicionar_lote(
+            [self.pendiente.id, self.confirmado.id, self.completado.id, 999999, self.pendiente.id], 'cancelado',
+        )
+
+        self.assertEqual(aplicados, {self.pendiente.id: 2, self.confirmado.id: 2})
+        self.assertEqual(rechazados, {self.completado.id: 'completado', 999999: None})
+
+    def test_motores_sin_returning(self):
+        with mock.patch('servicios.estados._soporta_returning', return_value=False):
+            aplicados, rechazados = estados.transicionar_lote([self.pendiente.id, self.completado.id], 'cancelado')
+            with self.assertRaises(estados.ConflictoVersion):
+                estados.transicionar(self.confirmado.id, 'en_proceso', version=5)
+
+        self.assertEqual(aplicados, {self.pendiente.id: 2})
+        self.assertEqual(rechazados, {self.completado.id: 'completado'})
+
+    def test_cancelar_con_version(self):
+        self.client.force_login(self.cliente)
+        url = f'/api/servicios/cancelar/{self.pendiente.id}/'
+        estados.transicionar(self.pendiente.id, 'confirmado')
+
+        respuesta = self.client.put(url, json.dumps({'version': 1}), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(respuesta.json()['version'], 2)
+
+        respuesta = self.client.put(url, json.dumps({'version': 2}), content_type='application/json')
+        self.assertEqual(respuesta.json(), {
+            'success': True, 'message': 'Servicio cancelado exitosamente', 'version': 3,
+        })
+        self.assertEqual(self.client.put(url).status_code, 400)
+        self.assertEqual(self.client.put(f'/api/servicios/cancelar/{self.completado.id + 100}/').status_code, 404)
+
+    def test_transiciones_en_lote_solo_personal(self):
+        datos = json.dumps({'ids': [self.pendiente.id, self.completado.id], 'estado': 'confirmado'})
+        self.client.force_login(self.cliente)
+        self.assertEqual(
+            self.client.post('/api/servicios/transiciones/', datos, content_type='application/json').status_code, 403
+        )
+
+        self.client.force_login(self.staff)
+        respuesta = self.client.post('/api/servicios/transiciones/', datos, content_type='application/json').json()
+        self.assertEqual(respuesta['aplicados'], [{'id': self.pendiente.id, 'version': 2}])
+        self.assertEqual(respuesta['rechazados'], [{'id': self.completado.id, 'estado': 'completado'}])
+        invalido = json.dumps({'ids': [self.pendiente.id], 'estado': 'pendiente'})
+        self.assertEqual(
+            self.client.post('/api/servicios/transiciones/', invalido, content_type='application/json').status_code,
+            400,
+        )
+
+
+class EventosTests(TestCase):
+    """
+    Registro de auditoría de servicios, seguimientos y facturas
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = Usuario.objects.create_user(username='auditor', password='clave-segura-123', is_staff=True)
+        cls.cliente = Usuario.objects.create_user(username='cliente', password='clave-segura-123')
+
+    def _servicio(self, **campos):
+        return ServicioAgendado.objects.create(
+            usuario=self.cliente, tipo_servicio='residencial', descripcion='Limpieza',
+            direccion_servicio='Calle 1', fecha_servicio=timezone.now() + timedelta(days=1), **campos
+        )
+
+    def _eventos(self, **filtros):
+        return list(EventoServicio.objects.filter(**filtros).values_list('entidad', 'accion', 'actor_id', 'cambios'))
+
+    def test_alta_cambios_y_baja_con_autor(self):
+        servicio = self._servicio()
+        seguimiento = SeguimientoServicio.objects.create(servicio=servicio, equipo_asignado='Equipo 1')
+        seguimiento.progreso_porcentaje = 50
+        seguimiento.save()
+
+        self.client.force_login(self.cliente)
+        self.client.put(f'/api/servicios/cancelar/{servicio.id}/')
+        servicio_id = servicio.id
+        servicio.delete()
+
+        registrados = self._eventos(servicio_id=servicio_id)
+        self.assertEqual([(entidad, accion) for entidad, accion, _, _ in registrados], [
+            ('servicio', 'creado'), ('seguimiento', 'creado'), ('seguimiento', 'actualizado'),
+            ('servicio', 'actualizado'), ('seguimiento', 'eliminado'), ('servicio', 'eliminado'),
+        ])
+        self.assertEqual(registrados[0][3]['estado'], 'pendiente')
+        self.assertEqual(registrados[2][3], {'progreso_porcentaje': 50})
+        self.assertEqual(registrados[3][2:], (self.cliente.id, {'estado': 'cancelado', 'version': 2}))
+        self.assertIsNone(registrados[0][2])
+
+    def test_cambio_revertido_no_deja_evento(self):
+        servicio = self._servicio()
+        with self.assertRaises(ValueError), transaction.atomic():
+            servicio.descripcion = 'Otra'
+            servicio.save()
+            raise ValueError
+        servicio.save()
+
+        self.assertEqual(len(self._eventos(servicio_id=servicio.id)), 1)
+
+    def test_tabla_de_solo_insercion(self):
+        self._servicio()
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            EventoServicio.objects.update(accion='eliminado')
+
+    def test_lote_inserta_los_eventos_juntos(self):
+        ids = [self._servicio().id for _ in range(3)]
+        with CaptureQueriesContext(connection) as consultas:
+            estados.transicionar_lote(ids, 'confirmado')
+
+        self.assertEqual(sum(c['sql'].startswith('INSERT INTO "eventos_servicio"') for c in consultas), 1)
+        self.assertEqual(len(self._eventos(accion='actualizado', cambios__estado='confirmado')), 3)
+
+    def test_lectura_desde_cursor(self):
+        primero, segundo = self._servicio(), self._servicio()
+        self.client.force_login(self.cliente)
+        self.assertEqual(self.client.get('/api/servicios/eventos/').status_code, 403)
+
+        self.client.force_login(self.staff)
+        pagina = self.client.get('/api/servicios/eventos/', {'limite': 1}).json()
+        self.assertEqual([e['servicio_id'] for e in pagina['eventos']], [primero.id])
+        self.assertTrue(pagina['hay_mas'])
+
+        siguiente = self.client.get('/api/servicios/eventos/', {'cursor': pagina['cursor']}).json()
+        self.assertEqual([e['servicio_id'] for e in siguiente['eventos']], [segundo.id])
+        self.assertFalse(siguiente['hay_mas'])
+        self.assertEqual(siguiente['cursor'], siguiente['eventos'][0]['id'])
+        self.assertEqual(self.client.get('/api/servicios/eventos/', {'cursor': 'x'}).status_code, 400)
+
+    @override_settings(EVENTOS_RETRASO_LECTURA=5)
+    def test_lectura_deja_margen_para_transacciones_sin_confirmar(self):
+        servicio = self._servicio()
+        self.assertEqual(eventos.leer(), ([], False))
+        EventoServicio.objects.filter(servicio_id=servicio.id).delete()
+        EventoServicio.objects.create(
+            servicio_id=servicio.id, entidad='servicio', entidad_id=servicio.id, accion='creado',
+            fecha=timezone.now() - timedelta(seconds=6),
+        )
+        self.assertEqual([e['servicio_id'] for e in eventos.leer()[0]], [servicio.id])
+
+    def test_retraso_por_defecto_segun_el_motor(self):
+        with self.settings():
+            del settings.EVENTOS_RETRASO_LECTURA
+            self.assertEqual(eventos.retraso_lectura(), 0)
+            with mock.patch.object(connection, 'vendor', 'postgresql'):
+                self.assertEqual(eventos.retraso_lectura(), bd.RETRASO_EVENTOS_POSTGRESQL)
+
+    def test_poda_por_mes(self):
+        hoy = date(2024, 5, 10)
+        fechas = [datetime(2024, 2, 28), datetime(2024, 3, 1), datetime(2024, 3, 31), datetime(2024, 4, 1), datetime(2024, 5, 9)]
+        EventoServicio.objects.bulk_create([
+            EventoServicio(
+                servicio_id=1, entidad='servicio', entidad_id=1, accion='creado', fecha=timezone.make_aware(fecha),
+            )
+            for fecha in fechas
+        ])
+
+        self.assertEqual(eventos.inicio_mes_retenido(1, hoy), timezone.make_aware(datetime(2024, 4, 1)))
+        self.assertEqual(eventos.podar(meses=1, tamano_lote=1, hoy=hoy), 3)
+        self.assertEqual(
+            [timezone.localtime(f).date() for f in EventoServicio.objects.values_list('fecha', flat=True)],
+            [date(2024, 4, 1), date(2024, 5, 9)],
+        )
+
+
+class TransporteFallido(notificaciones.Transporte):
+    def enviar(self, destinatario, asunto, cuerpo):
+        raise ConnectionError('proveedor caído')
+
+
+class NotificacionesTests(TestCase):
+    """
+    Bandeja de salida de notificaciones y su worker
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Usuario.objects.create_user(
+            username='cliente', password='clave-segura-123', email='cliente@example.com', first_name='Ana',
+        )
+
+    def setUp(self):
+        notificaciones._transportes.clear()
+        self.addCleanup(notificaciones._transportes.clear)
+        hoy = timezone.localdate()
+        self.lunes = hoy + timedelta(days=7 - hoy.weekday() + 7)
+        cuadrilla = Cuadrilla.objects.create(nombre='Norte', tipos_servicio=['residencial'])
+        TurnoCuadrilla.objects.create(cuadrilla=cuadrilla, dia_semana=0, hora_inicio=time(8), hora_fin=time(17))
+        self.client.force_login(self.cliente)
+
+    def _agendar(self, hora):
+        return self.client.post('/api/servicios/agendar/', {
+            'tipo_servicio': 'residencial', 'descripcion': 'Limpieza', 'direccion_servicio': 'Calle 1',
+            'fecha_servicio': f'{self.lunes.isoformat()}T{hora}',
+        }, content_type='application/json')
+
+    def test_agendar_encola_sin_enviar(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self._agendar('08:00:00').status_code, 200)
+        self.assertEqual(sum(c['sql'].startswith('INSERT INTO "notificaciones_pendientes"') for c in consultas), 1)
+        # Rechazado por sobrecupo: la transacción no deja notificación
+        self.assertEqual(self._agendar('09:00:00').status_code, 409)
+
+        self.assertEqual(list(NotificacionPendiente.objects.values_list('tipo', 'estado', 'canales')), [
+            ('servicio_agendado', 'pendiente', ['email']),
+        ])
+        self.assertEqual(mail.outbox, [])
+
+    def test_worker_envia_y_marca_enviadas(self):
+        self._agendar('08:00:00')
+        servicio = ServicioAgendado.objects.get()
+        self.client.put(f'/api/servicios/cancelar/{servicio.id}/')
+
+        self.assertEqual(notificaciones.procesar_lote(), {'enviadas': 2, 'reintentos': 0, 'fallidas': 0})
+        self.assertEqual([m.subject for m in mail.outbox], ['Servicio agendado', 'Servicio cancelado'])
+        self.assertEqual(mail.outbox[0].to, ['cliente@example.com'])
+        self.assertIn('Hola Ana, su servicio de Servicios Residenciales', mail.outbox[0].body)
+        self.assertFalse(NotificacionPendiente.objects.exclude(estado='enviada').exists())
+        # Ya enviadas: un segundo lote no repite nada
+        self.assertEqual(notificaciones.procesar_lote(), {'enviadas': 0, 'reintentos': 0, 'fallidas': 0})
+
+    def test_reintentos_con_espera_y_fallo_definitivo(self):
+        self._agendar('08:00:00')
+        ruta = 'servicios.tests.TransporteFallido'
+        with override_settings(NOTIFICACIONES_TRANSPORTES={'email': ruta}, NOTIFICACIONES_ESPERA_BASE=60):
+            antes = timezone.now()
+            self.assertEqual(notificaciones.procesar_lote(maximo_intentos=2)['reintentos'], 1)
+            pendiente = NotificacionPendiente.objects.get()
+            self.assertEqual((pendiente.estado, pendiente.intentos), ('pendiente', 1))
+            self.assertEqual(pendiente.ultimo_error, 'email: proveedor caído')
+            self.assertGreaterEqual(pendiente.proximo_intento, antes + timedelta(seconds=54))
+
+            # Todavía no vence la espera: no se toma
+            self.assertEqual(notificaciones.procesar_lote(maximo_intentos=2)['reintentos'], 0)
+            NotificacionPendiente.objects.update(proximo_intento=timezone.now())
+            self.assertEqual(notificaciones.procesar_lote(maximo_intentos=2)['fallidas'], 1)
+
+        self.assertEqual(NotificacionPendiente.objects.get().estado, 'fallida')
+        self.assertEqual(mail.outbox, [])
+
+    def test_plantilla_invalida_no_detiene_el_lote(self):
+        self._agendar('08:00:00')
+        # Sin 'numero_factura' ni los montos en los datos
+        notificaciones.encolar([notificaciones.notificacion('factura_vencida', self.cliente.id)])
+
+        self.assertEqual(notificaciones.procesar_lote(), {'enviadas': 1, 'reintentos': 0, 'fallidas': 1})
+        fallida = NotificacionPendiente.objects.get(tipo='factura_vencida')
+        self.assertEqual(fallida.estado, 'fallida')
+        self.assertIn('numero_factura', fallida.ultimo_error)
+        self.assertEqual([m.subject for m in mail.outbox], ['Servicio agendado'])
+
+    def test_espera_exponencial_con_tope(self):
+        with override_settings(NOTIFICACIONES_ESPERA_BASE=10, NOTIFICACIONES_ESPERA_MAXIMA=60):
+            segundos = [notificaciones.espera(intentos).total_seconds() for intentos in (1, 2, 3, 10)]
+        for valor, esperado in zip(segundos, (10, 20, 40, 60)):
+            self.assertAlmostEqual(valor, esperado, delta=esperado * 0.1)
+
+    def test_lote_tomado_no_se_repite(self):
+        self._agendar('08:00:00')
+        tomadas = notificaciones.tomar_lote()
+        self.assertEqual(len(tomadas), 1)
+        # Otro worker no ve la fila hasta que vence el arriendo
+        self.assertEqual(notificaciones.tomar_lote(), [])
+        self.assertEqual(len(notificaciones.tomar_lote(ahora=timezone.now() + notificaciones.ARRIENDO * 2)), 1)
+
+    def test_canales_enviados_no_se_reintentan(self):
+        self.cliente.telefono = '3001234567'
+        self.cliente.save()
+        with override_settings(NOTIFICACIONES_CANALES=['email', 'sms'],
+                               NOTIFICACIONES_TRANSPORTES={'sms': 'servicios.tests.TransporteFallido'}):
+            self._agendar('08:00:00')
+            notificaciones.procesar_lote()
+
+        pendiente = NotificacionPendiente.objects.get()
+        self.assertEqual((pendiente.canales, pendiente.intentos), (['sms'], 1))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_transporte_archivo(self):
+        ruta = settings.BASE_DIR / 'notificaciones-prueba.jsonl'
+        self.addCleanup(ruta.unlink, missing_ok=True)
+        with override_settings(NOTIFICACIONES_ARCHIVO=ruta,
+                               NOTIFICACIONES_TRANSPORTES={'email': 'servicios.notificaciones.TransporteArchivo'}):
+            self._agendar('08:00:00')
+            salida = io.StringIO()
+            call_command('enviar_notificaciones', '--una-vez', stdout=salida)
+
+        self.assertIn('Notificaciones enviadas: 1', salida.getvalue())
+        linea = json.loads(ruta.read_text(encoding='utf-8'))
+        self.assertEqual((linea['destinatario'], linea['asunto']), ('cliente@example.com', 'Servicio agendado'))
@@ -5,6 +5,16 @@ app_name = 'servicios'
 
 urlpatterns = [
     path('agendar/', views.agendar_servicio, name='agendar'),
+    path('agendar-lote/', views.agendar_lote, name='agendar_lote'),
     path('mis-servicios/', views.mis_servicios, name='mis_servicios'),
     path('cancelar/<int:servicio_id>/', views.cancelar_servicio, name='cancelar'),
+    path('transiciones/', views.transicionar_servicios, name='transiciones'),
+    path('disponibilidad/', views.disponibilidad, name='disponibilidad'),
+    path('facturacion/resumen/', views.resumen_facturacion, name='resumen_facturacion'),
+    path('facturacion/cartera/', views.cartera, name='cartera'),
+    path('exportar/<str:tipo>/', views.exportar, name='exportar'),
+    path('buscar/', views.buscar_servicios, name='buscar'),
+    path('cuadrillas-cercanas/<int:servicio_id>/', views.cuadrillas_cercanas, name='cuadrillas_cercanas'),
+    path('rutas/', views.rutas, name='rutas'),
+    path('eventos/', views.eventos_servicios, name='eventos'),
 ]
\ No newline at end of file
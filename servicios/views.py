@@ -1,14 +1,144 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.utils import timezone
+from django.http import StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods
 from django.contrib.auth import get_user_model
-from .models import ServicioAgendado, HistorialServicio, SeguimientoServicio, FacturacionServicio
+from django.db import router
+from django.db.models import Count, F, Max, Q, Sum
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import ServicioAgendado, HistorialServicio, SeguimientoServicio, FacturacionServicio, ResumenFacturacion
+from alamosjclean.serializacion import RespuestaJSON, Serializador
+from . import agenda, busqueda, despacho, estados, eventos, exportacion, facturacion
+import base64
+import calendar
+import hashlib
 import json
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal
 
+# Límite de página por defecto y máximo para el listado paginado
+LIMITE_PAGINA_DEFECTO = 50
+LIMITE_PAGINA_MAXIMO = 200
+
+# Servicios (ya expandidas las recurrencias) admitidos en un lote
+MAXIMO_LOTE = 2000
+
+# Servicios por petición en las transiciones de estado en lote
+MAXIMO_LOTE_TRANSICIONES = 1000
+
+# Frecuencias de recurrencia del agendamiento en lote
+FRECUENCIAS_RECURRENCIA = {
+    'diaria': timedelta(days=1),
+    'semanal': timedelta(weeks=1),
+    'quincenal': timedelta(weeks=2),
+}
+
+# Columnas del servicio en las respuestas; el listado las proyecta con
+# values_list (evita instanciar modelos)
+COLUMNAS_SERVICIO = (
+    'id', 'tipo_servicio', 'descripcion', 'direccion_servicio', 'fecha_servicio',
+    'estado', 'version', 'precio_estimado', 'fecha_creacion', ('cuadrilla', 'cuadrilla__nombre'),
+)
+SERIALIZADOR_SERVICIO = Serializador(ServicioAgendado, COLUMNAS_SERVICIO)
+# La búsqueda del personal incluye el cliente de cada servicio
+SERIALIZADOR_BUSQUEDA = Serializador(ServicioAgendado, COLUMNAS_SERVICIO + (('usuario', 'usuario__username'),))
+TIPOS_SERVICIO_DISPLAY = dict(ServicioAgendado.TIPOS_SERVICIO)
+ESTADOS_PAGO_DISPLAY = dict(FacturacionServicio.ESTADOS_PAGO)
+
+# Resultados por página de la búsqueda de servicios
+BUSQUEDA_POR_PAGINA_DEFECTO = 20
+BUSQUEDA_POR_PAGINA_MAXIMO = 100
+
+# Clientes listados por defecto en el ranking de cartera vencida
+LIMITE_MOROSOS_DEFECTO = 20
+ESTADOS_SERVICIO_DISPLAY = dict(ServicioAgendado.ESTADOS_SERVICIO)
+
+# Cuadrillas sugeridas por servicio y precisiones de geohash admitidas en rutas
+CUADRILLAS_CERCANAS_DEFECTO = 3
+CUADRILLAS_CERCANAS_MAXIMO = 20
+PRECISION_RUTAS_MINIMA = 3
+PRECISION_RUTAS_MAXIMA = 7
+
+
+def _codificar_cursor(fecha_creacion, servicio_id):
+    """Codifica la posición (fecha_creacion, id) como cursor opaco"""
+    valor = f"{fecha_creacion.isoformat()}|{servicio_id}"
+    return base64.urlsafe_b64encode(valor.encode()).decode()
+
+
+def _decodificar_cursor(cursor):
+    """Decodifica un cursor; lanza ValueError si es inválido"""
+    try:
+        valor = base64.urlsafe_b64decode(cursor.encode()).decode()
+        fecha, servicio_id = valor.rsplit('|', 1)
+        fecha_creacion = parse_datetime(fecha)
+        servicio_id = int(servicio_id)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError('Cursor inválido') from e
+    if fecha_creacion is None:
+        raise ValueError('Cursor inválido')
+    return fecha_creacion, servicio_id
+
+
+def _parsear_limite_fecha(valor, fin_de_dia=False):
+    """Acepta fecha (YYYY-MM-DD) o fecha y hora ISO; lanza ValueError si es inválida"""
+    fecha_hora = parse_datetime(valor)
+    if fecha_hora is None:
+        fecha = parse_date(valor)
+        if fecha is None:
+            raise ValueError(f'Fecha inválida: {valor}')
+        fecha_hora = datetime.combine(fecha, time.max if fin_de_dia else time.min)
+    if timezone.is_naive(fecha_hora):
+        fecha_hora = timezone.make_aware(fecha_hora)
+    return fecha_hora
+
+
+def _validar_datos_servicio(data):
+    """
+    Valida los datos de un servicio a agendar y devuelve los campos del modelo;
+    lanza ValueError con el mensaje para el cliente
+    """
+    # Validar campos requeridos
+    required_fields = ['tipo_servicio', 'descripcion', 'direccion_servicio', 'fecha_servicio']
+    for field in required_fields:
+        if not data.get(field):
+            raise ValueError(f'El campo {field} es requerido')
+    
+    # Validar tipo de servicio
+    if data['tipo_servicio'] not in TIPOS_SERVICIO_DISPLAY:
+        raise ValueError('Tipo de servicio inválido')
+    
+    # Parsear fecha
+    try:
+        fecha_servicio = parse_datetime(str(data['fecha_servicio']))
+    except ValueError:
+        raise ValueError('Formato de fecha inválido')
+    if not fecha_servicio:
+        raise ValueError('Formato de fecha inválido. Use ISO format (YYYY-MM-DDTHH:MM:SS)')
+    if timezone.is_naive(fecha_servicio):
+        fecha_servicio = timezone.make_aware(fecha_servicio)
+    
+    precio_estimado = data.get('precio_estimado')
+    if precio_estimado not in (None, ''):
+        try:
+            precio_estimado = Decimal(str(precio_estimado)).quantize(Decimal('0.01'))
+        except ArithmeticError:
+            raise ValueError('Precio estimado inválido')
+    else:
+        precio_estimado = None
+    
+    return {
+        'tipo_servicio': data['tipo_servicio'],
+        'descripcion': data['descripcion'],
+        'direccion_servicio': data['direccion_servicio'],
+        'fecha_servicio': fecha_servicio,
+        'precio_estimado': precio_estimado,
+    }
+
+
 @csrf_exempt
 @login_required
 @require_http_methods(["POST"])
@@ -19,74 +149,296 @@ def agendar_servicio(request):
     try:
         data = json.loads(request.body)
         
-        # Validar campos requeridos
-        required_fields = ['tipo_servicio', 'descripcion', 'direccion_servicio', 'fecha_servicio']
-        for field in required_fields:
-            if not data.get(field):
-                return JsonResponse({
-                    'success': False,
-                    'message': f'El campo {field} es requerido'
-                }, status=400)
-        
-        # Validar tipo de servicio
-        tipos_validos = ['residencial', 'empresarial', 'especializado', 'postobra']
-        if data['tipo_servicio'] not in tipos_validos:
-            return JsonResponse({
+        try:
+            campos = _validar_datos_servicio(data)
+        except ValueError as e:
+            return RespuestaJSON({
                 'success': False,
-                'message': 'Tipo de servicio inválido'
+                'message': str(e)
             }, status=400)
         
-        # Parsear fecha
+        # Crear servicio agendado, admitido contra la capacidad de las cuadrillas
         try:
-            fecha_servicio = parse_datetime(data['fecha_servicio'])
-            if not fecha_servicio:
-                return JsonResponse({
-                    'success': False,
-                    'message': 'Formato de fecha inválido. Use ISO format (YYYY-MM-DDTHH:MM:SS)'
-                }, status=400)
-        except ValueError:
-            return JsonResponse({
+            servicio = agenda.agendar(usuario=request.user, **campos)
+        except agenda.SinDisponibilidad as e:
+            return RespuestaJSON({
                 'success': False,
-                'message': 'Formato de fecha inválido'
-            }, status=400)
-        
-        # Crear servicio agendado
-        servicio = ServicioAgendado.objects.create(
-            usuario=request.user,
-            tipo_servicio=data['tipo_servicio'],
-            descripcion=data['descripcion'],
-            direccion_servicio=data['direccion_servicio'],
-            fecha_servicio=fecha_servicio,
-            precio_estimado=data.get('precio_estimado')
-        )
+                'message': str(e)
+            }, status=409)
         
-        return JsonResponse({
+        return RespuestaJSON({
             'success': True,
             'message': 'Servicio agendado exitosamente',
-            'servicio': {
-                'id': servicio.id,
-                'tipo_servicio': servicio.get_tipo_servicio_display(),
-                'descripcion': servicio.descripcion,
-                'direccion_servicio': servicio.direccion_servicio,
-                'fecha_servicio': servicio.fecha_servicio.isoformat(),
-                'estado': servicio.get_estado_display(),
-                'precio_estimado': str(servicio.precio_estimado) if servicio.precio_estimado else None
-            }
+            'servicio': SERIALIZADOR_SERVICIO.instancia(servicio)
         })
         
     except json.JSONDecodeError:
-        return JsonResponse({
+        return RespuestaJSON({
             'success': False,
             'message': 'Datos JSON inválidos'
         }, status=400)
     except Exception as e:
-        return JsonResponse({
+        return RespuestaJSON({
             'success': False,
             'message': f'Error interno del servidor: {str(e)}'
         }, status=500)
 
+def _expandir_recurrencia(fecha_servicio, recurrencia, maximo=MAXIMO_LOTE):
+    """
+    Fechas de una regla {'frecuencia', 'repeticiones' | 'hasta'}; lanza ValueError.
+    Genera a lo sumo ``maximo`` + 1 fechas: con una más ya se sabe que no caben
+    """
+    if not isinstance(recurrencia, dict):
+        raise ValueError('Recurrencia inválida')
+    frecuencia = recurrencia.get('frecuencia')
+    if frecuencia not in FRECUENCIAS_RECURRENCIA and frecuencia != 'mensual':
+        raise ValueError('Frecuencia inválida. Use diaria, semanal, quincenal o mensual')
+    
+    if recurrencia.get('repeticiones') is not None:
+        try:
+            repeticiones = int(recurrencia['repeticiones'])
+        except (TypeError, ValueError):
+            raise ValueError('Repeticiones inválidas')
+        hasta = None
+    elif recurrencia.get('hasta'):
+        hasta = parse_date(str(recurrencia['hasta']))
+        if hasta is None:
+            raise ValueError('Fecha "hasta" inválida. Use YYYY-MM-DD')
+        repeticiones = maximo + 1
+    else:
+        raise ValueError('La recurrencia requiere "repeticiones" o "hasta"')
+    if repeticiones < 1:
+        raise ValueError('Repeticiones inválidas')
+    
+    local = timezone.localtime(fecha_servicio)
+    fechas = []
+    for n in range(min(repeticiones, maximo + 1)):
+        if frecuencia == 'mensual':
+            mes = local.month - 1 + n
+            anio, mes = local.year + mes // 12, mes % 12 + 1
+            dia = min(local.day, calendar.monthrange(anio, mes)[1])
+            fecha = timezone.make_aware(local.replace(tzinfo=None, year=anio, month=mes, day=dia))
+        else:
+            fecha = timezone.make_aware(local.replace(tzinfo=None) + FRECUENCIAS_RECURRENCIA[frecuencia] * n)
+        if hasta is not None and timezone.localtime(fecha).date() > hasta:
+            break
+        fechas.append(fecha)
+    if not fechas:
+        raise ValueError('La recurrencia no produce fechas')
+    return fechas
+
+
+def _lote_demasiado_grande():
+    return RespuestaJSON({
+        'success': False,
+        'message': f'El lote supera el máximo de {MAXIMO_LOTE} servicios'
+    }, status=400)
+
+
+@csrf_exempt
+@login_required
+@require_http_methods(["POST"])
+def agendar_lote(request):
+    """
+    Endpoint para agendar muchos servicios (con recurrencias) en una sola petición
+    """
+    try:
+        data = json.loads(request.body)
+        items = data.get('servicios') if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'El campo servicios debe ser una lista no vacía'
+            }, status=400)
+        if len(items) > MAXIMO_LOTE:
+            return _lote_demasiado_grande()
+        atomico = bool(data.get('atomico', False))
+        
+        # Validación de todo el lote en una pasada, antes de tocar la base de datos
+        resultados = []
+        pendientes = []
+        for indice, item in enumerate(items):
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError('Cada servicio debe ser un objeto')
+                campos = _validar_datos_servicio(item)
+                if item.get('recurrencia'):
+                    # Solo el cupo que queda: un lote enorme se rechaza sin expandirlo entero
+                    fechas = _expandir_recurrencia(
+                        campos['fecha_servicio'], item['recurrencia'], MAXIMO_LOTE - len(pendientes)
+                    )
+                else:
+                    fechas = [campos['fecha_servicio']]
+            except ValueError as e:
+                resultados.append({'indice': indice, 'success': False, 'message': str(e)})
+                continue
+            for fecha in fechas:
+                resultado = {'indice': indice, 'fecha_servicio': fecha.isoformat()}
+                resultados.append(resultado)
+                pendientes.append((resultado, dict(campos, usuario=request.user, fecha_servicio=fecha)))
+            if len(pendientes) > MAXIMO_LOTE:
+                return _lote_demasiado_grande()
+        
+        invalidos = len(resultados) - len(pendientes)
+        if atomico and invalidos:
+            pendientes = []
+        admitidos = agenda.agendar_lote([campos for _, campos in pendientes], atomico=atomico)
+        rechazados = sum(isinstance(admitido, agenda.SinDisponibilidad) for admitido in admitidos)
+        creados = 0
+        for (resultado, _), admitido in zip(pendientes, admitidos):
+            if isinstance(admitido, agenda.SinDisponibilidad):
+                resultado.update({'success': False, 'message': str(admitido)})
+            elif atomico and rechazados:
+                resultado.update({'success': False, 'message': 'No creado: otro servicio del lote atómico falló'})
+            else:
+                creados += 1
+                resultado.update({
+                    'success': True,
+                    'id': admitido.id,
+                    'cuadrilla': admitido.cuadrilla.nombre if admitido.cuadrilla else None
+                })
+        for resultado in resultados:
+            resultado.setdefault('success', False)
+            resultado.setdefault('message', 'No creado: otro servicio del lote atómico falló')
+        
+        return RespuestaJSON({
+            'success': creados > 0 and creados == len(resultados),
+            'creados': creados,
+            'fallidos': len(resultados) - creados,
+            'resultados': resultados
+        })
+        
+    except json.JSONDecodeError:
+        return RespuestaJSON({
+            'success': False,
+            'message': 'Datos JSON inválidos'
+        }, status=400)
+    except Exception as e:
+        return RespuestaJSON({
+            'success': False,
+            'message': f'Error interno del servidor: {str(e)}'
+        }, status=500)
+
+
+def _validador_servicios(request):
+    """
+    Calcula (última actualización, cantidad) de los servicios del usuario con una
+    sola consulta agregada sobre el índice (usuario, fecha_actualizacion).
+    Se memoriza en el request para que ETag y Last-Modified no consulten dos veces.
+    """
+    if not hasattr(request, '_validador_servicios'):
+        if request.user.is_authenticated:
+            request._validador_servicios = ServicioAgendado.objects.filter(
+                usuario=request.user
+            ).aggregate(ultima=Max('fecha_actualizacion'), cantidad=Count('id'))
+        else:
+            request._validador_servicios = None
+    return request._validador_servicios
+
+
+def _etag_mis_servicios(request):
+    validador = _validador_servicios(request)
+    if validador is None:
+        return None
+    ultima = validador['ultima'].isoformat() if validador['ultima'] else ''
+    # Los parámetros de consulta forman parte del validador: cada filtro/página es otra representación
+    base = f"{request.user.pk}|{validador['cantidad']}|{ultima}|{request.GET.urlencode()}"
+    return hashlib.md5(base.encode()).hexdigest()
+
+
+def _last_modified_mis_servicios(request):
+    validador = _validador_servicios(request)
+    return validador['ultima'] if validador else None
+
+
+def _consulta_mis_servicios(request):
+    """
+    Listado (sin evaluar) de los servicios del usuario con los filtros y el
+    cursor del request, y el límite de página (None si no se pagina); lanza
+    ValueError con el mensaje para el cliente. Lo comparten la vista síncrona y
+    la asíncrona.
+    """
+    servicios = ServicioAgendado.objects.filter(usuario=request.user)
+    
+    # Filtros opcionales
+    estado = request.GET.get('estado')
+    if estado:
+        if estado not in ESTADOS_SERVICIO_DISPLAY:
+            raise ValueError('Estado inválido')
+        servicios = servicios.filter(estado=estado)
+    
+    tipo_servicio = request.GET.get('tipo_servicio')
+    if tipo_servicio:
+        if tipo_servicio not in TIPOS_SERVICIO_DISPLAY:
+            raise ValueError('Tipo de servicio inválido')
+        servicios = servicios.filter(tipo_servicio=tipo_servicio)
+    
+    if request.GET.get('desde'):
+        servicios = servicios.filter(fecha_servicio__gte=_parsear_limite_fecha(request.GET['desde']))
+    if request.GET.get('hasta'):
+        servicios = servicios.filter(
+            fecha_servicio__lte=_parsear_limite_fecha(request.GET['hasta'], fin_de_dia=True)
+        )
+    
+    # Orden estable para la paginación por keyset (usa el índice usuario/fecha_creacion/id)
+    servicios = servicios.order_by('-fecha_creacion', '-id').values_list(*SERIALIZADOR_SERVICIO.lookups)
+    
+    # Sin 'limite' ni 'cursor' se devuelve el listado completo (compatibilidad)
+    if 'limite' not in request.GET and 'cursor' not in request.GET:
+        return servicios, None
+    
+    try:
+        limite = int(request.GET.get('limite', LIMITE_PAGINA_DEFECTO))
+    except ValueError:
+        limite = 0
+    if limite < 1:
+        raise ValueError('El límite debe ser un entero positivo')
+    limite = min(limite, LIMITE_PAGINA_MAXIMO)
+    
+    cursor = request.GET.get('cursor')
+    if cursor:
+        fecha_creacion, servicio_id = _decodificar_cursor(cursor)
+        servicios = servicios.filter(
+            Q(fecha_creacion__lt=fecha_creacion) |
+            Q(fecha_creacion=fecha_creacion, id__lt=servicio_id)
+        )
+    
+    # Se pide una fila extra para saber si hay página siguiente sin hacer COUNT(*)
+    return servicios[:limite + 1], limite
+
+
+def _datos_mis_servicios(filas, limite):
+    """Cuerpo de la respuesta de mis_servicios a partir de las filas leídas"""
+    if limite is None:
+        servicios_data = SERIALIZADOR_SERVICIO.filas(filas)
+        return {
+            'success': True,
+            'servicios': servicios_data,
+            'total': len(servicios_data)
+        }
+    
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    siguiente_cursor = None
+    if hay_mas:
+        ultima = filas[-1]
+        siguiente_cursor = _codificar_cursor(
+            ultima[SERIALIZADOR_SERVICIO.indice('fecha_creacion')], ultima[SERIALIZADOR_SERVICIO.indice('id')]
+        )
+    
+    servicios_data = SERIALIZADOR_SERVICIO.filas(filas)
+    return {
+        'success': True,
+        'servicios': servicios_data,
+        'total': len(servicios_data),
+        'siguiente_cursor': siguiente_cursor
+    }
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_mis_servicios, last_modified_func=_last_modified_mis_servicios)
 def mis_servicios(request):
     """
     Endpoint para obtener los servicios del usuario autenticado
@@ -94,69 +446,604 @@ def mis_servicios(request):
     try:
         # Verificar si el usuario está autenticado
         if not request.user.is_authenticated:
-            return JsonResponse({
+            return RespuestaJSON({
                 'success': False,
                 'message': 'Usuario no autenticado'
             }, status=401)
         
-        servicios = ServicioAgendado.objects.filter(usuario=request.user)
+        try:
+            servicios, limite = _consulta_mis_servicios(request)
+        except ValueError as e:
+            return RespuestaJSON({
+                'success': False,
+                'message': str(e)
+            }, status=400)
         
-        servicios_data = []
-        for servicio in servicios:
-            servicios_data.append({
-                'id': servicio.id,
-                'tipo_servicio': servicio.get_tipo_servicio_display(),
-                'descripcion': servicio.descripcion,
-                'direccion_servicio': servicio.direccion_servicio,
-                'fecha_servicio': servicio.fecha_servicio.isoformat(),
-                'estado': servicio.get_estado_display(),
-                'precio_estimado': str(servicio.precio_estimado) if servicio.precio_estimado else None,
-                'fecha_creacion': servicio.fecha_creacion.isoformat()
-            })
-        
-        return JsonResponse({
-            'success': True,
-            'servicios': servicios_data,
-            'total': len(servicios_data)
-        })
+        return RespuestaJSON(_datos_mis_servicios(list(servicios), limite))
         
     except Exception as e:
-        return JsonResponse({
+        return RespuestaJSON({
             'success': False,
             'message': f'Error interno del servidor: {str(e)}'
         }, status=500)
 
+
+def _version_esperada(request):
+    """
+    Versión del servicio que el cliente leyó ({"version": n} en el cuerpo,
+    opcional); lanza ValueError si es inválida
+    """
+    if not request.body:
+        return None
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        raise ValueError('Datos JSON inválidos')
+    version = data.get('version') if isinstance(data, dict) else None
+    if version is not None and (not isinstance(version, int) or isinstance(version, bool) or version < 1):
+        raise ValueError('La versión debe ser un entero positivo')
+    return version
+
+
 @csrf_exempt
 @login_required
 @require_http_methods(["PUT"])
 def cancelar_servicio(request, servicio_id):
     """
-    Endpoint para cancelar un servicio agendado
+    Endpoint para cancelar un servicio agendado. Con la versión leída del
+    servicio, la cancelación se rechaza (409) si cambió de estado entretanto.
     """
     try:
-        servicio = ServicioAgendado.objects.get(id=servicio_id, usuario=request.user)
+        try:
+            version = _version_esperada(request)
+        except ValueError as e:
+            return RespuestaJSON({
+                'success': False,
+                'message': str(e)
+            }, status=400)
         
-        if servicio.estado in ['completado', 'cancelado']:
-            return JsonResponse({
+        try:
+            version = estados.transicionar(servicio_id, 'cancelado', version=version, usuario=request.user)
+        except estados.TransicionInvalida:
+            return RespuestaJSON({
                 'success': False,
                 'message': 'No se puede cancelar un servicio completado o ya cancelado'
             }, status=400)
+        except estados.ConflictoVersion as e:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'El servicio cambió de estado; vuelva a consultarlo',
+                'version': e.version
+            }, status=409)
         
-        servicio.estado = 'cancelado'
-        servicio.save()
-        
-        return JsonResponse({
+        return RespuestaJSON({
             'success': True,
-            'message': 'Servicio cancelado exitosamente'
+            'message': 'Servicio cancelado exitosamente',
+            'version': version
         })
         
     except ServicioAgendado.DoesNotExist:
-        return JsonResponse({
+        return RespuestaJSON({
             'success': False,
             'message': 'Servicio no encontrado'
         }, status=404)
     except Exception as e:
-        return JsonResponse({
+        return RespuestaJSON({
+            'success': False,
+            'message': f'Error interno del servidor: {str(e)}'
+        }, status=500)
+
+
+@csrf_exempt
+@login_required
+@require_http_methods(["POST"])
+def transicionar_servicios(request):
+    """
+    Endpoint para el personal: pasa muchos servicios a un estado
+    ({"ids": [...], "estado": "confirmado"}) sin bloquearlos. Responde los
+    aplicados con su nueva versión y los rechazados con su estado actual.
+    """
+    try:
+        if not request.user.is_staff:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'No autorizado'
+            }, status=403)
+        
+        data = json.loads(request.body)
+        ids = data.get('ids') if isinstance(data, dict) else None
+        destino = data.get('estado') if isinstance(data, dict) else None
+        if (
+            not isinstance(ids, list) or not ids
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)
+        ):
+            return RespuestaJSON({
+                'success': False,
+                'message': 'El campo ids debe ser una lista no vacía de enteros'
+            }, status=400)
+        if len(ids) > MAXIMO_LOTE_TRANSICIONES:
+            return RespuestaJSON({
+                'success': False,
+                'message': f'Máximo {MAXIMO_LOTE_TRANSICIONES} servicios por petición'
+            }, status=400)
+        if destino not in estados.ORIGENES or not estados.ORIGENES[destino]:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'Estado de destino inválido'
+            }, status=400)
+        
+        aplicados, rechazados = estados.transicionar_lote(ids, destino)
+        return RespuestaJSON({
+            'success': True,
+            'aplicados': [{'id': i, 'version': version} for i, version in aplicados.items()],
+            'rechazados': [{'id': i, 'estado': estado} for i, estado in rechazados.items()]
+        })
+        
+    except json.JSONDecodeError:
+        return RespuestaJSON({
+            'success': False,
+            'message': 'Datos JSON inválidos'
+        }, status=400)
+    except Exception as e:
+        return RespuestaJSON({
+            'success': False,
+            'message': f'Error interno del servidor: {str(e)}'
+        }, status=500)
+
+
+@require_http_methods(["GET"])
+def disponibilidad(request):
+    """
+    Endpoint con los horarios libres de un tipo de servicio (por defecto, una semana)
+    """
+    try:
+        tipo_servicio = request.GET.get('tipo_servicio')
+        if tipo_servicio not in TIPOS_SERVICIO_DISPLAY:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'Tipo de servicio inválido'
+            }, status=400)
+        
+        desde = parse_date(request.GET['desde']) if request.GET.get('desde') else timezone.localdate()
+        if desde is None:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'Formato de fecha inválido. Use YYYY-MM-DD'
+            }, status=400)
+        
+        try:
+            dias = int(request.GET.get('dias', 7))
+            limite = int(request.GET['limite']) if request.GET.get('limite') else None
+        except ValueError:
+            dias, limite = 0, None
+        if not 1 <= dias <= agenda.MAXIMO_DIAS_DISPONIBILIDAD or (limite is not None and limite < 1):
+            return RespuestaJSON({
+                'success': False,
+                'message': f'dias debe estar entre 1 y {agenda.MAXIMO_DIAS_DISPONIBILIDAD} y limite ser positivo'
+            }, status=400)
+        
+        horarios = agenda.horarios_disponibles(tipo_servicio, desde, dias=dias, limite=limite)
+        return RespuestaJSON({
+            'success': True,
+            'tipo_servicio': tipo_servicio,
+            'duracion_minutos': int(agenda.duracion_servicio(tipo_servicio).total_seconds() // 60),
+            'horarios': [
+                {
+                    'inicio': horario['inicio'].isoformat(),
+                    'fin': horario['fin'].isoformat(),
+                    'cuadrillas_libres': horario['cuadrillas_libres']
+                }
+                for horario in horarios
+            ]
+        })
+        
+    except Exception as e:
+        return RespuestaJSON({
+            'success': False,
+            'message': f'Error interno del servidor: {str(e)}'
+        }, status=500)
+
+
+def _parsear_mes(valor):
+    """Convierte YYYY-MM en el primer día del mes; lanza ValueError si es inválido"""
+    try:
+        anio, mes = (int(parte) for parte in valor.split('-'))
+        return date(anio, mes, 1)
+    except (TypeError, ValueError):
+        raise ValueError(f'Mes inválido: {valor}. Use YYYY-MM')
+
+
+def _rango_meses(request):
+    desde = _parsear_mes(request.GET['desde']) if request.GET.get('desde') else None
+    hasta = _parsear_mes(request.GET['hasta']) if request.GET.get('hasta') else None
+    return desde, hasta
+
+
+def _monto(valor):
+    return str(Decimal(valor or 0).quantize(Decimal('0.01')))
+
+
+def _cartera_a_dict(por_estado, por_mes, recaudo):
+    """Serializa los totales calculados por facturacion.cartera()"""
+    estados = {}
+    total_pendiente = Decimal('0')
+    for estado, fila in por_estado.items():
+        pendiente = fila['total'] - fila['pagado']
+        total_pendiente += pendiente
+        estados[estado] = {
+            'nombre': ESTADOS_PAGO_DISPLAY.get(estado, estado),
+            'cantidad': fila['facturas'],
+            'monto_total': _monto(fila['total']),
+            'monto_pagado': _monto(fila['pagado']),
+            'monto_pendiente': _monto(pendiente),
+        }
+    return {
+        'total_pendiente': _monto(total_pendiente),
+        'total_vencido': estados.get('vencido', {}).get('monto_pendiente', _monto(None)),
+        'por_estado': estados,
+        'por_mes': [
+            {
+                'mes': fila['mes'].strftime('%Y-%m'),
+                'cantidad': fila['facturas'],
+                'monto_total': _monto(fila['total']),
+                'monto_pagado': _monto(fila['pagado']),
+                'monto_pendiente': _monto(fila['total'] - fila['pagado']),
+                'monto_vencido': _monto(fila['vencido']),
+            }
+            for fila in por_mes
+        ],
+        'recaudo_mensual': [
+            {'mes': fila['mes'].strftime('%Y-%m'), 'cantidad': fila['facturas'], 'monto_pagado': _monto(fila['pagado'])}
+            for fila in recaudo
+        ],
+    }
+
+
+@login_required
+@require_http_methods(["GET"])
+def resumen_facturacion(request):
+    """
+    Endpoint con la cartera del usuario autenticado (desde los resúmenes, sin
+    recorrer sus facturas). Filtros opcionales desde/hasta en formato YYYY-MM.
+    """
+    try:
+        try:
+            desde, hasta = _rango_meses(request)
+        except ValueError as e:
+            return RespuestaJSON({
+                'success': False,
+                'message': str(e)
+            }, status=400)
+        
+        por_estado, por_mes, recaudo = facturacion.cartera(request.user.id, desde, hasta)
+        return RespuestaJSON({
+            'success': True,
+            **_cartera_a_dict(por_estado, por_mes, recaudo)
+        })
+        
+    except Exception as e:
+        return RespuestaJSON({
+            'success': False,
+            'message': f'Error interno del servidor: {str(e)}'
+        }, status=500)
+
+
+@login_required
+@require_http_methods(["GET"])
+def cartera(request):
+    """
+    Endpoint de cartera global para el personal: totales por estado y mes,
+    recaudo mensual y clientes con mayor saldo vencido
+    """
+    try:
+        if not request.user.is_staff:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'No autorizado'
+            }, status=403)
+        
+        try:
+            desde, hasta = _rango_meses(request)
+            limite = int(request.GET.get('limite', LIMITE_MOROSOS_DEFECTO))
+            if limite < 1:
+                raise ValueError('El límite debe ser un entero positivo')
+        except ValueError as e:
+            return RespuestaJSON({
+                'success': False,
+                'message': str(e)
+            }, status=400)
+        
+        por_estado, por_mes, recaudo = facturacion.cartera(None, desde, hasta)
+        
+        vencidos = ResumenFacturacion.objects.filter(estado_pago='vencido')
+        if desde:
+            vencidos = vencidos.filter(mes__gte=desde)
+        if hasta:
+            vencidos = vencidos.filter(mes__lte=hasta)
+        morosos = vencidos.values('usuario_id', 'usuario__username').annotate(
+            cantidad=Sum('cantidad'),
+            monto_vencido=Sum(F('monto_total') - F('monto_pagado')),
+        ).order_by('-monto_vencido')[:limite]
+        
+        return RespuestaJSON({
+            'success': True,
+            **_cartera_a_dict(por_estado, por_mes, recaudo),
+            'clientes_vencidos': [
+                {
+                    'usuario_id': fila['usuario_id'],
+                    'username': fila['usuario__username'],
+                    'cantidad': fila['cantidad'],
+                    'monto_vencido': _monto(fila['monto_vencido']),
+                }
+                for fila in morosos
+            ]
+        })
+        
+    except Exception as e:
+        return RespuestaJSON({
+            'success': False,
+            'message': f'Error interno del servidor: {str(e)}'
+        }, status=500)
+
+
+def _parsear_fecha(valor):
+    """Convierte YYYY-MM-DD en fecha; lanza ValueError si es inválida"""
+    fecha = parse_date(valor) if valor else None
+    if fecha is None:
+        raise ValueError(f'Fecha inválida: {valor}. Use YYYY-MM-DD')
+    return fecha
+
+
+@login_required
+@require_http_methods(["GET"])
+def exportar(request, tipo):
+    """
+    Descarga en streaming (CSV o XLSX) de servicios, historial o facturas para
+    el personal, filtrable por rango de fechas con desde/hasta (YYYY-MM-DD)
+    """
+    try:
+        if not request.user.is_staff:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'No autorizado'
+            }, status=403)
+        
+        formato = request.GET.get('formato', 'csv')
+        if tipo not in exportacion.EXPORTACIONES or formato not in exportacion.FORMATOS:
+            return RespuestaJSON({
+                'success': False,
+                'message': f'Exportación no disponible: {tipo}.{formato}'
+            }, status=404)
+        
+        try:
+            desde = _parsear_fecha(request.GET['desde']) if request.GET.get('desde') else None
+            hasta = _parsear_fecha(request.GET['hasta']) if request.GET.get('hasta') else None
+        except ValueError as e:
+            return RespuestaJSON({
+                'success': False,
+                'message': str(e)
+            }, status=400)
+        
+        _, content_type = exportacion.FORMATOS[formato]
+        response = StreamingHttpResponse(
+            exportacion.exportar(tipo, formato, desde, hasta), content_type=content_type
+        )
+        nombre = f'{tipo}_{timezone.localdate():%Y%m%d}.{formato}'
+        response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+        return response
+        
+    except Exception as e:
+        return RespuestaJSON({
+            'success': False,
+            'message': f'Error interno del servidor: {str(e)}'
+        }, status=500)
+
+
+@login_required
+@require_http_methods(["GET"])
+def buscar_servicios(request):
+    """
+    Búsqueda de servicios para el personal por palabras de la descripción o de
+    la dirección (q), ordenada por relevancia, paginada con pagina/por_pagina y
+    filtrable por estado
+    """
+    try:
+        if not request.user.is_staff:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'No autorizado'
+            }, status=403)
+        
+        consulta = request.GET.get('q', '')
+        estado = request.GET.get('estado') or None
+        try:
+            if not busqueda.terminos(consulta):
+                raise ValueError('La búsqueda (q) debe tener al menos una palabra')
+            if estado and estado not in ESTADOS_SERVICIO_DISPLAY:
+                raise ValueError('Estado inválido')
+            try:
+                pagina = int(request.GET.get('pagina', 1))
+                por_pagina = int(request.GET.get('por_pagina', BUSQUEDA_POR_PAGINA_DEFECTO))
+            except ValueError:
+                pagina = por_pagina = 0
+            if pagina < 1 or por_pagina < 1:
+                raise ValueError('pagina y por_pagina deben ser enteros positivos')
+            por_pagina = min(por_pagina, BUSQUEDA_POR_PAGINA_MAXIMO)
+        except ValueError as e:
+            return RespuestaJSON({
+                'success': False,
+                'message': str(e)
+            }, status=400)
+        
+        # Ids por relevancia (con uno extra para saber si hay más) y luego sus
+        # columnas, las dos lecturas en la misma base
+        using = router.db_for_read(ServicioAgendado)
+        ids = busqueda.buscar(consulta, por_pagina + 1, (pagina - 1) * por_pagina, estado, using=using)
+        hay_mas = len(ids) > por_pagina
+        ids = ids[:por_pagina]
+        filas = {
+            fila[0]: fila
+            for fila in ServicioAgendado.objects.using(using).filter(id__in=ids).values_list(
+                *SERIALIZADOR_BUSQUEDA.lookups
+            )
+        }
+        
+        return RespuestaJSON({
+            'success': True,
+            'servicios': SERIALIZADOR_BUSQUEDA.filas(filas[i] for i in ids if i in filas),
+            'pagina': pagina,
+            'por_pagina': por_pagina,
+            'hay_mas': hay_mas
+        })
+        
+    except Exception as e:
+        return RespuestaJSON({
+            'success': False,
+            'message': f'Error interno del servidor: {str(e)}'
+        }, status=500)
+
+
+@login_required
+@require_http_methods(["GET"])
+def cuadrillas_cercanas(request, servicio_id):
+    """
+    Endpoint para el personal: cuadrillas activas más cercanas a la dirección
+    del servicio que atienden su tipo, con la distancia en km
+    """
+    try:
+        if not request.user.is_staff:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'No autorizado'
+            }, status=403)
+        
+        servicio = ServicioAgendado.objects.filter(id=servicio_id).first()
+        if servicio is None:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'Servicio no encontrado'
+            }, status=404)
+        
+        try:
+            cantidad = int(request.GET.get('cantidad', CUADRILLAS_CERCANAS_DEFECTO))
+            if cantidad < 1:
+                raise ValueError
+        except ValueError:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'La cantidad debe ser un entero positivo'
+            }, status=400)
+        
+        if not servicio.geohash:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'No se pudo ubicar la dirección del servicio'
+            }, status=400)
+        
+        cuadrillas = despacho.cuadrillas_cercanas(
+            servicio.latitud, servicio.longitud, servicio.tipo_servicio,
+            min(cantidad, CUADRILLAS_CERCANAS_MAXIMO),
+        )
+        return RespuestaJSON({
+            'success': True,
+            'servicio': {
+                'id': servicio.id,
+                'latitud': servicio.latitud,
+                'longitud': servicio.longitud,
+            },
+            'cuadrillas': cuadrillas
+        })
+        
+    except Exception as e:
+        return RespuestaJSON({
+            'success': False,
+            'message': f'Error interno del servidor: {str(e)}'
+        }, status=500)
+
+
+@login_required
+@require_http_methods(["GET"])
+def rutas(request):
+    """
+    Endpoint para el personal: servicios del día (fecha, YYYY-MM-DD; hoy por
+    defecto) agrupados por zona, cada zona con la cuadrilla más cercana
+    """
+    try:
+        if not request.user.is_staff:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'No autorizado'
+            }, status=403)
+        
+        try:
+            dia = _parsear_fecha(request.GET['fecha']) if request.GET.get('fecha') else timezone.localdate()
+            try:
+                precision = int(request.GET.get('precision', despacho.PRECISION_RUTAS_DEFECTO))
+            except ValueError:
+                precision = 0
+            if not PRECISION_RUTAS_MINIMA <= precision <= PRECISION_RUTAS_MAXIMA:
+                raise ValueError(
+                    f'La precisión debe estar entre {PRECISION_RUTAS_MINIMA} y {PRECISION_RUTAS_MAXIMA}'
+                )
+        except ValueError as e:
+            return RespuestaJSON({
+                'success': False,
+                'message': str(e)
+            }, status=400)
+        
+        rutas_dia, sin_ubicacion = despacho.rutas_del_dia(dia, precision)
+        return RespuestaJSON({
+            'success': True,
+            'fecha': dia.isoformat(),
+            'precision': precision,
+            'rutas': rutas_dia,
+            'sin_ubicacion': sin_ubicacion
+        })
+        
+    except Exception as e:
+        return RespuestaJSON({
+            'success': False,
+            'message': f'Error interno del servidor: {str(e)}'
+        }, status=500)
+
+
+@login_required
+@require_http_methods(["GET"])
+def eventos_servicios(request):
+    """
+    Endpoint para el personal: eventos de auditoría posteriores al cursor (el
+    id del último evento procesado), en orden, opcionalmente de un servicio.
+    La respuesta trae el cursor desde el que seguir leyendo.
+    """
+    try:
+        if not request.user.is_staff:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'No autorizado'
+            }, status=403)
+        
+        try:
+            cursor = int(request.GET.get('cursor', 0))
+            limite = int(request.GET.get('limite', eventos.LIMITE_LECTURA_DEFECTO))
+            servicio_id = int(request.GET['servicio']) if request.GET.get('servicio') else None
+            if cursor < 0 or limite < 1:
+                raise ValueError
+        except ValueError:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'cursor, limite y servicio deben ser enteros (limite positivo)'
+            }, status=400)
+        
+        lista, hay_mas = eventos.leer(cursor, min(limite, eventos.LIMITE_LECTURA_MAXIMO), servicio_id)
+        return RespuestaJSON({
+            'success': True,
+            'eventos': lista,
+            'cursor': lista[-1]['id'] if lista else cursor,
+            'hay_mas': hay_mas
+        })
+        
+    except Exception as e:
+        return RespuestaJSON({
             'success': False,
             'message': f'Error interno del servidor: {str(e)}'
         }, status=500)
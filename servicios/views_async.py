@@ -0,0 +1,164 @@
+"""
+Versiones asíncronas de agendar_servicio, mis_servicios y cancelar_servicio
+para el perfil ASGI (``alamosjclean.urls_asgi``).
+
+Validan y arman las consultas con las mismas funciones que las vistas de
+``views`` y leen con el ORM asíncrono (``async for``, ``afirst``). La admisión
+de ``agenda.agendar`` necesita una transacción con bloqueos y la cancelación
+es un UPDATE condicional sobre el cursor (``estados.aplicar``); el ORM
+asíncrono no ofrece ninguna de las dos, así que se ejecutan con
+``sync_to_async``.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import router
+
+from alamosjclean.asincrono import (
+    cargar_usuario, condicion, control_cache, exento_csrf, requiere_login, requiere_metodos,
+)
+from alamosjclean.serializacion import RespuestaJSON
+
+from . import agenda, estados
+from .models import ServicioAgendado
+from .views import (
+    SERIALIZADOR_SERVICIO, _consulta_mis_servicios, _datos_mis_servicios, _etag_mis_servicios,
+    _last_modified_mis_servicios, _validar_datos_servicio, _version_esperada,
+)
+
+
+@exento_csrf
+@requiere_login
+@requiere_metodos(["POST"])
+async def agendar_servicio(request):
+    """
+    Endpoint para agendar un nuevo servicio
+    """
+    try:
+        data = json.loads(request.body)
+
+        try:
+            campos = _validar_datos_servicio(data)
+        except ValueError as e:
+            return RespuestaJSON({
+                'success': False,
+                'message': str(e)
+            }, status=400)
+
+        # Crear servicio agendado, admitido contra la capacidad de las cuadrillas
+        try:
+            servicio = await sync_to_async(agenda.agendar)(usuario=request.user, **campos)
+        except agenda.SinDisponibilidad as e:
+            return RespuestaJSON({
+                'success': False,
+                'message': str(e)
+            }, status=409)
+
+        return RespuestaJSON({
+            'success': True,
+            'message': 'Servicio agendado exitosamente',
+            'servicio': SERIALIZADOR_SERVICIO.instancia(servicio)
+        })
+
+    except json.JSONDecodeError:
+        return RespuestaJSON({
+            'success': False,
+            'message': 'Datos JSON inválidos'
+        }, status=400)
+    except Exception as e:
+        return RespuestaJSON({
+            'success': False,
+            'message': f'Error interno del servidor: {str(e)}'
+        }, status=500)
+
+
+@exento_csrf
+@requiere_metodos(["GET"])
+@control_cache(private=True, no_cache=True)
+@condicion(etag_func=_etag_mis_servicios, last_modified_func=_last_modified_mis_servicios)
+async def mis_servicios(request):
+    """
+    Endpoint para obtener los servicios del usuario autenticado
+    """
+    try:
+        usuario = await cargar_usuario(request)
+        if not usuario.is_authenticated:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'Usuario no autenticado'
+            }, status=401)
+
+        try:
+            servicios, limite = _consulta_mis_servicios(request)
+        except ValueError as e:
+            return RespuestaJSON({
+                'success': False,
+                'message': str(e)
+            }, status=400)
+
+        filas = [fila async for fila in servicios]
+        return RespuestaJSON(_datos_mis_servicios(filas, limite))
+
+    except Exception as e:
+        return RespuestaJSON({
+            'success': False,
+            'message': f'Error interno del servidor: {str(e)}'
+        }, status=500)
+
+
+@exento_csrf
+@requiere_login
+@requiere_metodos(["PUT"])
+async def cancelar_servicio(request, servicio_id):
+    """
+    Endpoint para cancelar un servicio agendado. Con la versión leída del
+    servicio, la cancelación se rechaza (409) si cambió de estado entretanto.
+    """
+    try:
+        try:
+            version = _version_esperada(request)
+        except ValueError as e:
+            return RespuestaJSON({
+                'success': False,
+                'message': str(e)
+            }, status=400)
+
+        # El UPDATE condicional usa el cursor directamente, sin equivalente asíncrono
+        try:
+            nueva = await sync_to_async(estados.aplicar)(
+                servicio_id, 'cancelado', version=version, usuario=request.user,
+            )
+            if nueva is None:
+                # No se aplicó: la lectura que lo explica sí va por el ORM asíncrono
+                actual = await ServicioAgendado.objects.using(router.db_for_write(ServicioAgendado)).filter(
+                    id=servicio_id, usuario=request.user,
+                ).values_list('estado', 'version').afirst()
+                raise estados.rechazo(actual, 'cancelado')
+        except estados.TransicionInvalida:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'No se puede cancelar un servicio completado o ya cancelado'
+            }, status=400)
+        except estados.ConflictoVersion as e:
+            return RespuestaJSON({
+                'success': False,
+                'message': 'El servicio cambió de estado; vuelva a consultarlo',
+                'version': e.version
+            }, status=409)
+
+        return RespuestaJSON({
+            'success': True,
+            'message': 'Servicio cancelado exitosamente',
+            'version': nueva
+        })
+
+    except ServicioAgendado.DoesNotExist:
+        return RespuestaJSON({
+            'success': False,
+            'message': 'Servicio no encontrado'
+        }, status=404)
+    except Exception as e:
+        return RespuestaJSON({
+            'success': False,
+            'message': f'Error interno del servidor: {str(e)}'
+        }, status=500)